@@ -60,6 +60,9 @@ autodoc_default_options = {
 }
 autodoc_member_order = "bysource"
 autodoc_typehints = "description"
+# `abnf.vectorized` imports NumPy, an optional dependency the doc build does
+# not need for anything else.
+autodoc_mock_imports = ["numpy"]
 
 intersphinx_mapping = {
     "python": ("https://docs.python.org/3", None),
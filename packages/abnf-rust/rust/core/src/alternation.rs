@@ -9,36 +9,148 @@
 //!   longest match.
 //! * `true`: yield matches from the first successful alternative and
 //!   stop scanning the remaining ones.
+//!
+//! Either mode can be made adaptive: see [`Alternation::set_adaptive`].
 
-use std::sync::atomic::{AtomicBool, Ordering};
+use std::sync::atomic::{AtomicBool, AtomicU64, Ordering};
+use std::sync::RwLock;
 
 use smallvec::SmallVec;
 
+use crate::analysis::{first_set, grammar_generation, FactsCell};
 use crate::concatenation::sort_by_longest;
 use crate::error::ParseError;
 use crate::parser::{ArcParser, MatchList, ParseResult, Src};
 
+/// How many parses an adaptive `Alternation` makes between
+/// reorderings.
+const REORDER_PERIOD: u64 = 256;
+
 #[derive(Debug)]
 pub struct Alternation {
     pub parsers: Vec<ArcParser>,
     first_match: AtomicBool,
+    adaptive: AtomicBool,
+    /// Try the alternatives in `order` without counting; see
+    /// [`Alternation::set_ordered`].
+    ordered: AtomicBool,
+    /// How many times each alternative has matched, in `parsers`
+    /// order.  Counted only while adaptive.
+    hits: Vec<AtomicU64>,
+    calls: AtomicU64,
+    /// The order adaptive parses try alternatives in.
+    order: RwLock<Vec<usize>>,
+    /// For each alternative, the others that cannot match where it
+    /// does, and the grammar generation that was worked out for.
+    exclusive: RwLock<Option<(u64, Vec<Vec<usize>>)>>,
+    /// What the grammar says about any match; see `lparse`.
+    facts: FactsCell,
 }
 
 impl Alternation {
     pub fn new(parsers: Vec<ArcParser>) -> Self {
-        Self {
-            parsers,
-            first_match: AtomicBool::new(false),
-        }
+        Self::with_first_match(parsers, false)
     }
 
     pub fn with_first_match(parsers: Vec<ArcParser>, first_match: bool) -> Self {
+        let count = parsers.len();
         Self {
             parsers,
             first_match: AtomicBool::new(first_match),
+            adaptive: AtomicBool::new(false),
+            ordered: AtomicBool::new(false),
+            hits: (0..count).map(|_| AtomicU64::new(0)).collect(),
+            calls: AtomicU64::new(0),
+            order: RwLock::new((0..count).collect()),
+            exclusive: RwLock::new(None),
+            facts: FactsCell::default(),
         }
     }
 
+    pub fn adaptive(&self) -> bool {
+        self.adaptive.load(Ordering::Relaxed)
+    }
+
+    /// Opt in to counting how often each alternative matches and
+    /// trying the likeliest first.  Results are unchanged: the order
+    /// only decides what can be skipped.
+    pub fn set_adaptive(&self, value: bool) {
+        self.adaptive.store(value, Ordering::Relaxed);
+    }
+
+    pub fn ordered(&self) -> bool {
+        self.ordered.load(Ordering::Relaxed)
+    }
+
+    /// Try the alternatives in the order [`Alternation::hits`] gives,
+    /// without counting: what `Rule.specialize` sets from a profile.
+    pub fn set_ordered(&self, value: bool) {
+        self.ordered.store(value, Ordering::Relaxed);
+    }
+
+    /// Match counts, one per alternative.
+    pub fn hits(&self) -> Vec<u64> {
+        self.hits.iter().map(|h| h.load(Ordering::Relaxed)).collect()
+    }
+
+    /// Replace the match counts -- saved from another process, say --
+    /// and reorder to suit.  Returns `false`, changing nothing, if
+    /// there is not one count per alternative.
+    pub fn set_hits(&self, hits: &[u64]) -> bool {
+        if hits.len() != self.hits.len() {
+            return false;
+        }
+        for (slot, value) in self.hits.iter().zip(hits) {
+            slot.store(*value, Ordering::Relaxed);
+        }
+        self.reorder();
+        true
+    }
+
+    fn reorder(&self) {
+        let hits = self.hits();
+        let mut order: Vec<usize> = (0..hits.len()).collect();
+        // Stable: alternatives matched equally often keep declaration
+        // order.
+        order.sort_by_key(|&i| std::cmp::Reverse(hits[i]));
+        *self.order.write().unwrap_or_else(|e| e.into_inner()) = order;
+    }
+
+    /// Which alternatives exclude which.  Two that cannot match the
+    /// empty string, and whose matches cannot start with the same code
+    /// point, never both match at one offset.
+    fn exclusive(&self) -> Vec<Vec<usize>> {
+        let generation = grammar_generation();
+        {
+            let guard = self.exclusive.read().unwrap_or_else(|e| e.into_inner());
+            if let Some((g, exclusive)) = guard.as_ref() {
+                if *g == generation {
+                    return exclusive.clone();
+                }
+            }
+        }
+        let firsts: Vec<_> = self.parsers.iter().map(|p| first_set(p)).collect();
+        let exclusive: Vec<Vec<usize>> = firsts
+            .iter()
+            .enumerate()
+            .map(|(i, ours)| {
+                firsts
+                    .iter()
+                    .enumerate()
+                    .filter(|(j, theirs)| {
+                        *j != i
+                            && !(ours.nullable || theirs.nullable)
+                            && ours.chars.is_disjoint(&theirs.chars)
+                    })
+                    .map(|(j, _)| j)
+                    .collect()
+            })
+            .collect();
+        *self.exclusive.write().unwrap_or_else(|e| e.into_inner()) =
+            Some((generation, exclusive.clone()));
+        exclusive
+    }
+
     pub fn first_match(&self) -> bool {
         self.first_match.load(Ordering::Relaxed)
     }
@@ -47,7 +159,36 @@ impl Alternation {
         self.first_match.store(value, Ordering::Relaxed);
     }
 
+    /// Whether at most one alternative can match at any offset, so
+    /// that longest match stops at the first that does.  See
+    /// [`crate::analysis::prefix_free`].
+    pub fn prefix_free(&self) -> bool {
+        self.facts.read(
+            || Alternation::new(self.parsers.clone()).into(),
+            |facts| facts.prefix_free,
+        )
+    }
+
     pub fn lparse(&self, source: Src<'_>, start: usize) -> ParseResult {
+        if self.adaptive() || self.ordered() {
+            return self.lparse_adaptive(source, start);
+        }
+        let (deterministic, prefix_free) = self.facts.read(
+            || Alternation::new(self.parsers.clone()).into(),
+            |facts| (facts.deterministic, facts.prefix_free),
+        );
+        if deterministic {
+            // At most one alternative can match, and that one only one
+            // way, so the first to match is the answer.
+            for p in &self.parsers {
+                if let Ok(ms) = p.lparse(source, start) {
+                    if !ms.is_empty() {
+                        return Ok(ms);
+                    }
+                }
+            }
+            return Err(ParseError::new("Alternation", start));
+        }
         let mut all: MatchList = SmallVec::new();
         let mut found = false;
         let first_match = self.first_match();
@@ -71,6 +212,11 @@ impl Alternation {
                     Ok(SmallVec::new())
                 };
             }
+            if found && prefix_free {
+                // The alternatives after this one cannot match here, so
+                // longest match gets nothing more from trying them.
+                break;
+            }
         }
         if found {
             // Sort longest-first so downstream consumers (notably
@@ -87,4 +233,166 @@ impl Alternation {
             Err(ParseError::new("Alternation", start))
         }
     }
+
+    /// `lparse`, trying the alternatives that match most often first.
+    ///
+    /// The order is not allowed to show: the result is assembled in
+    /// declaration order exactly as `lparse` does.  What it buys is
+    /// skipping, so only an alternation that can stop early is
+    /// reordered.  Under first match no alternative declared after one
+    /// that matched can win, and in a prefix-free alternation none other
+    /// can match at all -- so trying the usual winner first usually
+    /// means trying nothing else.  Any other alternation is tried in
+    /// declaration order, and only counted.
+    fn lparse_adaptive(&self, source: Src<'_>, start: usize) -> ParseResult {
+        let exclusive = self.exclusive();
+        let counting = self.adaptive();
+        if counting
+            && self.calls.fetch_add(1, Ordering::Relaxed) % REORDER_PERIOD == REORDER_PERIOD - 1
+        {
+            self.reorder();
+        }
+        let (deterministic, prefix_free) = self.facts.read(
+            || Alternation::new(self.parsers.clone()).into(),
+            |facts| (facts.deterministic, facts.prefix_free),
+        );
+        let first_match = self.first_match();
+        let count = self.parsers.len();
+        let order: Vec<usize> = if first_match || prefix_free {
+            self.order.read().unwrap_or_else(|e| e.into_inner()).clone()
+        } else {
+            (0..count).collect()
+        };
+        if deterministic {
+            for index in order {
+                if let Ok(ms) = self.parsers[index].lparse(source, start) {
+                    if !ms.is_empty() {
+                        if counting {
+                            self.hits[index].fetch_add(1, Ordering::Relaxed);
+                        }
+                        return Ok(ms);
+                    }
+                }
+            }
+            return Err(ParseError::new("Alternation", start));
+        }
+        let mut results: Vec<Option<MatchList>> = (0..count).map(|_| None).collect();
+        let mut skip = vec![false; count];
+        let mut winner = count;
+        for index in order {
+            if skip[index] || (first_match && index > winner) {
+                continue;
+            }
+            let Ok(ms) = self.parsers[index].lparse(source, start) else {
+                continue;
+            };
+            if counting {
+                self.hits[index].fetch_add(1, Ordering::Relaxed);
+            }
+            winner = winner.min(index);
+            let matched = !ms.is_empty();
+            results[index] = Some(ms);
+            if prefix_free && matched {
+                // No other alternative can match here.
+                break;
+            }
+            for &other in &exclusive[index] {
+                skip[other] = true;
+            }
+        }
+        if first_match {
+            return match results.get_mut(winner).and_then(Option::take) {
+                Some(ms) => Ok(ms),
+                None => Err(ParseError::new("Alternation", start)),
+            };
+        }
+        let mut all: MatchList = SmallVec::new();
+        for ms in results.into_iter().flatten() {
+            all.extend(ms);
+        }
+        if all.is_empty() {
+            return Err(ParseError::new("Alternation", start));
+        }
+        if all.len() > 1 {
+            sort_by_longest(&mut all);
+        }
+        Ok(all)
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::literal::Literal;
+    use crate::parser::arc;
+
+    fn cps(s: &str) -> Vec<u32> {
+        s.chars().map(u32::from).collect()
+    }
+
+    fn ends(result: ParseResult) -> Option<Vec<usize>> {
+        result.ok().map(|ms| ms.iter().map(|m| m.start).collect())
+    }
+
+    /// Adaptive mode reorders what is tried, never what is returned.
+    #[test]
+    fn adaptive_results_match_declaration_order() {
+        for first_match in [false, true] {
+            let arms = || {
+                vec![
+                    arc(Literal::string("a", false)),
+                    arc(Literal::string("ab", false)),
+                    arc(Literal::string("x", false)),
+                    arc(Literal::string("abc", false)),
+                ]
+            };
+            let plain = Alternation::with_first_match(arms(), first_match);
+            let adaptive = Alternation::with_first_match(arms(), first_match);
+            adaptive.set_adaptive(true);
+            // Warm "x" and "abc" to the front.
+            assert!(adaptive.set_hits(&[0, 1, 50, 100]));
+            for input in ["abc", "ab", "x", "q", ""] {
+                let source = cps(input);
+                assert_eq!(
+                    ends(plain.lparse(&source, 0)),
+                    ends(adaptive.lparse(&source, 0)),
+                    "{input:?}, first_match={first_match}"
+                );
+            }
+        }
+    }
+
+    /// A profiled order is followed without counting, and changes no
+    /// result either.
+    #[test]
+    fn ordered_results_match_declaration_order() {
+        let arms = || {
+            vec![
+                arc(Literal::string("a", false)),
+                arc(Literal::string("b", false)),
+                arc(Literal::string("xy", false)),
+            ]
+        };
+        let plain = Alternation::new(arms());
+        let ordered = Alternation::new(arms());
+        assert!(ordered.prefix_free());
+        assert!(ordered.set_hits(&[0, 1, 50]));
+        ordered.set_ordered(true);
+        for input in ["a", "b", "xy", "x", ""] {
+            let source = cps(input);
+            assert_eq!(
+                ends(plain.lparse(&source, 0)),
+                ends(ordered.lparse(&source, 0)),
+                "{input:?}"
+            );
+        }
+        assert_eq!(ordered.hits(), vec![0, 1, 50]);
+    }
+
+    #[test]
+    fn set_hits_wants_one_count_per_alternative() {
+        let a = Alternation::new(vec![arc(Literal::string("a", false))]);
+        assert!(!a.set_hits(&[1, 2]));
+        assert_eq!(a.hits(), vec![0]);
+    }
 }
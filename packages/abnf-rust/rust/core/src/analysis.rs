@@ -0,0 +1,1331 @@
+//! Static analysis of combinator trees.
+//!
+//! Mirrors `abnf._analysis`: facts about a grammar that do not depend
+//! on the input, for the engine and the Python layer to skip work
+//! with.  A parser the analysis cannot see into (an `External`
+//! callback) answers with the value that promises nothing.
+//!
+//! Rule references are late-bound, so an answer for one rule can
+//! change whenever any rule is redefined.  Nothing here caches across
+//! calls; callers that do key their caches on [`grammar_generation`].
+
+use std::collections::{HashMap, HashSet};
+use std::sync::atomic::{AtomicU64, Ordering};
+use std::sync::{Arc, RwLock};
+
+use crate::casefold::ascii_fold_cp;
+use crate::literal::LiteralKind;
+use crate::node::{LiteralNode, Node, NodeKind};
+use crate::parser::{ArcParser, Parser, Src};
+use crate::rule::NamedRule;
+
+/// The largest code point; the upper end of [`CharClass::any`].
+const MAX_CODE_POINT: u32 = 0x10FFFF;
+
+/// Bumped by every definition or exclusion write on a `NamedRule`.
+static GRAMMAR_GENERATION: AtomicU64 = AtomicU64::new(0);
+
+/// Record that some rule changed.  Called by `NamedRule` itself.
+pub(crate) fn bump_generation() {
+    GRAMMAR_GENERATION.fetch_add(1, Ordering::Relaxed);
+}
+
+/// Current grammar generation.  Any cached analysis result stamped
+/// with an older value may be stale.
+pub fn grammar_generation() -> u64 {
+    GRAMMAR_GENERATION.load(Ordering::Relaxed)
+}
+
+/// A set of code points, held as sorted, disjoint, non-adjacent
+/// inclusive intervals.
+#[derive(Debug, Clone, Default, PartialEq, Eq)]
+pub struct CharClass {
+    intervals: Vec<(u32, u32)>,
+}
+
+impl CharClass {
+    pub fn empty() -> Self {
+        Self::default()
+    }
+
+    pub fn any() -> Self {
+        Self {
+            intervals: vec![(0, MAX_CODE_POINT)],
+        }
+    }
+
+    pub fn from_intervals(mut intervals: Vec<(u32, u32)>) -> Self {
+        intervals.sort_unstable();
+        let mut merged: Vec<(u32, u32)> = Vec::with_capacity(intervals.len());
+        for (lo, hi) in intervals {
+            match merged.last_mut() {
+                Some(last) if lo <= last.1.saturating_add(1) => {
+                    if hi > last.1 {
+                        last.1 = hi;
+                    }
+                }
+                _ => merged.push((lo, hi)),
+            }
+        }
+        Self { intervals: merged }
+    }
+
+    pub fn intervals(&self) -> &[(u32, u32)] {
+        &self.intervals
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.intervals.is_empty()
+    }
+
+    pub fn contains(&self, cp: u32) -> bool {
+        // Index of the first interval starting after `cp`; the one
+        // before it is the only candidate.
+        let index = self.intervals.partition_point(|&(lo, _)| lo <= cp);
+        index > 0 && cp <= self.intervals[index - 1].1
+    }
+
+    /// Whether the two classes have no code point in common.
+    pub fn is_disjoint(&self, other: &CharClass) -> bool {
+        let (mut i, mut j) = (0, 0);
+        while i < self.intervals.len() && j < other.intervals.len() {
+            let (a, b) = (self.intervals[i], other.intervals[j]);
+            if a.1 < b.0 {
+                i += 1;
+            } else if b.1 < a.0 {
+                j += 1;
+            } else {
+                return false;
+            }
+        }
+        true
+    }
+
+    pub fn union(&self, other: &CharClass) -> CharClass {
+        if other.is_empty() {
+            return self.clone();
+        }
+        if self.is_empty() {
+            return other.clone();
+        }
+        let mut all = self.intervals.clone();
+        all.extend_from_slice(&other.intervals);
+        Self::from_intervals(all)
+    }
+}
+
+/// What a parser can begin with: the code points a non-empty match
+/// can start with, and whether it can match the empty string.
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct First {
+    pub chars: CharClass,
+    pub nullable: bool,
+}
+
+impl First {
+    /// For a parser the analysis cannot see into.
+    fn unknown() -> Self {
+        Self {
+            chars: CharClass::any(),
+            nullable: true,
+        }
+    }
+
+    /// For a parser that can never match; the fixpoint's start.
+    fn none() -> Self {
+        Self {
+            chars: CharClass::empty(),
+            nullable: false,
+        }
+    }
+}
+
+/// Rules are identified by handle address: every reference to a rule
+/// shares one `Arc<NamedRule>`.
+fn rule_key(rule: &Arc<NamedRule>) -> usize {
+    Arc::as_ptr(rule) as usize
+}
+
+/// Every rule reachable from `parser`, each once.
+fn reachable_rules(parser: &Parser) -> Vec<Arc<NamedRule>> {
+    let mut seen: HashMap<usize, ()> = HashMap::new();
+    let mut rules: Vec<Arc<NamedRule>> = Vec::new();
+    let mut stack: Vec<ParserRef> = vec![ParserRef::Borrowed(parser)];
+    while let Some(node) = stack.pop() {
+        let node: &Parser = node.get();
+        match node {
+            Parser::Rule(rule) => {
+                if seen.insert(rule_key(rule), ()).is_some() {
+                    continue;
+                }
+                rules.push(rule.clone());
+                if let Some(definition) = rule.definition() {
+                    stack.push(ParserRef::Owned(definition));
+                }
+            }
+            Parser::Alternation(a) => {
+                stack.extend(a.parsers.iter().cloned().map(ParserRef::Owned));
+            }
+            Parser::Concatenation(c) => {
+                stack.extend(c.parsers.iter().cloned().map(ParserRef::Owned));
+            }
+            Parser::Repetition(r) => stack.push(ParserRef::Owned(r.element.clone())),
+            Parser::Option(o) => stack.push(ParserRef::Owned(o.alternation.clone())),
+            Parser::Literal(_) | Parser::Prose(_) | Parser::External(_) => {}
+        }
+    }
+    rules
+}
+
+/// A parser on the walk stack: the root is borrowed, everything
+/// below it is an `Arc` clone (a rule's definition lives behind a
+/// lock and cannot be borrowed out of it).
+enum ParserRef<'a> {
+    Borrowed(&'a Parser),
+    Owned(crate::parser::ArcParser),
+}
+
+impl ParserRef<'_> {
+    fn get(&self) -> &Parser {
+        match self {
+            ParserRef::Borrowed(p) => p,
+            ParserRef::Owned(p) => p,
+        }
+    }
+}
+
+fn literal_first(kind: &LiteralKind, case_sensitive: bool) -> First {
+    match kind {
+        LiteralKind::Range { lo, hi } => First {
+            chars: CharClass::from_intervals(vec![(*lo, *hi)]),
+            nullable: false,
+        },
+        LiteralKind::String { value, .. } => match value.first() {
+            None => First {
+                chars: CharClass::empty(),
+                nullable: true,
+            },
+            Some(&cp) => {
+                let folded = ascii_fold_cp(cp);
+                let mut intervals = vec![(cp, cp)];
+                // Case-insensitive literals fold ASCII only, so an
+                // ASCII letter has exactly two spellings.
+                if !case_sensitive && folded != cp {
+                    intervals.push((folded, folded));
+                } else if !case_sensitive && (u32::from(b'a')..=u32::from(b'z')).contains(&cp) {
+                    intervals.push((cp - 32, cp - 32));
+                }
+                First {
+                    chars: CharClass::from_intervals(intervals),
+                    nullable: false,
+                }
+            }
+        },
+    }
+}
+
+fn first_of(parser: &Parser, rules: &HashMap<usize, First>) -> First {
+    match parser {
+        Parser::Rule(rule) => {
+            if rule.definition().is_none() {
+                // Parsing it is a grammar error; promise nothing so
+                // the caller still parses and the error still shows.
+                return First::unknown();
+            }
+            rules
+                .get(&rule_key(rule))
+                .cloned()
+                .unwrap_or_else(First::unknown)
+        }
+        Parser::Literal(l) => literal_first(&l.kind, l.case_sensitive),
+        Parser::Alternation(a) => {
+            let mut out = First::none();
+            for p in &a.parsers {
+                let f = first_of(p, rules);
+                out.chars = out.chars.union(&f.chars);
+                out.nullable |= f.nullable;
+            }
+            out
+        }
+        Parser::Concatenation(c) => {
+            let mut chars = CharClass::empty();
+            for p in &c.parsers {
+                let f = first_of(p, rules);
+                chars = chars.union(&f.chars);
+                if !f.nullable {
+                    return First {
+                        chars,
+                        nullable: false,
+                    };
+                }
+            }
+            First {
+                chars,
+                nullable: true,
+            }
+        }
+        Parser::Repetition(r) => {
+            if r.repeat.max == Some(0) {
+                return First {
+                    chars: CharClass::empty(),
+                    nullable: true,
+                };
+            }
+            let f = first_of(&r.element, rules);
+            First {
+                chars: f.chars,
+                nullable: f.nullable || r.repeat.min == 0,
+            }
+        }
+        Parser::Option(o) => First {
+            chars: first_of(&o.alternation, rules).chars,
+            nullable: true,
+        },
+        Parser::Prose(_) => First::none(),
+        Parser::External(_) => First::unknown(),
+    }
+}
+
+/// FIRST set of `parser`, as a least fixpoint over the rules it
+/// reaches -- exact for recursive grammars, left recursion included.
+pub fn first_set(parser: &Parser) -> First {
+    let rules = reachable_rules(parser);
+    let mut values: HashMap<usize, First> = rules
+        .iter()
+        .map(|rule| (rule_key(rule), First::none()))
+        .collect();
+    let mut changed = true;
+    while changed {
+        changed = false;
+        for rule in &rules {
+            let value = match rule.definition() {
+                Some(definition) => first_of(&definition, &values),
+                None => First::unknown(),
+            };
+            let slot = values.get_mut(&rule_key(rule)).expect("seeded above");
+            if *slot != value {
+                *slot = value;
+                changed = true;
+            }
+        }
+    }
+    first_of(parser, &values)
+}
+
+/// How many code points a match of a parser can consume: at least
+/// `min`, and at most `max`, or any number if `max` is `None`.
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct Bounds {
+    pub min: usize,
+    pub max: Option<usize>,
+}
+
+impl Bounds {
+    /// For a rule reached again while its own bounds are being worked
+    /// out.  Its true bounds are at least this loose.
+    const RECURSIVE: Bounds = Bounds { min: 0, max: None };
+
+    fn exact(len: usize) -> Self {
+        Self {
+            min: len,
+            max: Some(len),
+        }
+    }
+}
+
+/// Rule bounds worked out so far in one analysis, and the rules being
+/// worked out.
+#[derive(Default)]
+struct BoundsScope {
+    done: HashMap<usize, Option<Bounds>>,
+    visiting: Vec<usize>,
+}
+
+/// Bounds of `parser`, or `None` if the analysis cannot see into it.
+///
+/// `None` propagates: a combinator with a child of unknown length --
+/// an undefined rule, which must still fail as one when parsed -- is
+/// of unknown length itself.
+fn bounds_of(parser: &Parser, scope: &mut BoundsScope) -> Option<Bounds> {
+    match parser {
+        Parser::Rule(rule) => {
+            let key = rule_key(rule);
+            if let Some(done) = scope.done.get(&key) {
+                return *done;
+            }
+            let definition = rule.definition()?;
+            if scope.visiting.contains(&key) {
+                return Some(Bounds::RECURSIVE);
+            }
+            scope.visiting.push(key);
+            let result = bounds_of(&definition, scope);
+            scope.visiting.pop();
+            scope.done.insert(key, result);
+            result
+        }
+        Parser::Literal(l) => Some(match &l.kind {
+            LiteralKind::Range { .. } => Bounds::exact(1),
+            LiteralKind::String { value, .. } => Bounds::exact(value.len()),
+        }),
+        Parser::Alternation(a) => {
+            let mut out: Option<Bounds> = None;
+            for p in &a.parsers {
+                let b = bounds_of(p, scope)?;
+                out = Some(match out {
+                    None => b,
+                    Some(o) => Bounds {
+                        min: o.min.min(b.min),
+                        max: match (o.max, b.max) {
+                            (Some(x), Some(y)) => Some(x.max(y)),
+                            _ => None,
+                        },
+                    },
+                });
+            }
+            out
+        }
+        Parser::Concatenation(c) => concatenation_bounds(&c.parsers, scope),
+        Parser::Repetition(r) => {
+            if r.repeat.max == Some(0) {
+                // The element is never tried.
+                return Some(Bounds::exact(0));
+            }
+            let element = bounds_of(&r.element, scope)?;
+            if element.max == Some(0) {
+                return Some(Bounds::exact(0));
+            }
+            Some(Bounds {
+                min: r.repeat.min.saturating_mul(element.min),
+                max: match (r.repeat.max, element.max) {
+                    (Some(x), Some(y)) => x.checked_mul(y),
+                    _ => None,
+                },
+            })
+        }
+        Parser::Option(o) => bounds_of(&o.alternation, scope).map(|b| Bounds {
+            min: 0,
+            max: b.max,
+        }),
+        Parser::Prose(_) | Parser::External(_) => None,
+    }
+}
+
+fn concatenation_bounds(parsers: &[ArcParser], scope: &mut BoundsScope) -> Option<Bounds> {
+    let mut out = Bounds::exact(0);
+    for p in parsers {
+        let b = bounds_of(p, scope)?;
+        out.min = out.min.saturating_add(b.min);
+        out.max = match (out.max, b.max) {
+            (Some(x), Some(y)) => x.checked_add(y),
+            _ => None,
+        };
+    }
+    Some(out)
+}
+
+/// Length bounds of any match of `parser`, or `None` if unknown.
+///
+/// Sound rather than tight: a rule that can reach itself is taken to
+/// have no maximum, and the minimum it contributes to its own
+/// recursion is 0.
+pub fn length_bounds(parser: &Parser) -> Option<Bounds> {
+    bounds_of(parser, &mut BoundsScope::default())
+}
+
+/// Whether `parser` can match the empty string.  One the analysis
+/// cannot see into is assumed to.
+pub fn nullable(parser: &Parser) -> bool {
+    first_set(parser).nullable
+}
+
+fn deterministic_of(parser: &Parser, visiting: &mut Vec<usize>) -> bool {
+    match parser {
+        Parser::Rule(rule) => {
+            let key = rule_key(rule);
+            if visiting.contains(&key) {
+                return false;
+            }
+            let Some(definition) = rule.definition() else {
+                return false;
+            };
+            if rule.is_atomic() {
+                // It commits to one match, whatever its definition offers.
+                return true;
+            }
+            visiting.push(key);
+            let result = deterministic_of(&definition, visiting);
+            visiting.pop();
+            result
+        }
+        Parser::Literal(_) => true,
+        Parser::Concatenation(c) => c.parsers.iter().all(|p| deterministic_of(p, visiting)),
+        Parser::Repetition(r) => {
+            r.repeat.max == Some(0)
+                || (r.repeat.max == Some(r.repeat.min) && deterministic_of(&r.element, visiting))
+        }
+        Parser::Alternation(a) => {
+            if !a.parsers.iter().all(|p| deterministic_of(p, visiting)) {
+                return false;
+            }
+            if a.parsers.len() == 1 {
+                return true;
+            }
+            let firsts: Vec<First> = a.parsers.iter().map(|p| first_set(p)).collect();
+            !firsts.iter().any(|f| f.nullable)
+                && firsts.iter().enumerate().all(|(i, ours)| {
+                    firsts[i + 1..]
+                        .iter()
+                        .all(|theirs| ours.chars.is_disjoint(&theirs.chars))
+                })
+        }
+        Parser::External(p) => p.deterministic(),
+        Parser::Option(_) | Parser::Prose(_) => false,
+    }
+}
+
+/// Whether `parser` can match at most one way at any offset.  Mirrors
+/// `abnf._analysis.deterministic`: literals, concatenations and
+/// fixed-count repetitions of deterministic parsers, and alternations
+/// of them no two of which can start with the same code point, none
+/// nullable.  A rule that can reach itself is taken not to be; an
+/// atomic one is, whatever its definition, and an external parser is
+/// if it says so ([`crate::ExternalParser::deterministic`]).
+pub fn deterministic(parser: &Parser) -> bool {
+    deterministic_of(parser, &mut Vec::new())
+}
+
+/// What the grammar says about any match of a combinator, for the
+/// combinator to check before parsing.
+#[derive(Debug)]
+pub(crate) struct Facts {
+    generation: u64,
+    /// The fewest code points a match consumes.
+    pub min_length: usize,
+    /// Whether a match can be empty.
+    pub nullable: bool,
+    /// The code points a non-empty match can begin with; `None` if it
+    /// can begin with any.
+    pub start: Option<Arc<CharClass>>,
+    /// The code points the parser matches, if every match is exactly
+    /// one of them, and the tree it builds over each; see
+    /// [`SingleChar`].
+    pub single: Option<Arc<SingleChar>>,
+    /// Whether a result is worth caching; see [`worth_memoising`].
+    pub memoise: bool,
+    /// Whether there is at most one match; see [`deterministic`].
+    pub deterministic: bool,
+    /// Whether at most one alternative can match; see [`prefix_free`].
+    pub prefix_free: bool,
+    /// Which parts need yield only their longest match, if any do; see
+    /// [`possessive_parts`].
+    pub possessive: Option<Arc<[bool]>>,
+}
+
+impl Facts {
+    fn of(parser: &Parser, generation: u64) -> Self {
+        let first = first_set(parser);
+        Self {
+            generation,
+            min_length: length_bounds(parser).map_or(0, |b| b.min),
+            nullable: first.nullable,
+            start: (first.chars != CharClass::any()).then(|| Arc::new(first.chars)),
+            single: SingleChar::of(parser).map(Arc::new),
+            memoise: worth_memoising(parser),
+            deterministic: deterministic(parser),
+            prefix_free: prefix_free(parser),
+            possessive: {
+                let parts = possessive_parts(parser);
+                parts.contains(&true).then(|| parts.into())
+            },
+        }
+    }
+
+    /// Whether a non-empty match can begin at `start`.  End of input
+    /// is a place none can.
+    pub fn can_start(&self, source: Src<'_>, start: usize) -> bool {
+        match &self.start {
+            None => true,
+            Some(chars) => source.get(start).is_some_and(|&cp| chars.contains(cp)),
+        }
+    }
+}
+
+/// `Facts` for one combinator, worked out on first use and again
+/// after any rule changes: rule references are late-bound, so a
+/// redefinition anywhere can change them.
+#[derive(Debug, Default)]
+pub(crate) struct FactsCell(RwLock<Option<Facts>>);
+
+impl FactsCell {
+    /// Apply `read` to the current facts, working them out from
+    /// `parser()` first if they are missing or stale.  `read` may run
+    /// under the lock, so it must not parse.
+    pub fn read<R>(&self, parser: impl FnOnce() -> ArcParser, read: impl FnOnce(&Facts) -> R) -> R {
+        let generation = grammar_generation();
+        {
+            // A poisoned lock holds facts that were complete when
+            // written; the generation check decides whether they are
+            // still current.
+            let guard = self.0.read().unwrap_or_else(|e| e.into_inner());
+            if let Some(facts) = guard.as_ref().filter(|f| f.generation == generation) {
+                return read(facts);
+            }
+        }
+        let facts = Facts::of(&parser(), generation);
+        let result = read(&facts);
+        *self.0.write().unwrap_or_else(|e| e.into_inner()) = Some(facts);
+        result
+    }
+}
+
+/// Text every match of a parser contains.
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct RequiredLiteral {
+    pub text: Vec<u32>,
+    pub case_sensitive: bool,
+}
+
+impl RequiredLiteral {
+    fn folded(&self) -> Vec<u32> {
+        if self.case_sensitive {
+            self.text.clone()
+        } else {
+            self.text.iter().map(|cp| ascii_fold_cp(*cp)).collect()
+        }
+    }
+}
+
+fn required_of(parser: &Parser, visiting: &mut Vec<usize>) -> Option<RequiredLiteral> {
+    match parser {
+        Parser::Rule(rule) => {
+            let key = rule_key(rule);
+            if visiting.contains(&key) {
+                return None;
+            }
+            let definition = rule.definition()?;
+            visiting.push(key);
+            let result = required_of(&definition, visiting);
+            visiting.pop();
+            result
+        }
+        Parser::Literal(l) => match &l.kind {
+            LiteralKind::String { value, .. } if !value.is_empty() => {
+                // Without ASCII letters a literal reads the same either
+                // way; searching for it case-sensitively is cheaper.
+                let has_letters = value.iter().any(|cp| {
+                    (u32::from(b'A')..=u32::from(b'Z')).contains(cp)
+                        || (u32::from(b'a')..=u32::from(b'z')).contains(cp)
+                });
+                Some(RequiredLiteral {
+                    text: value.to_vec(),
+                    case_sensitive: l.case_sensitive || !has_letters,
+                })
+            }
+            _ => None,
+        },
+        Parser::Concatenation(c) => {
+            let mut best: Option<RequiredLiteral> = None;
+            for p in &c.parsers {
+                if let Some(candidate) = required_of(p, visiting) {
+                    let longer = match &best {
+                        Some(b) => candidate.text.len() > b.text.len(),
+                        None => true,
+                    };
+                    if longer {
+                        best = Some(candidate);
+                    }
+                }
+            }
+            best
+        }
+        Parser::Alternation(a) => {
+            let mut common: Option<RequiredLiteral> = None;
+            for p in &a.parsers {
+                let candidate = required_of(p, visiting)?;
+                common = Some(match common {
+                    None => candidate,
+                    Some(c) if c.folded() != candidate.folded() => return None,
+                    Some(c) => RequiredLiteral {
+                        case_sensitive: c.case_sensitive && candidate.case_sensitive,
+                        text: c.text,
+                    },
+                });
+            }
+            common
+        }
+        Parser::Repetition(r) if r.repeat.min > 0 => required_of(&r.element, visiting),
+        _ => None,
+    }
+}
+
+/// The longest literal every match of `parser` is certain to contain.
+pub fn required_literal(parser: &Parser) -> Option<RequiredLiteral> {
+    required_of(parser, &mut Vec::new())
+}
+
+/// Every code point a match of `parser` can consume: the union of the
+/// terminals it reaches, or `None` if it reaches a parser the analysis
+/// cannot see into (an undefined rule, an external parser).
+pub fn alphabet(parser: &Parser) -> Option<CharClass> {
+    let mut seen: HashMap<usize, ()> = HashMap::new();
+    let mut intervals: Vec<(u32, u32)> = Vec::new();
+    let mut stack: Vec<ParserRef> = vec![ParserRef::Borrowed(parser)];
+    while let Some(node) = stack.pop() {
+        match node.get() {
+            Parser::Rule(rule) => {
+                if seen.insert(rule_key(rule), ()).is_some() {
+                    continue;
+                }
+                stack.push(ParserRef::Owned(rule.definition()?));
+            }
+            Parser::Literal(l) => match &l.kind {
+                LiteralKind::Range { lo, hi } => intervals.push((*lo, *hi)),
+                LiteralKind::String { value, .. } => {
+                    for &cp in value.iter() {
+                        intervals.push((cp, cp));
+                        if !l.case_sensitive {
+                            // ASCII only, as matching folds ASCII only.
+                            let folded = ascii_fold_cp(cp);
+                            if folded != cp {
+                                intervals.push((folded, folded));
+                            } else if (u32::from(b'a')..=u32::from(b'z')).contains(&cp) {
+                                intervals.push((cp - 32, cp - 32));
+                            }
+                        }
+                    }
+                }
+            },
+            Parser::Alternation(a) => {
+                stack.extend(a.parsers.iter().cloned().map(ParserRef::Owned));
+            }
+            Parser::Concatenation(c) => {
+                stack.extend(c.parsers.iter().cloned().map(ParserRef::Owned));
+            }
+            Parser::Repetition(r) => stack.push(ParserRef::Owned(r.element.clone())),
+            Parser::Option(o) => stack.push(ParserRef::Owned(o.alternation.clone())),
+            Parser::Prose(_) => {}
+            Parser::External(_) => return None,
+        }
+    }
+    Some(CharClass::from_intervals(intervals))
+}
+
+/// Whether a result of `parser` is worth keeping for the rest of a
+/// parse.  Not for one made of literals alone -- literals, and
+/// alternations, concatenations and options of them -- which parses
+/// again in about the time a lookup takes.  Anything reaching a rule
+/// or a repetition can take arbitrarily longer.
+pub fn worth_memoising(parser: &Parser) -> bool {
+    match parser {
+        Parser::Alternation(a) => a.parsers.iter().any(|p| worth_memoising(p)),
+        Parser::Concatenation(c) => c.parsers.iter().any(|p| worth_memoising(p)),
+        Parser::Option(o) => worth_memoising(&o.alternation),
+        Parser::Literal(_) | Parser::Prose(_) => false,
+        Parser::Repetition(_) | Parser::Rule(_) | Parser::External(_) => true,
+    }
+}
+
+/// The code points `parser` matches, if every match of it is exactly
+/// one of them and there is one match per code point: a one-character
+/// literal or a range, an alternation of those, or a rule defined as
+/// one without an exclusion.  `None` for anything else.
+///
+/// A repetition of such a parser is a run of those code points, which
+/// `Repetition` measures directly instead of parsing element by
+/// element.
+pub fn single_char(parser: &Parser) -> Option<CharClass> {
+    SingleChar::of(parser).map(|single| single.chars)
+}
+
+/// A parser that matches one code point at a time (see
+/// [`single_char`]): the code points, and the tree it builds over each.
+/// Mirrors `abnf._analysis.SingleChar`.
+#[derive(Debug)]
+pub struct SingleChar {
+    pub chars: CharClass,
+    /// Each terminal in declaration order, with the names of the rules
+    /// that enclose it, outermost first.
+    leaves: Vec<(CharClass, Vec<Arc<str>>)>,
+}
+
+impl SingleChar {
+    pub fn of(parser: &Parser) -> Option<Self> {
+        let mut leaves = Vec::new();
+        single_char_leaves(parser, &mut Vec::new(), &mut Vec::new(), &mut leaves)?;
+        let intervals = leaves
+            .iter()
+            .flat_map(|(chars, _): &(CharClass, _)| chars.intervals().iter().copied())
+            .collect();
+        Some(Self {
+            chars: CharClass::from_intervals(intervals),
+            leaves,
+        })
+    }
+
+    /// The node a match of `cp` at `offset` builds: a literal node in
+    /// the nodes of the rules around the first terminal matching it,
+    /// which is the one an alternation keeps when several match.
+    pub fn node(&self, cp: u32, offset: usize) -> NodeKind {
+        let names = self
+            .leaves
+            .iter()
+            .find(|(chars, _)| chars.contains(cp))
+            .map_or(&[][..], |(_, names)| names.as_slice());
+        let mut node = NodeKind::Literal(LiteralNode::new(offset, 1));
+        for name in names.iter().rev() {
+            node = NodeKind::Internal(Node::new(name.clone(), vec![node]));
+        }
+        node
+    }
+}
+
+fn single_char_leaves(
+    parser: &Parser,
+    visiting: &mut Vec<usize>,
+    names: &mut Vec<Arc<str>>,
+    leaves: &mut Vec<(CharClass, Vec<Arc<str>>)>,
+) -> Option<()> {
+    match parser {
+        Parser::Literal(l) => match &l.kind {
+            LiteralKind::String { value, .. } if value.len() != 1 => None,
+            kind => {
+                leaves.push((literal_first(kind, l.case_sensitive).chars, names.clone()));
+                Some(())
+            }
+        },
+        Parser::Alternation(a) => {
+            for alternative in &a.parsers {
+                single_char_leaves(alternative, visiting, names, leaves)?;
+            }
+            Some(())
+        }
+        Parser::Rule(rule) => {
+            // A rule already on the path recurses, and cannot be one
+            // code point.
+            let key = rule_key(rule);
+            if visiting.contains(&key) || rule.exclude().is_some() {
+                return None;
+            }
+            let definition = rule.definition()?;
+            visiting.push(key);
+            names.push(rule.name.clone());
+            let found = single_char_leaves(&definition, visiting, names, leaves);
+            names.pop();
+            visiting.pop();
+            found
+        }
+        _ => None,
+    }
+}
+
+/// The most strings [`rule_lexicon`] enumerates before giving up on a
+/// language.
+const LEXICON_LIMIT: usize = 1024;
+
+/// One string of a finite language: its ASCII fold, and the parts of it
+/// that must also match exactly, as `(offset, text)` pairs -- none for a
+/// string spelled only with case-insensitive literals.
+type Word = (Vec<u32>, Vec<(usize, Vec<u32>)>);
+
+/// A finite language, for telling in one lookup whether a text is in it.
+/// Mirrors `abnf._analysis.Lexicon`.
+#[derive(Debug)]
+pub struct Lexicon {
+    words: HashMap<Vec<u32>, Vec<Vec<(usize, Vec<u32>)>>>,
+    /// The alternations the language was enumerated through, all taken
+    /// as longest-match; see [`Lexicon::is_current`].
+    alternations: Vec<ArcParser>,
+}
+
+impl Lexicon {
+    fn new(words: Vec<Word>, alternations: Vec<ArcParser>) -> Self {
+        let mut index: HashMap<Vec<u32>, Vec<Vec<(usize, Vec<u32>)>>> = HashMap::new();
+        for (folded, exact) in words {
+            let spellings = index.entry(folded).or_default();
+            if !spellings.contains(&exact) {
+                spellings.push(exact);
+            }
+        }
+        // A spelling with nothing to check exactly accepts every spelling.
+        for spellings in index.values_mut() {
+            if spellings.iter().any(Vec::is_empty) {
+                spellings.retain(Vec::is_empty);
+            }
+        }
+        Self {
+            words: index,
+            alternations,
+        }
+    }
+
+    /// Whether the language is still the one enumerated: `first_match`
+    /// can be set on an alternation without redefining any rule.
+    pub fn is_current(&self) -> bool {
+        self.alternations
+            .iter()
+            .all(|a| !matches!(&**a, Parser::Alternation(a) if a.first_match()))
+    }
+
+    pub fn contains(&self, text: Src<'_>) -> bool {
+        let folded: Vec<u32> = text.iter().map(|cp| ascii_fold_cp(*cp)).collect();
+        self.words.get(&folded).is_some_and(|spellings| {
+            spellings.iter().any(|spelling| {
+                spelling
+                    .iter()
+                    .all(|(offset, exact)| text[*offset..*offset + exact.len()] == exact[..])
+            })
+        })
+    }
+}
+
+fn literal_words(kind: &LiteralKind, case_sensitive: bool) -> Option<Vec<Word>> {
+    let word = |text: Vec<u32>, case_sensitive: bool| -> Word {
+        let folded: Vec<u32> = text.iter().map(|cp| ascii_fold_cp(*cp)).collect();
+        let exact = if case_sensitive && folded != text {
+            vec![(0, text)]
+        } else {
+            Vec::new()
+        };
+        (folded, exact)
+    };
+    match kind {
+        LiteralKind::Range { lo, hi } => {
+            if (*hi - *lo) as usize >= LEXICON_LIMIT {
+                return None;
+            }
+            // Ranges are case-sensitive.
+            Some((*lo..=*hi).map(|cp| word(vec![cp], true)).collect())
+        }
+        LiteralKind::String { value, .. } => Some(vec![word(value.to_vec(), case_sensitive)]),
+    }
+}
+
+fn product(left: &[Word], right: &[Word]) -> Option<Vec<Word>> {
+    if left.len() * right.len() > LEXICON_LIMIT {
+        return None;
+    }
+    let mut words: Vec<Word> = Vec::with_capacity(left.len() * right.len());
+    for (left_folded, left_exact) in left {
+        for (right_folded, right_exact) in right {
+            let mut folded = left_folded.clone();
+            folded.extend_from_slice(right_folded);
+            let mut exact = left_exact.clone();
+            exact.extend(
+                right_exact
+                    .iter()
+                    .map(|(offset, text)| (offset + left_folded.len(), text.clone())),
+            );
+            words.push((folded, exact));
+        }
+    }
+    Some(dedup(words))
+}
+
+fn dedup(mut words: Vec<Word>) -> Vec<Word> {
+    words.sort();
+    words.dedup();
+    words
+}
+
+/// Every string `parser` matches, or `None` if there are too many, or
+/// infinitely many, or the analysis cannot see into it.  Pushes each
+/// alternation reached onto `alternations`.
+fn language_of(
+    parser: &ArcParser,
+    visiting: &mut Vec<usize>,
+    alternations: &mut Vec<ArcParser>,
+) -> Option<Vec<Word>> {
+    match &**parser {
+        Parser::Rule(rule) => rule_language(rule, visiting, alternations),
+        Parser::Literal(l) => literal_words(&l.kind, l.case_sensitive).map(dedup),
+        Parser::Alternation(a) => {
+            alternations.push(parser.clone());
+            let mut union: Vec<Word> = Vec::new();
+            for p in &a.parsers {
+                union.extend(language_of(p, visiting, alternations)?);
+                union = dedup(union);
+                if union.len() > LEXICON_LIMIT {
+                    return None;
+                }
+            }
+            Some(union)
+        }
+        Parser::Concatenation(c) => {
+            let mut result: Vec<Word> = vec![Word::default()];
+            for p in &c.parsers {
+                result = product(&result, &language_of(p, visiting, alternations)?)?;
+            }
+            Some(result)
+        }
+        Parser::Repetition(r) => {
+            let max = r.repeat.max?;
+            if max == 0 {
+                return Some(vec![Word::default()]);
+            }
+            let element = language_of(&r.element, visiting, alternations)?;
+            let mut power: Vec<Word> = vec![Word::default()];
+            let mut union: Vec<Word> = Vec::new();
+            for count in 0..=max {
+                if count >= r.repeat.min {
+                    union.extend(power.iter().cloned());
+                    union = dedup(union);
+                    if union.len() > LEXICON_LIMIT {
+                        return None;
+                    }
+                }
+                if count == max {
+                    break;
+                }
+                let following = product(&power, &element)?;
+                if following == power {
+                    // An element that can only match empty adds nothing more.
+                    union.extend(power);
+                    return Some(dedup(union));
+                }
+                power = following;
+            }
+            Some(union)
+        }
+        Parser::Option(o) => {
+            let mut words = language_of(&o.alternation, visiting, alternations)?;
+            words.push(Word::default());
+            Some(dedup(words))
+        }
+        Parser::Prose(_) | Parser::External(_) => None,
+    }
+}
+
+fn rule_language(
+    rule: &NamedRule,
+    visiting: &mut Vec<usize>,
+    alternations: &mut Vec<ArcParser>,
+) -> Option<Vec<Word>> {
+    // A rule with an exclusion of its own matches a language with holes
+    // in it, and so does an atomic one, once something follows it; a
+    // recursive one is rarely finite.
+    let key = std::ptr::from_ref(rule) as usize;
+    if rule.exclude().is_some()
+        || (rule.is_atomic() && !visiting.is_empty())
+        || visiting.contains(&key)
+    {
+        return None;
+    }
+    let definition = rule.definition()?;
+    visiting.push(key);
+    let result = language_of(&definition, visiting, alternations);
+    visiting.pop();
+    result
+}
+
+/// The language of `rule` as a [`Lexicon`], if it is finite and small
+/// enough to enumerate; `None` otherwise.  Only meaningful while
+/// [`Lexicon::is_current`].
+pub fn rule_lexicon(rule: &NamedRule) -> Option<Lexicon> {
+    let mut alternations: Vec<ArcParser> = Vec::new();
+    let words = rule_language(rule, &mut Vec::new(), &mut alternations)?;
+    Some(Lexicon::new(words, alternations))
+}
+
+/// Whether a string of `ours` is a prefix of one of `theirs`, ignoring
+/// case -- which can only find an overlap that is not there.
+fn overlaps(ours: &[Word], theirs: &[Word]) -> bool {
+    let folded: HashSet<&[u32]> = ours.iter().map(|(word, _)| word.as_slice()).collect();
+    theirs
+        .iter()
+        .any(|(word, _)| (0..=word.len()).any(|end| folded.contains(&word[..end])))
+}
+
+/// Whether `parser` is an alternation at most one alternative of which
+/// can match at any offset.  Mirrors `abnf._analysis.prefix_free`: two
+/// alternatives are told apart by their FIRST sets where neither is
+/// nullable, and otherwise by their languages where both are small and
+/// finite, no string of one being a prefix of a string of the other.
+pub fn prefix_free(parser: &Parser) -> bool {
+    let Parser::Alternation(a) = parser else {
+        return false;
+    };
+    let firsts: Vec<First> = a.parsers.iter().map(|p| first_set(p)).collect();
+    let mut languages: HashMap<usize, Option<Vec<Word>>> = HashMap::new();
+    let mut language = |index: usize| -> Option<Vec<Word>> {
+        languages
+            .entry(index)
+            .or_insert_with(|| language_of(&a.parsers[index], &mut Vec::new(), &mut Vec::new()))
+            .clone()
+    };
+    for (i, ours) in firsts.iter().enumerate() {
+        for (j, theirs) in firsts.iter().enumerate().skip(i + 1) {
+            if !(ours.nullable || theirs.nullable) && ours.chars.is_disjoint(&theirs.chars) {
+                continue;
+            }
+            let (Some(left), Some(right)) = (language(i), language(j)) else {
+                return false;
+            };
+            if overlaps(&left, &right) || overlaps(&right, &left) {
+                return false;
+            }
+        }
+    }
+    true
+}
+
+/// Which parts of `parser`, if it is a concatenation, are repetitions
+/// only the longest match of which can be part of one of the
+/// concatenation's.  The engine's counterpart of
+/// `abnf._analysis.possessive`: the element matches at most one way
+/// and never the empty string, so a shorter match is followed by
+/// another of the element, and what follows the repetition cannot
+/// start with anything the element can.  Only what follows within the
+/// concatenation is seen, so a repetition at its end never qualifies.
+pub fn possessive_parts(parser: &Parser) -> Vec<bool> {
+    let Parser::Concatenation(c) = parser else {
+        return Vec::new();
+    };
+    let mut parts = vec![false; c.parsers.len()];
+    // What can follow the part being looked at; `None` while that
+    // includes whatever follows the concatenation.
+    let mut follow: Option<CharClass> = None;
+    for (index, part) in c.parsers.iter().enumerate().rev() {
+        if let (Parser::Repetition(r), Some(chars)) = (&**part, &follow) {
+            if r.repeat.max != Some(r.repeat.min) {
+                let element = first_set(&r.element);
+                parts[index] = !element.nullable
+                    && element.chars.is_disjoint(chars)
+                    && deterministic(&r.element);
+            }
+        }
+        let first = first_set(part);
+        follow = if first.nullable {
+            follow.map(|chars| chars.union(&first.chars))
+        } else {
+            Some(first.chars)
+        };
+    }
+    parts
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::alternation::Alternation;
+    use crate::concatenation::Concatenation;
+    use crate::literal::Literal;
+    use crate::option::OptionParser;
+    use crate::parser::arc;
+    use crate::repetition::{Repeat, Repetition};
+
+    fn lit(s: &str) -> crate::parser::ArcParser {
+        arc(Literal::string(s, false))
+    }
+
+    #[test]
+    fn first_of_a_recursive_rule_is_exact() {
+        // a = "x" / "(" a ")"
+        let rule = Arc::new(NamedRule::new("a"));
+        let def = arc(Alternation::new(vec![
+            lit("x"),
+            arc(Concatenation::new(vec![lit("("), arc(rule.clone()), lit(")")])),
+        ]));
+        rule.set_definition(def);
+        let f = first_set(&Parser::Rule(rule));
+        assert!(!f.nullable);
+        assert_eq!(
+            f.chars.intervals(),
+            &[(u32::from(b'('), u32::from(b'(')), (u32::from(b'X'), u32::from(b'X')), (u32::from(b'x'), u32::from(b'x'))]
+        );
+    }
+
+    #[test]
+    fn optional_prefix_is_nullable_until_required_element() {
+        let p = Concatenation::new(vec![
+            arc(Repetition::new(Repeat::new(0, None), lit("-"))),
+            arc(Literal::range(u32::from(b'0'), u32::from(b'9'))),
+        ]);
+        let f = first_set(&Parser::Concatenation(p));
+        assert!(!f.nullable);
+        assert!(f.chars.contains(u32::from(b'-')));
+        assert!(f.chars.contains(u32::from(b'5')));
+        assert!(!f.chars.contains(u32::from(b'a')));
+    }
+
+    #[test]
+    fn required_literal_is_shared_by_every_alternative() {
+        let p = Concatenation::new(vec![
+            arc(Repetition::new(Repeat::new(0, None), lit("a"))),
+            lit("@"),
+            arc(Alternation::new(vec![lit("b"), lit("c")])),
+        ]);
+        let found = required_literal(&Parser::Concatenation(p)).expect("'@' is required");
+        assert_eq!(found.text, vec![u32::from(b'@')]);
+        assert!(found.case_sensitive);
+    }
+
+    #[test]
+    fn bounds_of_fixed_width_and_recursive_rules() {
+        // 2DIGIT ":" 1*3DIGIT
+        let digit = || arc(Literal::range(u32::from(b'0'), u32::from(b'9')));
+        let p = Concatenation::new(vec![
+            arc(Repetition::new(Repeat::new(2, Some(2)), digit())),
+            lit(":"),
+            arc(Repetition::new(Repeat::new(1, Some(3)), digit())),
+        ]);
+        assert_eq!(
+            length_bounds(&Parser::Concatenation(p)),
+            Some(Bounds { min: 4, max: Some(6) })
+        );
+
+        // a = "x" / "(" a ")"
+        let rule = Arc::new(NamedRule::new("a"));
+        rule.set_definition(arc(Alternation::new(vec![
+            lit("x"),
+            arc(Concatenation::new(vec![lit("("), arc(rule.clone()), lit(")")])),
+        ])));
+        assert_eq!(
+            length_bounds(&Parser::Rule(rule)),
+            Some(Bounds { min: 1, max: None })
+        );
+
+        // An undefined rule makes everything above it unknown.
+        let undefined = Arc::new(NamedRule::new("b"));
+        let p = Concatenation::new(vec![lit("xyz"), arc(undefined)]);
+        assert_eq!(length_bounds(&Parser::Concatenation(p)), None);
+    }
+
+    #[test]
+    fn alphabet_is_every_terminal_reached() {
+        // a = "x" / %x30-39 b ; b = "(" a ")"
+        let a = Arc::new(NamedRule::new("a"));
+        let b = Arc::new(NamedRule::new("b"));
+        a.set_definition(arc(Alternation::new(vec![
+            lit("x"),
+            arc(Concatenation::new(vec![
+                arc(Literal::range(u32::from(b'0'), u32::from(b'9'))),
+                arc(b.clone()),
+            ])),
+        ])));
+        b.set_definition(arc(Concatenation::new(vec![lit("("), arc(a.clone()), lit(")")])));
+        let chars = alphabet(&Parser::Rule(a)).expect("every rule is defined");
+        for c in "()0123456789xX".chars() {
+            assert!(chars.contains(u32::from(c)), "{c}");
+        }
+        assert!(!chars.contains(u32::from(b'y')));
+
+        let undefined = Arc::new(NamedRule::new("c"));
+        let p = Concatenation::new(vec![lit("xyz"), arc(undefined)]);
+        assert_eq!(alphabet(&Parser::Concatenation(p)), None);
+    }
+
+    #[test]
+    fn repetition_of_a_nullable_element_skips_zero_progress_rounds() {
+        // *( *" " "x" / *"y" )
+        let element = arc(Alternation::new(vec![
+            arc(Concatenation::new(vec![
+                arc(Repetition::new(Repeat::new(0, None), lit(" "))),
+                lit("x"),
+            ])),
+            arc(Repetition::new(Repeat::new(0, None), lit("y"))),
+        ]));
+        assert!(nullable(&element));
+        let p = Repetition::new(Repeat::new(0, None), element);
+        let source: Vec<u32> = "  xyy x!".chars().map(u32::from).collect();
+        let matches = p.lparse(&source, 0).expect("nullable repetition matches");
+        assert_eq!(matches[0].start, 7);
+    }
+    #[test]
+    fn a_finite_language_is_looked_up_by_spelling() {
+        // kw = "if" / %s"Nil" / %x41-42 "x"
+        let kw = NamedRule::new("kw");
+        kw.set_definition(arc(Alternation::new(vec![
+            lit("if"),
+            arc(Literal::string("Nil", true)),
+            arc(Concatenation::new(vec![
+                arc(Literal::range(u32::from(b'A'), u32::from(b'B'))),
+                lit("x"),
+            ])),
+        ])));
+        let lexicon = rule_lexicon(&kw).expect("finite");
+        let has = |s: &str| lexicon.contains(&s.chars().map(u32::from).collect::<Vec<_>>());
+        assert!(has("if") && has("IF") && has("Nil") && has("AX") && has("Bx"));
+        assert!(!has("nil") && !has("ax") && !has("i") && !has("ifx"));
+        assert!(lexicon.is_current());
+        let unbounded = NamedRule::new("u");
+        unbounded.set_definition(arc(Repetition::new(Repeat::new(1, None), lit("a"))));
+        assert!(rule_lexicon(&unbounded).is_none());
+    }
+
+    #[test]
+    fn fixed_formats_are_deterministic() {
+        let digit = || arc(Literal::range(u32::from(b'0'), u32::from(b'9')));
+        // 2DIGIT "-" ( "a" / DIGIT )
+        let fixed = Concatenation::new(vec![
+            arc(Repetition::new(Repeat::new(2, Some(2)), digit())),
+            lit("-"),
+            arc(Alternation::new(vec![lit("a"), digit()])),
+        ]);
+        assert!(deterministic(&Parser::Concatenation(fixed)));
+        // "a" / "ab": both start with "a".
+        let overlapping = Alternation::new(vec![lit("a"), lit("ab")]);
+        assert!(!deterministic(&Parser::Alternation(overlapping)));
+        // 1*2DIGIT matches one digit or two.
+        let ranged = Repetition::new(Repeat::new(1, Some(2)), digit());
+        assert!(!deterministic(&Parser::Repetition(ranged)));
+        let source: Vec<u32> = "12-a".chars().map(u32::from).collect();
+        let fixed = Concatenation::new(vec![
+            arc(Repetition::new(Repeat::new(2, Some(2)), digit())),
+            lit("-"),
+            arc(Alternation::new(vec![lit("a"), digit()])),
+        ]);
+        let matches = fixed.lparse(&source, 0).expect("matches");
+        assert_eq!(matches.len(), 1);
+        assert_eq!(matches[0].start, 4);
+    }
+
+    #[test]
+    fn prefix_free_alternatives_cannot_both_match() {
+        let alternation = |arms: Vec<ArcParser>| Parser::Alternation(Alternation::new(arms));
+        // Told apart by FIRST.
+        assert!(prefix_free(&alternation(vec![lit("get"), lit("post")])));
+        // Told apart by language: neither is a prefix of the other.
+        assert!(prefix_free(&alternation(vec![lit("ab"), lit("ac")])));
+        assert!(!prefix_free(&alternation(vec![lit("a"), lit("ab")])));
+        // An option matches the empty string, a prefix of anything.
+        let option = arc(OptionParser::new(arc(Alternation::new(vec![lit("b")]))));
+        assert!(!prefix_free(&alternation(vec![option, lit("c")])));
+        // 1*"a" is infinite, so nothing is known about what it overlaps.
+        let many = arc(Repetition::new(Repeat::new(1, None), lit("a")));
+        assert!(!prefix_free(&alternation(vec![many, lit("ab")])));
+    }
+
+    #[test]
+    fn repetitions_the_rest_cannot_start_like_are_possessive() {
+        let digits = || {
+            arc(Repetition::new(
+                Repeat::new(1, None),
+                arc(Literal::range(0x30, 0x39)),
+            ))
+        };
+        let concatenation =
+            |parts: Vec<ArcParser>| Parser::Concatenation(Concatenation::new(parts));
+        // 1*DIGIT "." 1*DIGIT: the last is followed by whatever follows.
+        let decimal = concatenation(vec![digits(), lit("."), digits()]);
+        assert_eq!(possessive_parts(&decimal), vec![true, false, false]);
+        let source: Vec<u32> = "12.34".chars().map(u32::from).collect();
+        let matches = decimal.lparse(&source, 0).unwrap();
+        assert_eq!(
+            matches.iter().map(|m| m.start).collect::<Vec<_>>(),
+            vec![5, 4]
+        );
+        // 1*( "a" / "ab" ) "b": "ab" can be given back as "a" for "b".
+        let ambiguous = arc(Alternation::new(vec![lit("a"), lit("ab")]));
+        let ambiguous = arc(Repetition::new(Repeat::new(1, None), ambiguous));
+        assert_eq!(
+            possessive_parts(&concatenation(vec![ambiguous, lit("b")])),
+            vec![false, false]
+        );
+        // 1*DIGIT [ "0" ]: the option can start with a digit.
+        let option = arc(OptionParser::new(arc(Alternation::new(vec![lit("0")]))));
+        assert_eq!(
+            possessive_parts(&concatenation(vec![digits(), option])),
+            vec![false, false]
+        );
+    }
+}
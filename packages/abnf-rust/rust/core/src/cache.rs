@@ -29,7 +29,7 @@
 use std::cell::Cell;
 use std::collections::HashMap;
 use std::num::NonZeroUsize;
-use std::sync::atomic::{AtomicU64, Ordering};
+use std::sync::atomic::{AtomicU64, AtomicU8, Ordering};
 
 use lru::LruCache;
 
@@ -223,6 +223,27 @@ impl ParseScope {
         });
         Self { _private: () }
     }
+
+    /// Like [`ParseScope::enter`], but an outermost entry re-opens
+    /// `epoch` -- claimed by an earlier scope -- instead of claiming a
+    /// new one.  Lets several parses of one source share their
+    /// entries (`Rule.search` tries one rule at many offsets) without
+    /// holding a scope open across the Python code between them.
+    ///
+    /// Sound for the same reason the epoch scheme is: only the parse
+    /// that claimed `epoch` ever stamps entries with it, and a cache
+    /// some other parse touched in between carries that parse's epoch
+    /// and is reset on first use.
+    pub fn resume(epoch: u64) -> Self {
+        PARSE_DEPTH.with(|depth| {
+            let current = depth.get();
+            if current == 0 {
+                CURRENT_EPOCH.with(|e| e.set(epoch));
+            }
+            depth.set(current + 1);
+        });
+        Self { _private: () }
+    }
 }
 
 impl Drop for ParseScope {
@@ -244,6 +265,9 @@ impl Drop for ParseScope {
 /// exclusions and nothing at all in grammars that do not.
 pub struct SourceScope {
     previous: u64,
+    /// The enclosing parse's farthest failure, set aside so the
+    /// sub-parse's -- offsets into other text -- do not replace it.
+    failures: Option<crate::failure::Farthest>,
 }
 
 impl SourceScope {
@@ -251,13 +275,19 @@ impl SourceScope {
         let previous = CURRENT_EPOCH.with(Cell::get);
         let claimed = EPOCH_COUNTER.fetch_add(1, Ordering::Relaxed) + 1;
         CURRENT_EPOCH.with(|epoch| epoch.set(claimed));
-        Self { previous }
+        Self {
+            previous,
+            failures: Some(crate::failure::take()),
+        }
     }
 }
 
 impl Drop for SourceScope {
     fn drop(&mut self) {
         CURRENT_EPOCH.with(|epoch| epoch.set(self.previous));
+        if let Some(failures) = self.failures.take() {
+            crate::failure::restore(failures);
+        }
     }
 }
 
@@ -273,6 +303,31 @@ pub fn in_parse() -> bool {
     PARSE_DEPTH.with(Cell::get) > 0
 }
 
+/// A per-parser override of whether results are memoised: `None`
+/// leaves it to the parser.  Mirrors the `memoise` attribute of the
+/// pure-Python `Repetition` and `Option`.
+#[derive(Debug, Default)]
+pub struct MemoiseOverride(AtomicU8);
+
+impl MemoiseOverride {
+    pub fn get(&self) -> Option<bool> {
+        match self.0.load(Ordering::Relaxed) {
+            1 => Some(true),
+            2 => Some(false),
+            _ => None,
+        }
+    }
+
+    pub fn set(&self, value: Option<bool>) {
+        let encoded = match value {
+            None => 0,
+            Some(true) => 1,
+            Some(false) => 2,
+        };
+        self.0.store(encoded, Ordering::Relaxed);
+    }
+}
+
 #[cfg(test)]
 mod tests {
     use super::*;
@@ -371,6 +426,28 @@ mod tests {
         assert!(!unique.contains(&0), "epoch 0 means never parsed");
     }
 
+    /// Resuming an epoch sees the entries made under it, and nothing
+    /// made by a parse that ran in between.
+    #[test]
+    fn resumed_epoch_keeps_its_own_entries_only() {
+        let mut cache = ParseCache::new(None);
+        let epoch = {
+            let _scope = ParseScope::enter();
+            cache.put(5, marker("first session"));
+            current_epoch()
+        };
+        {
+            let _scope = ParseScope::resume(epoch);
+            assert!(cache.get(5).is_some(), "resumed epoch lost its entries");
+        }
+        {
+            let _scope = ParseScope::enter();
+            cache.put(6, marker("someone else"));
+        }
+        let _scope = ParseScope::resume(epoch);
+        assert!(cache.get(5).is_none() && cache.get(6).is_none());
+    }
+
     /// A cache that has never seen a parse holds nothing.
     #[test]
     fn fresh_cache_is_empty_under_a_new_epoch() {
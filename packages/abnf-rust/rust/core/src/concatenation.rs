@@ -2,36 +2,80 @@
 //!
 //! Mirrors `abnf.parser.Concatenation` (`_parser_python.py:157-189`).
 
+use std::collections::HashSet;
+
 use smallvec::{smallvec, SmallVec};
 
-use crate::error::ParseError;
+use crate::analysis::FactsCell;
+use crate::error::{ErrorParser, ParseError};
 use crate::matcher::Match;
 use crate::parser::{ArcParser, MatchList, NodeList, ParseResult, Src};
 
 #[derive(Debug)]
 pub struct Concatenation {
     pub parsers: Vec<ArcParser>,
+    /// What the grammar says about any match; see `lparse`.
+    facts: FactsCell,
 }
 
 impl Concatenation {
     pub fn new(parsers: Vec<ArcParser>) -> Self {
-        Self { parsers }
+        Self {
+            parsers,
+            facts: FactsCell::default(),
+        }
     }
 
     pub fn lparse(&self, source: Src<'_>, start: usize) -> ParseResult {
+        // Too little input left for every part to match, or a code
+        // point no match can start with: fail now rather than after
+        // parsing however many parts do fit.  Same error the loop
+        // below would raise.
+        let (hopeless, deterministic, possessive) = self.facts.read(
+            || Concatenation::new(self.parsers.clone()).into(),
+            |facts| {
+                (
+                    source.len().saturating_sub(start) < facts.min_length
+                        || !(facts.nullable || facts.can_start(source, start)),
+                    facts.deterministic,
+                    facts.possessive.clone(),
+                )
+            },
+        );
+        if hopeless {
+            let label = ErrorParser::from("Concatenation");
+            crate::failure::record(&label, start);
+            return Err(ParseError::new(label, start));
+        }
+        if deterministic {
+            return self.lparse_one(source, start);
+        }
         let mut match_list: MatchList = smallvec![Match::new(SmallVec::new(), start)];
-        for parser in &self.parsers {
+        for (index, parser) in self.parsers.iter().enumerate() {
             let mut next: MatchList = SmallVec::new();
+            // One candidate per end offset.  Candidates ending at the
+            // same offset extend identically from there on, so only the
+            // first -- the one a longest-first consumer keeps anyway --
+            // can ever be chosen; keeping the rest multiplied the list
+            // by every ambiguity along the way.
+            let mut ends: HashSet<usize> = HashSet::new();
             // Consume `match_list` by value so the last extension of
             // each prefix can move — instead of clone — the prefix
             // nodes.  For deterministic grammars (one extension per
             // prefix, the common case), this saves one allocation
             // per concatenation step per surviving prefix.
             for prefix in match_list.drain(..) {
-                let extensions = match parser.lparse(source, prefix.start) {
+                let mut extensions = match parser.lparse(source, prefix.start) {
                     Ok(e) => e,
                     Err(_) => continue,
                 };
+                if possessive.as_ref().is_some_and(|parts| parts[index]) {
+                    // A shorter match is followed by another round of
+                    // the repetition, which the rest cannot start with;
+                    // see `analysis::possessive_parts`.
+                    extensions.truncate(1);
+                }
+                extensions.retain(|ext| ends.insert(ext.start));
                 if extensions.is_empty() {
                     continue;
                 }
@@ -65,9 +109,52 @@ impl Concatenation {
         }
         Ok(match_list)
     }
+
+    /// `lparse` where every part has at most one match (see
+    /// `analysis::deterministic`): one prefix, extended in place, with
+    /// no candidate list and no set of end offsets.
+    fn lparse_one(&self, source: Src<'_>, start: usize) -> ParseResult {
+        let mut nodes: NodeList = SmallVec::new();
+        let mut end = start;
+        for parser in &self.parsers {
+            let Some(m) = parser
+                .lparse(source, end)
+                .ok()
+                .and_then(|ms| ms.into_iter().next())
+            else {
+                return Err(ParseError::new("Concatenation", start));
+            };
+            nodes.extend(m.nodes);
+            end = m.start;
+        }
+        Ok(smallvec![Match::new(nodes, end)])
+    }
 }
 
 /// Stable sort by `start` descending — longest match first.
 pub(crate) fn sort_by_longest(matches: &mut [Match]) {
     matches.sort_by_key(|m| std::cmp::Reverse(m.start));
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::alternation::Alternation;
+    use crate::literal::Literal;
+    use crate::parser::{arc, Parser};
+
+    #[test]
+    fn keeps_one_candidate_per_end_offset() {
+        // ("a" / "a") ("a" / "aa"): four derivations, two ends.
+        let ambiguous = |second: &str| {
+            arc(Parser::Alternation(Alternation::new(vec![
+                arc(Parser::Literal(Literal::string("a", false))),
+                arc(Parser::Literal(Literal::string(second, false))),
+            ])))
+        };
+        let parser = Concatenation::new(vec![ambiguous("a"), ambiguous("aa")]);
+        let source: Vec<u32> = "aaa".chars().map(u32::from).collect();
+        let ends: Vec<usize> = parser.lparse(&source, 0).unwrap().iter().map(|m| m.start).collect();
+        assert_eq!(ends, vec![3, 2]);
+    }
+}
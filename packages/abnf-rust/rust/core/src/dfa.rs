@@ -0,0 +1,566 @@
+//! Deterministic finite automata for regular rules.
+//!
+//! Mirrors `abnf._dfa`: a rule that cannot reach itself matches a
+//! regular language, and a DFA over classes of code points tells where
+//! its matches can end in one pass, without backtracking.  Only rules
+//! whose language the grammar alone determines are compiled -- none with
+//! an exclusion, prose, or an `External` parser anywhere below -- and the
+//! automaton is built for longest-match alternation, so it stops
+//! describing the rule once `first_match` is set on an alternation it
+//! went through; see [`Dfa::is_current`].
+//!
+//! `NamedRule` consults one only for a frozen rule, and only to turn
+//! away input no match can start at.  A match still has to be parsed,
+//! for its nodes.
+
+use std::collections::{BTreeMap, BTreeSet, HashMap, HashSet};
+
+use crate::literal::LiteralKind;
+use crate::parser::{ArcParser, Parser, Src};
+use crate::rule::NamedRule;
+
+/// The most states an automaton may have, before and after
+/// determinising.
+const STATE_LIMIT: usize = 4096;
+
+/// The most NFA states the subset construction may visit, counted once
+/// per DFA state it builds.  The automata that come to need too many
+/// states get there slowly; this gives up on them sooner.
+const WORK_LIMIT: usize = 100_000;
+
+/// The state nothing leaves.
+const DEAD: usize = 0;
+/// The state before the first code point.
+const START: usize = 1;
+
+/// The largest code point.
+const MAX_CODE_POINT: u32 = 0x10FFFF;
+
+/// A deterministic automaton over classes of code points: the classes
+/// are the intervals between consecutive `bounds`, every code point in
+/// one treated alike by the rule.
+#[derive(Debug)]
+pub struct Dfa {
+    bounds: Vec<u32>,
+    /// The class of each ASCII code point, found without a search.
+    ascii: [u32; 128],
+    classes: usize,
+    /// `table[state * classes + class]` is the state after reading a code
+    /// point of that class.
+    table: Vec<u32>,
+    accepting: Vec<bool>,
+    /// The alternations the automaton was built through, all taken as
+    /// longest-match.
+    alternations: Vec<ArcParser>,
+}
+
+/// How far a [`Dfa`] got from one offset.
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub struct Scan {
+    /// Where the longest match ends, if there is one.
+    pub longest: Option<usize>,
+    /// Where reading stopped: at the first code point no match can
+    /// continue with, or at the end of the source.
+    pub stop: usize,
+}
+
+impl Dfa {
+    fn new(
+        bounds: Vec<u32>,
+        table: Vec<u32>,
+        accepting: Vec<bool>,
+        alternations: Vec<ArcParser>,
+    ) -> Self {
+        let classes = bounds.len() + 1;
+        let mut ascii = [0u32; 128];
+        for (cp, class) in (0u32..).zip(ascii.iter_mut()) {
+            *class = bounds.partition_point(|&bound| bound <= cp) as u32;
+        }
+        Self {
+            bounds,
+            ascii,
+            classes,
+            table,
+            accepting,
+            alternations,
+        }
+    }
+
+    pub fn states(&self) -> usize {
+        self.accepting.len()
+    }
+
+    /// Whether the rule still matches the language compiled.
+    pub fn is_current(&self) -> bool {
+        self.alternations
+            .iter()
+            .all(|a| !matches!(&**a, Parser::Alternation(a) if a.first_match()))
+    }
+
+    #[inline]
+    fn class(&self, cp: u32) -> usize {
+        match self.ascii.get(cp as usize) {
+            Some(class) => *class as usize,
+            None => self.bounds.partition_point(|&bound| bound <= cp),
+        }
+    }
+
+    /// Run from `start` until no match can continue.
+    pub fn scan(&self, source: Src<'_>, start: usize) -> Scan {
+        let mut state = START;
+        let mut longest = self.accepting[START].then_some(start);
+        for (offset, &cp) in source.iter().enumerate().skip(start) {
+            state = self.table[state * self.classes + self.class(cp)] as usize;
+            if state == DEAD {
+                return Scan {
+                    longest,
+                    stop: offset,
+                };
+            }
+            if self.accepting[state] {
+                longest = Some(offset + 1);
+            }
+        }
+        Scan {
+            longest,
+            stop: source.len(),
+        }
+    }
+}
+
+/// Why no automaton was built: the language is not regular, cannot be
+/// seen from here, or needs more than `STATE_LIMIT` states.
+struct NoAutomaton;
+
+/// Thompson's construction: each parser becomes a fragment with one
+/// entry and one exit, joined to others by empty moves.
+#[derive(Default)]
+struct Nfa {
+    moves: Vec<Vec<((u32, u32), usize)>>,
+    empty: Vec<Vec<usize>>,
+    alternations: Vec<ArcParser>,
+}
+
+impl Nfa {
+    fn state(&mut self) -> Result<usize, NoAutomaton> {
+        if self.moves.len() >= STATE_LIMIT {
+            return Err(NoAutomaton);
+        }
+        self.moves.push(Vec::new());
+        self.empty.push(Vec::new());
+        Ok(self.moves.len() - 1)
+    }
+
+    fn rule(
+        &mut self,
+        rule: &NamedRule,
+        visiting: &mut Vec<usize>,
+    ) -> Result<(usize, usize), NoAutomaton> {
+        let key = std::ptr::from_ref(rule) as usize;
+        // An atomic rule inside another matches less than its definition
+        // says; on its own it matches just as much, only once.
+        if rule.exclude().is_some()
+            || (rule.is_atomic() && !visiting.is_empty())
+            || visiting.contains(&key)
+        {
+            return Err(NoAutomaton);
+        }
+        let definition = rule.definition().ok_or(NoAutomaton)?;
+        visiting.push(key);
+        let fragment = self.fragment(&definition, visiting);
+        visiting.pop();
+        fragment
+    }
+
+    fn fragment(
+        &mut self,
+        parser: &ArcParser,
+        visiting: &mut Vec<usize>,
+    ) -> Result<(usize, usize), NoAutomaton> {
+        match &**parser {
+            Parser::Rule(rule) => self.rule(rule, visiting),
+            Parser::Literal(literal) => {
+                let steps: Vec<Vec<(u32, u32)>> = match &literal.kind {
+                    // Ranges are case-sensitive.
+                    LiteralKind::Range { lo, hi } => vec![vec![(*lo, *hi)]],
+                    // An empty literal fails at the end of the source,
+                    // which no state can tell.
+                    LiteralKind::String { value, .. } if value.is_empty() => {
+                        return Err(NoAutomaton)
+                    }
+                    LiteralKind::String { value, .. } => value
+                        .iter()
+                        .map(|&cp| match char::from_u32(cp) {
+                            Some(c) if !literal.case_sensitive && c.is_ascii_alphabetic() => {
+                                let (lower, upper) =
+                                    (c.to_ascii_lowercase() as u32, c.to_ascii_uppercase() as u32);
+                                vec![(lower, lower), (upper, upper)]
+                            }
+                            _ => vec![(cp, cp)],
+                        })
+                        .collect(),
+                };
+                let entry = self.state()?;
+                let mut end = entry;
+                for intervals in steps {
+                    let following = self.state()?;
+                    self.moves[end]
+                        .extend(intervals.into_iter().map(|interval| (interval, following)));
+                    end = following;
+                }
+                Ok((entry, end))
+            }
+            Parser::Alternation(a) => {
+                self.alternations.push(parser.clone());
+                let (entry, exit) = (self.state()?, self.state()?);
+                for arm in &a.parsers {
+                    let (start, end) = self.fragment(arm, visiting)?;
+                    self.empty[entry].push(start);
+                    self.empty[end].push(exit);
+                }
+                Ok((entry, exit))
+            }
+            Parser::Concatenation(c) => {
+                let entry = self.state()?;
+                let mut end = entry;
+                for part in &c.parsers {
+                    let (start, following) = self.fragment(part, visiting)?;
+                    self.empty[end].push(start);
+                    end = following;
+                }
+                Ok((entry, end))
+            }
+            Parser::Repetition(r) => {
+                let entry = self.state()?;
+                let mut end = entry;
+                for _ in 0..r.repeat.min {
+                    let (start, following) = self.fragment(&r.element, visiting)?;
+                    self.empty[end].push(start);
+                    end = following;
+                }
+                let exit = self.state()?;
+                self.empty[end].push(exit);
+                match r.repeat.max {
+                    None => {
+                        // Any number more: loop back from the element's exit.
+                        let (start, following) = self.fragment(&r.element, visiting)?;
+                        self.empty[end].push(start);
+                        self.empty[following].push(end);
+                    }
+                    Some(max) => {
+                        for _ in r.repeat.min..max {
+                            let (start, following) = self.fragment(&r.element, visiting)?;
+                            self.empty[end].push(start);
+                            self.empty[following].push(exit);
+                            end = following;
+                        }
+                    }
+                }
+                Ok((entry, exit))
+            }
+            Parser::Option(o) => {
+                let (entry, exit) = (self.state()?, self.state()?);
+                let (start, end) = self.fragment(&o.alternation, visiting)?;
+                self.empty[entry].extend([start, exit]);
+                self.empty[end].push(exit);
+                Ok((entry, exit))
+            }
+            Parser::Prose(_) | Parser::External(_) => Err(NoAutomaton),
+        }
+    }
+}
+
+/// The subset construction, over the classes of code points the NFA's
+/// moves tell apart.  A DFA state is the set of NFA states with a move
+/// to make, or that are the exit, reachable without reading anything.
+fn determinise(nfa: &Nfa, entry: usize, exit: usize) -> Option<(Vec<u32>, Vec<u32>, Vec<bool>)> {
+    let mut points: BTreeSet<u32> = BTreeSet::new();
+    for &((lo, hi), _) in nfa.moves.iter().flatten() {
+        points.insert(lo);
+        points.insert(hi.saturating_add(1));
+    }
+    points.remove(&0);
+    points.remove(&(MAX_CODE_POINT + 1));
+    let bounds: Vec<u32> = points.into_iter().collect();
+    let classes = bounds.len() + 1;
+    let class_of = |cp: u32| bounds.partition_point(|&bound| bound <= cp);
+
+    let mut closures: HashMap<usize, Vec<usize>> = HashMap::new();
+    let mut closure = |state: usize| -> Vec<usize> {
+        closures
+            .entry(state)
+            .or_insert_with(|| {
+                let mut seen: HashSet<usize> = HashSet::from([state]);
+                let mut pending = vec![state];
+                while let Some(current) = pending.pop() {
+                    for &following in &nfa.empty[current] {
+                        if seen.insert(following) {
+                            pending.push(following);
+                        }
+                    }
+                }
+                let mut kernel: Vec<usize> = seen
+                    .into_iter()
+                    .filter(|&s| !nfa.moves[s].is_empty() || s == exit)
+                    .collect();
+                kernel.sort_unstable();
+                kernel
+            })
+            .clone()
+    };
+
+    // Where a code point of each class takes each NFA state.
+    let mut steps: HashMap<usize, Vec<(usize, Vec<usize>)>> = HashMap::new();
+
+    let start = closure(entry);
+    let mut numbers: HashMap<Vec<usize>, u32> =
+        HashMap::from([(Vec::new(), DEAD as u32), (start.clone(), START as u32)]);
+    let mut order: Vec<Vec<usize>> = vec![Vec::new(), start.clone()];
+    let mut table: Vec<u32> = vec![DEAD as u32; 2 * classes];
+    let mut pending: Vec<Vec<usize>> = vec![start];
+    let mut work = 0;
+    while let Some(current) = pending.pop() {
+        work += current.len();
+        if work > WORK_LIMIT {
+            return None;
+        }
+        let row = numbers[&current] as usize * classes;
+        let mut targets: BTreeMap<usize, BTreeSet<usize>> = BTreeMap::new();
+        for &state in &current {
+            let by_class = steps.entry(state).or_insert_with(|| {
+                let mut by_class: BTreeMap<usize, BTreeSet<usize>> = BTreeMap::new();
+                for &((lo, hi), target) in &nfa.moves[state] {
+                    let reached = closure(target);
+                    for class in class_of(lo)..=class_of(hi) {
+                        by_class
+                            .entry(class)
+                            .or_default()
+                            .extend(reached.iter().copied());
+                    }
+                }
+                by_class
+                    .into_iter()
+                    .map(|(class, reached)| (class, reached.into_iter().collect()))
+                    .collect()
+            });
+            for (class, reached) in by_class.iter() {
+                targets
+                    .entry(*class)
+                    .or_default()
+                    .extend(reached.iter().copied());
+            }
+        }
+        for (class, reached) in targets {
+            let following: Vec<usize> = reached.into_iter().collect();
+            let number = match numbers.get(&following) {
+                Some(&number) => number,
+                None => {
+                    if order.len() >= STATE_LIMIT {
+                        return None;
+                    }
+                    let number = order.len() as u32;
+                    numbers.insert(following.clone(), number);
+                    order.push(following.clone());
+                    table.resize(table.len() + classes, DEAD as u32);
+                    pending.push(following);
+                    number
+                }
+            };
+            table[row + class] = number;
+        }
+    }
+    let accepting: Vec<bool> = order.iter().map(|states| states.contains(&exit)).collect();
+    let (table, accepting) = minimise(table, accepting, classes);
+    Some((bounds, table, accepting))
+}
+
+/// The smallest automaton accepting what `table` does: Hopcroft's
+/// partition refinement.  States that cannot reach a match merge into
+/// `DEAD`, so reading stops as soon as a match is out of reach.
+fn minimise(table: Vec<u32>, accepting: Vec<bool>, classes: usize) -> (Vec<u32>, Vec<bool>) {
+    let states = accepting.len();
+    // Which states each class of code point leads to each state from.
+    let mut sources: Vec<HashMap<usize, Vec<usize>>> = vec![HashMap::new(); classes];
+    for state in 0..states {
+        for (class, by_target) in sources.iter_mut().enumerate() {
+            by_target
+                .entry(table[state * classes + class] as usize)
+                .or_default()
+                .push(state);
+        }
+    }
+
+    let mut block_of: Vec<usize> = vec![0; states];
+    let mut blocks: Vec<HashSet<usize>> = Vec::new();
+    for flag in [false, true] {
+        let members: HashSet<usize> = (0..states).filter(|&s| accepting[s] == flag).collect();
+        if !members.is_empty() {
+            for &state in &members {
+                block_of[state] = blocks.len();
+            }
+            blocks.push(members);
+        }
+    }
+    let mut splitters: HashSet<usize> = (0..blocks.len()).collect();
+    while let Some(&index) = splitters.iter().next() {
+        splitters.remove(&index);
+        let splitter: Vec<usize> = blocks[index].iter().copied().collect();
+        for by_target in &sources {
+            let mut touched: BTreeMap<usize, HashSet<usize>> = BTreeMap::new();
+            for target in &splitter {
+                for &state in by_target.get(target).into_iter().flatten() {
+                    touched.entry(block_of[state]).or_default().insert(state);
+                }
+            }
+            for (index, inside) in touched {
+                if inside.len() == blocks[index].len() {
+                    continue;
+                }
+                blocks[index].retain(|state| !inside.contains(state));
+                let split = blocks.len();
+                for &state in &inside {
+                    block_of[state] = split;
+                }
+                let smaller = inside.len() <= blocks[index].len();
+                blocks.push(inside);
+                if splitters.contains(&index) || smaller {
+                    splitters.insert(split);
+                } else {
+                    splitters.insert(index);
+                }
+            }
+        }
+    }
+
+    if block_of[START] == block_of[DEAD] || blocks.len() == states {
+        // Nothing to merge, or nothing matches at all and `START` has to
+        // stay apart from `DEAD` regardless.
+        return (table, accepting);
+    }
+    let mut numbers: HashMap<usize, usize> =
+        HashMap::from([(block_of[DEAD], DEAD), (block_of[START], START)]);
+    for &block in &block_of {
+        let next = numbers.len();
+        numbers.entry(block).or_insert(next);
+    }
+    let mut merged = vec![DEAD as u32; numbers.len() * classes];
+    let mut flags = vec![false; numbers.len()];
+    for state in 0..states {
+        let number = numbers[&block_of[state]];
+        flags[number] = accepting[state];
+        for class in 0..classes {
+            merged[number * classes + class] =
+                numbers[&block_of[table[state * classes + class] as usize]] as u32;
+        }
+    }
+    (merged, flags)
+}
+
+/// A DFA accepting exactly what `rule` matches, or `None` if its language
+/// is not regular, is not determined by the grammar alone, or needs more
+/// than `STATE_LIMIT` states.
+pub fn rule_dfa(rule: &NamedRule) -> Option<Dfa> {
+    let mut nfa = Nfa::default();
+    let (entry, exit) = nfa.rule(rule, &mut Vec::new()).ok()?;
+    let (bounds, table, accepting) = determinise(&nfa, entry, exit)?;
+    Some(Dfa::new(bounds, table, accepting, nfa.alternations))
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::alternation::Alternation;
+    use crate::concatenation::Concatenation;
+    use crate::literal::Literal;
+    use crate::option::OptionParser;
+    use crate::parser::arc;
+    use crate::repetition::{Repeat, Repetition};
+    use std::sync::Arc;
+
+    fn cps(s: &str) -> Vec<u32> {
+        s.chars().map(u32::from).collect()
+    }
+
+    #[test]
+    fn scans_to_the_longest_match_and_stops_where_none_can_continue() {
+        // time = 2DIGIT ":" 2DIGIT [ ":" 2DIGIT ]
+        let digits = || {
+            arc(Repetition::new(
+                Repeat::new(2, Some(2)),
+                arc(Literal::range(u32::from(b'0'), u32::from(b'9'))),
+            ))
+        };
+        let time = NamedRule::new("time");
+        time.set_definition(arc(Concatenation::new(vec![
+            digits(),
+            arc(Literal::string(":", false)),
+            digits(),
+            arc(OptionParser::new(arc(Alternation::new(vec![arc(
+                Concatenation::new(vec![arc(Literal::string(":", false)), digits()]),
+            )])))),
+        ])));
+        let dfa = rule_dfa(&time).expect("regular");
+        let scan = |s: &str| dfa.scan(&cps(s), 0);
+        assert_eq!(
+            scan("12:34:56"),
+            Scan {
+                longest: Some(8),
+                stop: 8
+            }
+        );
+        assert_eq!(
+            scan("12:34:5x"),
+            Scan {
+                longest: Some(5),
+                stop: 7
+            }
+        );
+        assert_eq!(
+            scan("12:3x"),
+            Scan {
+                longest: None,
+                stop: 4
+            }
+        );
+        // One state per position and a dead one, however the NFA was built.
+        assert_eq!(dfa.states(), 10);
+    }
+
+    #[test]
+    fn recursive_and_excluded_rules_have_none() {
+        // list = "(" *list ")"
+        let list = Arc::new(NamedRule::new("list"));
+        list.set_definition(arc(Concatenation::new(vec![
+            arc(Literal::string("(", false)),
+            arc(Repetition::new(Repeat::new(0, None), arc(list.clone()))),
+            arc(Literal::string(")", false)),
+        ])));
+        assert!(rule_dfa(&list).is_none());
+        let word = NamedRule::new("word");
+        word.set_definition(arc(Repetition::new(
+            Repeat::new(1, None),
+            arc(Literal::range(u32::from(b'a'), u32::from(b'z'))),
+        )));
+        assert!(rule_dfa(&word).is_some());
+        let keyword = Arc::new(NamedRule::new("keyword"));
+        keyword.set_definition(arc(Literal::string("if", false)));
+        word.set_exclude(Some(keyword));
+        assert!(rule_dfa(&word).is_none());
+    }
+
+    #[test]
+    fn first_match_makes_it_stale() {
+        let ab = NamedRule::new("ab");
+        ab.set_definition(arc(Alternation::new(vec![
+            arc(Literal::string("a", false)),
+            arc(Literal::string("ab", false)),
+        ])));
+        let dfa = rule_dfa(&ab).expect("regular");
+        assert_eq!(dfa.scan(&cps("AB"), 0).longest, Some(2));
+        assert!(dfa.is_current());
+        if let Parser::Alternation(a) = &*ab.definition().expect("defined") {
+            a.set_first_match(true);
+        }
+        assert!(!dfa.is_current());
+    }
+}
@@ -0,0 +1,125 @@
+//! Farthest-failure tracking.
+//!
+//! Mirrors `abnf._parser_python._expect`: the terminals record where
+//! they fail -- and combinators record where the analysis lets them
+//! skip trying an element -- so a failed parse can say how far into the
+//! input it got and what it was looking for there.  `ParseError.start`
+//! only says where the failing rule began.
+//!
+//! The state is per thread and belongs to one epoch (see `cache`):
+//! recording under a new epoch starts over, so nothing needs clearing
+//! between parses.  Recording costs a comparison unless the failure is
+//! at or past the farthest offset so far.
+
+use std::cell::RefCell;
+
+use crate::cache::{current_epoch, in_parse};
+use crate::error::ErrorParser;
+
+/// At most this many expectations are kept for one offset.  The first
+/// ones are the ones worth reading.
+const EXPECTED_LIMIT: usize = 64;
+
+#[derive(Debug, Clone, Default)]
+pub(crate) struct Farthest {
+    epoch: u64,
+    offset: usize,
+    expected: Vec<ErrorParser>,
+}
+
+thread_local! {
+    static FARTHEST: RefCell<Farthest> = RefCell::new(Farthest::default());
+}
+
+/// Record that `parser` did not match at `offset` in the current parse.
+pub(crate) fn record(parser: &ErrorParser, offset: usize) {
+    if !in_parse() {
+        return;
+    }
+    let epoch = current_epoch();
+    FARTHEST.with(|cell| {
+        let mut state = cell.borrow_mut();
+        if state.epoch != epoch || offset > state.offset {
+            state.epoch = epoch;
+            state.offset = offset;
+            state.expected.clear();
+            state.expected.push(parser.clone());
+        } else if offset == state.offset
+            && state.expected.len() < EXPECTED_LIMIT
+            && !state.expected.iter().any(|e| e.as_str() == parser.as_str())
+        {
+            state.expected.push(parser.clone());
+        }
+    });
+}
+
+/// Whether the current parse has already failed past `offset`, so that
+/// nothing failing at or before it could change what is recorded.
+/// Always true outside a parse, where nothing is.
+pub(crate) fn failed_past(offset: usize) -> bool {
+    if !in_parse() {
+        return true;
+    }
+    let epoch = current_epoch();
+    FARTHEST.with(|cell| {
+        let state = cell.borrow();
+        state.epoch == epoch && !state.expected.is_empty() && state.offset > offset
+    })
+}
+
+/// The farthest offset the current epoch's parse failed at, and the
+/// parsers that failed there, first failure first -- handed over and
+/// forgotten, so that asking twice does not report one parse's failure
+/// for the next.  `None` if nothing has failed under this epoch.
+pub fn take_farthest_failure() -> Option<(usize, Vec<ErrorParser>)> {
+    let epoch = current_epoch();
+    let state = take();
+    (state.epoch == epoch && !state.expected.is_empty()).then_some((state.offset, state.expected))
+}
+
+/// Set the state aside for a sub-parse over a different source, whose
+/// failures are at offsets into that source and so must not mix with
+/// the enclosing parse's.  See `SourceScope`.
+pub(crate) fn take() -> Farthest {
+    FARTHEST.with(|cell| std::mem::take(&mut *cell.borrow_mut()))
+}
+
+/// Put back what `take` set aside.
+pub(crate) fn restore(state: Farthest) {
+    FARTHEST.with(|cell| *cell.borrow_mut() = state);
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::cache::ParseScope;
+
+    #[test]
+    fn keeps_the_farthest_offset_and_what_failed_there() {
+        let _scope = ParseScope::enter();
+        record(&"a".into(), 1);
+        record(&"b".into(), 3);
+        record(&"c".into(), 2);
+        record(&"d".into(), 3);
+        record(&"b".into(), 3);
+        let (offset, expected) = take_farthest_failure().expect("failures recorded");
+        assert_eq!(offset, 3);
+        let expected: Vec<&str> = expected.iter().map(ErrorParser::as_str).collect();
+        assert_eq!(expected, ["b", "d"]);
+    }
+
+    #[test]
+    fn a_new_parse_starts_over() {
+        {
+            let _scope = ParseScope::enter();
+            record(&"a".into(), 5);
+        }
+        let _scope = ParseScope::enter();
+        assert!(take_farthest_failure().is_none());
+        record(&"a".into(), 5);
+        assert!(take_farthest_failure().is_some());
+        assert!(take_farthest_failure().is_none());
+        record(&"b".into(), 0);
+        assert_eq!(take_farthest_failure().map(|(offset, _)| offset), Some(0));
+    }
+}
@@ -22,11 +22,14 @@
 #![deny(unsafe_op_in_unsafe_fn)]
 
 mod alternation;
+mod analysis;
 mod cache;
 mod casefold;
 mod concatenation;
 mod core_rules;
+mod dfa;
 mod error;
+mod failure;
 mod literal;
 mod matcher;
 mod meta_grammar;
@@ -37,13 +40,20 @@ mod prose;
 mod registry;
 mod repetition;
 mod rule;
+mod terminal;
 mod visitor;
 
 pub use alternation::Alternation;
-pub use cache::{ParseCache, ParseScope, SourceScope};
+pub use analysis::{
+    alphabet, first_set, grammar_generation, length_bounds, nullable, required_literal, single_char,
+    Bounds, CharClass, First, RequiredLiteral,
+};
+pub use cache::{current_epoch, in_parse, MemoiseOverride, ParseCache, ParseScope, SourceScope};
 pub use concatenation::Concatenation;
 pub use core_rules::install_core_rules;
-pub use error::ParseError;
+pub use dfa::{rule_dfa, Dfa, Scan};
+pub use error::{ErrorParser, ParseError};
+pub use failure::take_farthest_failure;
 pub use literal::{Literal, LiteralKind};
 pub use matcher::Match;
 pub use meta_grammar::{build_meta_grammar, install_meta_grammar};
@@ -54,4 +64,5 @@ pub use prose::Prose;
 pub use registry::RuleRegistry;
 pub use repetition::{Repeat, Repetition};
 pub use rule::NamedRule;
+pub use terminal::Terminal;
 pub use visitor::{parse_rule_source, parse_rulelist_source, visit_rule, visit_rulelist, DefinedAs};
@@ -22,7 +22,7 @@ use std::sync::Arc;
 use smallvec::smallvec;
 
 use crate::casefold::ascii_fold_cp;
-use crate::error::ParseError;
+use crate::error::{ErrorParser, ParseError};
 use crate::matcher::Match;
 use crate::node::{LiteralNode, NodeKind};
 use crate::parser::{ParseResult, Src};
@@ -105,8 +105,15 @@ impl Literal {
     }
 
     #[inline]
+    /// How a failure of this literal is described.
+    pub(crate) fn label(&self) -> ErrorParser {
+        self.error_label.clone().into()
+    }
+
     fn parse_error(&self, start: usize) -> ParseError {
-        ParseError::new(self.error_label.clone(), start)
+        let label = self.label();
+        crate::failure::record(&label, start);
+        ParseError::new(label, start)
     }
 
     #[inline]
@@ -1,27 +1,105 @@
 //! `OptionParser` — ABNF `[ ... ]` operator.
 //!
-//! Mirrors `abnf.parser.Option` (`_parser_python.py:267-288`):
-//! syntactic sugar over `Repetition(Repeat(0, 1), alternation)`.
+//! Mirrors `abnf.parser.Option`: the element's matches, longest
+//! first, then the empty match -- what
+//! `Repetition(Repeat(0, 1), alternation)` yields, without the
+//! repetition's machinery.
 
-use crate::parser::{ArcParser, ParseResult, Src};
-use crate::repetition::{Repeat, Repetition};
+use std::collections::HashSet;
+use std::sync::Mutex;
+
+use smallvec::{smallvec, SmallVec};
+
+use crate::analysis::FactsCell;
+use crate::cache::{CachedResult, MemoiseOverride, ParseCache};
+use crate::concatenation::sort_by_longest;
+use crate::matcher::Match;
+use crate::parser::{ArcParser, MatchList, ParseResult, Src};
 
 #[derive(Debug)]
 pub struct OptionParser {
     pub alternation: ArcParser,
-    repetition: Repetition,
+    /// What the grammar says about matches of `alternation`; see
+    /// `lparse`.
+    facts: FactsCell,
+    /// Used only where the facts say the element is worth memoising.
+    cache: Mutex<ParseCache>,
+    /// Overrides what the facts say.
+    pub memoise: MemoiseOverride,
 }
 
 impl OptionParser {
     pub fn new(alternation: ArcParser) -> Self {
-        let repetition = Repetition::new(Repeat::new(0, Some(1)), alternation.clone());
         Self {
             alternation,
-            repetition,
+            facts: FactsCell::default(),
+            cache: Mutex::new(ParseCache::default()),
+            memoise: MemoiseOverride::default(),
         }
     }
 
     pub fn lparse(&self, source: Src<'_>, start: usize) -> ParseResult {
-        self.repetition.lparse(source, start)
+        // Where no non-empty match of the element can begin, the empty
+        // match is all there is: do not try the element.
+        let (possible, memoise) = self.facts.read(
+            || self.alternation.clone(),
+            |facts| (facts.can_start(source, start), facts.memoise),
+        );
+        if !possible {
+            crate::failure::record(&self.alternation.label(), start);
+            return Ok(smallvec![Match::new(SmallVec::new(), start)]);
+        }
+        if !self.memoise.get().unwrap_or(memoise) {
+            return Ok(self.matches(source, start));
+        }
+        {
+            // Tolerate a poisoned mutex, as `Repetition` does: the
+            // cache is only ever an optimisation.
+            let mut cache = self.cache.lock().unwrap_or_else(|e| e.into_inner());
+            if let Some(CachedResult::Matches(ms)) = cache.get(start) {
+                return Ok(ms);
+            }
+        }
+        let matches = self.matches(source, start);
+        let mut cache = self.cache.lock().unwrap_or_else(|e| e.into_inner());
+        cache.put(start, CachedResult::Matches(matches.clone()));
+        Ok(matches)
+    }
+
+    fn matches(&self, source: Src<'_>, start: usize) -> MatchList {
+        let mut matches = self.alternation.lparse(source, start).unwrap_or_default();
+        // An empty match of the element ends where the option's own
+        // does, so it adds nothing; nor does a second match ending
+        // where another did.
+        let mut seen: HashSet<usize> = HashSet::from([start]);
+        matches.retain(|m| seen.insert(m.start));
+        if matches.len() > 1 {
+            sort_by_longest(&mut matches);
+        }
+        matches.push(Match::new(SmallVec::new(), start));
+        matches
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::alternation::Alternation;
+    use crate::literal::Literal;
+    use crate::parser::{arc, Parser};
+
+    #[test]
+    fn yields_element_matches_longest_first_then_empty() {
+        let element = arc(Parser::Alternation(Alternation::new(vec![
+            arc(Parser::Literal(Literal::string("x", false))),
+            arc(Parser::Literal(Literal::string("xx", false))),
+        ])));
+        let option = OptionParser::new(element);
+        let ends = |source: &str| -> Vec<usize> {
+            let source: Vec<u32> = source.chars().map(u32::from).collect();
+            option.lparse(&source, 0).unwrap().iter().map(|m| m.start).collect()
+        };
+        assert_eq!(ends("xxx"), vec![2, 1, 0]);
+        assert_eq!(ends("y"), vec![0]);
     }
 }
@@ -6,6 +6,7 @@ use smallvec::SmallVec;
 
 use crate::alternation::Alternation;
 use crate::concatenation::Concatenation;
+use crate::error::ErrorParser;
 use crate::literal::Literal;
 use crate::matcher::Match;
 use crate::node::NodeKind;
@@ -57,6 +58,17 @@ pub type ArcParser = Arc<Parser>;
 /// [`ParseResult`] shape.
 pub trait ExternalParser: std::fmt::Debug + Send + Sync + 'static {
     fn lparse(&self, source: Src<'_>, start: usize) -> ParseResult;
+
+    /// How a failure of this parser is described; see [`Parser::label`].
+    fn label(&self) -> ErrorParser {
+        "External".into()
+    }
+
+    /// Whether this parser matches at most one way at any offset; see
+    /// `analysis::deterministic`.  Nothing is known of an arbitrary one.
+    fn deterministic(&self) -> bool {
+        false
+    }
 }
 
 /// Tagged union over every combinator type.
@@ -85,6 +97,22 @@ impl Parser {
             Parser::External(p) => p.lparse(source, start),
         }
     }
+
+    /// How a failure of this parser is described in the farthest
+    /// failure of a parse: a terminal or rule by its value or name, a
+    /// combinator by its kind.
+    pub(crate) fn label(&self) -> ErrorParser {
+        match self {
+            Parser::Alternation(_) => "Alternation".into(),
+            Parser::Concatenation(_) => "Concatenation".into(),
+            Parser::Repetition(_) => "Repetition".into(),
+            Parser::Option(_) => "Option".into(),
+            Parser::Literal(p) => p.label(),
+            Parser::Prose(_) => "Prose".into(),
+            Parser::Rule(p) => p.label(),
+            Parser::External(p) => p.label(),
+        }
+    }
 }
 
 // `From<X> for Parser` lets each combinator type be lifted into the
@@ -1,6 +1,6 @@
 //! `Prose` — placeholder for prose-val productions; always fails.
 
-use crate::error::ParseError;
+use crate::error::{ErrorParser, ParseError};
 use crate::parser::{ParseResult, Src};
 
 #[derive(Debug, Clone, Default)]
@@ -8,6 +8,8 @@ pub struct Prose;
 
 impl Prose {
     pub fn lparse(&self, _source: Src<'_>, start: usize) -> ParseResult {
-        Err(ParseError::new("Prose", start))
+        let label = ErrorParser::from("Prose");
+        crate::failure::record(&label, start);
+        Err(ParseError::new(label, start))
     }
 }
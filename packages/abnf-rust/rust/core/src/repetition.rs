@@ -8,7 +8,8 @@ use std::sync::Mutex;
 
 use smallvec::{smallvec, SmallVec};
 
-use crate::cache::{CachedResult, ParseCache};
+use crate::analysis::{FactsCell, SingleChar};
+use crate::cache::{CachedResult, MemoiseOverride, ParseCache};
 use crate::concatenation::{sort_by_longest, Concatenation};
 use crate::error::ParseError;
 use crate::matcher::Match;
@@ -44,7 +45,11 @@ pub struct Repetition {
     /// mutates one after handing it to `Repetition`, and a caller who
     /// did would need to rebuild the `Repetition` too.
     min_parser: Option<ArcParser>,
+    /// What the grammar says about matches of `element`; see `lparse`.
+    element_facts: FactsCell,
     cache: Mutex<ParseCache>,
+    /// `Some(false)` to skip `cache` altogether.
+    pub memoise: MemoiseOverride,
 }
 
 impl Repetition {
@@ -57,7 +62,9 @@ impl Repetition {
             repeat,
             element,
             min_parser,
+            element_facts: FactsCell::default(),
             cache: Mutex::new(ParseCache::default()),
+            memoise: MemoiseOverride::default(),
         }
     }
 
@@ -66,7 +73,31 @@ impl Repetition {
     }
 
     pub fn lparse(&self, source: Src<'_>, start: usize) -> ParseResult {
+        if let Some(max) = self.repeat.max {
+            let single = self
+                .element_facts
+                .read(|| self.element.clone(), |facts| facts.single.clone());
+            if let Some(single) = single {
+                return self.lparse_run(source, start, max, &single);
+            }
+        }
+        if self.repeat.max == Some(self.repeat.min)
+            && self
+                .element_facts
+                .read(|| self.element.clone(), |facts| facts.deterministic)
         {
+            // A fixed count of a deterministic element has one match,
+            // the `min` prefix parser's; there is no count to choose,
+            // and so nothing worth caching.
+            return match &self.min_parser {
+                None => Ok(smallvec![Match::new(SmallVec::new(), start)]),
+                Some(concat) => concat
+                    .lparse(source, start)
+                    .map_err(|_| ParseError::new("Repetition", start)),
+            };
+        }
+        let memoise = self.memoise.get() != Some(false);
+        if memoise {
             // Tolerate a poisoned mutex: a panic in some unrelated
             // earlier code path must not permanently brick this rule.
             // The cache is purely a hit-rate optimisation; stale
@@ -96,11 +127,13 @@ impl Repetition {
                 Ok(ms) => ms,
                 Err(_) => {
                     let err = ParseError::new("Repetition", start);
-                    // Tolerate a poisoned mutex, as above: a stale
-                    // entry left by a poisoned holder costs a miss,
-                    // never a wrong answer.
-                    let mut cache = self.cache.lock().unwrap_or_else(|e| e.into_inner());
-                    cache.put(start, CachedResult::Failed(err.clone()));
+                    if memoise {
+                        // Tolerate a poisoned mutex, as above: a stale
+                        // entry left by a poisoned holder costs a miss,
+                        // never a wrong answer.
+                        let mut cache = self.cache.lock().unwrap_or_else(|e| e.into_inner());
+                        cache.put(start, CachedResult::Failed(err.clone()));
+                    }
                     return Err(err);
                 }
             }
@@ -110,6 +143,16 @@ impl Repetition {
         let mut last_match_set = match_set.clone();
         let mut match_count = self.repeat.min;
 
+        // Where no non-empty match of the element can begin, the
+        // element can at most match the empty string -- which ends
+        // where the repeat already does, so it would be discarded
+        // below.  The element's FIRST set says where that is, so skip
+        // the call there instead of making it to find out.  Cloned out
+        // once: the lock must not be held across the element's parse.
+        let progress = self
+            .element_facts
+            .read(|| self.element.clone(), |facts| facts.start.clone());
+
         loop {
             if let Some(max) = self.repeat.max {
                 if match_count == max {
@@ -118,6 +161,12 @@ impl Repetition {
             }
             let mut new_match_set: MatchList = SmallVec::new();
             for prefix in last_match_set.drain(..) {
+                if let Some(chars) = &progress {
+                    if !source.get(prefix.start).is_some_and(|&cp| chars.contains(cp)) {
+                        crate::failure::record(&self.element.label(), prefix.start);
+                        continue;
+                    }
+                }
                 let extensions = match self.element.lparse(source, prefix.start) {
                     Ok(e) => e,
                     Err(_) => continue,
@@ -152,7 +201,7 @@ impl Repetition {
             sort_by_longest(&mut match_set);
         }
 
-        {
+        if memoise {
             // Tolerate a poisoned mutex: a panic in some unrelated
             // earlier code path must not permanently brick this rule.
             // The cache is purely a hit-rate optimisation; stale
@@ -166,13 +215,56 @@ impl Repetition {
         }
         Ok(match_set)
     }
+
+    /// `lparse` for a bounded repetition of an element that matches
+    /// one code point at a time (`4DIGIT`, `1*4HEXDIG`).  The run of
+    /// code points the element accepts is measured, and the nodes over
+    /// it built from what the analysis says the element builds over
+    /// each, so the element is never parsed.  Each count ends somewhere
+    /// different, so there is nothing to deduplicate, and a run is
+    /// cheaper to measure again than to cache.
+    fn lparse_run(&self, source: Src<'_>, start: usize, max: usize, single: &SingleChar) -> ParseResult {
+        let run = source
+            .get(start..)
+            .unwrap_or_default()
+            .iter()
+            .take(max)
+            .take_while(|&&cp| single.chars.contains(cp))
+            .count();
+        if run < max {
+            // The element did not match where the run stopped.
+            crate::failure::record(&self.element.label(), start + run);
+        }
+        if run < self.repeat.min {
+            return Err(ParseError::new("Repetition", start));
+        }
+        let mut nodes: NodeList = SmallVec::new();
+        let mut matches: MatchList = SmallVec::new();
+        if self.repeat.min == 0 {
+            matches.push(Match::new(SmallVec::new(), start));
+        }
+        for count in 1..=run {
+            let offset = start + count - 1;
+            nodes.push(single.node(source[offset], offset));
+            if count >= self.repeat.min {
+                matches.push(Match::new(nodes.clone(), start + count));
+            }
+        }
+        matches.reverse();
+        Ok(matches)
+    }
 }
 
 #[cfg(test)]
 mod tests {
+    use std::cell::Cell;
+    use std::sync::Arc;
+
     use super::*;
+    use crate::alternation::Alternation;
     use crate::literal::Literal;
     use crate::parser::{arc, Parser};
+    use crate::rule::{NamedRule, LPARSE_CALLS};
 
     /// M6 regression: after the cache mutex is poisoned by a panic
     /// somewhere up the stack, subsequent `Repetition::lparse` calls
@@ -203,4 +295,47 @@ mod tests {
         let result = parser.lparse(&[0x78, 0x78, 0x78], 0);
         assert!(result.is_ok(), "expected Ok, got {result:?}");
     }
+
+    #[test]
+    fn bounded_run_of_single_characters_yields_each_count() {
+        let digit = arc(Parser::Literal(Literal::range(u32::from(b'0'), u32::from(b'9'))));
+        let parser = Repetition::new(Repeat::new(2, Some(4)), digit);
+        let source: Vec<u32> = "12345".chars().map(u32::from).collect();
+        let ends: Vec<usize> = parser.lparse(&source, 0).unwrap().iter().map(|m| m.start).collect();
+        assert_eq!(ends, vec![4, 3, 2]);
+        assert!(parser.lparse(&source, 4).is_err());
+    }
+
+    /// The nodes over a run are built from the span, the same as
+    /// parsing each code point would build, without parsing any.
+    #[test]
+    fn bounded_run_builds_nodes_without_parsing_the_element() {
+        let digit = Arc::new(NamedRule::new("DIGIT"));
+        digit.set_definition(arc(Literal::range(u32::from(b'0'), u32::from(b'9'))));
+        let hexdig = Arc::new(NamedRule::new("HEXDIG"));
+        hexdig.set_definition(arc(Alternation::new(vec![
+            arc(Parser::Rule(digit)),
+            arc(Literal::range(u32::from(b'a'), u32::from(b'f'))),
+            arc(Literal::string("0", false)),
+        ])));
+        let element = arc(Parser::Rule(hexdig));
+        let parser = Repetition::new(Repeat::new(1, Some(4)), element.clone());
+        let source: Vec<u32> = "0fa9z".chars().map(u32::from).collect();
+        let expected: Vec<String> = (0..4)
+            .map(|offset| format!("{:?}", element.lparse(&source, offset).unwrap()[0].nodes))
+            .collect();
+
+        let before = LPARSE_CALLS.with(Cell::get);
+        let matches = parser.lparse(&source, 0).unwrap();
+        assert_eq!(LPARSE_CALLS.with(Cell::get), before);
+
+        let ends: Vec<usize> = matches.iter().map(|m| m.start).collect();
+        assert_eq!(ends, vec![4, 3, 2, 1]);
+        let built: Vec<String> = matches[0]
+            .nodes
+            .iter()
+            .map(|node| format!("{:?}", [node]))
+            .collect();
+        assert_eq!(built, expected);
+    }
 }
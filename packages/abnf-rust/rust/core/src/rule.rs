@@ -5,14 +5,17 @@
 
 use std::cell::Cell;
 use std::collections::HashSet;
-use std::sync::{Arc, RwLock};
+use std::sync::atomic::{AtomicBool, Ordering};
+use std::sync::{Arc, OnceLock, RwLock};
 
 use smallvec::{smallvec, SmallVec};
 
-use crate::error::ParseError;
+use crate::analysis::Lexicon;
+use crate::dfa::Dfa;
+use crate::error::{ErrorParser, ParseError};
 use crate::matcher::Match;
-use crate::node::{Node, NodeKind};
-use crate::parser::{ArcParser, MatchList, ParseResult, Src};
+use crate::node::{LiteralNode, Node, NodeKind};
+use crate::parser::{ArcParser, MatchList, ParseResult, Parser, Src};
 
 /// Maximum nested rule-recursion depth.  A left-recursive grammar
 /// (`a = a "x" / "x"`) would otherwise recurse through Rust native
@@ -62,6 +65,13 @@ thread_local! {
     static STACK_ANCHOR: Cell<usize> = const { Cell::new(0) };
 }
 
+#[cfg(test)]
+thread_local! {
+    /// How many times `NamedRule::lparse` has run on this thread, for
+    /// tests that check a rule is not parsed.
+    pub(crate) static LPARSE_CALLS: Cell<usize> = const { Cell::new(0) };
+}
+
 /// Address of a local in the calling frame, used to measure stack
 /// consumption.  `black_box` forces `probe` into a real stack slot
 /// rather than a register, and `inline(always)` keeps the slot in
@@ -158,6 +168,31 @@ pub struct NamedRule {
     /// a rule reference paid a `format!` allocation per discarded
     /// `ParseError`.
     error_label: Arc<str>,
+    /// Definition and exclusion as they stood when the grammar was
+    /// frozen (`Rule.freeze`).  Once set, both are read from here
+    /// without touching either lock: a frozen rule can be shared
+    /// between threads at the cost of an atomic load per reference.
+    frozen: OnceLock<Frozen>,
+    /// This rule's language as a lookup table, when it is finite and
+    /// small -- what an exclusion of reserved words usually is -- and
+    /// the grammar generation it was worked out for.  See
+    /// `is_excluded`.
+    lexicon: RwLock<Option<(u64, Option<Arc<Lexicon>>)>>,
+    /// This rule's DFA, compiled the first time a frozen rule is parsed
+    /// (never before: its definition could still change).  See
+    /// `automaton`.
+    dfa: OnceLock<Option<Dfa>>,
+    /// `Rule.token`: the rule's node is its match as one literal, and
+    /// the nodes of its definition are dropped.
+    token: AtomicBool,
+    /// `Rule.atomic`: the rule commits to its first (longest) match.
+    atomic: AtomicBool,
+}
+
+#[derive(Debug)]
+struct Frozen {
+    definition: Option<ArcParser>,
+    exclude: Option<Arc<NamedRule>>,
 }
 
 impl NamedRule {
@@ -169,24 +204,76 @@ impl NamedRule {
             definition: RwLock::new(None),
             exclude: RwLock::new(None),
             error_label,
+            frozen: OnceLock::new(),
+            lexicon: RwLock::new(None),
+            dfa: OnceLock::new(),
+            token: AtomicBool::new(false),
+            atomic: AtomicBool::new(false),
         }
     }
 
+    /// Fix the definition and exclusion as they are now.  Later reads
+    /// are lock-free; later writes panic, so the Python side checks
+    /// first and raises `GrammarError` instead.  Idempotent.
+    pub fn freeze(&self) {
+        self.frozen.get_or_init(|| Frozen {
+            definition: self.definition(),
+            exclude: self.exclude(),
+        });
+    }
+
+    pub fn is_frozen(&self) -> bool {
+        self.frozen.get().is_some()
+    }
+
+    fn assert_not_frozen(&self) {
+        assert!(!self.is_frozen(), "rule \"{}\" is frozen", self.name);
+    }
+
     /// Set (or clear) the exclusion.  Mirrors `Rule.exclude_rule` on
     /// the Python side, which the dispatch shim forwards here so the
     /// engine sees exclusions on nested rule references and not just
     /// on whichever rule the caller happened to parse directly.
     pub fn set_exclude(&self, rule: Option<Arc<NamedRule>>) {
+        self.assert_not_frozen();
         *self.exclude.write().unwrap_or_else(|e| e.into_inner()) = rule;
+        crate::analysis::bump_generation();
     }
 
-    fn exclude(&self) -> Option<Arc<NamedRule>> {
+    pub(crate) fn exclude(&self) -> Option<Arc<NamedRule>> {
+        if let Some(frozen) = self.frozen.get() {
+            return frozen.exclude.clone();
+        }
         self.exclude
             .read()
             .unwrap_or_else(|e| e.into_inner())
             .clone()
     }
 
+    /// Set `Rule.token`, which the grammar text sets with the
+    /// `; @abnf: token` pragma.
+    pub fn set_token(&self, value: bool) {
+        self.assert_not_frozen();
+        self.token.store(value, Ordering::Relaxed);
+        crate::analysis::bump_generation();
+    }
+
+    pub fn is_token(&self) -> bool {
+        self.token.load(Ordering::Relaxed)
+    }
+
+    /// Set `Rule.atomic`, which the grammar text sets with the
+    /// `; @abnf: atomic` pragma.
+    pub fn set_atomic(&self, value: bool) {
+        self.assert_not_frozen();
+        self.atomic.store(value, Ordering::Relaxed);
+        crate::analysis::bump_generation();
+    }
+
+    pub fn is_atomic(&self) -> bool {
+        self.atomic.load(Ordering::Relaxed)
+    }
+
     /// Whether `text` parses completely as the excluded rule.
     ///
     /// Mirrors the pure-Python check, which runs `parse_all` over the
@@ -203,6 +290,9 @@ impl NamedRule {
         if excluded.definition().is_none() {
             panic!("Undefined rule \"{}\"", excluded.name);
         }
+        if let Some(lexicon) = excluded.lexicon().filter(|l| l.is_current()) {
+            return lexicon.contains(text);
+        }
         // The sub-parse runs over different text inside the current
         // parse, so it needs its own epoch -- position-keyed cache
         // entries from the two must not mix.
@@ -213,26 +303,71 @@ impl NamedRule {
         }
     }
 
+    /// `rule_lexicon` of this rule, worked out again after any rule
+    /// changes.
+    fn lexicon(&self) -> Option<Arc<Lexicon>> {
+        let generation = crate::analysis::grammar_generation();
+        if let Some((stamp, lexicon)) = &*self.lexicon.read().unwrap_or_else(|e| e.into_inner()) {
+            if *stamp == generation {
+                return lexicon.clone();
+            }
+        }
+        let lexicon = crate::analysis::rule_lexicon(self).map(Arc::new);
+        *self.lexicon.write().unwrap_or_else(|e| e.into_inner()) =
+            Some((generation, lexicon.clone()));
+        lexicon
+    }
+
     pub fn set_definition(&self, def: ArcParser) {
+        self.assert_not_frozen();
         // Tolerate a poisoned lock: even if a panic in an earlier
         // code path left it poisoned, we still want to record the
         // new definition rather than permanently brick every parse
         // that touches this rule.
         *self.definition.write().unwrap_or_else(|e| e.into_inner()) = Some(def);
+        crate::analysis::bump_generation();
     }
 
     pub fn definition(&self) -> Option<ArcParser> {
+        if let Some(frozen) = self.frozen.get() {
+            return frozen.definition.clone();
+        }
         self.definition
             .read()
             .unwrap_or_else(|e| e.into_inner())
             .clone()
     }
 
+    /// The DFA of a frozen rule, while it describes the rule.  A rule
+    /// defined as a single literal has none: the literal is matched as
+    /// fast as a DFA is run.
+    fn automaton(&self) -> Option<&Dfa> {
+        if !self.is_frozen() {
+            return None;
+        }
+        self.dfa
+            .get_or_init(|| match self.definition().as_deref() {
+                Some(Parser::Literal(_)) | None => None,
+                Some(_) => crate::dfa::rule_dfa(self),
+            })
+            .as_ref()
+            .filter(|dfa| dfa.is_current())
+    }
+
+    /// How a failure of this rule is described.
+    pub(crate) fn label(&self) -> ErrorParser {
+        self.error_label.clone().into()
+    }
+
     fn parse_error(&self, start: usize) -> ParseError {
-        ParseError::new(self.error_label.clone(), start)
+        let label = self.label();
+        crate::failure::record(&label, start);
+        ParseError::new(label, start)
     }
 
     pub fn lparse(&self, source: Src<'_>, start: usize) -> ParseResult {
+        #[cfg(test)]
+        LPARSE_CALLS.with(|calls| calls.set(calls.get() + 1));
         // Bound recursion depth so left-recursive grammars surface as
         // a catchable Python exception instead of overflowing the
         // native stack and SIGSEGVing the process.  `_guard` releases
@@ -279,19 +414,33 @@ impl NamedRule {
         let Some(def) = self.definition() else {
             panic!("Undefined rule \"{}\"", self.name);
         };
+        // Where no match can start, the DFA says so in one pass.  Parsing
+        // would have tried no terminal past where it stopped, so if the
+        // parse has already failed farther on, it would have recorded
+        // nothing either, and its error would have been the one the
+        // definition fails with.
+        //
+        // The DFA is only used to reject.  Where it accepts, the
+        // definition is parsed below exactly as it would be unfrozen: the
+        // pure-Python engine's ends-and-derivation path (`abnf._dfa`) has
+        // no counterpart here, so a successful parse of a frozen rule
+        // still runs the combinators.
+        if let Some(dfa) = self.automaton() {
+            let scan = dfa.scan(source, start);
+            if scan.longest.is_none() && crate::failure::failed_past(scan.stop) {
+                return Err(ParseError::new(failure_label(def), start));
+            }
+        }
         let inner = def.lparse(source, start)?;
 
         let excluded = self.exclude();
+        let token = self.is_token();
 
         // Hot path: most rules produce exactly one match and have no
         // exclusion.  Skip the dedup allocation entirely.
         if inner.len() == 1 && excluded.is_none() {
             let m = inner.into_iter().next().expect("len == 1");
-            let node = Node::new(self.name.clone(), m.nodes.into_vec());
-            return Ok(smallvec![Match::new(
-                smallvec![NodeKind::Internal(node)],
-                m.start,
-            )]);
+            return Ok(smallvec![self.wrap(m, start, token)]);
         }
 
         // Multi-match (ambiguous grammar) or an exclusion to apply:
@@ -311,8 +460,10 @@ impl NamedRule {
                     continue;
                 }
             }
-            let node = Node::new(self.name.clone(), m.nodes.into_vec());
-            wrapped.push(Match::new(smallvec![NodeKind::Internal(node)], m.start));
+            wrapped.push(self.wrap(m, start, token));
+            if self.is_atomic() {
+                break;
+            }
         }
         if wrapped.is_empty() {
             Err(self.parse_error(start))
@@ -320,4 +471,49 @@ impl NamedRule {
             Ok(wrapped)
         }
     }
+
+    /// The match of this rule that `m`, a match of its definition from
+    /// `start`, makes: the definition's nodes under one named for the
+    /// rule, or for a token, the matched text.
+    fn wrap(&self, m: Match, start: usize, token: bool) -> Match {
+        let children = if token {
+            vec![NodeKind::Literal(LiteralNode::new(start, m.start - start))]
+        } else {
+            m.nodes.into_vec()
+        };
+        let node = Node::new(self.name.clone(), children);
+        Match::new(smallvec![NodeKind::Internal(node)], m.start)
+    }
+}
+
+/// How parsing `definition` describes its failure: by the first parser
+/// down a chain of rules defined as other rules that is not one.
+fn failure_label(mut definition: ArcParser) -> ErrorParser {
+    while let Parser::Rule(rule) = &*definition {
+        match rule.definition() {
+            Some(inner) => definition = inner,
+            None => break,
+        }
+    }
+    definition.label()
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::literal::Literal;
+    use crate::parser::arc;
+
+    #[test]
+    fn frozen_rule_keeps_its_definition_and_refuses_another() {
+        let rule = NamedRule::new("a");
+        rule.set_definition(arc(Literal::string("x", false)));
+        rule.freeze();
+        assert!(rule.is_frozen());
+        assert_eq!(rule.lparse(&[u32::from(b'x')], 0).map(|m| m.len()).ok(), Some(1));
+        let redefine = std::panic::catch_unwind(std::panic::AssertUnwindSafe(|| {
+            rule.set_definition(arc(Literal::string("y", false)));
+        }));
+        assert!(redefine.is_err());
+    }
 }
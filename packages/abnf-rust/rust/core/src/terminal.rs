@@ -0,0 +1,345 @@
+//! `Terminal` — a terminal matched by code rather than by grammar.
+//!
+//! Mirrors `abnf.parser.Terminal`: a function of the source and an
+//! offset returns where its match ends, or `None`, and the match is a
+//! single `LiteralNode`.  Assigned as a rule's definition it stands in
+//! for a rule whose grammar is slow to parse.
+//!
+//! The bundled terminals ([`Terminal::bundled`]) are plain `fn`s over
+//! the code points, mirroring `abnf._terminals`; each returns the end of
+//! the longest match of its rule as the RFC writes it.
+
+use std::fmt;
+use std::sync::Arc;
+
+use smallvec::smallvec;
+
+use crate::error::{ErrorParser, ParseError};
+use crate::matcher::Match;
+use crate::node::{LiteralNode, NodeKind};
+use crate::parser::{ExternalParser, ParseResult, Src};
+
+/// The code that matches a terminal: where its match from `start` ends.
+pub type ScanFn = dyn Fn(Src<'_>, usize) -> Option<usize> + Send + Sync;
+
+pub struct Terminal {
+    name: Arc<str>,
+    /// `Terminal('name')`, formatted once for every failure to share.
+    label: Arc<str>,
+    scan: Box<ScanFn>,
+}
+
+impl fmt::Debug for Terminal {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        f.write_str(&self.label)
+    }
+}
+
+impl Terminal {
+    pub fn new(
+        name: impl Into<Arc<str>>,
+        scan: impl Fn(Src<'_>, usize) -> Option<usize> + Send + Sync + 'static,
+    ) -> Self {
+        let name = name.into();
+        let label = format!("Terminal('{name}')").into();
+        Self {
+            name,
+            label,
+            scan: Box::new(scan),
+        }
+    }
+
+    /// The bundled terminal for the rule `name`, matched
+    /// case-insensitively; `None` if there is none.
+    pub fn bundled(name: &str) -> Option<Self> {
+        BUNDLED
+            .iter()
+            .find(|(bundled, _)| bundled.eq_ignore_ascii_case(name))
+            .map(|&(bundled, scan)| Self::new(bundled, scan))
+    }
+
+    /// The names [`Terminal::bundled`] knows.
+    pub fn bundled_names() -> impl Iterator<Item = &'static str> {
+        BUNDLED.iter().map(|&(name, _)| name)
+    }
+
+    pub fn name(&self) -> &str {
+        &self.name
+    }
+}
+
+impl ExternalParser for Terminal {
+    fn lparse(&self, source: Src<'_>, start: usize) -> ParseResult {
+        match (self.scan)(source, start) {
+            Some(end) => {
+                debug_assert!(start <= end && end <= source.len());
+                let node = NodeKind::Literal(LiteralNode::new(start, end - start));
+                Ok(smallvec![Match::new(smallvec![node], end)])
+            }
+            None => {
+                let label = self.label();
+                crate::failure::record(&label, start);
+                Err(ParseError::new(label, start))
+            }
+        }
+    }
+
+    fn label(&self) -> ErrorParser {
+        self.label.clone().into()
+    }
+
+    fn deterministic(&self) -> bool {
+        true
+    }
+}
+
+/// A bundled terminal's code.
+type BundledScan = fn(Src<'_>, usize) -> Option<usize>;
+
+/// The bundled terminals, by the names of the rules they match.
+const BUNDLED: &[(&str, BundledScan)] = &[
+    ("IPv4address", ipv4address),
+    ("IPv6address", ipv6address),
+    ("base64", base64),
+    ("UTF8-octets", utf8_octets),
+];
+
+const DOT: u32 = '.' as u32;
+const COLON: u32 = ':' as u32;
+const EQUALS: u32 = '=' as u32;
+
+/// The longest IPv4address, and the longest IPv6address.
+const IPV4_LONGEST: usize = "255.255.255.255".len();
+const IPV6_LONGEST: usize = "ffff:ffff:ffff:ffff:ffff:ffff:255.255.255.255".len();
+
+fn is_digit(c: u32) -> bool {
+    (0x30..=0x39).contains(&c)
+}
+
+fn is_hexdig(c: u32) -> bool {
+    is_digit(c) || (0x41..=0x46).contains(&c) || (0x61..=0x66).contains(&c)
+}
+
+fn is_base64_char(c: u32) -> bool {
+    is_digit(c)
+        || (0x41..=0x5A).contains(&c)
+        || (0x61..=0x7A).contains(&c)
+        || c == '+' as u32
+        || c == '/' as u32
+}
+
+/// Where the run of code points satisfying `class` from `start` ends,
+/// looking no further than `limit` of them.
+fn run(source: Src<'_>, start: usize, class: fn(u32) -> bool, limit: usize) -> usize {
+    let stop = source.len().min(start + limit);
+    start
+        + source[start.min(stop)..stop]
+            .iter()
+            .take_while(|&&c| class(c))
+            .count()
+}
+
+/// The longest `source[start..stop]` with `stop <= end` that is
+/// `valid`, as `stop`.
+fn longest(source: Src<'_>, start: usize, end: usize, valid: fn(&[u32]) -> bool) -> Option<usize> {
+    (start + 1..=end)
+        .rev()
+        .find(|&stop| valid(&source[start..stop]))
+}
+
+/// Whether `text` is all of a `dec-octet`: 0 to 255, with no leading
+/// zero.
+fn is_dec_octet(text: &[u32]) -> bool {
+    (1..=3).contains(&text.len())
+        && text.iter().all(|&c| is_digit(c))
+        && (text.len() == 1 || text[0] != '0' as u32)
+        && text.iter().fold(0, |n, &c| n * 10 + (c - 0x30)) <= 255
+}
+
+fn is_ipv4(text: &[u32]) -> bool {
+    let mut parts = 0;
+    for part in text.split(|&c| c == DOT) {
+        if !is_dec_octet(part) {
+            return false;
+        }
+        parts += 1;
+    }
+    parts == 4
+}
+
+/// How many 16-bit pieces `text` -- `h16` separated by ":" -- spells
+/// out, the last of which may be an `IPv4address` (two pieces) when
+/// `ipv4_last`; `None` if it is not one of those.  Empty is none.
+fn units(text: &[u32], ipv4_last: bool) -> Option<usize> {
+    if text.is_empty() {
+        return Some(0);
+    }
+    let groups = text.split(|&c| c == COLON).count();
+    let mut count = 0;
+    for (i, group) in text.split(|&c| c == COLON).enumerate() {
+        if ipv4_last && i == groups - 1 && group.contains(&DOT) {
+            if !is_ipv4(group) {
+                return None;
+            }
+            count += 2;
+        } else if (1..=4).contains(&group.len()) && group.iter().all(|&c| is_hexdig(c)) {
+            count += 1;
+        } else {
+            return None;
+        }
+    }
+    Some(count)
+}
+
+/// Whether `text` is all of an `IPv6address`: eight pieces, or fewer
+/// with one "::" standing for the rest.
+fn is_ipv6(text: &[u32]) -> bool {
+    let double = |s: &[u32]| s.windows(2).position(|w| w == [COLON, COLON]);
+    match double(text) {
+        None => units(text, true) == Some(8),
+        Some(at) => {
+            let (left, right) = (&text[..at], &text[at + 2..]);
+            if double(right).is_some() {
+                return false;
+            }
+            match (units(left, false), units(right, true)) {
+                (Some(l), Some(r)) => l + r <= 7,
+                _ => false,
+            }
+        }
+    }
+}
+
+/// RFC 3986 `IPv4address`.
+pub fn ipv4address(source: Src<'_>, start: usize) -> Option<usize> {
+    let end = run(source, start, |c| is_digit(c) || c == DOT, IPV4_LONGEST);
+    longest(source, start, end, is_ipv4)
+}
+
+/// RFC 3986 `IPv6address`.
+pub fn ipv6address(source: Src<'_>, start: usize) -> Option<usize> {
+    let end = run(
+        source,
+        start,
+        |c| is_hexdig(c) || c == COLON || c == DOT,
+        IPV6_LONGEST,
+    );
+    longest(source, start, end, is_ipv6)
+}
+
+/// RFC 9051 `base64`: groups of four `base64-char`, the last of which
+/// may be padded with "=".  It matches the empty string.
+pub fn base64(source: Src<'_>, start: usize) -> Option<usize> {
+    let end = run(source, start, is_base64_char, source.len());
+    let groups_end = start + (end - start) / 4 * 4;
+    let padding = |n: usize| {
+        source
+            .get(end..end + n)
+            .is_some_and(|p| p.iter().all(|&c| c == EQUALS))
+    };
+    Some(match end - groups_end {
+        2 if padding(2) => end + 2,
+        3 if padding(1) => end + 1,
+        _ => groups_end,
+    })
+}
+
+/// The length of the `UTF8-char` `text` starts with, if it does.
+fn utf8_char(text: &[u32]) -> Option<usize> {
+    let (length, lo, hi) = match *text.first()? {
+        0x00..=0x7F => return Some(1),
+        0xC2..=0xDF => (2, 0x80, 0xBF),
+        0xE0 => (3, 0xA0, 0xBF),
+        0xE1..=0xEC | 0xEE..=0xEF => (3, 0x80, 0xBF),
+        0xED => (3, 0x80, 0x9F),
+        0xF0 => (4, 0x90, 0xBF),
+        0xF1..=0xF3 => (4, 0x80, 0xBF),
+        0xF4 => (4, 0x80, 0x8F),
+        _ => return None,
+    };
+    let tail = text.get(1..length)?;
+    ((lo..=hi).contains(&tail[0]) && tail[1..].iter().all(|c| (0x80..=0xBF).contains(c)))
+        .then_some(length)
+}
+
+/// RFC 3629 `UTF8-octets`: octets -- code points up to U+00FF -- that
+/// are well-formed UTF-8.  It matches the empty string.
+pub fn utf8_octets(source: Src<'_>, start: usize) -> Option<usize> {
+    let mut end = start;
+    while let Some(length) = source.get(end..).and_then(utf8_char) {
+        end += length;
+    }
+    Some(end)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn cps(s: &str) -> Vec<u32> {
+        s.chars().map(u32::from).collect()
+    }
+
+    fn end(name: &str, s: &str) -> Option<usize> {
+        let terminal = Terminal::bundled(name).unwrap();
+        terminal
+            .lparse(&cps(s), 0)
+            .ok()
+            .map(|matches| matches[0].start)
+    }
+
+    #[test]
+    fn ipv4_matches_the_longest_address() {
+        assert_eq!(end("IPv4address", "192.168.0.1"), Some(11));
+        assert_eq!(end("IPv4address", "1.2.3.45x"), Some(8));
+        // "256" is not a dec-octet, but "25" is.
+        assert_eq!(end("IPv4address", "1.2.3.256"), Some(8));
+        assert_eq!(end("IPv4address", "01.2.3.4"), None);
+        assert_eq!(end("IPv4address", "1.2.3"), None);
+    }
+
+    #[test]
+    fn ipv6_matches_the_longest_address() {
+        assert_eq!(end("ipv6address", "::"), Some(2));
+        assert_eq!(end("IPv6address", "1:2:3:4:5:6:7:8"), Some(15));
+        assert_eq!(end("IPv6address", "::ffff:1.2.3.4]"), Some(14));
+        assert_eq!(end("IPv6address", "1:2:3:4:5:6:7::"), Some(15));
+        assert_eq!(end("IPv6address", "1:2::3:4:5:6:7:8"), Some(14));
+        assert_eq!(end("IPv6address", "1:::2"), Some(3));
+        assert_eq!(end("IPv6address", "12345::"), None);
+        assert_eq!(end("IPv6address", "1.2.3.4::"), None);
+    }
+
+    #[test]
+    fn base64_stops_at_the_last_whole_group() {
+        assert_eq!(end("base64", ""), Some(0));
+        assert_eq!(end("base64", "aGVsbG8="), Some(8));
+        assert_eq!(end("base64", "aGk=="), Some(4));
+        assert_eq!(end("base64", "aA=="), Some(4));
+        assert_eq!(end("base64", "abcdef"), Some(4));
+    }
+
+    #[test]
+    fn utf8_octets_stop_at_the_first_malformed_sequence() {
+        let octets = |bytes: &[u8]| -> String { bytes.iter().map(|&b| char::from(b)).collect() };
+        assert_eq!(end("UTF8-octets", &octets("é€😀".as_bytes())), Some(9));
+        assert_eq!(end("UTF8-octets", &octets(b"a\xc0\x80")), Some(1));
+        assert_eq!(end("UTF8-octets", &octets(b"ab\xed\xa0\x80")), Some(2));
+        assert_eq!(end("UTF8-octets", &octets(b"\xe2\x82")), Some(0));
+        assert_eq!(end("UTF8-octets", "a\u{100}"), Some(1));
+    }
+
+    #[test]
+    fn failure_is_labelled_by_name() {
+        let terminal = Terminal::new("digit", |source: Src<'_>, start: usize| {
+            source
+                .get(start)
+                .filter(|&&c| is_digit(c))
+                .map(|_| start + 1)
+        });
+        let err = terminal.lparse(&cps("x"), 0).unwrap_err();
+        assert_eq!(err.parser.as_str(), "Terminal('digit')");
+        assert!(terminal.deterministic());
+        assert!(Terminal::bundled("nonesuch").is_none());
+    }
+}
@@ -8,7 +8,7 @@ use crate::error::ParseError;
 use crate::literal::Literal;
 use crate::node::{LiteralNode, Node, NodeKind};
 use crate::option::OptionParser;
-use crate::parser::{ArcParser, Src};
+use crate::parser::{ArcParser, Parser, Src};
 use crate::prose::Prose;
 use crate::registry::RuleRegistry;
 use crate::repetition::{Repeat, Repetition};
@@ -20,13 +20,86 @@ pub enum DefinedAs {
     Extend,
 }
 
+/// Settings a comment such as `; @abnf: token atomic` makes for the
+/// rule it belongs to.  Mirrors `abnf.parser.ABNFGrammarNodeVisitor`,
+/// which also warns of words it does not know; here they are ignored.
+#[derive(Debug, Default, Clone, Copy, PartialEq, Eq)]
+struct Pragmas {
+    token: bool,
+    atomic: bool,
+    nomemo: bool,
+    first_match: bool,
+}
+
+impl Pragmas {
+    /// The pragmas in the comments anywhere in `node`.
+    fn read(node: &Node, src: Src<'_>) -> Self {
+        let mut pragmas = Self::default();
+        let mut stack = vec![node];
+        while let Some(node) = stack.pop() {
+            if node.name.as_ref() != "comment" {
+                stack.extend(node.children.iter().filter_map(|child| match child {
+                    NodeKind::Internal(inner) => Some(inner),
+                    NodeKind::Literal(_) => None,
+                }));
+                continue;
+            }
+            let text = node.value(src);
+            let Some(words) = text[1..]
+                .trim_start_matches([' ', '\t'])
+                .strip_prefix("@abnf:")
+            else {
+                continue;
+            };
+            for word in words.split_whitespace() {
+                match word.to_ascii_lowercase().as_str() {
+                    "token" => pragmas.token = true,
+                    "atomic" => pragmas.atomic = true,
+                    "nomemo" => pragmas.nomemo = true,
+                    "first-match" => pragmas.first_match = true,
+                    _ => {}
+                }
+            }
+        }
+        pragmas
+    }
+
+    fn union(self, other: Self) -> Self {
+        Self {
+            token: self.token || other.token,
+            atomic: self.atomic || other.atomic,
+            nomemo: self.nomemo || other.nomemo,
+            first_match: self.first_match || other.first_match,
+        }
+    }
+}
+
+/// Call `f` on `parser` and every combinator inside it, stopping at
+/// rule references: those are rules of their own, with settings of
+/// their own.
+fn for_each_combinator(parser: &Parser, f: &mut impl FnMut(&Parser)) {
+    f(parser);
+    match parser {
+        Parser::Alternation(a) => a.parsers.iter().for_each(|p| for_each_combinator(p, f)),
+        Parser::Concatenation(c) => c.parsers.iter().for_each(|p| for_each_combinator(p, f)),
+        Parser::Repetition(r) => for_each_combinator(&r.element, f),
+        Parser::Option(o) => for_each_combinator(&o.alternation, f),
+        Parser::Literal(_) | Parser::Prose(_) | Parser::Rule(_) | Parser::External(_) => {}
+    }
+}
+
 /// Walk a `rulelist` node, installing each rule into `registry`.
 pub fn visit_rulelist(node: &Node, src: Src<'_>, registry: &mut RuleRegistry) -> Vec<Arc<NamedRule>> {
     let mut result = Vec::new();
+    // Pragmas on the comment lines since the last rule, for the next.
+    let mut pending = Pragmas::default();
     for child in node.children.iter() {
         if let NodeKind::Internal(inner) = child {
             if inner.name.as_ref() == "rule" {
-                result.push(visit_rule(inner, src, registry));
+                result.push(visit_rule_with(inner, src, registry, pending));
+                pending = Pragmas::default();
+            } else {
+                pending = pending.union(Pragmas::read(inner, src));
             }
         }
     }
@@ -35,6 +108,17 @@ pub fn visit_rulelist(node: &Node, src: Src<'_>, registry: &mut RuleRegistry) ->
 
 /// Walk a `rule` node, install its definition, and return the handle.
 pub fn visit_rule(node: &Node, src: Src<'_>, registry: &mut RuleRegistry) -> Arc<NamedRule> {
+    visit_rule_with(node, src, registry, Pragmas::default())
+}
+
+/// `visit_rule`, with `pending` the pragmas of the comment lines before
+/// the rule.
+fn visit_rule_with(
+    node: &Node,
+    src: Src<'_>,
+    registry: &mut RuleRegistry,
+    pending: Pragmas,
+) -> Arc<NamedRule> {
     let mut name: Option<Arc<str>> = None;
     let mut defined_as: DefinedAs = DefinedAs::Define;
     let mut elements_parser: Option<ArcParser> = None;
@@ -51,6 +135,14 @@ pub fn visit_rule(node: &Node, src: Src<'_>, registry: &mut RuleRegistry) -> Arc
 
     let name = name.expect("rule: missing rulename");
     let elements_parser = elements_parser.expect("rule: missing elements");
+    let pragmas = pending.union(Pragmas::read(node, src));
+    if pragmas.nomemo {
+        for_each_combinator(&elements_parser, &mut |parser| match parser {
+            Parser::Repetition(r) => r.memoise.set(Some(false)),
+            Parser::Option(o) => o.memoise.set(Some(false)),
+            _ => {}
+        });
+    }
 
     let final_def: ArcParser = match defined_as {
         DefinedAs::Define => elements_parser,
@@ -62,7 +154,21 @@ pub fn visit_rule(node: &Node, src: Src<'_>, registry: &mut RuleRegistry) -> Arc
             Alternation::new(vec![existing, elements_parser]).into()
         }
     };
-    registry.define(name.as_ref(), final_def)
+    if pragmas.first_match {
+        for_each_combinator(&final_def, &mut |parser| {
+            if let Parser::Alternation(a) = parser {
+                a.set_first_match(true);
+            }
+        });
+    }
+    let rule = registry.define(name.as_ref(), final_def);
+    if pragmas.token {
+        rule.set_token(true);
+    }
+    if pragmas.atomic {
+        rule.set_atomic(true);
+    }
+    rule
 }
 
 fn visit_defined_as(node: &Node, src: Src<'_>) -> DefinedAs {
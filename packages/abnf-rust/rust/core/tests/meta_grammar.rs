@@ -9,7 +9,8 @@
 use std::sync::Arc;
 
 use abnf_core::{
-    build_meta_grammar, parse_rule_source, parse_rulelist_source, Literal, NamedRule, RuleRegistry,
+    build_meta_grammar, parse_rule_source, parse_rulelist_source, Literal, NamedRule, NodeKind,
+    Parser, RuleRegistry,
 };
 
 /// The engine indexes by code point (issue #173), so tests build their
@@ -149,3 +150,45 @@ fn case_insensitive_string_default() {
     assert!(lit.lparse(&cps("FOO"), 0).is_ok());
     assert!(lit.lparse(&cps("foo"), 0).is_ok());
 }
+
+#[test]
+fn pragma_comments_set_rule_settings() {
+    let mut registry = fresh_registry();
+    let source = "; @abnf: token\r\n\
+                  word = 1*ALPHA\r\n\
+                  greedy = 1*\"q\" ; @abnf: atomic nomemo\r\n\
+                  tail = greedy \"q\"\r\n\
+                  pick = \"a\" / \"ab\"\r\n\
+                  \x20 ; @abnf: first-match\r\n\
+                  plain = 1*ALPHA ; just a comment\r\n";
+    let rules = parse_rulelist_source(source, &mut registry).expect("rulelist");
+    let [word, greedy, tail, pick, plain] = &rules[..] else {
+        panic!("expected five rules");
+    };
+    assert!(word.is_token() && !word.is_atomic());
+    assert!(greedy.is_atomic() && !greedy.is_token());
+    assert!(!plain.is_token() && !tail.is_atomic());
+
+    // A token's node holds the match as a single literal.
+    let matches = word.lparse(&cps("abc1"), 0).unwrap();
+    let NodeKind::Internal(node) = &matches[0].nodes[0] else {
+        panic!("expected the rule's node");
+    };
+    assert!(matches!(&node.children[..], [NodeKind::Literal(l)] if l.length == 3));
+
+    // An atomic rule never gives back the "q" that follows it.
+    assert!(tail.lparse(&cps("qqq"), 0).is_err());
+    let definition = greedy.definition().expect("defined");
+    let Parser::Repetition(r) = &*definition else {
+        panic!("expected a repetition");
+    };
+    assert_eq!(r.memoise.get(), Some(false));
+
+    // The comment line continuing `pick` belongs to it.
+    let definition = pick.definition().expect("defined");
+    let Parser::Alternation(a) = &*definition else {
+        panic!("expected an alternation");
+    };
+    assert!(a.first_match());
+    assert_eq!(pick.lparse(&cps("ab"), 0).unwrap()[0].start, 1);
+}
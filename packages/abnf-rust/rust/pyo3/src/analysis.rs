@@ -0,0 +1,44 @@
+//! Static grammar analysis, exposed to `abnf._analysis`.
+//!
+//! The Rust-backed combinators expose no children, so the Python
+//! analyses cannot see into a rule whose definition lives here.  These
+//! functions answer for such a rule from the engine's own tree, in the
+//! shapes the Python side uses.
+
+use pyo3::prelude::*;
+
+use abnf_core::Parser;
+
+use crate::bridge::get_or_create;
+
+/// FIRST set of `rule`: `(intervals, nullable)`, with each interval an
+/// inclusive `(lo, hi)` pair of code points.
+#[pyfunction]
+pub fn first_set(rule: &Bound<'_, PyAny>) -> PyResult<(Vec<(u32, u32)>, bool)> {
+    let first = abnf_core::first_set(&Parser::Rule(get_or_create(rule)?));
+    Ok((first.chars.intervals().to_vec(), first.nullable))
+}
+
+/// The longest literal every match of `rule` contains, as
+/// `(code_points, case_sensitive)`, or `None`.
+#[pyfunction]
+pub fn required_literal(rule: &Bound<'_, PyAny>) -> PyResult<Option<(Vec<u32>, bool)>> {
+    let found = abnf_core::required_literal(&Parser::Rule(get_or_create(rule)?));
+    Ok(found.map(|literal| (literal.text, literal.case_sensitive)))
+}
+
+/// Length bounds of any match of `rule`, as `(min, max)` with `max`
+/// `None` when unbounded, or `None` if they are unknown.
+#[pyfunction]
+pub fn length_bounds(rule: &Bound<'_, PyAny>) -> PyResult<Option<(usize, Option<usize>)>> {
+    let bounds = abnf_core::length_bounds(&Parser::Rule(get_or_create(rule)?));
+    Ok(bounds.map(|b| (b.min, b.max)))
+}
+
+/// Every code point a match of `rule` can consume, as inclusive
+/// `(lo, hi)` intervals, or `None` if it is unknown.
+#[pyfunction]
+pub fn alphabet(rule: &Bound<'_, PyAny>) -> PyResult<Option<Vec<(u32, u32)>>> {
+    let chars = abnf_core::alphabet(&Parser::Rule(get_or_create(rule)?));
+    Ok(chars.map(|c| c.intervals().to_vec()))
+}
@@ -96,6 +96,30 @@ pub fn set_exclude_for(
     Ok(())
 }
 
+/// Set `Rule.token` or `Rule.atomic` -- named by `pragma` -- on the
+/// `NamedRule` for `py_rule`, so the engine honours them on nested
+/// rule references and not only for the rule a parse starts from.
+pub fn set_pragma_for(py_rule: &Bound<'_, PyAny>, pragma: &str, value: bool) -> PyResult<()> {
+    let handle = get_or_create(py_rule)?;
+    match pragma {
+        "token" => handle.set_token(value),
+        "atomic" => handle.set_atomic(value),
+        _ => {
+            return Err(pyo3::exceptions::PyValueError::new_err(format!(
+                "unknown rule setting {pragma:?}"
+            )))
+        }
+    }
+    Ok(())
+}
+
+/// Freeze the `NamedRule` for `py_rule` (`Rule.freeze`): its
+/// definition and exclusion are fixed, and read without locking.
+pub fn freeze_for(py_rule: &Bound<'_, PyAny>) -> PyResult<()> {
+    get_or_create(py_rule)?.freeze();
+    Ok(())
+}
+
 /// Current size of the bridge registry.  Primarily useful in tests
 /// and diagnostics; not part of the public API contract.
 #[pyfunction]
@@ -7,7 +7,14 @@
 //! visitor).  Each `lparse` call re-acquires the GIL, invokes the
 //! wrapped object's `lparse` method, and marshals the resulting
 //! match list back into Rust.
+//!
+//! [`py_scan`] is the cheaper convention of a `Terminal` built from a
+//! Python callable: it returns an end offset, so nothing comes back to
+//! marshal.
+
+use std::sync::Arc;
 
+use pyo3::exceptions::PyValueError;
 use pyo3::prelude::*;
 use pyo3::types::PyType;
 use smallvec::SmallVec;
@@ -42,8 +49,9 @@ impl ExternalParser for PyCallbackParser {
             // engine holds code points, and this is the one caller
             // with no original `str` object to hand on.  Borrowing the
             // outer source would not do: an exclusion sub-parse runs
-            // this parser over a *slice* of it.
-            let py_source = match crate::source::from_code_points(py, source) {
+            // this parser over a *slice* of it.  Rebuilt once per
+            // parse, not once per call.
+            let py_source = match crate::source::cached_str(py, source) {
                 Ok(s) => s,
                 Err(e) => return Err(handle_pyerr(py, e, &self.description, start)),
             };
@@ -73,6 +81,37 @@ impl ExternalParser for PyCallbackParser {
     }
 }
 
+/// The code of a `Terminal` built from a Python callable:
+/// `scan(source, start)` returns where the match ends, or `None`.
+///
+/// Raising `ParseError` is also no match; any other exception
+/// propagates, as from a `PyCallbackParser`, and so does an end outside
+/// `start..=len(source)`, as the `ValueError` the pure-Python
+/// `Terminal` raises.
+pub fn py_scan(
+    scan: Py<PyAny>,
+    name: Arc<str>,
+) -> impl Fn(Src<'_>, usize) -> Option<usize> + Send + Sync + 'static {
+    move |source: Src<'_>, start: usize| {
+        Python::attach(|py| {
+            let end = crate::source::cached_str(py, source)
+                .and_then(|text| scan.bind(py).call1((text, start)))
+                .and_then(|end| end.extract::<Option<isize>>());
+            match end {
+                Ok(None) => None,
+                Ok(Some(end)) => match usize::try_from(end) {
+                    Ok(end) if start <= end && end <= source.len() => Some(end),
+                    _ => propagate_pyerr(PyValueError::new_err(format!(
+                        "Terminal('{name}') matched from {start} to {end}, outside the source."
+                    ))),
+                },
+                Err(err) if is_parse_error(py, &err) => None,
+                Err(err) => propagate_pyerr(err),
+            }
+        })
+    }
+}
+
 /// Decide whether a `PyErr` raised by the wrapped Python callback
 /// represents a `ParseError` (handle as normal backtracking) or
 /// something else (propagate to the Python caller verbatim).
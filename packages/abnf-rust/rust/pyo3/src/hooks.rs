@@ -5,12 +5,27 @@
 //! every `rule.definition = value` write keeps the Rust shadow
 //! registry of `NamedRule` handles in sync, and [`set_exclude_hook`]
 //! onto `Rule._set_exclude_hook` so `Rule.exclude_rule` reaches the
-//! engine too.
+//! engine too, as [`set_pragma_hook`] on `Rule._set_pragma_hook` does
+//! for `Rule.token` and `Rule.atomic`.  [`freeze_hook`] goes onto `Rule._freeze_hook`, so a
+//! frozen grammar's handles stop taking locks.  [`farthest_failure`]
+//! goes onto `Rule._farthest_failure_hook`, which a failed parse asks
+//! how far into the input the engine got.  [`evaluate_hook`] goes onto
+//! `Rule._evaluate_hook`, which `Rule.evaluate` parses through.
+
+use std::collections::HashMap;
+use std::sync::Arc;
 
 use pyo3::prelude::*;
+use pyo3::types::{PyDict, PyList, PyString};
+
+use abnf_core::{NodeKind, ParseError};
 
-use crate::bridge::{set_definition_for, set_exclude_for};
+use crate::bridge::{
+    freeze_for, get_or_create, set_definition_for, set_exclude_for, set_pragma_for,
+};
+use crate::errors::parse_error_to_pyerr;
 use crate::parsers::extract_parser;
+use crate::source::{substring, CodePoints};
 
 #[pyfunction]
 pub fn set_definition_hook(rule: &Bound<'_, PyAny>, definition: &Bound<'_, PyAny>) -> PyResult<()> {
@@ -28,3 +43,122 @@ pub fn set_exclude_hook(
     set_exclude_for(rule, excluded)?;
     Ok(())
 }
+
+#[pyfunction]
+pub fn set_pragma_hook(rule: &Bound<'_, PyAny>, pragma: &str, value: bool) -> PyResult<()> {
+    set_pragma_for(rule, pragma, value)?;
+    Ok(())
+}
+
+#[pyfunction]
+pub fn freeze_hook(rule: &Bound<'_, PyAny>) -> PyResult<()> {
+    freeze_for(rule)?;
+    Ok(())
+}
+
+/// The farthest offset the last parse on this thread failed at, and
+/// descriptions of what failed there; `None` if nothing did.  Asking
+/// forgets the answer.
+#[pyfunction]
+pub fn farthest_failure() -> Option<(usize, Vec<String>)> {
+    abnf_core::take_farthest_failure().map(|(offset, expected)| {
+        (offset, expected.iter().map(|e| e.as_str().to_owned()).collect())
+    })
+}
+
+/// Parse `source` from `start` with `rule`, and return what `actions`
+/// make of the longest match, with where it ends.  See `Rule.evaluate`.
+///
+/// The engine's nodes are walked here, in Rust: Python is called only
+/// for a rule with an action, and no Python `Node` is built for any.
+#[pyfunction]
+pub fn evaluate_hook<'py>(
+    rule: &Bound<'py, PyAny>,
+    source: &Bound<'py, PyString>,
+    start: usize,
+    actions: &Bound<'py, PyDict>,
+) -> PyResult<(Bound<'py, PyList>, usize)> {
+    let py = rule.py();
+    let handle = get_or_create(rule)?;
+    let cps = CodePoints::new(source)?;
+    let result = crate::recursion::call_lparse(source.as_ptr() as usize, || {
+        handle.lparse(cps.as_slice(), start)
+    })?;
+    let matches = result.map_err(|err| parse_error_to_pyerr(py, err))?;
+    let Some(longest) = matches.first() else {
+        let err = ParseError::new(handle.name.clone(), start);
+        return Err(parse_error_to_pyerr(py, err));
+    };
+    let mut walk = Actions {
+        source,
+        actions,
+        found: HashMap::new(),
+    };
+    let mut values = Vec::new();
+    walk.act_all(&longest.nodes, &mut values)?;
+    Ok((PyList::new(py, values)?, longest.start))
+}
+
+/// The walk of [`evaluate_hook`].
+struct Actions<'a, 'py> {
+    source: &'a Bound<'py, PyString>,
+    actions: &'a Bound<'py, PyDict>,
+    /// Each rule name's action, or `None`, looked up once per walk.
+    found: HashMap<Arc<str>, Option<Bound<'py, PyAny>>>,
+}
+
+impl<'py> Actions<'_, 'py> {
+    /// The action for rule `name`, looked up as `NodeVisitor.visit`
+    /// looks up a visit method.
+    fn action(&mut self, name: &Arc<str>) -> PyResult<Option<Bound<'py, PyAny>>> {
+        if let Some(found) = self.found.get(name) {
+            return Ok(found.clone());
+        }
+        let key =
+            PyString::new(self.source.py(), &name.replace('-', "_")).call_method0("casefold")?;
+        let action = self.actions.get_item(key)?;
+        self.found.insert(name.clone(), action.clone());
+        Ok(action)
+    }
+
+    /// Append what the actions make of `nodes` to `values`, and return
+    /// the span the nodes cover, if any.
+    fn act_all(
+        &mut self,
+        nodes: &[NodeKind],
+        values: &mut Vec<Bound<'py, PyAny>>,
+    ) -> PyResult<Option<(usize, usize)>> {
+        let mut span: Option<(usize, usize)> = None;
+        for node in nodes {
+            if let Some((start, end)) = self.act(node, values)? {
+                span = Some(span.map_or((start, end), |(s, e)| (s.min(start), e.max(end))));
+            }
+        }
+        Ok(span)
+    }
+
+    /// [`Actions::act_all`] for one node.  A rule with an action adds
+    /// what it returns; one without adds what the rules under it do.
+    fn act(
+        &mut self,
+        node: &NodeKind,
+        values: &mut Vec<Bound<'py, PyAny>>,
+    ) -> PyResult<Option<(usize, usize)>> {
+        let node = match node {
+            NodeKind::Literal(l) => return Ok(Some((l.offset, l.offset + l.length))),
+            NodeKind::Internal(node) => node,
+        };
+        let Some(action) = self.action(&node.name)? else {
+            return self.act_all(&node.children, values);
+        };
+        let mut inner = Vec::new();
+        let span = self.act_all(&node.children, &mut inner)?;
+        let py = self.source.py();
+        let text = match span {
+            Some((start, end)) => substring(self.source, start, end)?,
+            None => PyString::new(py, ""),
+        };
+        values.push(action.call1((text, PyList::new(py, inner)?))?);
+        Ok(span)
+    }
+}
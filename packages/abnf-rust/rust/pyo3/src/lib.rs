@@ -12,6 +12,7 @@
 #[global_allocator]
 static GLOBAL: mimalloc::MiMalloc = mimalloc::MiMalloc;
 
+mod analysis;
 mod bootstrap;
 mod bridge;
 mod errors;
@@ -39,6 +40,7 @@ fn _ext(_py: Python<'_>, m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_class::<parsers::PyOption>()?;
     m.add_class::<parsers::PyLiteral>()?;
     m.add_class::<parsers::PyProse>()?;
+    m.add_class::<parsers::PyTerminal>()?;
     m.add_class::<parsers::PyRepeat>()?;
 
     // Parse tree
@@ -46,11 +48,22 @@ fn _ext(_py: Python<'_>, m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_class::<nodes::PyNode>()?;
     m.add_class::<nodes::PyLiteralNode>()?;
 
+    // Searching
+    m.add_class::<recursion::ParseSession>()?;
+
     // Functions
     m.add_function(wrap_pyfunction!(bootstrap::bootstrap, m)?)?;
     m.add_function(wrap_pyfunction!(hooks::set_definition_hook, m)?)?;
     m.add_function(wrap_pyfunction!(hooks::set_exclude_hook, m)?)?;
+    m.add_function(wrap_pyfunction!(hooks::set_pragma_hook, m)?)?;
+    m.add_function(wrap_pyfunction!(hooks::freeze_hook, m)?)?;
+    m.add_function(wrap_pyfunction!(hooks::farthest_failure, m)?)?;
+    m.add_function(wrap_pyfunction!(hooks::evaluate_hook, m)?)?;
     m.add_function(wrap_pyfunction!(bridge::bridge_size, m)?)?;
+    m.add_function(wrap_pyfunction!(analysis::first_set, m)?)?;
+    m.add_function(wrap_pyfunction!(analysis::required_literal, m)?)?;
+    m.add_function(wrap_pyfunction!(analysis::length_bounds, m)?)?;
+    m.add_function(wrap_pyfunction!(analysis::alphabet, m)?)?;
 
     Ok(())
 }
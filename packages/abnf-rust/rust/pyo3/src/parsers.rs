@@ -1,19 +1,19 @@
 //! Combinator pyclasses — the Rust-backed `Alternation`,
-//! `Concatenation`, `Repetition`, `Option`, `Literal`, `Prose`, and
-//! `Repeat`.  Constructor signatures and observable attributes match
+//! `Concatenation`, `Repetition`, `Option`, `Literal`, `Prose`,
+//! `Terminal` and `Repeat`.  Constructor signatures and observable attributes match
 //! the Python originals so the dispatch shim in `abnf.parser` can
 //! rebind these names transparently.
 
 use std::sync::Arc;
 
-use pyo3::exceptions::PyTypeError;
+use pyo3::exceptions::{PyTypeError, PyValueError};
 use pyo3::prelude::*;
 use pyo3::sync::PyOnceLock;
 use pyo3::types::{PyInt, PyString, PyTuple, PyType};
 
 use abnf_core::{
     arc, Alternation, ArcParser, Concatenation, Literal, LiteralKind, OptionParser, Parser, Prose,
-    Repeat, Repetition,
+    Repeat, Repetition, Terminal,
 };
 
 use crate::errors::parse_error_to_pyerr;
@@ -152,6 +152,76 @@ impl PyAlternation {
         }
     }
 
+    #[getter]
+    fn adaptive(&self) -> bool {
+        if let Parser::Alternation(a) = &*self.inner {
+            a.adaptive()
+        } else {
+            false
+        }
+    }
+
+    #[setter]
+    fn set_adaptive(&self, value: bool) {
+        if let Parser::Alternation(a) = &*self.inner {
+            a.set_adaptive(value);
+        }
+    }
+
+    /// Whether to try alternatives in the order of `hits`, without
+    /// counting; see `abnf.parser.Alternation.ordered`.
+    #[getter]
+    fn ordered(&self) -> bool {
+        if let Parser::Alternation(a) = &*self.inner {
+            a.ordered()
+        } else {
+            false
+        }
+    }
+
+    #[setter]
+    fn set_ordered(&self, value: bool) {
+        if let Parser::Alternation(a) = &*self.inner {
+            a.set_ordered(value);
+        }
+    }
+
+    /// Whether longest match stops at the first alternative to match;
+    /// see `abnf.parser.Alternation.prefix_free`.
+    #[getter]
+    fn prefix_free(&self) -> bool {
+        if let Parser::Alternation(a) = &*self.inner {
+            a.prefix_free()
+        } else {
+            false
+        }
+    }
+
+    /// How many times each alternative has matched; see
+    /// `abnf.parser.Alternation.hits`.
+    #[getter]
+    fn hits(&self) -> Vec<u64> {
+        if let Parser::Alternation(a) = &*self.inner {
+            a.hits()
+        } else {
+            Vec::new()
+        }
+    }
+
+    #[setter]
+    fn set_hits(&self, value: Vec<u64>) -> PyResult<()> {
+        if let Parser::Alternation(a) = &*self.inner {
+            if !a.set_hits(&value) {
+                return Err(pyo3::exceptions::PyValueError::new_err(format!(
+                    "expected {} counts, one per alternative; got {}.",
+                    a.parsers.len(),
+                    value.len()
+                )));
+            }
+        }
+        Ok(())
+    }
+
     fn __str__(&self) -> String {
         "Alternation(...)".to_string()
     }
@@ -161,7 +231,7 @@ impl PyAlternation {
 // Concatenation
 // ----------------------------------------------------------------
 
-#[pyclass(name = "Concatenation", module = "abnf_rust._ext", from_py_object)]
+#[pyclass(name = "Concatenation", module = "abnf_rust._ext", from_py_object, weakref)]
 #[derive(Clone, Debug)]
 pub struct PyConcatenation {
     pub inner: ArcParser,
@@ -200,7 +270,7 @@ impl PyConcatenation {
 // Repetition
 // ----------------------------------------------------------------
 
-#[pyclass(name = "Repetition", module = "abnf_rust._ext", from_py_object)]
+#[pyclass(name = "Repetition", module = "abnf_rust._ext", from_py_object, weakref)]
 #[derive(Clone, Debug)]
 pub struct PyRepetition {
     pub inner: ArcParser,
@@ -209,10 +279,17 @@ pub struct PyRepetition {
 #[pymethods]
 impl PyRepetition {
     #[new]
-    fn new(repeat: PyRepeat, element: &Bound<'_, PyAny>) -> PyResult<Self> {
+    #[pyo3(signature = (repeat, element, memoise=None))]
+    fn new(
+        repeat: PyRepeat,
+        element: &Bound<'_, PyAny>,
+        memoise: Option<bool>,
+    ) -> PyResult<Self> {
         let child = extract_parser(element)?;
+        let repetition = Repetition::new(repeat.to_core(), child);
+        repetition.memoise.set(memoise);
         Ok(Self {
-            inner: Repetition::new(repeat.to_core(), child).into(),
+            inner: repetition.into(),
         })
     }
 
@@ -229,6 +306,17 @@ impl PyRepetition {
         lparse_iter(py, result, source)
     }
 
+    /// Whether results are memoised; see
+    /// `abnf.parser.Repetition.memoise`.
+    #[getter]
+    fn memoise(&self) -> Option<bool> {
+        if let Parser::Repetition(r) = &*self.inner {
+            r.memoise.get()
+        } else {
+            None
+        }
+    }
+
     fn __str__(&self) -> String {
         "Repetition(...)".to_string()
     }
@@ -238,7 +326,7 @@ impl PyRepetition {
 // Option
 // ----------------------------------------------------------------
 
-#[pyclass(name = "Option", module = "abnf_rust._ext", from_py_object)]
+#[pyclass(name = "Option", module = "abnf_rust._ext", from_py_object, weakref)]
 #[derive(Clone, Debug)]
 pub struct PyOption {
     pub inner: ArcParser,
@@ -247,10 +335,13 @@ pub struct PyOption {
 #[pymethods]
 impl PyOption {
     #[new]
-    fn new(alternation: &Bound<'_, PyAny>) -> PyResult<Self> {
+    #[pyo3(signature = (alternation, memoise=None))]
+    fn new(alternation: &Bound<'_, PyAny>, memoise: Option<bool>) -> PyResult<Self> {
         let child = extract_parser(alternation)?;
+        let option = OptionParser::new(child);
+        option.memoise.set(memoise);
         Ok(Self {
-            inner: OptionParser::new(child).into(),
+            inner: option.into(),
         })
     }
 
@@ -267,6 +358,17 @@ impl PyOption {
         lparse_iter(py, result, source)
     }
 
+    /// Whether results are memoised; see
+    /// `abnf.parser.Option.memoise`.
+    #[getter]
+    fn memoise(&self) -> Option<bool> {
+        if let Parser::Option(o) = &*self.inner {
+            o.memoise.get()
+        } else {
+            None
+        }
+    }
+
     fn __str__(&self) -> String {
         "Option(...)".to_string()
     }
@@ -276,7 +378,7 @@ impl PyOption {
 // Literal
 // ----------------------------------------------------------------
 
-#[pyclass(name = "Literal", module = "abnf_rust._ext", from_py_object)]
+#[pyclass(name = "Literal", module = "abnf_rust._ext", from_py_object, weakref)]
 #[derive(Clone, Debug)]
 pub struct PyLiteral {
     pub inner: ArcParser,
@@ -407,6 +509,81 @@ impl PyProse {
     }
 }
 
+// ----------------------------------------------------------------
+// Terminal
+// ----------------------------------------------------------------
+
+#[pyclass(name = "Terminal", module = "abnf_rust._ext", from_py_object)]
+#[derive(Clone, Debug)]
+pub struct PyTerminal {
+    pub inner: ArcParser,
+    #[pyo3(get)]
+    pub name: String,
+}
+
+impl PyTerminal {
+    fn from_terminal(terminal: Terminal) -> Self {
+        let name = terminal.name().to_string();
+        Self {
+            inner: arc(Parser::External(Arc::new(terminal))),
+            name,
+        }
+    }
+}
+
+#[pymethods]
+impl PyTerminal {
+    /// `scan(source, start)` returns where the match ends, or `None`.
+    /// It is called with the source as a `str`, built once per parse,
+    /// and what it returns is an int: nothing to marshal either way.
+    #[new]
+    #[pyo3(signature = (scan, name=None))]
+    fn new(scan: &Bound<'_, PyAny>, name: Option<String>) -> PyResult<Self> {
+        if !scan.is_callable() {
+            return Err(PyTypeError::new_err("scan argument must be callable."));
+        }
+        let name: Arc<str> = match name {
+            Some(name) => name.into(),
+            None => match scan.getattr("__name__") {
+                Ok(name) => name.extract::<String>()?.into(),
+                Err(_) => "scan".into(),
+            },
+        };
+        let code = crate::external::py_scan(scan.clone().unbind(), name.clone());
+        Ok(Self::from_terminal(Terminal::new(name, code)))
+    }
+
+    /// The bundled terminal for the rule `name`, matched in Rust with
+    /// no call into Python at all.
+    #[staticmethod]
+    fn bundled(name: &str) -> PyResult<Self> {
+        match Terminal::bundled(name) {
+            Some(terminal) => Ok(Self::from_terminal(terminal)),
+            None => Err(PyValueError::new_err(format!(
+                "no bundled terminal '{name}'; there are {}.",
+                Terminal::bundled_names().collect::<Vec<_>>().join(", ")
+            ))),
+        }
+    }
+
+    fn lparse(
+        &self,
+        py: Python<'_>,
+        source: &Bound<'_, PyString>,
+        start: usize,
+    ) -> PyResult<Py<LparseIter>> {
+        let cps = CodePoints::new(source)?;
+        let result = crate::recursion::call_lparse(source.as_ptr() as usize, || {
+            self.inner.lparse(cps.as_slice(), start)
+        })?;
+        lparse_iter(py, result, source)
+    }
+
+    fn __str__(&self) -> String {
+        format!("Terminal('{}')", self.name)
+    }
+}
+
 // ----------------------------------------------------------------
 // Parser extraction
 // ----------------------------------------------------------------
@@ -435,6 +612,9 @@ pub fn extract_parser(obj: &Bound<'_, PyAny>) -> PyResult<ArcParser> {
     if let Ok(p) = obj.cast::<PyProse>() {
         return Ok(p.borrow().inner.clone());
     }
+    if let Ok(p) = obj.cast::<PyTerminal>() {
+        return Ok(p.borrow().inner.clone());
+    }
     // If the value is a Python `Rule`, look up — or lazily create —
     // its shadow Rust `NamedRule` in the bridge registry.  This is the
     // fast path that keeps rule references purely in Rust at parse
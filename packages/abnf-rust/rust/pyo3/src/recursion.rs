@@ -30,6 +30,7 @@ use std::sync::Once;
 
 use pyo3::exceptions::PyRecursionError;
 use pyo3::prelude::*;
+use pyo3::types::{PyString, PyTuple};
 
 /// Substring identifying the depth-exceeded panic emitted by
 /// `NamedRule::lparse`.  Kept narrow so the hook never silences
@@ -173,6 +174,65 @@ where
     }
 }
 
+/// One memo shared by several parses of the same source, for
+/// `Rule.search` / `Rule.finditer`, which try one rule at many offsets.
+///
+/// A context manager: each `with session:` block runs as part of the
+/// same parse epoch, so `Repetition` entries made at one candidate
+/// offset answer lookups from the next.  The epoch is claimed on first
+/// entry and re-opened on each later one; nothing is held between
+/// blocks, so Python code -- a `finditer` consumer -- can run in
+/// between without being inside a parse.
+///
+/// Entered inside a parse already in progress it does nothing, and
+/// `call_lparse` scopes the nested calls exactly as it would without
+/// it.
+#[pyclass(unsendable, module = "abnf_rust._ext")]
+pub struct ParseSession {
+    source: Py<PyString>,
+    epoch: Option<u64>,
+    active: Option<(abnf_core::ParseScope, RestoreSourceId)>,
+}
+
+#[pymethods]
+impl ParseSession {
+    #[new]
+    fn new(source: Bound<'_, PyString>) -> Self {
+        Self {
+            source: source.unbind(),
+            epoch: None,
+            active: None,
+        }
+    }
+
+    fn __enter__(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
+        if slf.active.is_some() || abnf_core::in_parse() {
+            return slf;
+        }
+        let scope = match slf.epoch {
+            Some(epoch) => abnf_core::ParseScope::resume(epoch),
+            None => abnf_core::ParseScope::enter(),
+        };
+        slf.epoch = Some(abnf_core::current_epoch());
+        let source_id = slf.source.as_ptr() as usize;
+        let previous_source = CURRENT_SOURCE_ID.with(Cell::get);
+        CURRENT_SOURCE_ID.with(|id| id.set(source_id));
+        slf.active = Some((scope, RestoreSourceId(previous_source)));
+        slf
+    }
+
+    #[pyo3(signature = (*_exc_info))]
+    fn __exit__(&mut self, _exc_info: &Bound<'_, PyTuple>) -> bool {
+        // Restore the source identity before closing the scope, the
+        // reverse of the order `__enter__` set them up in.
+        if let Some((scope, restore)) = self.active.take() {
+            drop(restore);
+            drop(scope);
+        }
+        false
+    }
+}
+
 fn payload_message(payload: &Box<dyn std::any::Any + Send>) -> String {
     if let Some(s) = payload.downcast_ref::<String>() {
         s.clone()
@@ -19,7 +19,8 @@
 //! contiguous span of the source, so no text needs to be rebuilt.
 //! [`from_code_points`] is the fallback for the one case with no
 //! original object to slice: handing a sub-slice to an embedded Python
-//! parser.
+//! parser.  [`cached_str`] rebuilds it once per parse rather than once
+//! per call.
 //!
 //! Every function here works for lone surrogates, which is the point
 //! (issue #173).  `PyUnicode_AsUCS4`, `PyUnicode_Substring` and
@@ -42,6 +43,15 @@ thread_local! {
 
 const POOL_LIMIT: usize = 8;
 
+/// What identifies the text `cached_str` last rebuilt: the parse epoch
+/// and the code-point buffer's address and length.
+type RebuiltKey = (u64, usize, usize);
+
+thread_local! {
+    /// The `str` `cached_str` last rebuilt, and from what.
+    static REBUILT: RefCell<Option<(RebuiltKey, Py<PyString>)>> = const { RefCell::new(None) };
+}
+
 /// A `str`'s code points, in a buffer borrowed from the thread-local
 /// pool and returned to it on drop.
 pub struct CodePoints {
@@ -164,3 +174,33 @@ pub fn from_code_points<'py>(py: Python<'py>, cps: &[u32]) -> PyResult<Bound<'py
     // reference to a `str`.
     Ok(unsafe { Bound::from_owned_ptr(py, obj) }.cast_into::<PyString>()?)
 }
+
+/// [`from_code_points`], rebuilt once per parse.
+///
+/// An embedded Python parser -- a `Terminal` above all -- is called at
+/// offset after offset of the same source, and rebuilding the whole
+/// text for each call made a parse quadratic in its length.  Within
+/// one parse epoch the engine reads one text, from buffers that are not
+/// written while it does, so the epoch with the buffer's address and
+/// length identifies it; a sub-parse over another text (an exclusion's
+/// slice, a callback parsing something else) runs under an epoch of its
+/// own.  Outside a parse there is no epoch to trust, and nothing is
+/// kept.
+pub fn cached_str<'py>(py: Python<'py>, cps: &[u32]) -> PyResult<Bound<'py, PyString>> {
+    if !abnf_core::in_parse() {
+        return from_code_points(py, cps);
+    }
+    let key = (abnf_core::current_epoch(), cps.as_ptr() as usize, cps.len());
+    let cached = REBUILT.with(|cell| {
+        cell.borrow()
+            .as_ref()
+            .filter(|(rebuilt, _)| *rebuilt == key)
+            .map(|(_, text)| text.clone_ref(py))
+    });
+    if let Some(text) = cached {
+        return Ok(text.into_bound(py));
+    }
+    let text = from_code_points(py, cps)?;
+    REBUILT.with(|cell| *cell.borrow_mut() = Some((key, text.clone().unbind())));
+    Ok(text)
+}
@@ -21,12 +21,22 @@ from abnf_rust._ext import (  # type: ignore[import-not-found]
     Match,
     Node,
     Option,
+    ParseSession,
     Prose,
     Repeat,
     Repetition,
+    Terminal,
+    alphabet,
     bootstrap,
+    evaluate_hook,
+    farthest_failure,
+    first_set,
+    freeze_hook,
+    length_bounds,
+    required_literal,
     set_definition_hook,
     set_exclude_hook,
+    set_pragma_hook,
 )
 
 #: Signals to :mod:`abnf.parser` that the compiled extension exposes
@@ -49,11 +59,21 @@ __all__ = [
     "Match",
     "Node",
     "Option",
+    "ParseSession",
     "Prose",
     "Repeat",
     "Repetition",
+    "Terminal",
     "__version__",
+    "alphabet",
     "bootstrap",
+    "evaluate_hook",
+    "farthest_failure",
+    "first_set",
+    "freeze_hook",
+    "length_bounds",
+    "required_literal",
     "set_definition_hook",
     "set_exclude_hook",
+    "set_pragma_hook",
 ]
@@ -3,6 +3,8 @@
 from importlib.metadata import PackageNotFoundError, metadata  # pragma: no cover
 
 from abnf.parser import (
+    Forest,
+    ForestNode,
     GrammarError,
     GrammarWarning,
     LiteralNode,
@@ -14,6 +16,8 @@ from abnf.parser import (
 )
 
 __all__ = [
+    "Forest",
+    "ForestNode",
     "GrammarError",
     "GrammarWarning",
     "LiteralNode",
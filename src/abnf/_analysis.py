@@ -0,0 +1,1515 @@
+"""Static analysis of combinator trees.
+
+Facts about a grammar that do not depend on the input -- which characters a
+rule can start with, how long a match of it can be, what text every match of
+it must contain -- and that the parser can use to avoid work.  Everything here is an optimisation aid: an
+analysis that cannot see into a parser (a Rust-backed combinator, which
+exposes no children, or a parser you wrote yourself) answers with the value
+that promises nothing, and the caller falls back to parsing.
+
+The combinator classes are imported here before `abnf.parser` rebinds them to
+their Rust-backed equivalents, so the names below are always the pure-Python
+ones -- the only ones with children to walk.  For a rule whose definition is
+Rust-backed, the engine answers instead, through `_backend`.
+
+Results for rules are cached, and the cache is dropped whenever any rule's
+definition or exclusion is assigned -- a rule reference is late-bound, so a
+change anywhere can change the answer for any rule that reaches it.
+"""
+
+from __future__ import annotations
+
+import bisect
+import re
+import typing
+
+from abnf import _parser_python as _py
+from abnf._parser_python import (
+    Alternation,
+    Concatenation,
+    Literal,
+    Option,
+    Parser,
+    Prose,
+    Repetition,
+    Rule,
+    Source,
+    Terminal,
+)
+
+#: The active backend module when it is Rust, set by `abnf.parser`; `None`
+#: otherwise.  Consulted for rules whose definitions this module cannot see
+#: into.
+_backend: typing.Any = None
+
+#: The largest code point.  `Literal` ranges are bounded by it, and so is
+#: `CharClass.ANY`.
+_MAX_CODE_POINT = 0x10FFFF
+
+
+class CharClass:
+    """An immutable set of code points, held as sorted disjoint intervals.
+
+    Ranges in real grammars are wide (`%x80-10FFFF`), so enumerating members
+    is out of the question; intervals keep a class the size of the grammar
+    that produced it.
+    """
+
+    __slots__ = ("_lows", "intervals")
+
+    ANY: typing.ClassVar[CharClass]
+    EMPTY: typing.ClassVar[CharClass]
+
+    def __init__(self, intervals: typing.Iterable[tuple[int, int]] = ()):
+        merged: list[tuple[int, int]] = []
+        for lo, hi in sorted(intervals):
+            if merged and lo <= merged[-1][1] + 1:
+                if hi > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], hi)
+            else:
+                merged.append((lo, hi))
+        self.intervals = tuple(merged)
+        self._lows = [lo for lo, _ in merged]
+
+    @classmethod
+    def of(cls, chars: typing.Iterable[str]) -> CharClass:
+        return cls((ord(c), ord(c)) for c in chars)
+
+    def __or__(self, other: CharClass) -> CharClass:
+        if not other.intervals or self is other:
+            return self
+        if not self.intervals:
+            return other
+        return CharClass(self.intervals + other.intervals)
+
+    def __invert__(self) -> CharClass:
+        """Every code point not in this class."""
+        gaps: list[tuple[int, int]] = []
+        low = 0
+        for lo, hi in self.intervals:
+            if lo > low:
+                gaps.append((low, lo - 1))
+            low = hi + 1
+        if low <= _MAX_CODE_POINT:
+            gaps.append((low, _MAX_CODE_POINT))
+        return CharClass(gaps)
+
+    def __contains__(self, char: str) -> bool:
+        cp = ord(char)
+        index = bisect.bisect_right(self._lows, cp) - 1
+        return index >= 0 and cp <= self.intervals[index][1]
+
+    def isdisjoint(self, other: CharClass) -> bool:
+        """Whether the two classes have no code point in common."""
+        mine, theirs = self.intervals, other.intervals
+        i = j = 0
+        while i < len(mine) and j < len(theirs):
+            if mine[i][1] < theirs[j][0]:
+                i += 1
+            elif theirs[j][1] < mine[i][0]:
+                j += 1
+            else:
+                return False
+        return True
+
+    def __bool__(self) -> bool:
+        return bool(self.intervals)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, CharClass) and self.intervals == other.intervals
+
+    def __hash__(self) -> int:
+        return hash(self.intervals)
+
+    def __repr__(self) -> str:
+        return f"CharClass({list(self.intervals)!r})"
+
+    def pattern(self) -> str:
+        """A regular-expression character class matching exactly this set.
+
+        Code points are written as escapes, so nothing in the class -- `]`,
+        `-`, `\\`, a surrogate -- needs special treatment.  The empty class,
+        which a regular expression cannot spell, is a pattern that never
+        matches.
+        """
+
+        if not self.intervals:
+            return "(?!)"
+
+        def escape(cp: int) -> str:
+            return f"\\U{cp:08x}"
+
+        parts = [
+            escape(lo) if lo == hi else f"{escape(lo)}-{escape(hi)}"
+            for lo, hi in self.intervals
+        ]
+        return f"[{''.join(parts)}]"
+
+
+CharClass.ANY = CharClass([(0, _MAX_CODE_POINT)])
+CharClass.EMPTY = CharClass()
+
+
+class First(typing.NamedTuple):
+    """What a parser can begin with: the characters a non-empty match can
+    start with, and whether it can match the empty string at all."""
+
+    chars: CharClass
+    nullable: bool
+
+
+#: For a parser the analysis cannot see into: anything, including nothing.
+_FIRST_UNKNOWN = First(CharClass.ANY, True)
+#: For a parser that can never match.  The starting point of the fixpoint.
+_FIRST_NONE = First(CharClass.EMPTY, False)
+
+
+def _literal_chars(literal: Literal) -> CharClass:
+    """The characters `literal` can start with."""
+    value = literal.value
+    if isinstance(value, tuple):
+        return CharClass([(ord(value[0]), ord(value[1]))])
+    first = value[0]
+    if literal.case_sensitive or not first.isascii():
+        return CharClass.of(first)
+    # Case-insensitive literals fold ASCII only (see `_ascii_fold`), so the
+    # two spellings of an ASCII letter are all there is.
+    return CharClass.of({first.lower(), first.upper()})
+
+
+#### Caching ####
+
+_cache: dict[tuple[str, Rule], typing.Any] = {}
+_cache_generation = -1
+
+
+def _cached(kind: str, rule: Rule) -> typing.Any:
+    """Cached result of analysis `kind` for `rule`, or `_MISSING`."""
+    global _cache_generation
+    if _cache_generation != _py._grammar_generation:
+        # A frozen rule reaches only frozen rules, so no write can change
+        # what is known about it.  Where the definitions are the engine's,
+        # what a rule reaches cannot be seen from here, so neither can that.
+        kept = (
+            {
+                key: value
+                for key, value in _cache.items()
+                if getattr(key[1], "_frozen", False)
+            }
+            if _backend is None
+            else {}
+        )
+        _cache.clear()
+        _cache.update(kept)
+        _cache_generation = _py._grammar_generation
+    return _cache.get((kind, rule), _MISSING)
+
+
+_MISSING: typing.Any = object()
+
+
+def _definition(rule: Rule) -> Parser | None:
+    """The rule's definition, or `None` if it has none yet.  A rule whose
+    grammar module deferred building it is built now."""
+    definition = getattr(rule, "_definition", None)
+    if definition is None and rule._build_if_deferred():
+        definition = getattr(rule, "_definition", None)
+    return definition
+
+
+def _defined_rules() -> list[Rule]:
+    """Every rule there is with a definition.  The rest include rules still
+    deferred by their grammar modules, which no rule with a definition
+    refers to, and which are not built by being looked at here."""
+    return [
+        rule
+        for rule in dict.fromkeys(Rule._obj_map.values())
+        if getattr(rule, "_definition", None) is not None
+    ]
+
+
+_TRANSPARENT = (
+    Rule,
+    Alternation,
+    Concatenation,
+    Repetition,
+    Option,
+    Literal,
+    Prose,
+    Terminal,
+)
+
+
+def _engine(name: str, rule: Rule) -> typing.Any:
+    """Ask the backend engine about `rule`, if its definition is opaque
+    here and the engine can answer; `_MISSING` otherwise."""
+    definition = _definition(rule)
+    if definition is None or isinstance(definition, _TRANSPARENT):
+        return _MISSING
+    function = getattr(_backend, name, None)
+    if function is None:
+        return _MISSING
+    return function(rule)
+
+
+def _reachable_rules(parser: Parser) -> list[Rule]:
+    """Every rule `parser` can reach, including itself if it is one."""
+    seen: dict[Rule, None] = {}
+    stack = [parser]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Rule):
+            if node in seen:
+                continue
+            seen[node] = None
+            definition = _definition(node)
+            if definition is not None:
+                stack.append(definition)
+        elif isinstance(node, (Alternation, Concatenation)):
+            stack.extend(node.parsers)
+        elif isinstance(node, Repetition):
+            stack.append(node.element)
+        elif isinstance(node, Option):
+            stack.append(node.alternation)
+    return list(seen)
+
+
+#### FIRST sets ####
+
+
+def _first(parser: Parser, rules: dict[Rule, First]) -> First:
+    """FIRST of `parser`, reading rule values from `rules`."""
+    if isinstance(parser, Rule):
+        if _definition(parser) is None:
+            # Parsing it raises GrammarError; promise nothing, so callers
+            # still parse and the error still surfaces.
+            return _FIRST_UNKNOWN
+        return rules.get(parser, _FIRST_UNKNOWN)
+    if isinstance(parser, Literal):
+        if parser.value == "":
+            return First(CharClass.EMPTY, True)
+        return First(_literal_chars(parser), False)
+    if isinstance(parser, Alternation):
+        chars = CharClass.EMPTY
+        nullable = False
+        for child in parser.parsers:
+            first = _first(child, rules)
+            chars = chars | first.chars
+            nullable = nullable or first.nullable
+        return First(chars, nullable)
+    if isinstance(parser, Concatenation):
+        chars = CharClass.EMPTY
+        for child in parser.parsers:
+            first = _first(child, rules)
+            chars = chars | first.chars
+            if not first.nullable:
+                return First(chars, False)
+        return First(chars, True)
+    if isinstance(parser, Repetition):
+        if parser.repeat.max == 0:
+            return First(CharClass.EMPTY, True)
+        first = _first(parser.element, rules)
+        return First(first.chars, first.nullable or parser.repeat.min == 0)
+    if isinstance(parser, Option):
+        return First(_first(parser.alternation, rules).chars, True)
+    if isinstance(parser, Prose):
+        return _FIRST_NONE
+    return _FIRST_UNKNOWN
+
+
+def first(parser: Parser) -> First:
+    """FIRST set of `parser`.
+
+    Computed as a least fixpoint over the rules `parser` reaches, so
+    recursive grammars -- left-recursive ones included -- get an exact
+    answer rather than a conservative one.
+    """
+
+    if isinstance(parser, Rule):
+        cached = _cached("first", parser)
+        if cached is not _MISSING:
+            return cached
+    values: dict[Rule, First] = {}
+    pending: list[Rule] = []
+    for rule in _reachable_rules(parser):
+        # A cached rule is a finished fixpoint -- everything it depends on
+        # was reachable from it, and solved with it.
+        cached = _cached("first", rule)
+        if cached is _MISSING:
+            values[rule] = _FIRST_NONE
+            pending.append(rule)
+        else:
+            values[rule] = cached
+    changed = True
+    while changed:
+        changed = False
+        for rule in pending:
+            definition = _definition(rule)
+            value = _FIRST_UNKNOWN if definition is None else _first(definition, values)
+            if value == _FIRST_UNKNOWN:
+                answer = _engine("first_set", rule)
+                if answer is not _MISSING:
+                    intervals, nullable = answer
+                    value = First(CharClass(intervals), nullable)
+            if value != values[rule]:
+                values[rule] = value
+                changed = True
+    for rule in pending:
+        _cache[("first", rule)] = values[rule]
+    return _first(parser, values)
+
+
+def nullable(parser: Parser) -> bool:
+    """Whether `parser` can match the empty string.  One the analysis cannot
+    see into is assumed to."""
+    return first(parser).nullable
+
+
+def start_test(parser: Parser) -> typing.Callable[[Source, int], typing.Any] | None:
+    """A test of whether a non-empty match of `parser` can begin at an offset:
+    called as ``test(source, offset)``, it is falsy where one cannot, end of
+    input included.  `None` if one can begin anywhere, as far as the analysis
+    can tell."""
+    chars = first(parser).chars
+    if chars == CharClass.ANY:
+        return None
+    return re.compile(chars.pattern()).match
+
+
+#: `first_terminals` answers, by parser, for the `_grammar_generation` they
+#: were worked out for.  Each parser is kept with its answer, so its `id` is
+#: not reused while the answer stands.
+_terminals_cache: tuple[int, dict[int, tuple[Parser, tuple[Parser, ...]]]] = (-1, {})
+
+
+def first_terminals(parser: Parser) -> tuple[Parser, ...]:
+    """The terminals a non-empty match of `parser` can begin with, in the
+    order a parse would try them: what trying `parser` where it cannot match
+    records as failing (see `ParseError.expected`).
+
+    A rule without a definition, or one this module cannot see into, stands
+    for itself, as does any parser of your own; prose, which never matches,
+    for nothing.
+    """
+    global _terminals_cache
+    generation = _py._grammar_generation
+    if _terminals_cache[0] != generation:
+        _terminals_cache = (generation, {})
+    cached = _terminals_cache[1].get(id(parser))
+    if cached is not None and cached[0] is parser:
+        return cached[1]
+    found: dict[int, Parser] = {}
+    seen: set[int] = set()
+    stack = [parser]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if isinstance(node, Rule):
+            definition = _definition(node)
+            if definition is None or not isinstance(definition, _TRANSPARENT):
+                found[id(node)] = node
+            else:
+                stack.append(definition)
+        elif isinstance(node, Alternation):
+            stack.extend(reversed(node.parsers))
+        elif isinstance(node, Concatenation):
+            parts: list[Parser] = []
+            for child in node.parsers:
+                parts.append(child)
+                if not nullable(child):
+                    break
+            stack.extend(reversed(parts))
+        elif isinstance(node, Repetition):
+            if node.repeat.max != 0:
+                stack.append(node.element)
+        elif isinstance(node, Option):
+            stack.append(node.alternation)
+        elif isinstance(node, Literal):
+            if node.value != "":
+                found[id(node)] = node
+        elif not isinstance(node, Prose):
+            found[id(node)] = node
+    terminals = tuple(found.values())
+    _terminals_cache[1][id(parser)] = (parser, terminals)
+    return terminals
+
+
+def worth_memoising(parser: Parser) -> bool:
+    """Whether a result of `parser` is worth keeping for the rest of a parse.
+
+    Not for one made of literals alone -- literals, and alternations,
+    concatenations and options of them -- which parses again in about the
+    time a lookup takes.  Anything reaching a rule or a repetition can take
+    arbitrarily longer.
+    """
+    stack = [parser]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (Alternation, Concatenation)):
+            stack.extend(node.parsers)
+        elif isinstance(node, Option):
+            stack.append(node.alternation)
+        elif not isinstance(node, (Literal, Prose)):
+            return True
+    return False
+
+
+#### Determinism ####
+
+
+def _deterministic(parser: Parser, visiting: set[Rule]) -> bool:
+    if isinstance(parser, Rule):
+        cached = _cached("deterministic", parser)
+        if cached is not _MISSING:
+            return cached
+        definition = _definition(parser)
+        if definition is None or parser in visiting:
+            return False
+        if parser._atomic:
+            # It commits to one match, whatever its definition offers.
+            return True
+        visiting.add(parser)
+        try:
+            result = _deterministic(definition, visiting)
+        finally:
+            visiting.discard(parser)
+        _cache[("deterministic", parser)] = result
+        return result
+    if isinstance(parser, (Literal, Terminal)):
+        return True
+    if isinstance(parser, Concatenation):
+        return all(_deterministic(child, visiting) for child in parser.parsers)
+    if isinstance(parser, Repetition):
+        repeat = parser.repeat
+        return repeat.max == 0 or (
+            repeat.min == repeat.max and _deterministic(parser.element, visiting)
+        )
+    if isinstance(parser, Alternation):
+        if not all(_deterministic(child, visiting) for child in parser.parsers):
+            return False
+        if len(parser.parsers) == 1:
+            return True
+        firsts = [first(child) for child in parser.parsers]
+        if any(child.nullable for child in firsts):
+            return False
+        return all(
+            ours.chars.isdisjoint(theirs.chars)
+            for index, ours in enumerate(firsts)
+            for theirs in firsts[index + 1 :]
+        )
+    return False
+
+
+def deterministic(parser: Parser) -> bool:
+    """Whether `parser` can match at most one way at any offset.
+
+    True of literals and terminals; of concatenations and fixed-count repetitions of
+    deterministic parsers; and of alternations of them no two of which can
+    start with the same character, none matching the empty string.  A rule
+    is as deterministic as its definition, unless it can reach itself, which
+    is taken to make it not -- as is an option, or a repetition with a range
+    of counts, each of which offers the empty or shorter match besides the
+    longest.  An atomic rule (see `Rule.atomic`) is deterministic whatever
+    its definition.
+    """
+    return _deterministic(parser, set())
+
+
+#### Re-entry ####
+
+# How often a combinator can be entered at one offset during one parse, as
+# the `+` of `_entries` needs them: at most once in all, at most once per
+# offset, or more.
+_ONCE, _PER_OFFSET, _MANY = 0, 1, 2
+
+
+def reentrant(parser: Parser) -> bool:
+    """Whether `parser` -- a repetition or option in some rule's definition
+    -- can be entered twice at the same offset during one parse, which is
+    the only way a memoised result of it is ever read back.
+
+    Any rule may be the one a parse starts from, so this is worked out over
+    every rule there is.  A rule referenced from two places may be reached at
+    one offset through both.  Within a definition, the parts of a
+    concatenation after the first, and a repetition's element, are entered
+    at offsets that depend on where earlier matches ended -- once each per
+    offset if their parent is entered once, but from two entries of the
+    parent, possibly at the same offset twice.  A combinator no rule's
+    definition holds is answered `True`.
+
+    A parser this module cannot see into is taken to be a terminal.  One
+    that parses rules itself may enter them more often than this says, and
+    a repetition it reaches that is answered `False` then parses again
+    where it could have been looked up -- slower, never different.
+    """
+    if _backend is not None:
+        return True
+    return _entries().get(parser, _MANY) == _MANY
+
+
+_entries_cache: tuple[int, dict[Parser, int]] = (-1, {})
+
+
+def _entries() -> dict[Parser, int]:
+    """How often each repetition and option can be entered at one offset,
+    for the current `_grammar_generation`."""
+    global _entries_cache
+    generation = _py._grammar_generation
+    if _entries_cache[0] != generation:
+        _entries_cache = (generation, _count_entries())
+    return _entries_cache[1]
+
+
+def _count_entries() -> dict[Parser, int]:
+    # Entries of each combinator relative to its rule's, as a "depth" to add
+    # to the rule's: 0 for one entered as often as the rule, 1 for one entered
+    # once per offset when the rule is entered once, `_MANY` for more.
+    depths: dict[Parser, tuple[Rule, int]] = {}
+    sites: dict[Rule, list[tuple[Rule, int]]] = {}
+    for rule in _defined_rules():
+        nodes, references = _walk(rule)
+        for node, depth in nodes:
+            # Held in two definitions: entered from both.
+            depths[node] = (rule, _MANY if node in depths else depth)
+        for reference, depth in references:
+            sites.setdefault(reference, []).append((rule, depth))
+
+    entries: dict[Rule, int] = {}
+    for rule in sites:
+        # Follow the chain of single references up to a rule whose entries
+        # are known, then fill them in on the way back down.
+        chain: list[Rule] = []
+        current: Rule | None = rule
+        while current is not None and current not in entries:
+            if current in chain:
+                # Reached from itself, as well as from wherever it started.
+                entries[current] = _MANY
+                break
+            chain.append(current)
+            found = sites.get(current, ())
+            if len(found) == 1:
+                current = found[0][0]
+            else:
+                # Where a parse starts, or reached from several places.
+                entries[current] = _ONCE if not found else _MANY
+                current = None
+        for link in reversed(chain):
+            if link not in entries:
+                owner, depth = sites[link][0]
+                entries[link] = min(entries[owner] + depth, _MANY)
+
+    return {
+        node: min(entries.get(rule, _ONCE) + depth, _MANY)
+        for node, (rule, depth) in depths.items()
+    }
+
+
+_Walk = tuple[list[tuple[Parser, int]], list[tuple[Rule, int]]]
+
+#: `_walk` of each rule, with the definition it was worked out for.  Unlike
+#: the other analyses, the walk depends on nothing but the definition, so
+#: it is kept until that is replaced rather than until any rule changes.
+_walks: dict[Rule, tuple[Parser | None, _Walk]] = {}
+
+
+def _walk(rule: Rule) -> _Walk:
+    """The repetitions and options in `rule`'s definition, and the rules it
+    references, each with its depth relative to the rule (see
+    `_count_entries`)."""
+    definition = _definition(rule)
+    cached = _walks.get(rule)
+    if cached is not None and cached[0] is definition:
+        return cached[1]
+    nodes: list[tuple[Parser, int]] = []
+    references: list[tuple[Rule, int]] = []
+    seen: dict[Parser, int] = {}
+    stack: list[tuple[Parser, int]] = [] if definition is None else [(definition, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if isinstance(node, Rule):
+            references.append((node, depth))
+            continue
+        if not isinstance(node, (Alternation, Concatenation, Option, Repetition)):
+            # A terminal -- see `reentrant` on parsers of your own.
+            continue
+        if node in seen:
+            # Held in two places: entered from both.
+            if seen[node] == _MANY:
+                continue
+            depth = _MANY
+        seen[node] = depth
+        if isinstance(node, Alternation):
+            stack.extend((child, depth) for child in node.parsers)
+        elif isinstance(node, Concatenation):
+            later = min(depth + 1, _MANY)
+            stack.extend(
+                (child, depth if i == 0 else later)
+                for i, child in enumerate(node.parsers)
+            )
+        elif isinstance(node, Option):
+            nodes.append((node, depth))
+            stack.append((node.alternation, depth))
+        elif isinstance(node, Repetition):
+            nodes.append((node, depth))
+            # Each round enters the element only where the last one ended
+            # somewhere new -- unless a `min` prefix of two or more has
+            # entered it at those offsets already.
+            element = min(depth + 1, _MANY) if node.repeat.min <= 1 else _MANY
+            stack.append((node.element, element))
+    walk = (nodes, references)
+    _walks[rule] = (definition, walk)
+    return walk
+
+
+#### Possessive repetitions ####
+
+
+def possessives(root: Rule) -> frozenset[Parser]:
+    """The repetitions of which only the longest match can ever be part of a
+    successful parse starting from `root`, so that they need yield no other.
+
+    In ``1*DIGIT "."`` a shorter run of digits is followed by a digit, which
+    ``"."`` cannot start with: giving characters back never helps.  That
+    holds where the element matches at most one way and never the empty
+    string (see `deterministic`) -- so every shorter match is followed by
+    another match of the element -- and nothing that can follow the
+    repetition starts with a character the element can.
+
+    What can follow is worked out over the rules `root` reaches, the only
+    ones such a parse can enter: within a definition from what comes after
+    the repetition, and past the end of one from whatever follows each
+    reference to the rule.  The parse keeps only the longest match of
+    `root`, so that adds nothing; a rule with an exclusion, which may reject
+    its longest match for a shorter one, can be followed by anything.  With
+    the Rust backend, whose engine answers for itself, there are none.
+
+    Worked out once per root, and again only once a rule it reaches has
+    changed: defining or changing any other rule leaves the answer as it
+    was.
+
+    A parser this module cannot see into is taken to be a terminal.  One
+    of your own that parses a rule and wants more than its longest match
+    should call the rule's ``definition`` instead.
+    """
+    if _backend is not None:
+        return frozenset()
+    generation = _py._grammar_generation
+    cached = _possessives_cache.get(root)
+    if cached is not None:
+        checked, built, rules, found = cached
+        if checked == generation:
+            return found
+        if all(rule._changed_generation <= built for rule in rules):
+            _possessives_cache[root] = (generation, built, rules, found)
+            return found
+    # Undefined ones too: defining one changes what `root` reaches.
+    rules = _reachable_rules(root)
+    found = _find_possessives([rule for rule in rules if _definition(rule)])
+    _possessives_cache[root] = (generation, generation, rules, found)
+    return found
+
+
+def possessive(repetition: Repetition, root: Rule) -> bool:
+    """Whether `repetition` is one of `possessives(root)`."""
+    return repetition in possessives(root)
+
+
+#: `possessives` of each root: the generation it was last found current at
+#: and the one it was worked out at, and the rules it was worked out over.
+_possessives_cache: dict[Rule, tuple[int, int, list[Rule], frozenset[Parser]]] = {}
+
+
+# What can follow a part of a definition: characters, and whether what can
+# follow the rule itself can too.
+_Follow = tuple[CharClass, bool]
+
+
+def _find_possessives(rules: list[Rule]) -> frozenset[Parser]:
+    # Where each rule is referenced, and each repetition held, with what
+    # can follow it there.
+    sites: list[tuple[Rule, Rule, _Follow]] = []
+    held: list[tuple[Rule, Repetition, _Follow]] = []
+    walk = _FollowWalk({rule: first(rule) for rule in rules}, sites, held)
+    for rule in rules:
+        walk.visit(
+            rule, typing.cast(Parser, _definition(rule)), (CharClass.EMPTY, True)
+        )
+
+    # What can follow each rule, grown from nothing to a fixpoint.
+    follows = {
+        rule: CharClass.ANY if rule.exclude is not None else CharClass.EMPTY
+        for rule in rules
+    }
+    changed = True
+    while changed:
+        changed = False
+        for owner, rule, (chars, open_) in sites:
+            if rule not in follows:
+                continue
+            grown = follows[rule] | chars
+            if open_:
+                grown = grown | follows[owner]
+            if grown != follows[rule]:
+                follows[rule] = grown
+                changed = True
+
+    verdicts: dict[Parser, bool] = {}
+    for owner, repetition, (chars, open_) in held:
+        if verdicts.get(repetition, True):
+            element = walk.first(repetition.element)
+            after = chars | follows[owner] if open_ else chars
+            verdicts[repetition] = (
+                not element.nullable
+                and element.chars.isdisjoint(after)
+                and deterministic(repetition.element)
+            )
+    return frozenset(repetition for repetition, verdict in verdicts.items() if verdict)
+
+
+class _FollowWalk:
+    """Records the rule references and repetitions in definitions, with what
+    can follow each."""
+
+    def __init__(
+        self,
+        firsts: dict[Rule, First],
+        sites: list[tuple[Rule, Rule, _Follow]],
+        held: list[tuple[Rule, Repetition, _Follow]],
+    ):
+        self._firsts = firsts
+        self._sites = sites
+        self._held = held
+
+    def first(self, parser: Parser) -> First:
+        """`first`, without working out again what every rule starts with."""
+        return _first(parser, self._firsts)
+
+    def visit(self, owner: Rule, node: Parser, follow: _Follow) -> None:
+        """Walk `node`, part of `owner`'s definition, which `follow` can
+        follow."""
+        if isinstance(node, Rule):
+            self._sites.append((owner, node, follow))
+        elif isinstance(node, Alternation):
+            for child in node.parsers:
+                self.visit(owner, child, follow)
+        elif isinstance(node, Option):
+            self.visit(owner, node.alternation, follow)
+        elif isinstance(node, Concatenation):
+            chars, open_ = follow
+            for child in reversed(node.parsers):
+                self.visit(owner, child, (chars, open_))
+                child_first = self.first(child)
+                if child_first.nullable:
+                    chars = chars | child_first.chars
+                else:
+                    chars, open_ = child_first.chars, False
+        elif isinstance(node, Repetition):
+            repeat = node.repeat
+            if repeat.max is None or repeat.min != repeat.max:
+                self._held.append((owner, node, follow))
+            chars, open_ = follow
+            if repeat.max is None or repeat.max > 1:
+                # The element can be followed by another round of itself.
+                chars = chars | self.first(node.element).chars
+            self.visit(owner, node.element, (chars, open_))
+
+
+#### Single-character parsers ####
+
+
+class SingleChar:
+    """What a parser that matches one character at a time matches, and the
+    tree it builds over each one."""
+
+    def __init__(self, leaves: list[tuple[CharClass, tuple[str, ...]]]):
+        # Each terminal in declaration order, with the rules that enclose it.
+        self._leaves = leaves
+        self._names: dict[str, tuple[str, ...]] = {}
+        chars = CharClass.EMPTY
+        for leaf_chars, _ in leaves:
+            chars = chars | leaf_chars
+        self.chars = chars
+
+    def names(self, char: str) -> tuple[str, ...]:
+        """The rules, outermost first, whose nodes enclose the literal node
+        for `char`: those around the first terminal matching it, which is the
+        one an alternation keeps when several match the same span."""
+        names = self._names.get(char)
+        if names is None:
+            names = next(names for chars, names in self._leaves if char in chars)
+            self._names[char] = names
+        return names
+
+
+def single_char(parser: Parser) -> SingleChar | None:
+    """`parser` as a `SingleChar`, if every match of it is exactly one
+    character: a one-character literal or a range, an alternation of those,
+    or a rule defined as one without an exclusion.  `None` otherwise."""
+    leaves = _single_char(parser, ())
+    return None if leaves is None else SingleChar(leaves)
+
+
+def _single_char(
+    parser: Parser, names: tuple[str, ...]
+) -> list[tuple[CharClass, tuple[str, ...]]] | None:
+    if isinstance(parser, Literal):
+        if isinstance(parser.value, tuple) or len(parser.value) == 1:
+            return [(_literal_chars(parser), names)]
+        return None
+    if isinstance(parser, Alternation):
+        leaves: list[tuple[CharClass, tuple[str, ...]]] = []
+        for alternative in parser.parsers:
+            theirs = _single_char(alternative, names)
+            if theirs is None:
+                return None
+            leaves.extend(theirs)
+        return leaves
+    if isinstance(parser, Rule):
+        definition = _definition(parser)
+        # A rule already on the path recurses, and cannot be one character.
+        if parser.name in names or parser.exclude is not None or definition is None:
+            return None
+        return _single_char(definition, (*names, parser.name))
+    return None
+
+
+def run_match(
+    chars: CharClass, minimum: int, maximum: int
+) -> typing.Callable[[Source, int], re.Match[str] | None] | None:
+    """A test for a run of `minimum` to `maximum` characters from `chars`,
+    longest first: called as ``match(source, offset)``, it returns the run's
+    `re.Match`, or `None` if the run is too short.  `None` if `minimum` is
+    more than a regular expression can count to."""
+    if minimum > _RE_MAX_REPEAT:
+        return None
+    # A bound `re` cannot spell is one no string could reach.
+    upper = "" if maximum > _RE_MAX_REPEAT else maximum
+    return re.compile(f"(?:{chars.pattern()}){{{minimum},{upper}}}").match
+
+
+#: The largest repeat count a regular expression accepts.
+_RE_MAX_REPEAT = 2**32 - 2
+
+
+def _combinators(parser: Parser) -> typing.Iterator[tuple[Rule | None, Parser]]:
+    """Every combinator reachable from `parser`, each with the rule whose
+    definition it is part of (`None` for those above the first rule)."""
+    seen: set[int] = set()
+    stack: list[tuple[Rule | None, Parser]] = [(None, parser)]
+    while stack:
+        owner, node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield owner, node
+        if isinstance(node, Rule):
+            definition = _definition(node)
+            if definition is not None:
+                stack.append((node, definition))
+        elif isinstance(node, (Alternation, Concatenation)):
+            stack.extend((owner, child) for child in node.parsers)
+        elif isinstance(node, Repetition):
+            stack.append((owner, node.element))
+        elif isinstance(node, Option):
+            stack.append((owner, node.alternation))
+
+
+def nullable_repetitions(parser: Parser) -> list[tuple[Rule | None, Repetition]]:
+    """Unbounded repetitions reachable from `parser` whose element can match
+    the empty string, each with the rule it occurs in.
+
+    Such a repetition is a performance hazard rather than an error: every
+    match of the element is a candidate end of a repeat, so `*( *WSP x )`
+    explores each run of spaces once per way of splitting it.  The parser no
+    longer retries the element where it could only match the empty string,
+    but cannot avoid the splitting.
+    """
+    return [
+        (owner, node)
+        for owner, node in _combinators(parser)
+        if isinstance(node, Repetition)
+        and node.repeat.max is None
+        # Unknown is nullable too, but is no evidence of a hazard.
+        and first(node.element) != _FIRST_UNKNOWN
+        and nullable(node.element)
+    ]
+
+
+#### Length bounds ####
+
+
+class Bounds(typing.NamedTuple):
+    """How many characters a match of a parser can consume: at least `min`,
+    and at most `max`, or any number if `max` is `None`."""
+
+    min: int
+    max: int | None
+
+
+#: For a rule reached again while its own bounds are being worked out.  Its
+#: true bounds are at least this loose, so using them there is sound.
+_BOUNDS_RECURSIVE = Bounds(0, None)
+
+
+def _bounds(parser: Parser, visiting: set[Rule]) -> Bounds | None:
+    """Bounds of `parser`, or `None` if the analysis cannot see into it.
+
+    `None` propagates: a combinator with a child of unknown length -- an
+    undefined rule, say, which must still raise `GrammarError` when parsed --
+    is of unknown length itself, so no caller rejects input on its account.
+    """
+    if isinstance(parser, Rule):
+        cached = _cached("bounds", parser)
+        if cached is not _MISSING:
+            return cached
+        definition = _definition(parser)
+        if definition is None:
+            return None
+        if parser in visiting:
+            return _BOUNDS_RECURSIVE
+        answer = _engine("length_bounds", parser)
+        if answer is not _MISSING:
+            result = None if answer is None else Bounds(*answer)
+        else:
+            visiting.add(parser)
+            try:
+                result = _bounds(definition, visiting)
+            finally:
+                visiting.discard(parser)
+        _cache[("bounds", parser)] = result
+        return result
+    if isinstance(parser, Literal):
+        size = 1 if isinstance(parser.value, tuple) else len(parser.value)
+        return Bounds(size, size)
+    if isinstance(parser, Alternation):
+        children = [_bounds(child, visiting) for child in parser.parsers]
+        if not children or None in children:
+            return None
+        known = typing.cast("list[Bounds]", children)
+        maxima = [child.max for child in known]
+        return Bounds(
+            min(child.min for child in known),
+            None if None in maxima else max(typing.cast("list[int]", maxima)),
+        )
+    if isinstance(parser, Concatenation):
+        low = 0
+        high: int | None = 0
+        for child in parser.parsers:
+            bounds = _bounds(child, visiting)
+            if bounds is None:
+                return None
+            low += bounds.min
+            high = None if high is None or bounds.max is None else high + bounds.max
+        return Bounds(low, high)
+    if isinstance(parser, Repetition):
+        repeat = parser.repeat
+        if repeat.max == 0:
+            # The element is never tried.
+            return Bounds(0, 0)
+        element = _bounds(parser.element, visiting)
+        if element is None:
+            return None
+        if element.max == 0:
+            return Bounds(0, 0)
+        return Bounds(
+            repeat.min * element.min,
+            None
+            if repeat.max is None or element.max is None
+            else repeat.max * element.max,
+        )
+    if isinstance(parser, Option):
+        element = _bounds(parser.alternation, visiting)
+        return None if element is None else Bounds(0, element.max)
+    return None
+
+
+def bounds(parser: Parser) -> Bounds | None:
+    """Length bounds of any match of `parser`, or `None` if unknown.
+
+    Sound rather than tight: a rule that can reach itself is taken to have
+    no maximum, and the minimum it contributes to its own recursion is 0.
+    Grammars recurse through `*`-repetitions almost without exception, which
+    makes them unbounded anyway.
+    """
+    return _bounds(parser, set())
+
+
+#### Alphabets ####
+
+
+def _literal_alphabet(literal: Literal) -> list[tuple[int, int]]:
+    """Every character `literal` can match, as intervals."""
+    value = literal.value
+    if isinstance(value, tuple):
+        return [(ord(value[0]), ord(value[1]))]
+    chars = set(value)
+    if not literal.case_sensitive:
+        # Matching folds ASCII only (see `_ascii_fold`).
+        chars.update(c.swapcase() for c in value if c.isascii())
+    return [(ord(c), ord(c)) for c in chars]
+
+
+def alphabet(parser: Parser) -> CharClass | None:
+    """Every character a match of `parser` can consume -- the union of the
+    terminals it reaches -- or `None` if it reaches a parser the analysis
+    cannot see into.
+
+    A superset, not the exact set: a terminal counts whether or not any
+    match actually gets to use it.  That is what makes it sound to reject
+    input holding a character outside it without parsing.
+    """
+
+    if isinstance(parser, Rule):
+        cached = _cached("alphabet", parser)
+        if cached is not _MISSING:
+            return cached
+    intervals: list[tuple[int, int]] = []
+    seen: set[Rule] = set()
+    stack = [parser]
+    result: CharClass | None = None
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Rule):
+            if node in seen:
+                continue
+            seen.add(node)
+            definition = _definition(node)
+            answer = _engine("alphabet", node)
+            if definition is None or answer is None:
+                break
+            if answer is _MISSING:
+                stack.append(definition)
+            else:
+                intervals.extend(answer)
+        elif isinstance(node, Literal):
+            intervals.extend(_literal_alphabet(node))
+        elif isinstance(node, (Alternation, Concatenation)):
+            stack.extend(node.parsers)
+        elif isinstance(node, Repetition):
+            stack.append(node.element)
+        elif isinstance(node, Option):
+            stack.append(node.alternation)
+        elif not isinstance(node, Prose):
+            break
+    else:
+        result = CharClass(intervals)
+    if isinstance(parser, Rule):
+        _cache[("alphabet", parser)] = result
+    return result
+
+
+def alien_search(parser: Parser) -> typing.Callable[[Source], typing.Any] | None:
+    """A search for the first character no match of `parser` can consume:
+    called as ``search(source)``, it returns a `re.Match` at that character,
+    or `None` if there is none.  `None` itself if every character might be
+    consumed, as far as the analysis can tell.
+
+    The search is a single pass in the regular-expression engine, so
+    checking a whole input costs far less than parsing any of it.
+    """
+
+    if isinstance(parser, Rule):
+        cached = _cached("alien_search", parser)
+        if cached is not _MISSING:
+            return cached
+    chars = alphabet(parser)
+    alien = CharClass.EMPTY if chars is None else ~chars
+    search = re.compile(alien.pattern()).search if alien else None
+    if isinstance(parser, Rule):
+        _cache[("alien_search", parser)] = search
+    return search
+
+
+#### Required literals ####
+
+
+class RequiredLiteral(typing.NamedTuple):
+    """Text every match of a parser contains."""
+
+    text: str
+    case_sensitive: bool
+
+
+def _required_literal(parser: Parser, visiting: set[Rule]) -> RequiredLiteral | None:
+    if isinstance(parser, Rule):
+        cached = _cached("required", parser)
+        if cached is not _MISSING:
+            return cached
+        definition = _definition(parser)
+        if definition is None or parser in visiting:
+            return None
+        answer = _engine("required_literal", parser)
+        if answer is not _MISSING:
+            result = (
+                None
+                if answer is None
+                else RequiredLiteral("".join(map(chr, answer[0])), answer[1])
+            )
+            _cache[("required", parser)] = result
+            return result
+        visiting.add(parser)
+        try:
+            result = _required_literal(definition, visiting)
+        finally:
+            visiting.discard(parser)
+        _cache[("required", parser)] = result
+        return result
+    if isinstance(parser, Literal):
+        value = parser.value
+        if isinstance(value, tuple) or not value:
+            return None
+        # A literal without ASCII letters reads the same either way, and
+        # searching for it case-sensitively avoids folding the source.
+        case_sensitive = parser.case_sensitive or not any(
+            c.isascii() and c.isalpha() for c in value
+        )
+        return RequiredLiteral(value, case_sensitive)
+    if isinstance(parser, Concatenation):
+        best: RequiredLiteral | None = None
+        for child in parser.parsers:
+            candidate = _required_literal(child, visiting)
+            if candidate is not None and (
+                best is None or len(candidate.text) > len(best.text)
+            ):
+                best = candidate
+        return best
+    if isinstance(parser, Alternation):
+        common: RequiredLiteral | None = None
+        for child in parser.parsers:
+            candidate = _required_literal(child, visiting)
+            if candidate is None:
+                return None
+            if common is None:
+                common = candidate
+            elif _fold_literal(candidate) != _fold_literal(common):
+                return None
+            elif candidate.case_sensitive != common.case_sensitive:
+                common = RequiredLiteral(common.text, False)
+        return common
+    if isinstance(parser, Repetition) and parser.repeat.min > 0:
+        return _required_literal(parser.element, visiting)
+    return None
+
+
+def _fold_literal(literal: RequiredLiteral) -> str:
+    return literal.text if literal.case_sensitive else _py._ascii_fold(literal.text)
+
+
+def required_literal(parser: Parser) -> RequiredLiteral | None:
+    """The longest literal every match of `parser` is certain to contain,
+    or `None` if there is no such literal the analysis can find."""
+    return _required_literal(parser, set())
+
+
+#### Finite languages ####
+
+#: The most strings `lexicon` enumerates before giving up on a language.
+_LEXICON_LIMIT = 1024
+
+#: One string of a finite language: its ASCII fold, and the parts of it that
+#: must also match exactly, as ``(offset, text)`` pairs -- none for a string
+#: spelled only with case-insensitive literals.
+_Word = tuple[str, tuple[tuple[int, str], ...]]
+
+_EMPTY_WORD: _Word = ("", ())
+
+
+class Lexicon:
+    """A finite language, for telling in one lookup whether a text is in it.
+
+    Built by `lexicon` for a rule every match of which is one of a small set
+    of strings -- reserved words, typically, excluded from an identifier --
+    so that asking whether a text parses completely as the rule does not
+    mean parsing it.
+    """
+
+    __slots__ = ("_alternations", "_words")
+
+    def __init__(
+        self, words: typing.Iterable[_Word], alternations: typing.Iterable[Alternation]
+    ):
+        index: dict[str, set[tuple[tuple[int, str], ...]]] = {}
+        for folded, exact in words:
+            index.setdefault(folded, set()).add(exact)
+        # A spelling with nothing to check exactly accepts every spelling.
+        self._words = {
+            folded: ((),) if () in spellings else tuple(spellings)
+            for folded, spellings in index.items()
+        }
+        self._alternations = tuple(alternations)
+
+    @property
+    def current(self) -> bool:
+        """Whether the language is still the one enumerated.  It was worked
+        out for longest-match alternation, and ``first_match`` can be set on
+        an alternation without redefining any rule."""
+        return not any(alternation.first_match for alternation in self._alternations)
+
+    def __contains__(self, text: str) -> bool:
+        spellings = self._words.get(_py._ascii_fold(text))
+        return spellings is not None and any(
+            all(
+                text[offset : offset + len(exact)] == exact
+                for offset, exact in spelling
+            )
+            for spelling in spellings
+        )
+
+
+def _literal_words(literal: Literal) -> list[_Word] | None:
+    value = literal.value
+    if isinstance(value, tuple):
+        low, high = ord(value[0]), ord(value[1])
+        if high - low >= _LEXICON_LIMIT:
+            return None
+        # Ranges are case-sensitive.
+        texts = [chr(code) for code in range(low, high + 1)]
+        case_sensitive = True
+    else:
+        texts = [value]
+        case_sensitive = literal.case_sensitive
+    words = []
+    for text in texts:
+        folded = _py._ascii_fold(text)
+        exact = ((0, text),) if case_sensitive and folded != text else ()
+        words.append((folded, exact))
+    return words
+
+
+def _product(left: set[_Word], right: set[_Word]) -> set[_Word] | None:
+    if len(left) * len(right) > _LEXICON_LIMIT:
+        return None
+    return {
+        (
+            left_folded + right_folded,
+            left_exact
+            + tuple((offset + len(left_folded), text) for offset, text in right_exact),
+        )
+        for left_folded, left_exact in left
+        for right_folded, right_exact in right
+    }
+
+
+def _language(
+    parser: Parser, visiting: set[Rule], alternations: list[Alternation]
+) -> set[_Word] | None:
+    """Every string `parser` matches, or `None` if there are too many, or
+    infinitely many, or the analysis cannot see into it.  Appends each
+    alternation reached to `alternations`."""
+    if isinstance(parser, Rule):
+        definition = _definition(parser)
+        # A rule with an exclusion of its own matches a language with holes
+        # in it, and so does an atomic one, once something follows it; a
+        # recursive one is rarely finite.
+        if (
+            definition is None
+            or parser._exclude is not None
+            or (parser._atomic and visiting)
+            or parser in visiting
+        ):
+            return None
+        visiting.add(parser)
+        try:
+            return _language(definition, visiting, alternations)
+        finally:
+            visiting.discard(parser)
+    if isinstance(parser, Literal):
+        words = _literal_words(parser)
+        return None if words is None else set(words)
+    if isinstance(parser, Alternation):
+        alternations.append(parser)
+        union: set[_Word] = set()
+        for child in parser.parsers:
+            words = _language(child, visiting, alternations)
+            if words is None:
+                return None
+            union |= words
+            if len(union) > _LEXICON_LIMIT:
+                return None
+        return union
+    if isinstance(parser, Concatenation):
+        result: set[_Word] | None = {_EMPTY_WORD}
+        for child in parser.parsers:
+            words = _language(child, visiting, alternations)
+            if words is None:
+                return None
+            result = _product(typing.cast("set[_Word]", result), words)
+            if result is None:
+                return None
+        return result
+    if isinstance(parser, Repetition):
+        repeat = parser.repeat
+        if repeat.max is None:
+            return None
+        if repeat.max == 0:
+            return {_EMPTY_WORD}
+        element = _language(parser.element, visiting, alternations)
+        if element is None:
+            return None
+        power: set[_Word] = {_EMPTY_WORD}
+        union = set()
+        for count in range(repeat.max + 1):
+            if count >= repeat.min:
+                union |= power
+                if len(union) > _LEXICON_LIMIT:
+                    return None
+            if count == repeat.max:
+                break
+            following = _product(power, element)
+            if following is None:
+                return None
+            if following == power:
+                # An element that can only match empty adds nothing more.
+                union |= power
+                break
+            power = following
+        return union
+    if isinstance(parser, Option):
+        words = _language(parser.alternation, visiting, alternations)
+        return None if words is None else words | {_EMPTY_WORD}
+    return None
+
+
+def lexicon(rule: Rule) -> Lexicon | None:
+    """The language of `rule` as a `Lexicon`, if it is finite and small
+    enough to enumerate -- at most `_LEXICON_LIMIT` strings -- and `None`
+    otherwise.  Only meaningful while `Lexicon.current`."""
+    cached = _cached("lexicon", rule)
+    if cached is _MISSING:
+        alternations: list[Alternation] = []
+        words = _language(rule, set(), alternations)
+        cached = None if words is None else Lexicon(words, alternations)
+        _cache[("lexicon", rule)] = cached
+    return cached
+
+
+#### Prefix-free alternations ####
+
+
+def _overlaps(ours: set[_Word], theirs: set[_Word]) -> bool:
+    """Whether a string of `ours` is a prefix of one of `theirs`, ignoring
+    case -- which can only find an overlap that is not there."""
+    folded = {word for word, _ in ours}
+    return any(
+        word[:end] in folded for word, _ in theirs for end in range(len(word) + 1)
+    )
+
+
+def prefix_free(alternation: Alternation) -> bool:
+    """Whether at most one of `alternation`'s alternatives can match at any
+    offset.
+
+    Two matches at one offset are both prefixes of the input from there, so
+    one is a prefix of the other.  Alternatives no match of which is a
+    prefix of another's never both match; once one has, trying the rest
+    cannot change the result, and longest match and first match agree.  Two
+    alternatives are told apart by their FIRST sets, where neither matches
+    the empty string; failing that, by their languages, where both are
+    small and finite (see `_language`).  Either way what is compared is
+    everything an alternative could match, so a nested alternation set to
+    first match, which matches less, does not make the answer wrong.
+    """
+    parsers = alternation.parsers
+    firsts = [first(parser) for parser in parsers]
+    languages: dict[int, set[_Word] | None] = {}
+
+    def language(index: int) -> set[_Word] | None:
+        if index not in languages:
+            languages[index] = _language(parsers[index], set(), [])
+        return languages[index]
+
+    for index, ours in enumerate(firsts):
+        for other in range(index + 1, len(firsts)):
+            theirs = firsts[other]
+            if not (ours.nullable or theirs.nullable) and ours.chars.isdisjoint(
+                theirs.chars
+            ):
+                continue
+            left, right = language(index), language(other)
+            if left is None or right is None:
+                return False
+            if _overlaps(left, right) or _overlaps(right, left):
+                return False
+    return True
+
+
+#### Search prefilter ####
+
+
+class Prefilter:
+    """Finds the offsets at which a rule could possibly match.
+
+    Combines the rule's FIRST set, scanned with a compiled character class,
+    with its required literal, scanned with `str.find`: a match cannot begin
+    where its first character is impossible, nor anywhere after the last
+    occurrence of text it must contain.  Nullable rules can match anywhere,
+    so for them every offset is a candidate.
+    """
+
+    __slots__ = ("_first", "_literal", "_nullable")
+
+    def __init__(self, parser: Parser):
+        first_set = first(parser)
+        self._nullable = first_set.nullable
+        self._first = (
+            None
+            if first_set.nullable or first_set.chars == CharClass.ANY
+            else re.compile(first_set.chars.pattern())
+        )
+        self._literal = required_literal(parser)
+
+    def scanner(self, source: Source) -> _Scanner:
+        return _Scanner(self, source)
+
+
+class _Scanner:
+    """A `Prefilter` applied to one source.
+
+    Remembers where the required literal next occurs, so scanning a source
+    finds each occurrence once rather than once per candidate.
+    """
+
+    __slots__ = ("_end", "_first", "_folded", "_literal_at", "_needle", "_source")
+
+    def __init__(self, prefilter: Prefilter, source: Source):
+        literal = prefilter._literal
+        self._source = source
+        self._end = len(source)
+        self._first = prefilter._first
+        self._needle = None if literal is None else _fold_literal(literal)
+        self._folded = (
+            _py._ascii_fold(source)
+            if literal is not None and not literal.case_sensitive
+            else source
+        )
+        # Offset of the first occurrence of the required literal at or
+        # after the last position asked about; -1 once there is none.
+        self._literal_at = -2
+
+    def next(self, pos: int) -> int | None:
+        """The first candidate offset at or after `pos`, or `None` if no
+        match can begin anywhere from `pos` on."""
+        if pos > self._end:
+            return None
+        if self._first is not None:
+            found = self._first.search(self._source, pos)
+            if found is None:
+                return None
+            pos = found.start()
+        if self._needle is not None:
+            if -1 < self._literal_at < pos or self._literal_at == -2:
+                self._literal_at = self._folded.find(self._needle, pos)
+            if self._literal_at == -1:
+                return None
+        return pos
+
+
+def prefilter(rule: Rule) -> Prefilter:
+    """The (cached) search prefilter for `rule`."""
+    cached = _cached("prefilter", rule)
+    if cached is _MISSING:
+        cached = Prefilter(rule)
+        _cache[("prefilter", rule)] = cached
+    return cached
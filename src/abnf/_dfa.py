@@ -0,0 +1,659 @@
+"""Deterministic finite automata for regular rules.
+
+A rule that cannot reach itself -- through its own definition or through
+other rules' -- matches a regular language, and a DFA decides membership in
+one character at a time, without backtracking.  `dfa` builds one for such
+a rule, over classes of characters rather than characters: ``%x80-10FFFF`` is
+one class, not a million columns.
+
+What the DFA accepts is exactly what ``parse_all`` accepts, so only rules
+whose language the grammar text alone determines are compiled.  A rule with
+an exclusion, a first-match alternation (which matches less than the
+language its alternatives spell), prose, or a definition this module cannot
+see into -- a Rust-backed combinator, say -- has none, and the caller parses.
+
+`Rule.lparse` runs the DFA of a frozen rule in place of parsing it, and
+``abnf.vectorized`` runs one over whole arrays at once.  `derive` builds the
+nodes of a match a DFA found from the DFAs of the rule's parts, so the rule
+is not parsed to build them either.
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import typing
+from array import array
+
+from abnf import _analysis
+from abnf._parser_python import (
+    Alternation,
+    Concatenation,
+    Literal,
+    LiteralNode,
+    Node,
+    Nodes,
+    Option,
+    ParseError,
+    Parser,
+    Repetition,
+    Rule,
+    _ascii_fold,
+)
+
+#: The most states an automaton may have, before and after determinising.
+#: ``1*64DIGIT`` is 64 copies of ``DIGIT``; nesting a few of those multiplies.
+_STATE_LIMIT = 4096
+
+#: The most NFA states the subset construction may visit, counted once per
+#: DFA state it builds.  The automata that come to need too many states get
+#: there slowly; this gives up on them sooner.
+_WORK_LIMIT = 100_000
+
+#: The state nothing leaves.
+DEAD = 0
+#: The state before the first character.
+START = 1
+
+
+class DFA:
+    """A deterministic automaton over classes of characters.
+
+    The class of a code point is ``bisect.bisect_right(bounds, cp)``: the
+    classes are the intervals between consecutive ``bounds``, every code
+    point in one treated alike by the rule.  ``table[state * classes +
+    class]`` is the state after reading a character of that class.
+    """
+
+    __slots__ = (
+        "_alternations",
+        "accepting",
+        "bounds",
+        "classes",
+        "parts",
+        "singles",
+        "table",
+    )
+
+    def __init__(
+        self,
+        bounds: list[int],
+        table: array[int],
+        accepting: bytes,
+        alternations: typing.Iterable[Alternation],
+    ):
+        self.bounds = bounds
+        self.classes = len(bounds) + 1
+        self.table = table
+        #: One byte per state: 1 where the text read so far is a match.
+        self.accepting = accepting
+        self._alternations = tuple(alternations)
+        #: The automata of the rule's parts, and which of them match one
+        #: character at a time, worked out as `derive` needs them.
+        self.parts: dict[tuple[Parser, ...], DFA | None] = {}
+        self.singles: dict[Parser, _analysis.SingleChar | None] = {}
+
+    @property
+    def states(self) -> int:
+        return len(self.accepting)
+
+    @property
+    def current(self) -> bool:
+        """Whether the rule still matches the language compiled.  It was
+        compiled for longest-match alternation, and ``first_match`` can be
+        set on an alternation without redefining any rule."""
+        return not any(alternation.first_match for alternation in self._alternations)
+
+    def check(self, text: str) -> int | None:
+        """``None`` if all of `text` matches; otherwise the offset of the
+        first character no match can continue with, or ``len(text)`` if the
+        text ends before any match does."""
+        bounds, classes, table = self.bounds, self.classes, self.table
+        state = START
+        for offset, char in enumerate(text):
+            state = table[state * classes + bisect.bisect_right(bounds, ord(char))]
+            if state == DEAD:
+                return offset
+        return None if self.accepting[state] else len(text)
+
+    def ends(
+        self, source: str, start: int, end: int | None = None
+    ) -> tuple[list[int], int]:
+        """Every offset at which a match starting at `start` can end,
+        shortest first, and where reading stopped: at the first character no
+        match can continue with, or at `end`, by default the end of
+        `source`."""
+        bounds, classes, table, accepting = (
+            self.bounds,
+            self.classes,
+            self.table,
+            self.accepting,
+        )
+        stop = len(source) if end is None else end
+        state = START
+        ends = [start] if accepting[START] else []
+        for offset in range(start, stop):
+            state = table[
+                state * classes + bisect.bisect_right(bounds, ord(source[offset]))
+            ]
+            if state == DEAD:
+                return ends, offset
+            if accepting[state]:
+                ends.append(offset + 1)
+        return ends, stop
+
+    def spans(self, source: str, start: int, end: int) -> bool:
+        """Whether a match from `start` can end at `end`."""
+        bounds, classes, table = self.bounds, self.classes, self.table
+        state = START
+        for offset in range(start, end):
+            state = table[
+                state * classes + bisect.bisect_right(bounds, ord(source[offset]))
+            ]
+            if state == DEAD:
+                return False
+        return bool(self.accepting[state])
+
+
+class _NFA:
+    """Thompson's construction: each parser becomes a fragment with one
+    entry and one exit, joined to others by empty moves."""
+
+    def __init__(self, alternations: list[Alternation]):
+        self.moves: list[list[tuple[tuple[int, int], int]]] = []
+        self.empty: list[list[int]] = []
+        self.alternations = alternations
+
+    def state(self) -> int:
+        if len(self.moves) >= _STATE_LIMIT:
+            raise _TooLarge
+        self.moves.append([])
+        self.empty.append([])
+        return len(self.moves) - 1
+
+    def fragment(self, parser: Parser, visiting: set[Rule]) -> tuple[int, int]:
+        if isinstance(parser, Rule):
+            definition = _analysis._definition(parser)
+            # An atomic rule inside another matches less than its definition
+            # says; on its own it matches just as much, only once.
+            if (
+                definition is None
+                or parser._exclude is not None
+                or (parser._atomic and visiting)
+                or parser in visiting
+            ):
+                raise _NotRegular
+            visiting.add(parser)
+            try:
+                return self.fragment(definition, visiting)
+            finally:
+                visiting.discard(parser)
+        if isinstance(parser, Literal):
+            return self._literal(parser)
+        if isinstance(parser, Alternation):
+            self.alternations.append(parser)
+            entry, exit_ = self.state(), self.state()
+            for child in parser.parsers:
+                start, end = self.fragment(child, visiting)
+                self.empty[entry].append(start)
+                self.empty[end].append(exit_)
+            return entry, exit_
+        if isinstance(parser, Concatenation):
+            entry = end = self.state()
+            for child in parser.parsers:
+                start, following = self.fragment(child, visiting)
+                self.empty[end].append(start)
+                end = following
+            return entry, end
+        if isinstance(parser, Repetition):
+            return self._repetition(parser, visiting)
+        if isinstance(parser, Option):
+            entry, exit_ = self.state(), self.state()
+            start, end = self.fragment(parser.alternation, visiting)
+            self.empty[entry] += [start, exit_]
+            self.empty[end].append(exit_)
+            return entry, exit_
+        raise _NotRegular
+
+    def _literal(self, literal: Literal) -> tuple[int, int]:
+        value = literal.value
+        if not value:
+            # An empty literal fails at the end of the text, which no state
+            # can tell.
+            raise _NotRegular
+        entry = end = self.state()
+        if isinstance(value, tuple):
+            # Ranges are case-sensitive.
+            steps = [[(ord(value[0]), ord(value[1]))]]
+        else:
+            steps = [
+                [(ord(c), ord(c)) for c in {char.lower(), char.upper()}]
+                if not literal.case_sensitive and char.isascii() and char.isalpha()
+                else [(ord(char), ord(char))]
+                for char in value
+            ]
+        for intervals in steps:
+            following = self.state()
+            self.moves[end].extend((interval, following) for interval in intervals)
+            end = following
+        return entry, end
+
+    def _repetition(
+        self, repetition: Repetition, visiting: set[Rule]
+    ) -> tuple[int, int]:
+        repeat = repetition.repeat
+        entry = end = self.state()
+        for _ in range(repeat.min):
+            start, following = self.fragment(repetition.element, visiting)
+            self.empty[end].append(start)
+            end = following
+        exit_ = self.state()
+        self.empty[end].append(exit_)
+        if repeat.max is None:
+            # Any number more: loop back from the element's exit.
+            start, following = self.fragment(repetition.element, visiting)
+            self.empty[end].append(start)
+            self.empty[following].append(end)
+            return entry, exit_
+        for _ in range(repeat.max - repeat.min):
+            start, following = self.fragment(repetition.element, visiting)
+            self.empty[end].append(start)
+            self.empty[following].append(exit_)
+            end = following
+        return entry, exit_
+
+
+class _NotRegular(Exception):
+    """The rule's language is not regular, or cannot be seen from here."""
+
+
+class _TooLarge(Exception):
+    """The automaton would be bigger than `_STATE_LIMIT`."""
+
+
+def _determinise(
+    nfa: _NFA, entry: int, exit_: int
+) -> tuple[list[int], array[int], bytes] | None:
+    """The subset construction, over the classes of characters the NFA's
+    moves tell apart.
+
+    A DFA state is the set of NFA states with a character to move on, or
+    that are the exit, reachable without reading anything; the rest tell
+    two such sets apart no further.
+    """
+    points = {lo for moves in nfa.moves for (lo, _), _ in moves} | {
+        hi + 1 for moves in nfa.moves for (_, hi), _ in moves
+    }
+    bounds = sorted(points - {0, _analysis._MAX_CODE_POINT + 1})
+    classes = len(bounds) + 1
+
+    closures: dict[int, frozenset[int]] = {}
+
+    def closure(state: int) -> frozenset[int]:
+        reached = closures.get(state)
+        if reached is None:
+            seen = {state}
+            pending = [state]
+            while pending:
+                for following in nfa.empty[pending.pop()]:
+                    if following not in seen:
+                        seen.add(following)
+                        pending.append(following)
+            reached = closures[state] = frozenset(
+                s for s in seen if nfa.moves[s] or s == exit_
+            )
+        return reached
+
+    steps: dict[int, dict[int, set[int]]] = {}
+
+    def step(state: int) -> dict[int, set[int]]:
+        """Where a character of each class takes `state`."""
+        by_class = steps.get(state)
+        if by_class is None:
+            by_class = steps[state] = {}
+            for (lo, hi), target in nfa.moves[state]:
+                reached = closure(target)
+                low = bisect.bisect_right(bounds, lo)
+                for cls in range(low, bisect.bisect_right(bounds, hi) + 1):
+                    by_class.setdefault(cls, set()).update(reached)
+        return by_class
+
+    start = closure(entry)
+    numbers: dict[frozenset[int], int] = {frozenset(): DEAD, start: START}
+    order = [frozenset(), start]
+    table = array("i", [DEAD] * (2 * classes))
+    pending = [start]
+    work = 0
+    while pending:
+        current = pending.pop()
+        work += len(current)
+        if work > _WORK_LIMIT:
+            return None
+        row = numbers[current] * classes
+        targets: dict[int, set[int]] = {}
+        for state in current:
+            for cls, reached in step(state).items():
+                targets.setdefault(cls, set()).update(reached)
+        for cls, reached in targets.items():
+            following = frozenset(reached)
+            number = numbers.get(following)
+            if number is None:
+                if len(order) >= _STATE_LIMIT:
+                    return None
+                number = numbers[following] = len(order)
+                order.append(following)
+                table.extend([DEAD] * classes)
+                pending.append(following)
+            table[row + cls] = number
+    accepting = bytes(exit_ in states for states in order)
+    return (bounds, *_minimise(table, accepting, classes))
+
+
+def _minimise(
+    table: array[int], accepting: bytes, classes: int
+) -> tuple[array[int], bytes]:
+    """The smallest automaton accepting what `table` does: Hopcroft's
+    partition refinement, which merges every pair of states no text tells
+    apart.  States that cannot reach a match merge into `DEAD`, so reading
+    stops as soon as a match is out of reach rather than at the end."""
+
+    states = len(accepting)
+    # Which states each class of character leads to each state from.
+    sources: list[dict[int, list[int]]] = [{} for _ in range(classes)]
+    for state in range(states):
+        row = state * classes
+        for cls in range(classes):
+            sources[cls].setdefault(table[row + cls], []).append(state)
+
+    block_of = [0] * states
+    blocks: list[set[int]] = []
+    for flag in (0, 1):
+        members = {state for state in range(states) if accepting[state] == flag}
+        if members:
+            for state in members:
+                block_of[state] = len(blocks)
+            blocks.append(members)
+    splitters = set(range(len(blocks)))
+    while splitters:
+        splitter = list(blocks[splitters.pop()])
+        for by_target in sources:
+            touched: dict[int, set[int]] = {}
+            for target in splitter:
+                for state in by_target.get(target, ()):
+                    touched.setdefault(block_of[state], set()).add(state)
+            for index, inside in touched.items():
+                block = blocks[index]
+                if len(inside) == len(block):
+                    continue
+                block -= inside
+                split = len(blocks)
+                blocks.append(inside)
+                for state in inside:
+                    block_of[state] = split
+                if index in splitters or len(inside) <= len(block):
+                    splitters.add(split)
+                else:
+                    splitters.add(index)
+
+    if block_of[START] == block_of[DEAD] or len(blocks) == states:
+        # Nothing to merge, or nothing matches at all and `START` has to stay
+        # apart from `DEAD` regardless.
+        return table, accepting
+    numbers = {block_of[DEAD]: DEAD, block_of[START]: START}
+    for state in range(states):
+        numbers.setdefault(block_of[state], len(numbers))
+    merged = array("i", [DEAD] * (len(numbers) * classes))
+    flags = bytearray(len(numbers))
+    for state in range(states):
+        number = numbers[block_of[state]]
+        flags[number] = accepting[state]
+        row, merged_row = state * classes, number * classes
+        for cls in range(classes):
+            merged[merged_row + cls] = numbers[block_of[table[row + cls]]]
+    return merged, bytes(flags)
+
+
+def dfa(rule: Rule) -> DFA | None:
+    """A DFA accepting exactly the texts `rule` matches all of, or `None` if
+    the rule's language is not regular, is not determined by the grammar
+    text alone (see the module docstring), or needs more than
+    `_STATE_LIMIT` states."""
+    cached = _analysis._cached("dfa", rule)
+    if cached is _analysis._MISSING:
+        cached = _analysis._cache[("dfa", rule)] = _compile(rule)
+    return cached if cached is not None and cached.current else None
+
+
+def _compile(parser: Parser) -> DFA | None:
+    """A DFA accepting exactly the texts `parser` matches all of, or `None`
+    as for `dfa`."""
+    alternations: list[Alternation] = []
+    nfa = _NFA(alternations)
+    try:
+        entry, exit_ = nfa.fragment(parser, set())
+    except (_NotRegular, _TooLarge):
+        return None
+    built = _determinise(nfa, entry, exit_)
+    return None if built is None else DFA(*built, alternations)
+
+
+#### Derivations ####
+
+
+def derive(rule: Rule, source: str, start: int, end: int) -> Nodes:
+    """The nodes of `rule`'s match from `start` to `end`, which its DFA
+    found: those of the first derivation `Rule.lparse` would have found.
+
+    The DFA says where a match ends, not how it was derived; the DFAs of
+    the rule's parts say the rest.  Where the parsers choose -- a split
+    between the parts of a concatenation, an alternative, a count -- the
+    span each part must match is known, so each choice is a question about
+    where one of those DFAs can end, asked in the order the parsers would
+    have tried it.  A part too large for a DFA of its own is parsed.
+    """
+    automaton = typing.cast(DFA, rule._automaton)
+    return _Derivation(source, automaton).nodes(rule, start, end)
+
+
+class _Derivation:
+    """One `derive`: the nodes of a parser's match of a known span.
+
+    Each parser chooses as it does when it parses.  A concatenation keeps,
+    of the candidates ending at one offset, the one whose first part is
+    longest, then whose second part is, and so on.  An alternation yields
+    its alternatives' matches in order, longest first, so a span is the
+    first alternative's that can match it.  A repetition keeps, for each
+    offset, the candidate that reached it in the fewest rounds, and of
+    those, the first: each round extends the last round's candidates in
+    the order they were found, each by its longest match first.
+    """
+
+    __slots__ = ("parts", "singles", "source")
+
+    def __init__(self, source: str, automaton: DFA):
+        self.source = source
+        self.parts = automaton.parts
+        self.singles = automaton.singles
+
+    def nodes(self, parser: Parser, start: int, end: int) -> Nodes:
+        """The nodes of `parser`'s match from `start` to `end`."""
+        source = self.source
+        if end == start + 1:
+            single = self.single(parser)
+            if single is not None:
+                return [self.leaf(single, start)]
+        if isinstance(parser, Rule):
+            if parser._token:
+                literal = LiteralNode(source[start:end], start, end - start)
+                return [Node(parser.name, literal)]
+            definition = typing.cast("Parser", _analysis._definition(parser))
+            return [Node(parser.name, *self.nodes(definition, start, end))]
+        if isinstance(parser, Literal):
+            return [
+                typing.cast(Node, LiteralNode(source[start:end], start, end - start))
+            ]
+        if isinstance(parser, Alternation):
+            for child in parser.parsers:
+                if self.spans((child,), start, end):
+                    return self.nodes(child, start, end)
+        elif isinstance(parser, Concatenation):
+            return self.sequence(parser.parsers, start, end)
+        elif isinstance(parser, Option):
+            return [] if start == end else self.nodes(parser.alternation, start, end)
+        elif isinstance(parser, Repetition):
+            return self.repetition(parser, start, end)
+        return self.parsed((parser,), start, end)
+
+    def sequence(self, parsers: typing.Sequence[Parser], start: int, end: int) -> Nodes:
+        """The nodes of `parsers`' match, one after another, from `start` to
+        `end`: the longest first part the rest can follow, and so on."""
+        nodes: Nodes = []
+        at = start
+        last = len(parsers) - 1
+        for index in range(last):
+            parser = parsers[index]
+            rest = tuple(parsers[index + 1 :])
+            for following in self.ends(parser, at, end):
+                if self.spans(rest, following, end):
+                    break
+            else:
+                return self.parsed(tuple(parsers[index:]), at, end, nodes)
+            nodes += self.nodes(parser, at, following)
+            at = following
+        nodes += self.nodes(parsers[last], at, end)
+        return nodes
+
+    def repetition(self, repetition: Repetition, start: int, end: int) -> Nodes:
+        """The nodes of `repetition`'s match from `start` to `end`: the path
+        to `end` of the rounds `Repetition.lparse` makes."""
+        repeat, element = repetition.repeat, repetition.element
+        single = self.single(element)
+        if single is not None:
+            # One round per character.
+            return [self.leaf(single, offset) for offset in range(start, end)]
+        min_parser = typing.cast("Concatenation | None", repetition._min_parser)
+        # Where each offset was first reached from, rounds of the element
+        # since the first offset; `None` for the first ones, which the
+        # `min` prefix parser reaches.
+        previous: dict[int, int | None] = dict.fromkeys(
+            [start] if min_parser is None else self.ends(min_parser, start, end)
+        )
+        frontier = list(previous)
+        rounds = repeat.min
+        while end not in previous and frontier:
+            if repeat.max is not None and rounds == repeat.max:
+                break
+            reached = []
+            for at in frontier:
+                for following in self.ends(element, at, end):
+                    if following not in previous:
+                        previous[following] = at
+                        reached.append(following)
+            frontier = reached
+            rounds += 1
+        if end not in previous:
+            return self.parsed((repetition,), start, end)
+        path = [end]
+        while (at := previous[path[-1]]) is not None:
+            path.append(at)
+        path.reverse()
+        nodes = (
+            []
+            if min_parser is None
+            else self.sequence(min_parser.parsers, start, path[0])
+        )
+        for at, following in itertools.pairwise(path):
+            nodes += self.nodes(element, at, following)
+        return nodes
+
+    def single(self, parser: Parser) -> _analysis.SingleChar | None:
+        """`parser` as an `_analysis.SingleChar`, if it is one."""
+        singles = self.singles
+        if parser in singles:
+            return singles[parser]
+        found = singles[parser] = _analysis.single_char(parser)
+        return found
+
+    def leaf(self, single: _analysis.SingleChar, offset: int) -> Node:
+        """The node of a one-character match at `offset`: the literal, in
+        the nodes of the rules around it."""
+        char = self.source[offset]
+        node = typing.cast(Node, LiteralNode(char, offset, 1))
+        for name in reversed(single.names(char)):
+            node = Node(name, node)
+        return node
+
+    def automaton(self, parsers: tuple[Parser, ...]) -> DFA | None:
+        """The DFA of `parsers` one after another, built the first time."""
+        parts = self.parts
+        if parsers in parts:
+            return parts[parsers]
+        built = parts[parsers] = _compile(
+            parsers[0] if len(parsers) == 1 else Concatenation(*parsers)
+        )
+        return built
+
+    def ends(self, parser: Parser, start: int, end: int) -> list[int]:
+        """Where `parser`'s matches from `start` end, up to `end`, longest
+        first."""
+        if isinstance(parser, Literal):
+            value = parser.value
+            following = start + (1 if isinstance(value, tuple) else len(value))
+            if following <= end and self.literal(parser, start, following):
+                return [following]
+            return []
+        automaton = self.automaton((parser,))
+        if automaton is None:
+            found = {match.start for match in _matches(parser, self.source, start)}
+            return sorted((offset for offset in found if offset <= end), reverse=True)
+        found, _ = automaton.ends(self.source, start, end)
+        found.reverse()
+        return found
+
+    def spans(self, parsers: tuple[Parser, ...], start: int, end: int) -> bool:
+        """Whether `parsers`, one after another, can match from `start` to
+        `end`."""
+        if len(parsers) == 1 and isinstance(parsers[0], Literal):
+            return self.literal(parsers[0], start, end)
+        automaton = self.automaton(parsers)
+        if automaton is None:
+            return any(
+                match.start == end
+                for match in _matches(Concatenation(*parsers), self.source, start)
+            )
+        return automaton.spans(self.source, start, end)
+
+    def literal(self, literal: Literal, start: int, end: int) -> bool:
+        """Whether `literal` matches from `start` to `end`."""
+        value, text = literal.value, self.source[start:end]
+        if isinstance(value, tuple):
+            return len(text) == 1 and value[0] <= text <= value[1]
+        if len(text) != len(value):
+            return False
+        return (
+            text if literal.case_sensitive else _ascii_fold(text)
+        ) == literal.pattern
+
+    def parsed(
+        self,
+        parsers: tuple[Parser, ...],
+        start: int,
+        end: int,
+        nodes: Nodes | None = None,
+    ) -> Nodes:
+        """`nodes` and then those of `parsers`' first match from `start` to
+        `end`, found by parsing them: for a part with no DFA of its own."""
+        parser = parsers[0] if len(parsers) == 1 else Concatenation(*parsers)
+        for match in _matches(parser, self.source, start):
+            if match.start == end:
+                return [*(nodes or ()), *match.nodes]
+        msg = f"{parser} matched where it does not"
+        raise AssertionError(msg)
+
+
+def _matches(parser: Parser, source: str, start: int) -> typing.Iterator[typing.Any]:
+    """`parser`'s matches from `start`, none if it fails."""
+    try:
+        yield from parser.lparse(source, start)
+    except ParseError:
+        return
@@ -0,0 +1,505 @@
+"""Shared packed parse forests: every derivation of an input, not only the
+longest.  See `Rule.parse_forest`.
+
+`Rule.parse` settles ambiguity as it goes -- matches are merged by end
+offset and the longest wins -- so the derivations it drops cannot be
+recovered from its result.  The forest is built by a separate recognizer
+that keeps them apart.  It records, for each part of the grammar and each
+offset, the set of offsets a match from there can end at.  Every span
+`(part, start, end)` is then a node of the forest, and the ways it was
+derived -- its families -- are read back off those sets on demand.  A span
+reached along two derivations is one node, which is what keeps the forest
+polynomial in the input while the number of trees in it is not.
+
+The recognizer walks the pure-Python combinators.  Where the Rust backend
+built a rule from ABNF text, the recognizer builds it again from that text
+in pure Python, and walks that instead; a definition the engine built any
+other way is one part of the forest, with a derivation per end.
+
+Rules are matched exactly as the parser matches them: exclusions apply,
+first-match alternations resolve to the first alternative that matches at
+all, and a repetition stops at an element that would match the empty string
+once its minimum is met -- the only way `*( *WSP x )` has finitely many
+derivations.  A rule that reaches itself at the offset it started from has
+no end of them; `parse_forest` raises `ParseError` for it, as the parser
+does.
+"""
+
+from __future__ import annotations
+
+import types
+import typing
+
+from abnf import _analysis
+from abnf._parser_python import (
+    Alternation,
+    Concatenation,
+    GrammarError,
+    Literal,
+    LiteralNode,
+    Node,
+    Option,
+    ParseError,
+    Parser,
+    Prose,
+    Repeat,
+    Repetition,
+    Rule,
+    Source,
+)
+
+#: The classes definitions are rebuilt with: this module's, bound before the
+#: Rust backend replaces them in `abnf._parser_python`.
+_KINDS = types.SimpleNamespace(
+    Alternation=Alternation,
+    Concatenation=Concatenation,
+    Literal=Literal,
+    Option=Option,
+    Prose=Prose,
+    Repeat=Repeat,
+    Repetition=Repetition,
+)
+_WALKED = (Rule, Alternation, Concatenation, Repetition, Option, Literal, Prose)
+
+# Recognizer states.  Besides the combinators themselves, a concatenation
+# is recognized part by part, and a repetition count by count, so that the
+# derivations of a long one share their beginnings:
+#
+#   ("prefix", concatenation, k)  the first k parts
+#   ("count", repetition, k)      exactly k repeats
+#   ("more", repetition)          at least repeat.min repeats
+_State = typing.Any
+#: A node of the forest: a state, and the span of source it matched.
+_Span = tuple[_State, int, int]
+
+
+class _Recognizer:
+    """The end offsets every state can reach from every offset, worked out
+    on demand and memoised for one source."""
+
+    def __init__(self, source: Source):
+        self.source = source
+        self._ends: dict[tuple[_State, int], frozenset[int]] = {}
+        # States being worked out: meeting one again at the same offset is
+        # a rule reaching itself without consuming anything.
+        self._active: set[tuple[_State, int]] = set()
+        self._definitions: dict[Rule, Parser] = {}
+
+    def definition(self, rule: Rule) -> Parser:
+        """The definition of `rule` to walk: its own, or one built again in
+        pure Python from the ABNF text that built the engine's."""
+
+        found = self._definitions.get(rule)
+        if found is not None:
+            return found
+        found = _analysis._definition(rule)
+        if found is None:
+            msg = f'Undefined rule "{rule.name}"'
+            raise GrammarError(msg)
+        source = rule._source_text()
+        if not isinstance(found, _WALKED) and source is not None:
+            found, _ = rule._definition_from_text(*source, like=rule, kinds=_KINDS)
+        self._definitions[rule] = found
+        return found
+
+    def ends(self, state: _State, start: int) -> frozenset[int]:
+        key = (state, start)
+        found = self._ends.get(key)
+        if found is not None:
+            return found
+        if key in self._active:
+            raise ParseError(_parser(state), start)
+        self._active.add(key)
+        try:
+            found = self._compute(state, start)
+        finally:
+            self._active.discard(key)
+        self._ends[key] = found
+        return found
+
+    def _compute(self, state: _State, start: int) -> frozenset[int]:
+        if isinstance(state, tuple):
+            # The states of concatenations and repetitions are filled in
+            # a whole chain at a time, by the combinator's own entry.
+            self.ends(state[1], start)
+            return self._ends.get((state, start), frozenset())
+        if isinstance(state, Rule):
+            ends = self.ends(self.definition(state), start)
+            exclude = state.exclude
+            if exclude is None:
+                return ends
+            return frozenset(
+                end for end in ends if not _matches(exclude, self.source[start:end])
+            )
+        if isinstance(state, Alternation):
+            if state.first_match:
+                for parser in state.parsers:
+                    ends = self.ends(parser, start)
+                    if ends:
+                        return ends
+                return frozenset()
+            return frozenset().union(
+                *(self.ends(parser, start) for parser in state.parsers)
+            )
+        if isinstance(state, Concatenation):
+            ends = frozenset((start,))
+            self._ends[(("prefix", state, 0), start)] = ends
+            for k, parser in enumerate(state.parsers, 1):
+                ends = frozenset().union(*(self.ends(parser, m) for m in ends))
+                self._ends[(("prefix", state, k), start)] = ends
+            return ends
+        if isinstance(state, Repetition):
+            return self._repetition(state, start)
+        if isinstance(state, Option):
+            return frozenset((start,)) | self.ends(state.alternation, start)
+        if isinstance(state, Prose):
+            return frozenset()
+        # A literal, or a parser this module cannot see into: one
+        # derivation per end, as the parser itself reports them.
+        try:
+            return frozenset(match.start for match in state.lparse(self.source, start))
+        except ParseError:
+            return frozenset()
+
+    def _repetition(self, repetition: Repetition, start: int) -> frozenset[int]:
+        repeat = repetition.repeat
+        element = repetition.element
+        ends = frozenset((start,))
+        self._ends[(("count", repetition, 0), start)] = ends
+        result = ends if repeat.min == 0 else frozenset()
+        k = 0
+        while ends and (repeat.max is None or k < repeat.max):
+            if k == repeat.min and repeat.max is None:
+                break
+            k += 1
+            ends = frozenset(
+                end
+                for m in ends
+                for end in self.ends(element, m)
+                if k <= repeat.min or end > m
+            )
+            self._ends[(("count", repetition, k), start)] = ends
+            if k >= repeat.min:
+                result |= ends
+        if repeat.max is not None:
+            return result
+        # Past the minimum, an unbounded repetition is one state: each
+        # further repeat must consume something, so the set of ends is a
+        # closure rather than a chain.
+        more = set(self._ends.get((("count", repetition, repeat.min), start), ()))
+        pending = list(more)
+        while pending:
+            m = pending.pop()
+            for end in self.ends(element, m):
+                if end > m and end not in more:
+                    more.add(end)
+                    pending.append(end)
+        result = frozenset(more)
+        self._ends[(("more", repetition), start)] = result
+        return result
+
+    def families(self, span: _Span) -> list[tuple[_Span, ...]]:
+        """The ways `span` was derived, each a tuple of the spans it is
+        made of, left to right.  A leaf has one way, made of nothing."""
+
+        state, start, end = span
+        if isinstance(state, tuple):
+            kind, parser = state[0], state[1]
+            if kind == "prefix" or kind == "count":
+                k = state[2]
+                if k == 0:
+                    return [()]
+                part = parser.parsers[k - 1] if kind == "prefix" else parser.element
+                progress = kind == "count" and k > parser.repeat.min
+                previous = (kind, parser, k - 1)
+                return [
+                    ((part, start, end),)
+                    if k == 1
+                    else ((previous, start, m), (part, m, end))
+                    for m in sorted(self.ends(previous, start))
+                    if end in self.ends(part, m) and not (progress and end == m)
+                ]
+            # "more"
+            repetition = parser
+            base = ("count", repetition, repetition.repeat.min)
+            found: list[tuple[_Span, ...]] = []
+            if end in self.ends(base, start):
+                found.append(((base, start, end),))
+            found.extend(
+                ((state, start, m), (repetition.element, m, end))
+                for m in sorted(self.ends(state, start))
+                if m < end and end in self.ends(repetition.element, m)
+            )
+            return found
+        if isinstance(state, Rule):
+            return [((self.definition(state), start, end),)]
+        if isinstance(state, Alternation):
+            parsers = state.parsers
+            if state.first_match:
+                # Only the alternative the recognizer settled on.
+                parsers = next(([p] for p in parsers if self.ends(p, start)), [])
+            return [
+                ((parser, start, end),)
+                for parser in parsers
+                if end in self.ends(parser, start)
+            ]
+        if isinstance(state, Concatenation):
+            return self.families((("prefix", state, len(state.parsers)), start, end))
+        if isinstance(state, Repetition):
+            repeat = state.repeat
+            if repeat.max is None:
+                return [((("more", state), start, end),)]
+            return [
+                (((("count", state, k)), start, end),)
+                for k in range(repeat.min, repeat.max + 1)
+                if end in self._ends.get((("count", state, k), start), ())
+            ]
+        if isinstance(state, Option):
+            if end == start:
+                return [()]
+            return [((state.alternation, start, end),)]
+        return [()]
+
+    def leaf(self, span: _Span) -> list[Node] | None:
+        """The nodes of `span` if it is a leaf of the forest, else `None`."""
+
+        state, start, end = span
+        if isinstance(state, Literal):
+            return [
+                typing.cast(
+                    Node, LiteralNode(self.source[start:end], start, end - start)
+                )
+            ]
+        if isinstance(
+            state, (tuple, Rule, Alternation, Concatenation, Repetition, Option, Prose)
+        ):
+            return None
+        for match in state.lparse(self.source, start):
+            if match.start == end:
+                return match.nodes
+        return None  # pragma: no cover -- `end` came from this parser
+
+
+def _parser(state: _State) -> Parser:
+    return state[1] if isinstance(state, tuple) else state
+
+
+def _matches(rule: Rule, text: str) -> bool:
+    try:
+        rule.parse_all(text)
+    except ParseError:
+        return False
+    return True
+
+
+class ForestNode:
+    """All derivations of one part of the grammar over one span of the
+    source.
+
+    A node appears once in its forest however many derivations pass
+    through it.  Its :attr:`families` are the ways it was derived; nodes
+    are equal when they are the same part of the grammar over the same
+    span.
+    """
+
+    __slots__ = ("_forest", "_span")
+
+    def __init__(self, forest: Forest, span: _Span):
+        self._forest = forest
+        self._span = span
+
+    @property
+    def name(self) -> str | None:
+        """The rule this node is a match of, or ``None`` for a node inside
+        a rule's definition."""
+        state = self._span[0]
+        return state.name if isinstance(state, Rule) else None
+
+    @property
+    def start(self) -> int:
+        return self._span[1]
+
+    @property
+    def end(self) -> int:
+        return self._span[2]
+
+    @property
+    def value(self) -> str:
+        """The source text this node matched."""
+        return self._forest.source[self.start : self.end]
+
+    @property
+    def families(self) -> list[tuple[ForestNode, ...]]:
+        """Each way this node was derived: the nodes it is made of, left to
+        right.  A terminal has one way, made of nothing; more than one way
+        is an ambiguity."""
+        return [
+            tuple(ForestNode(self._forest, child) for child in family)
+            for family in self._forest._recognizer.families(self._span)
+        ]
+
+    def count(self) -> int:
+        """How many derivations this node has."""
+        return self._forest._count(self._span)
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, ForestNode)
+            and self._forest is other._forest
+            and self._span == other._span
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self._forest), self._span))
+
+    def __repr__(self) -> str:
+        label = (
+            self.name
+            if self.name is not None
+            else type(_parser(self._span[0])).__name__
+        )
+        return f"ForestNode({label}, {self.start}, {self.end})"
+
+
+class Forest:
+    """Every derivation of a source by a rule, with the parts they have in
+    common shared.  Returned by :meth:`Rule.parse_forest`."""
+
+    def __init__(self, rule: Rule, source: Source, recognizer: _Recognizer):
+        self.rule = rule
+        self.source = source
+        self._recognizer = recognizer
+        self._counts: dict[_Span, int] = {}
+        #: The node for the whole source.
+        self.root = ForestNode(self, (rule, 0, len(source)))
+
+    def count(self) -> int:
+        """How many derivations the source has, worked out without
+        enumerating them.  1 for an unambiguous parse."""
+        return self._count(self.root._span)
+
+    def _count(self, span: _Span) -> int:
+        # Post-order over the forest with an explicit stack: a repetition of
+        # n elements is a chain of n nodes, too deep to recurse through.
+        counts = self._counts
+        families = self._recognizer.families
+        stack = [span]
+        while stack:
+            top = stack[-1]
+            if top in counts:
+                stack.pop()
+                continue
+            pending = [
+                child
+                for family in families(top)
+                for child in family
+                if child not in counts
+            ]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            total = 0
+            for family in families(top):
+                product = 1
+                for child in family:
+                    product *= counts[child]
+                total += product
+            counts[top] = total
+        return counts[span]
+
+    def trees(self) -> typing.Iterator[Node]:
+        """The parse trees, one per derivation, built only as they are
+        asked for.
+
+        Derivations are taken in grammar order: earlier alternatives first,
+        and fewer repeats before more.  Two derivations that differ only in
+        which of two alternatives matched the same text give equal trees.
+        """
+
+        recognizer = self._recognizer
+        # Depth-first over the choices, with an explicit stack.  A frame is
+        # the work left to do -- spans to expand, and rule names whose node
+        # closes there -- and the output so far, both as linked lists so
+        # that the frames for sibling choices share them.
+        _close = object()
+        stack: list[tuple[typing.Any, typing.Any]] = [((self.root._span, None), None)]
+        while stack:
+            work, output = stack.pop()
+            while work is not None:
+                item, work = work
+                if isinstance(item, tuple) and len(item) == 2 and item[0] is _close:
+                    output = (item, output)
+                    continue
+                leaf = recognizer.leaf(item)
+                if leaf is not None:
+                    for node in leaf:
+                        output = (node, output)
+                    continue
+                state = item[0]
+                if isinstance(state, Rule):
+                    output = ((_close, None), output)
+                    work = (
+                        (recognizer.definition(state), item[1], item[2]),
+                        ((_close, state.name), work),
+                    )
+                    continue
+                choices = recognizer.families(item)
+                if not choices:  # pragma: no cover -- every span has a way
+                    break
+                # Take the first way now; come back for the rest later.
+                stack.extend(
+                    (_push(family, work), output) for family in reversed(choices[1:])
+                )
+                work = _push(choices[0], work)
+            else:
+                yield _build(output, _close)
+
+    def __iter__(self) -> typing.Iterator[Node]:
+        return self.trees()
+
+
+def _push(family: tuple[_Span, ...], work: typing.Any) -> typing.Any:
+    for span in reversed(family):
+        work = (span, work)
+    return work
+
+
+def _build(output: typing.Any, close: object) -> Node:
+    """The tree an output list describes.
+
+    The list runs backwards from the last node emitted.  A rule's children
+    lie between its opening marker ``(close, None)`` and its closing one
+    ``(close, name)``.
+    """
+
+    items = []
+    while output is not None:
+        item, output = output
+        items.append(item)
+    items.reverse()
+    frames: list[list[Node]] = [[]]
+    for item in items:
+        if isinstance(item, tuple) and item[0] is close:
+            if item[1] is None:
+                frames.append([])
+            else:
+                children = frames.pop()
+                frames[-1].append(Node(item[1], *children))
+        else:
+            frames[-1].append(item)
+    return frames[0][0]
+
+
+def parse_forest(rule: Rule, source: Source) -> Forest:
+    # Which builds every rule it reaches, if its grammar deferred that.
+    rule._build_if_deferred()
+    recognizer = _Recognizer(source)
+    try:
+        ends = recognizer.ends(rule, 0)
+    except RecursionError as exc:
+        # As `Rule.parse`: input nested past the stack is not accepted.
+        raise ParseError(rule, 0) from exc
+    if len(source) not in ends:
+        raise ParseError(rule, max(ends, default=0))
+    return Forest(rule, source, recognizer)
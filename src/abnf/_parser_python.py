@@ -1,17 +1,24 @@
 from __future__ import annotations
 
 import abc
+import contextlib
 import contextvars
 import operator
 import pathlib
+import re
+import sys
+import threading
 import typing
 import warnings
 from collections import OrderedDict
 from collections.abc import Generator
-from weakref import WeakSet
+from weakref import WeakSet, WeakValueDictionary
 
 from .typing import Protocol, runtime_checkable
 
+if typing.TYPE_CHECKING:
+    from abnf._forest import Forest
+
 Source = str
 Nodes = list["Node"]
 
@@ -52,12 +59,143 @@ class Match:
     treats those as one result.
     """
 
-    __slots__ = ("nodes", "start")
+    __slots__ = ("_deferred", "_nodes", "start")
 
     def __init__(self, nodes: Nodes, start: int):
-        self.nodes = nodes
+        self._nodes: Nodes | None = nodes
+        # How to build `_nodes` when it is `None`: `(head, tail)`, two
+        # matches end to end; `(name, inner)`, a rule's node around the
+        # nodes of `inner`; or `(rule, (source, start))`, the rule's match
+        # from `start` found by its DFA.  See `_concat`, `_named` and
+        # `Rule._lparse_automaton`.
+        self._deferred: tuple[typing.Any, typing.Any] | None = None
         self.start = start
 
+    @classmethod
+    def _concat(cls, head: Match, tail: Match) -> Match:
+        """`head` followed by `tail`, without building the node list.
+
+        A parse tries far more candidates than it keeps -- every alternative,
+        every repeat count -- and only the longest survives.  Joining two
+        node lists for each of them, and building a `Node` per rule
+        candidate (see `_named`), was most of the cost of building trees
+        nobody looked at.  Instead the match records where its nodes come
+        from, and `nodes` builds the list for the one that is asked.
+        """
+
+        # An empty side contributes nothing: reuse the other.  It ends
+        # where this match would, since an empty match consumes nothing.
+        if head._nodes is not None and not head._nodes:
+            return tail
+        if tail._nodes is not None and not tail._nodes:
+            return head
+        match = cls.__new__(cls)
+        match._nodes = None
+        match._deferred = (head, tail)
+        match.start = tail.start
+        return match
+
+    @classmethod
+    def _named(cls, name: str, inner: Match) -> Match:
+        """A match of rule `name` consisting of `inner`, without building
+        its `Node`."""
+
+        match = cls.__new__(cls)
+        match._nodes = None
+        match._deferred = (name, inner)
+        match.start = inner.start
+        return match
+
+    @property
+    def nodes(self) -> Nodes:
+        nodes = self._nodes
+        if nodes is None:
+            nodes = self._nodes = self._build()
+            self._deferred = None
+        return nodes
+
+    @nodes.setter
+    def nodes(self, value: Nodes) -> None:
+        self._nodes = value
+        self._deferred = None
+
+    def _build(self) -> Nodes:
+        """The node list `_deferred` describes."""
+
+        head, inner = typing.cast("tuple[typing.Any, typing.Any]", self._deferred)
+        if isinstance(head, str):
+            return [Node(head, *inner.nodes)]
+        if isinstance(head, Rule):
+            return head._derive(*inner, self.start)
+        # A repetition of n elements is a chain of n joins; walk it with a
+        # stack rather than recursion, which a long input would exhaust.
+        nodes: Nodes = []
+        stack: list[Match] = [inner, head]
+        while stack:
+            match = stack.pop()
+            deferred = getattr(match, "_deferred", None)
+            if deferred is None or isinstance(deferred[0], (str, Rule)):
+                # Built already, a rule's match, or from another backend.
+                nodes.extend(match.nodes)
+            else:
+                stack.extend((deferred[1], deferred[0]))
+        return nodes
+
+    def _act(
+        self, source: str, begin: int, actions: dict[str, typing.Any]
+    ) -> list[typing.Any]:
+        """What `actions` make of this match, which begins at `begin`: see
+        `Rule.evaluate`.
+
+        Walks what `_deferred` describes as `_build` does, but builds no
+        nodes: a rule with an action contributes what the action returns,
+        and one without contributes what the rules under it do.  The walk
+        keeps its own stack, as rules can nest as deep as the parse went.
+        """
+
+        values: list[typing.Any] = []
+        # Each entry adds to the list it carries: a match, beginning at an
+        # offset; a node built already; or, once the values under a rule
+        # are in, the rule's name, its text and those values.
+        stack: list[tuple[typing.Any, ...]] = [(values, self, begin)]
+        while stack:
+            entry = stack.pop()
+            out = entry[0]
+            if len(entry) == 4:
+                _, name, text, under = entry
+                action = _action(name, actions)
+                if action is None:
+                    out.extend(under)
+                else:
+                    out.append(action(text, under))
+                continue
+            if len(entry) == 2:
+                node = entry[1]
+                if isinstance(node, LiteralNode):
+                    continue
+                under = []
+                stack.append((out, node.name, node.value, under))
+                stack.extend((under, child) for child in reversed(node.children))
+                continue
+            _, match, at = entry
+            deferred = getattr(match, "_deferred", None)
+            if deferred is None:
+                # Built already, or from another backend.
+                stack.extend((out, node) for node in reversed(match.nodes))
+                continue
+            head, inner = deferred
+            if isinstance(head, str | Rule):
+                if isinstance(head, Rule):
+                    inner = head._derivation(*inner, match.start)
+                    head = head.name
+                under = []
+                stack.append((out, head, source[at : match.start], under))
+                stack.append((under, inner, at))
+            else:
+                stack.append((out, inner, head.start))
+                stack.append((out, head, at))
+        return values
+
     def _value(self) -> str:
         return "".join(node.value for node in self.nodes)
 
@@ -84,6 +222,17 @@ class Match:
         return self.start == __o.start and self._value() == __o._value()
 
 
+def _action(name: str, actions: dict[str, typing.Any]) -> typing.Any:
+    """The action for rule `name`, looked up as `NodeVisitor.visit` looks up
+    a visit method; `None` if it has none."""
+    return actions.get(name.replace("-", "_").casefold())
+
+
+#: `Match` as defined here.  `abnf.parser` rebinds this module's `Match` to
+#: the Rust backend's class, which cannot defer building its nodes; the
+#: pure-Python combinators, whose matches can, use this name instead.
+_Match = Match
+
 MatchSet = set[Match]
 Matches = typing.Iterator[Match]
 
@@ -135,9 +284,13 @@ class _CachedParseError:
 # for backward compatibility with any external code that stored sets.
 ParseCacheValue = list[Match] | MatchSet | _CachedParseError
 
-# Per-parse memo.  `Rule.parse` binds `(source, {})` for the duration of one
-# parse and `Repetition` memoises into that dict, so nothing survives the call
-# that created it.  `ContextVar.set` returns a token and `reset(token)` restores
+# Per-parse memo.  `Rule.parse` binds `(source, {}, shared, possessives)` for
+# the duration of one parse and `Repetition` memoises into that dict, so
+# nothing survives the call that created it.  `shared` is true for a
+# `_Session`'s memo, which outlives one parse: there everything is memoised,
+# not only what the analysis finds one parse could read back.  `possessives`
+# are the repetitions that, parsing from this rule, need only their longest
+# match (`_analysis.possessives`).  `ContextVar.set` returns a token and `reset(token)` restores
 # the previous binding, which gives nesting for free: `Rule.lparse`'s `exclude`
 # check runs `parse_all` on a *different* source mid-parse, and that inner parse
 # simply binds its own memo and gives this one back on the way out.
@@ -146,12 +299,140 @@ ParseCacheValue = list[Match] | MatchSet | _CachedParseError
 # 29.9ns vs 34.6ns), and it isolates asyncio tasks as well as threads.  Only
 # `Rule.parse` ever writes it -- never a generator, whose `set` would leak into
 # the caller's context between yields.
-_ParseMemo = tuple[Source, dict[tuple[int, int], ParseCacheValue]]
+_ParseMemo = tuple[
+    Source, dict[tuple[int, int], ParseCacheValue], bool, typing.Container[Parser]
+]
 _parse_memo: contextvars.ContextVar[_ParseMemo | None] = contextvars.ContextVar(
     "abnf_parse_memo", default=None
 )
 
 
+class _Failures:
+    """Where one parse got farthest, and what it was looking for there.
+
+    Recorded by the terminals as they fail -- and where the analysis lets a
+    combinator skip trying one -- so that a failed parse can say where the
+    input went wrong, which `ParseError.start` (where the failing rule
+    began) does not.  Recording is a comparison per failure; nothing is
+    described until a `ParseError` is asked.
+    """
+
+    __slots__ = ("exact", "expected", "farthest", "pending", "skipped")
+
+    def __init__(self, farthest: int = -1, expected: typing.Iterable[object] = ()):
+        self.farthest = farthest
+        #: Parsers -- or, from the Rust engine, their descriptions -- that
+        #: failed at `farthest`, first failure first, each once: a dict for
+        #: the membership test, used as an ordered set.
+        self.expected: dict[object, None] = dict.fromkeys(expected)
+        #: Whether a rule was matched through its DFA (see `Rule.lparse`)
+        #: where parsing it could have recorded a failure: the DFA tries no
+        #: terminals, so it records none.
+        self.skipped = False
+        #: Whether rules must be parsed rather than matched through their
+        #: DFA: set when a parse that skipped is run again to find out
+        #: where it failed.
+        self.exact = False
+        #: A parse that skipped and failed, `(rule, source, start)`, to be
+        #: run again exactly when where it failed is first asked.  Most
+        #: failures are only caught, so most are never run again.
+        self.pending: tuple[Rule, Source, int] | None = None
+
+    def _restart(self) -> None:
+        """Forget what was recorded, and record everything from now on."""
+        self.farthest = -1
+        self.expected = {}
+        self.skipped = False
+        self.exact = True
+
+    def _resolve(self) -> None:
+        """Run the `pending` parse again, recording everything."""
+        pending = self.pending
+        if pending is None:
+            return
+        self.pending = None
+        rule, source, start = pending
+        self._restart()
+        with contextlib.suppress(ParseError):
+            rule._parse_tracked(source, start, self, whole=True)
+
+
+#: At most this many expectations are kept for one offset.  The first ones
+#: are the ones worth reading.
+_EXPECTED_LIMIT = 64
+
+_parse_failures: contextvars.ContextVar[_Failures | None] = contextvars.ContextVar(
+    "abnf_parse_failures", default=None
+)
+
+
+def _expect(parser: object, offset: int) -> None:
+    """Record that `parser` did not match at `offset` in the current parse."""
+    failures = _parse_failures.get()
+    if failures is None or offset < failures.farthest:
+        return
+    if offset > failures.farthest:
+        failures.farthest = offset
+        failures.expected = {parser: None}
+    elif len(failures.expected) < _EXPECTED_LIMIT:
+        failures.expected[parser] = None
+
+
+def _expect_first(parser: Parser, offset: int) -> None:
+    """Record, as `_expect` does, the terminals `parser` can begin with (see
+    `_analysis.first_terminals`): what trying it at `offset` would have
+    recorded, where the analysis showed it cannot match there."""
+    failures = _parse_failures.get()
+    if failures is None or offset < failures.farthest:
+        return
+    from abnf import _analysis
+
+    for terminal in _analysis.first_terminals(parser):
+        _expect(terminal, offset)
+
+
+def _record_backend_failure(found: tuple[int, list[str]] | None) -> None:
+    """Fold the Rust engine's farthest failure -- an offset and descriptions
+    of what failed there, as `Rule._farthest_failure_hook` returns it -- into
+    the current parse's."""
+    if found is not None:
+        offset, expected = found
+        for description in expected:
+            _expect(description, offset)
+
+
+#: Bumped on every write to a rule's `definition` or `exclude`.  Static
+#: analyses of the grammar (`abnf._analysis`) cache per rule, and a rule
+#: reference is late-bound, so any write can change any rule's answer; they
+#: compare against this to know when to start over.
+_grammar_generation = 0
+
+#: `_analysis_generation` of a combinator whose grammar is frozen: later than
+#: any generation, so no write can make its analysis stale.  See
+#: `Rule.freeze`.
+_FROZEN_GENERATION = float("inf")
+
+#: Held while rules deferred by a grammar module are built (see
+#: `Rule._defer_rules`), so a thread reading a definition another is
+#: building waits for it.  Reentrant: building one grammar's rules can
+#: build rules imported from another.  Also guards `_interned_parsers`.
+_deferred_lock = threading.RLock()
+
+#: The name of the rule in a rule's ABNF text: the first line starting
+#: with a letter, since comment lines and continuation lines cannot.
+_DEFERRED_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9-]*", re.MULTILINE)
+
+#: The tokens of a rule's ABNF text, where those matching the group are rule
+#: names: quoted strings, prose, comments and numeric values are matched
+#: whole so that nothing in them is taken for one.  Prose that is a rule
+#: name refers to that rule (see `ABNFGrammarNodeVisitor.visit_prose_val`),
+#: so only its opening bracket is matched, leaving the name to the group.
+_DEFERRED_TOKENS = re.compile(
+    r'"[^"]*"|<(?=[A-Za-z][A-Za-z0-9-]*>)|<[^>]*>|;[^\r\n]*'
+    r"|%[A-Za-z][0-9A-Fa-f.-]*|([A-Za-z][A-Za-z0-9-]*)"
+)
+
+
 _CACHE_DEPRECATION = (
     "The parse cache is now scoped to a single parse and discarded when that "
     "parse returns, so {what} no longer has any effect and can be removed. "
@@ -280,8 +561,94 @@ class Alternation:
     def __init__(self, *parsers: Parser, first_match: bool = False):
         self.parsers = list(parsers)
         self.first_match = first_match
+        #: Opt-in: count how often each alternative matches, and try the
+        #: likeliest first.  See `_lparse_adaptive`.
+        self.adaptive = False
+        #: Try the alternatives in the order `hits` gives, without counting:
+        #: what `Rule.specialize` sets from a profile.
+        self.ordered = False
+        #: How many times each alternative has matched, in `parsers` order.
+        #: Counted only while `adaptive` is set; assignable, so counts saved
+        #: from one process can warm up another.
+        self.hits = [0] * len(self.parsers)
+        self._calls = 0
+        # For each alternative, the others that cannot match where it does;
+        # see `_analyse`.
+        self._exclusive: list[frozenset[int]] = []
+        # Whether at most one alternative can match at any offset, and that
+        # one only one way; see `_lparse_one`.
+        self._deterministic = False
+        # Whether at most one alternative can match at any offset, so that
+        # longest match can stop at the first that does; see `lparse`.
+        self._prefix_free = False
+        self._analysis_generation = -1
+
+    @property
+    def hits(self) -> list[int]:
+        return self._hits
+
+    @hits.setter
+    def hits(self, value: typing.Iterable[int]) -> None:
+        hits = list(value)
+        if len(hits) != len(self.parsers):
+            msg = f"expected {len(self.parsers)} counts, one per alternative; got {len(hits)}."
+            raise ValueError(msg)
+        self._hits = hits
+        self._reorder()
+
+    @property
+    def prefix_free(self) -> bool:
+        """Whether at most one alternative can match at any offset.  If so,
+        longest match stops at the first alternative that matches, as first
+        match would, with the same result.  See `_analysis.prefix_free`."""
+        if self._analysis_generation < _grammar_generation or len(
+            self._exclusive
+        ) != len(self.parsers):
+            self._analyse()
+        return self._prefix_free
+
+    def _reorder(self) -> None:
+        # Stable: alternatives matched equally often keep declaration order.
+        self._order = sorted(
+            range(len(self._hits)), key=self._hits.__getitem__, reverse=True
+        )
+
+    def _analyse(self) -> None:
+        """Work out which alternatives exclude which.
+
+        Two alternatives that cannot match the empty string, and whose
+        matches cannot start with the same character, never both match at
+        one offset.  Once one has matched, the other need not be tried.
+        """
+        from abnf import _analysis
+
+        firsts = [_analysis.first(parser) for parser in self.parsers]
+        self._exclusive = [
+            frozenset(
+                other
+                for other, theirs in enumerate(firsts)
+                if other != index
+                and not (ours.nullable or theirs.nullable)
+                and ours.chars.isdisjoint(theirs.chars)
+            )
+            for index, ours in enumerate(firsts)
+        ]
+        self._deterministic = _analysis.deterministic(self)
+        self._prefix_free = _analysis.prefix_free(self)
+        self._analysis_generation = _grammar_generation
 
     def lparse(self, source: Source, start: int) -> Matches:
+        if self.adaptive or self.ordered:
+            yield from self._lparse_adaptive(source, start)
+            return
+        # `parsers` is a public list; the analysis follows it.
+        if self._analysis_generation < _grammar_generation or len(
+            self._exclusive
+        ) != len(self.parsers):
+            self._analyse()
+        if self._deterministic:
+            yield self._match_alternative(source, start)
+            return
         # Collect matches from every alternative, then yield them
         # longest-first.  Doing the sort here (rather than once per
         # `Rule.parse` call as `set + next_longest`) lets downstream
@@ -303,6 +670,10 @@ class Alternation:
                 if match_found:
                     yield from accumulated
                 return
+            if match_found and self._prefix_free:
+                # The alternatives after this one cannot match here, so
+                # longest match gets nothing more from trying them.
+                break
         if not match_found:
             raise ParseError(self, start)
         # Skip the sort on the common deterministic single-match
@@ -313,10 +684,103 @@ class Alternation:
             accumulated.sort(key=lambda m: m.start, reverse=True)
         yield from accumulated
 
+    def _lparse_one(self, source: Source, start: int) -> Match:
+        """The one match of a deterministic alternation (see
+        `_analysis.deterministic`): the first alternative to match is the
+        only one that can, so the rest are not tried."""
+        if self.adaptive or self.ordered:
+            return next(self._lparse_adaptive(source, start))
+        if self._analysis_generation < _grammar_generation or len(
+            self._exclusive
+        ) != len(self.parsers):
+            self._analyse()
+        return self._match_alternative(source, start)
+
+    def _match_alternative(self, source: Source, start: int) -> Match:
+        for parser in self.parsers:
+            try:
+                return parser._lparse_one(source, start)  # type: ignore[attr-defined]
+            except ParseError:  # noqa: PERF203
+                continue
+        raise ParseError(self, start)
+
+    def _lparse_adaptive(self, source: Source, start: int) -> Matches:
+        """`lparse`, trying the alternatives that match most often first.
+
+        The order alternatives are tried in is not allowed to show: the
+        result is assembled in declaration order exactly as `lparse` does.
+        What the order buys is skipping, so only an alternation that can
+        stop early is reordered.  Under first match no alternative declared
+        after one that matched can win, and in a prefix-free alternation
+        (see `prefix_free`) none other can match at all -- so trying the
+        usual winner first usually means trying nothing else.  Any other
+        alternation is tried in declaration order, and only counted.
+        """
+        parsers = self.parsers
+        if self._analysis_generation < _grammar_generation or len(
+            self._exclusive
+        ) != len(parsers):
+            if len(self._hits) != len(parsers):
+                # `parsers` is a public list; the counts follow it.
+                self.hits = [0] * len(parsers)
+            self._analyse()
+        counting = self.adaptive
+        if counting:
+            self._calls += 1
+            if self._calls % _REORDER_PERIOD == 0:
+                self._reorder()
+
+        if self._deterministic:
+            for index in self._order:
+                try:
+                    match = parsers[index]._lparse_one(source, start)  # type: ignore[attr-defined]
+                except ParseError:
+                    continue
+                if counting:
+                    self._hits[index] += 1
+                yield match
+                return
+            raise ParseError(self, start)
+
+        reorder = self.first_match or self._prefix_free
+        results: dict[int, list[Match]] = {}
+        skip: frozenset[int] = frozenset()
+        winner = len(parsers)
+        for index in self._order if reorder else range(len(parsers)):
+            if index in skip or (self.first_match and index > winner):
+                continue
+            try:
+                results[index] = list(parsers[index].lparse(source, start))
+            except ParseError:
+                continue
+            if counting:
+                self._hits[index] += 1
+            winner = min(winner, index)
+            if self._prefix_free and results[index]:
+                # No other alternative can match here.
+                break
+            skip = skip | self._exclusive[index]
+
+        if self.first_match:
+            if winner == len(parsers):
+                raise ParseError(self, start)
+            yield from results[winner]
+            return
+        accumulated = [match for index in sorted(results) for match in results[index]]
+        if not accumulated:
+            raise ParseError(self, start)
+        if len(accumulated) > 1:
+            accumulated.sort(key=lambda m: m.start, reverse=True)
+        yield from accumulated
+
     def __str__(self):
         return self.str_template % ", ".join(map(str, self.parsers))
 
 
+#: How many parses an adaptive `Alternation` makes between reorderings.
+_REORDER_PERIOD = 256
+
+
 class Concatenation:
     """Implements the ABNF concatention operation. Concatention(parser1, parser2, ...)
     returns a parser that invokes parser1, parser2, ... in turn and returns a list of Nodes
@@ -327,21 +791,60 @@ class Concatenation:
 
     def __init__(self, *parsers: Parser):
         self.parsers = parsers
+        # What the grammar says about any match -- the fewest characters it
+        # can consume, and a test of whether one can begin at an offset --
+        # and the `_grammar_generation` it was worked out for: rule
+        # references are late-bound, so redefining any rule can change it.
+        self._min_length = 0
+        self._can_start: typing.Callable[[Source, int], typing.Any] | None = None
+        self._deterministic = False
+        self._analysis_generation = -1
+
+    def _analyse(self) -> None:
+        from abnf import _analysis
+
+        bounds = _analysis.bounds(self)
+        self._min_length = 0 if bounds is None else bounds.min
+        # A nullable concatenation can match anywhere.  FIRST looks past the
+        # nullable parts at the front to the first part that is not.
+        self._can_start = (
+            None if _analysis.nullable(self) else _analysis.start_test(self)
+        )
+        self._deterministic = _analysis.deterministic(self)
+        self._analysis_generation = _grammar_generation
 
     def lparse(self, source: Source, start: int):
+        if self._analysis_generation < _grammar_generation:
+            self._analyse()
+        # Too little input left for every part to match, or a character no
+        # match can start with: fail now rather than after parsing however
+        # many parts do fit.  Same error the loop below would raise.
+        if start + self._min_length > len(source) or (
+            self._can_start is not None and not self._can_start(source, start)
+        ):
+            _expect_first(self, start)
+            raise ParseError(self, start)
+        if self._deterministic:
+            yield self._match_parts(source, start)
+            return
         match_list: list[Match] = [Match([], start)]
         for parser in self.parsers:
             current_match_list: list[Match] = []
+            # One candidate per end offset.  Candidates ending at the same
+            # offset extend identically from there on, so only the first --
+            # the one a longest-first consumer keeps anyway -- can ever be
+            # chosen; keeping the rest multiplied the list by every ambiguity
+            # along the way.
+            ends: set[int] = set()
             for match in match_list:
-                try:  # noqa: SIM105
-                    current_match_list.extend(
-                        [
-                            Match(match.nodes + m.nodes, m.start)
-                            for m in parser.lparse(source, match.start)
-                        ]
-                    )
-                except ParseError:  # noqa: PERF203
-                    pass
+                try:
+                    extensions = list(parser.lparse(source, match.start))
+                except ParseError:
+                    continue
+                for m in extensions:
+                    if m.start not in ends:
+                        ends.add(m.start)
+                        current_match_list.append(_Match._concat(match, m))
             if current_match_list:
                 match_list = current_match_list
             else:
@@ -351,6 +854,32 @@ class Concatenation:
         else:
             yield from match_list
 
+    def _lparse_one(self, source: Source, start: int) -> Match:
+        """The one match of a deterministic concatenation (see
+        `_analysis.deterministic`): each part has at most one, so there are
+        no candidate lists to keep, and each part is asked for its match
+        directly rather than through a generator."""
+        if self._analysis_generation < _grammar_generation:
+            self._analyse()
+        if start + self._min_length > len(source) or (
+            self._can_start is not None and not self._can_start(source, start)
+        ):
+            _expect_first(self, start)
+            raise ParseError(self, start)
+        return self._match_parts(source, start)
+
+    def _match_parts(self, source: Source, start: int) -> Match:
+        match = Match([], start)
+        try:
+            for parser in self.parsers:
+                match = _Match._concat(
+                    match,
+                    parser._lparse_one(source, match.start),  # type: ignore[attr-defined]
+                )
+        except ParseError:
+            raise ParseError(self, start) from None
+        return match
+
     def __str__(self):
         return self.str_template % ", ".join(map(str, self.parsers))
 
@@ -382,7 +911,7 @@ class Repeat:
 class Repetition:
     """Implements the ABNF Repetition operation."""
 
-    def __init__(self, repeat: Repeat, element: Parser):
+    def __init__(self, repeat: Repeat, element: Parser, memoise: bool | None = None):
         self.repeat = repeat
         self.element = element
         # The `min` prefix parser depends only on `element` and `repeat.min`,
@@ -395,8 +924,64 @@ class Repetition:
         self._min_parser = (
             Concatenation(*([element] * repeat.min)) if repeat.min else None
         )
+        # Whether the element can make progress at an offset, and the
+        # `_grammar_generation` that was worked out for; see `lparse`.
+        self._can_progress: typing.Callable[[Source, int], typing.Any] | None = None
+        # For a bounded repetition of an element that matches one character
+        # at a time, a test for the run of such characters, and the names of
+        # the rules the element wraps each in; see `_lparse_run`.
+        self._run: typing.Callable[[Source, int], typing.Any] | None = None
+        self._run_names: typing.Callable[[str], tuple[str, ...]] | None = None
+        # Whether results go into the parse's memo; see `memoise`.
+        self._memoise = True if memoise is None else memoise
+        self._memoise_override = memoise
+        # Whether the repetition has a fixed count of a deterministic
+        # element; see `_lparse_one`.
+        self._deterministic = False
+        self._analysis_generation = -1
+
+    @property
+    def memoise(self) -> bool | None:
+        """Whether this repetition's results are memoised for the rest of a
+        parse: `None`, the default, leaves it to the analysis, which
+        memoises only repetitions that can be entered twice at one offset.
+        `True` or `False`, given when the repetition is built, overrides it.
+
+        Fixed once built: grammar text builds one repetition for every rule
+        with the same one (see `_interned`).  To set it for one rule, set
+        :attr:`Rule.memoise`, which gives the rule repetitions of its own.
+        """
+        return self._memoise_override
+
+    def _analyse(self) -> None:
+        from abnf import _analysis
+
+        self._can_progress = _analysis.start_test(self.element)
+        self._memoise = (
+            _analysis.reentrant(self)
+            if self._memoise_override is None
+            else self._memoise_override
+        )
+        single = (
+            None if self.repeat.max is None else _analysis.single_char(self.element)
+        )
+        self._run = (
+            None
+            if single is None
+            else _analysis.run_match(
+                single.chars, self.repeat.min, typing.cast("int", self.repeat.max)
+            )
+        )
+        self._run_names = None if single is None else single.names
+        self._deterministic = _analysis.deterministic(self)
+        self._analysis_generation = _grammar_generation
 
     def lparse(self, source: Source, start: int) -> Matches:
+        if self._analysis_generation < _grammar_generation:
+            self._analyse()
+        if self._deterministic:
+            yield self._match_count(source, start)
+            return
         # Memoise into the current parse's context rather than into
         # per-instance state.  Because the memo dies with the parse, the
         # grammar cannot change underneath it, so there is nothing to
@@ -407,26 +992,48 @@ class Repetition:
         # `ctx[0] is source` enforces the invariant the key relies on: one
         # memo, one source, so `start` alone identifies a position.  A direct
         # `lparse` call outside any parse, or one that somehow reaches a
-        # different source under an active memo, falls back to a memo scoped
-        # to this call -- correct either way, since the memo is only ever an
+        # different source under an active memo, falls back to no memo at
+        # all -- correct either way, since the memo is only ever an
         # optimisation.
+        #
+        # Nor is a repetition the analysis found cannot be entered twice at
+        # one offset memoised (see `_analysis.reentrant`): nothing would read
+        # the result back.  Except in a session, which enters its rule at
+        # many offsets.
+        #
+        # Whether only the longest match can be part of one that succeeds
+        # depends on where the parse started; see `_analysis.possessives`.
         ctx = _parse_memo.get()
-        memo = ctx[1] if ctx is not None and ctx[0] is source else {}
+        memo = (
+            ctx[1]
+            if ctx is not None and ctx[0] is source and (self._memoise or ctx[2])
+            else None
+        )
+        possessive = ctx is not None and ctx[0] is source and self in ctx[3]
 
         cache_key = (id(self), start)
-        cached_matchset = memo.get(cache_key)
-        if cached_matchset is not None:
-            if isinstance(cached_matchset, _CachedParseError):
-                raise ParseError(
-                    cached_matchset.parser,
-                    cached_matchset.start,
-                    *cached_matchset.args,
-                )
-            # Already longest-first: the list is sorted once, before it
-            # goes into the memo, rather than on every hit.  A cold
-            # rfc5322 parse takes ~1,700 hits, each of which used to
-            # pay a list copy and a sort of a list that never changes.
-            yield from cached_matchset
+        if memo is not None:
+            cached_matchset = memo.get(cache_key)
+            if cached_matchset is not None:
+                if isinstance(cached_matchset, _CachedParseError):
+                    raise ParseError(
+                        cached_matchset.parser,
+                        cached_matchset.start,
+                        *cached_matchset.args,
+                    )
+                # Already longest-first: the list is sorted once, before it
+                # goes into the memo, rather than on every hit.  A cold
+                # rfc5322 parse takes ~1,700 hits, each of which used to
+                # pay a list copy and a sort of a list that never changes.
+                yield from cached_matchset
+                return
+        if self._run is not None:
+            run_matches = self._run_matches(source, start)
+            if possessive:
+                del run_matches[1:]
+            if memo is not None:
+                memo[cache_key] = run_matches
+            yield from run_matches
             return
 
         # De-duplicate by `Match.start` (i.e. by end position) rather
@@ -449,7 +1056,8 @@ class Repetition:
                 # If this raises a ParseError the minimum match was not reached.
                 match_list = list(min_parser.lparse(source, start))
             except ParseError as exc:
-                memo[cache_key] = _CachedParseError(exc.parser, exc.start, exc.args)
+                if memo is not None:
+                    memo[cache_key] = _CachedParseError(exc.parser, exc.start, exc.args)
                 raise
             seen_starts = set()
             deduped: list[Match] = []
@@ -463,6 +1071,19 @@ class Repetition:
         last_match_set = list(match_list)
         match_count = self.repeat.min
 
+        # Where no non-empty match of the element can begin, the element can
+        # at most match the empty string -- which ends where the repeat
+        # already does, so it would be discarded below.  The element's FIRST
+        # set says where that is, so skip the call there instead of making
+        # it to find out.  This is what ends `*( *WSP x )` without one more
+        # round of the element at every frontier.
+        can_progress = self._can_progress
+        # With a `min` of one, the element has been tried at `start` already,
+        # and if it matched empty there, trying it again finds nothing new.
+        # Not trying it means the element is entered at most once per offset,
+        # which is what `_analysis.reentrant` counts on.
+        tried = start if self.repeat.min == 1 else None
+
         while True:
             if self.repeat.max is not None and match_count == self.repeat.max:
                 break
@@ -470,20 +1091,31 @@ class Repetition:
             new_match_set: list[Match] = []
             new_seen_starts: set[int] = set()
             for match in last_match_set:
+                if match.start == tried:
+                    continue
+                if can_progress is not None and not can_progress(source, match.start):
+                    _expect_first(self.element, match.start)
+                    continue
                 try:
                     g = self.element.lparse(source, match.start)
                     for m in g:
                         if m.start in seen_starts or m.start in new_seen_starts:
                             continue
                         new_seen_starts.add(m.start)
-                        new_match_set.append(Match(match.nodes + m.nodes, m.start))
+                        new_match_set.append(_Match._concat(match, m))
                 except ParseError:
                     pass
 
             if new_match_set:
                 match_count = match_count + 1
                 seen_starts.update(new_seen_starts)
-                match_list.extend(new_match_set)
+                if possessive:
+                    # Giving back a round cannot help what follows (see
+                    # `_analysis.possessives`), so the shorter counts are
+                    # neither kept nor memoised.
+                    match_list = new_match_set
+                else:
+                    match_list.extend(new_match_set)
                 last_match_set = new_match_set
             else:
                 break
@@ -494,9 +1126,66 @@ class Repetition:
         # unchanged -- it just happens once instead of per hit.
         if len(match_list) > 1:
             match_list.sort(key=lambda match: match.start, reverse=True)
-        memo[cache_key] = match_list
+        if memo is not None:
+            memo[cache_key] = match_list
         yield from match_list
 
+    def _lparse_one(self, source: Source, start: int) -> Match:
+        """The one match of a fixed count of a deterministic element (see
+        `_analysis.deterministic`) -- ``4DIGIT`` -- which is the match of
+        the `min` prefix parser.  Not memoised: there is no choice of count
+        to remember, and parsing it again costs what the parts cost."""
+        if self._analysis_generation < _grammar_generation:
+            self._analyse()
+        return self._match_count(source, start)
+
+    def _match_count(self, source: Source, start: int) -> Match:
+        if self._run is not None:
+            return self._run_matches(source, start)[0]
+        if self._min_parser is None:
+            return Match([], start)
+        return self._min_parser._lparse_one(source, start)  # type: ignore[attr-defined]
+
+    def _run_matches(self, source: Source, start: int) -> list[Match]:
+        """The matches, longest first, of a bounded repetition of an element
+        that matches one character at a time -- ``4DIGIT``, ``1*4HEXDIG``.
+
+        One regular-expression match measures the run, and the tree for each
+        character is the literal node inside the rules the analysis names for
+        it, so the element is never called.  Each count ends somewhere
+        different, leaving nothing to de-duplicate.  Too short a run is not
+        memoised: measuring it again is as cheap as looking it up.  A match
+        is, since alternatives sharing a prefix (``h16`` in ``IPv6address``)
+        ask for the same run over and over.
+        """
+        run = typing.cast("typing.Callable[[Source, int], typing.Any]", self._run)(
+            source, start
+        )
+        if run is None:
+            if _parse_failures.get() is not None:
+                # Let the element record where the run stopped.
+                for offset in range(start, start + self.repeat.min):
+                    try:
+                        next(iter(self.element.lparse(source, offset)))
+                    except ParseError:  # noqa: PERF203
+                        break
+            # The error the `min` prefix parser would have raised.
+            raise ParseError(typing.cast("Parser", self._min_parser), start)
+        if self.repeat.max is None or run.end() - start < self.repeat.max:
+            _expect_first(self.element, run.end())
+        names = typing.cast("typing.Callable[[str], tuple[str, ...]]", self._run_names)
+        match = Match([], start)
+        matches = [match]
+        for offset in range(start, run.end()):
+            char = source[offset]
+            leaf = Match([typing.cast(Node, LiteralNode(char, offset, 1))], offset + 1)
+            for name in reversed(names(char)):
+                leaf = _Match._named(name, leaf)
+            match = _Match._concat(match, leaf)
+            matches.append(match)
+        matches.reverse()
+        return matches[: len(matches) - self.repeat.min]
+
     def __str__(self):
         return f"Repetition({self.repeat}, {self.element})"
 
@@ -506,9 +1195,37 @@ class Option:
 
     str_template = "Option(%s)"
 
-    def __init__(self, alternation: Parser):
+    def __init__(self, alternation: Parser, memoise: bool | None = None):
         self.alternation = alternation
-        self.parser = Repetition(Repeat(0, 1), alternation)
+        # Whether a non-empty match can begin at an offset, whether results
+        # are worth memoising, and the `_grammar_generation` those were
+        # worked out for; see `lparse`.
+        self._can_start: typing.Callable[[Source, int], typing.Any] | None = None
+        self._memoise = True if memoise is None else memoise
+        self._memoise_override = memoise
+        self._analysis_generation = -1
+
+    @property
+    def memoise(self) -> bool | None:
+        """Whether this option's results are memoised for the rest of a
+        parse: `None`, the default, leaves it to the analysis, which
+        memoises only options of something slower to parse than to look up
+        that can be entered twice at one offset.  `True` or `False`, given
+        when the option is built, overrides it; fixed once built, as
+        `Repetition.memoise` is.
+        """
+        return self._memoise_override
+
+    def _analyse(self) -> None:
+        from abnf import _analysis
+
+        self._can_start = _analysis.start_test(self.alternation)
+        self._memoise = (
+            _analysis.worth_memoising(self.alternation) and _analysis.reentrant(self)
+            if self._memoise_override is None
+            else self._memoise_override
+        )
+        self._analysis_generation = _grammar_generation
 
     def lparse(self, source: Source, start: int) -> Matches:
         """
@@ -518,8 +1235,48 @@ class Option:
         :returns: parse tree, new offset at which to continue parsing
         :rtype: Node, int
         :raises ParseError:
+
+        The element's matches, longest first, then the empty match -- what
+        ``Repetition(Repeat(0, 1), alternation)`` yields, without its
+        machinery.  Where no non-empty match can begin, the empty match is
+        all there is, and the element is not tried.
         """
-        return self.parser.lparse(source, start)
+
+        if self._analysis_generation < _grammar_generation:
+            self._analyse()
+        if self._can_start is not None and not self._can_start(source, start):
+            _expect_first(self.alternation, start)
+            yield Match([], start)
+            return
+        # The per-parse memo `Repetition.lparse` uses, on the same terms.
+        ctx = _parse_memo.get()
+        if ctx is None or ctx[0] is not source or not (self._memoise or ctx[2]):
+            yield from self._matches(source, start)
+            return
+        memo = ctx[1]
+        cache_key = (id(self), start)
+        matches = memo.get(cache_key)
+        if matches is None:
+            matches = self._matches(source, start)
+            memo[cache_key] = matches
+        yield from typing.cast("list[Match]", matches)
+
+    def _matches(self, source: Source, start: int) -> list[Match]:
+        # An empty match of the element ends where the option's own does, so
+        # it adds nothing; nor does a second match ending where another did.
+        seen = {start}
+        matches: list[Match] = []
+        try:
+            for match in self.alternation.lparse(source, start):
+                if match.start not in seen:
+                    seen.add(match.start)
+                    matches.append(match)
+        except ParseError:
+            pass
+        if len(matches) > 1:
+            matches.sort(key=lambda match: match.start, reverse=True)
+        matches.append(Match([], start))
+        return matches
 
     def __str__(self):
         return self.str_template % str(self.alternation)
@@ -556,38 +1313,48 @@ class Literal:
             value if isinstance(value, tuple) or case_sensitive else _ascii_fold(value)
         )
 
-        self.lparse = (
-            self._lparse_range if isinstance(value, tuple) else self._lparse_value
-        )
+        if isinstance(value, tuple):
+            self.lparse = self._lparse_range
+            self._lparse_one = self._match_range
+        else:
+            self.lparse = self._lparse_value
+            self._lparse_one = self._match_value
 
     def _lparse_range(self, source: str, start: int) -> Matches:
         """Parse source when self.value represents a range."""
+        yield self._match_range(source, start)
+
+    def _lparse_value(self, source: str, start: int) -> Matches:
+        """Parse source when self.value represents a literal."""
+        yield self._match_value(source, start)
+
+    def _match_range(self, source: str, start: int) -> Match:
         # ranges are always case-sensitive
-        try:
+        if start < len(source):
             src = source[start]
             if self.value[0] <= src <= self.value[1]:
-                yield Match([typing.cast(Node, LiteralNode(src, start, 1))], start + 1)
-            else:
-                raise ParseError(self, start)
-        except IndexError as e:
-            raise ParseError(self, start) from e
+                return Match([typing.cast(Node, LiteralNode(src, start, 1))], start + 1)
+        # Most failures are behind the farthest one; do not call to find out.
+        failures = _parse_failures.get()
+        if failures is not None and start >= failures.farthest:
+            _expect(self, start)
+        raise ParseError(self, start)
 
-    def _lparse_value(self, source: str, start: int) -> Matches:
-        """Parse source when self.value represents a literal."""
+    def _match_value(self, source: str, start: int) -> Match:
         # we check position to ensure that the case pattern = '' and start >= len(source)
         # is handled correctly.
         if start < len(source):
             src = source[start : start + len(self.value)]
             match = src if self.case_sensitive else _ascii_fold(src)
             if match == self.pattern:
-                yield Match(
+                return Match(
                     [typing.cast(Node, LiteralNode(src, start, len(src)))],
                     start + len(src),
                 )
-            else:
-                raise ParseError(self, start)
-        else:
-            raise ParseError(self, start)
+        failures = _parse_failures.get()
+        if failures is not None and start >= failures.farthest:
+            _expect(self, start)
+        raise ParseError(self, start)
 
     def __str__(self):
         # str(self.value) handles the case value == tuple.
@@ -606,15 +1373,78 @@ class Literal:
 
 class Prose:
     def lparse(self, source: Source, start: int) -> Matches:
+        _expect(self, start)
+        raise ParseError(self, start)
+
+
+class Terminal:
+    """A terminal matched by code rather than by grammar: ``scan(source,
+    start)`` returns where its match from `start` ends, or ``None`` if there
+    is none.
+
+    Assigned as a rule's definition, it stands in for a rule whose grammar
+    is slow to parse -- an address, an encoding -- with a check written
+    directly.  It matches once, so it is the longest match the code finds
+    that is used, and its node is a single `LiteralNode`.
+    """
+
+    def __init__(
+        self,
+        scan: typing.Callable[[str, int], int | None],
+        name: str | None = None,
+    ):
+        if not callable(scan):
+            msg = "scan argument must be callable."
+            raise TypeError(msg)
+        self.scan = scan
+        self.name = getattr(scan, "__name__", "scan") if name is None else name
+
+    @classmethod
+    def bundled(cls, name: str) -> Terminal:
+        """The bundled terminal for the rule `name`: one of
+        ``IPv4address``, ``IPv6address`` (RFC 3986), ``base64`` (RFC 9051)
+        and ``UTF8-octets`` (RFC 3629).  Names are case-insensitive."""
+
+        from abnf import _terminals
+
+        folded = name.casefold()
+        for bundled_name, scan in _terminals.BUNDLED.items():
+            if bundled_name.casefold() == folded:
+                return cls(scan, bundled_name)
+        names = ", ".join(_terminals.BUNDLED)
+        msg = f"no bundled terminal {name!r}; there are {names}."
+        raise ValueError(msg)
+
+    def lparse(self, source: Source, start: int) -> Matches:
+        yield self._lparse_one(source, start)
+
+    def _lparse_one(self, source: Source, start: int) -> Match:
+        end = self.scan(source, start)
+        if end is not None:
+            if not start <= end <= len(source):
+                msg = f"{self} matched from {start} to {end}, outside the source."
+                raise ValueError(msg)
+            return Match(
+                [typing.cast(Node, LiteralNode(source[start:end], start, end - start))],
+                end,
+            )
+        failures = _parse_failures.get()
+        if failures is not None and start >= failures.farthest:
+            _expect(self, start)
         raise ParseError(self, start)
 
+    def __str__(self):
+        return f"Terminal({self.name!r})"
+
 
 T = typing.TypeVar("T", bound="Rule")
 
 
-class _FirstMatchAlternation:
-    """Backs :attr:`Rule.first_match_alternation` for both class-level and
-    per-rule access.
+class _AlternationSetting:
+    """Backs a per-alternation setting on :class:`Rule` --
+    :attr:`Rule.first_match_alternation` and
+    :attr:`Rule.adaptive_alternation` -- for both class-level and per-rule
+    access.
 
     Read on the class it reports the grammar-wide default; read on a rule it
     reports that rule's alternations.  Written on a rule it flips them.
@@ -622,13 +1452,54 @@ class _FirstMatchAlternation:
     ``Rule.__init_subclass__`` exists to undo.)
     """
 
+    def __init__(self, attribute: str):
+        #: The `Alternation` attribute this setting stands for.
+        self.attribute = attribute
+
     def __get__(self, instance: Rule | None, owner: type[Rule] | None = None) -> bool:
         if instance is None:
-            return owner._first_match_default if owner is not None else False
-        return instance._get_first_match_alternation()
+            return (
+                owner._alternation_defaults.get(self.attribute, False)
+                if owner is not None
+                else False
+            )
+        return instance._get_alternation_setting(self.attribute)
 
     def __set__(self, instance: Rule, value: bool) -> None:
-        instance._set_first_match_alternation(value)
+        instance._set_alternation_setting(self.attribute, value)
+
+
+class _Session:
+    """One memo shared by several parses of the same source.
+
+    `Rule.search` tries a rule at many offsets, and a sub-parse at one offset
+    is often exactly a sub-parse at another -- a repetition reached from two
+    starting points.  Each `parse` call here binds the same memo, so those
+    are computed once.  The binding is made and undone per call, never held:
+    `finditer` is a generator, and a binding held across its yields would
+    leak into the caller.
+    """
+
+    __slots__ = ("_backend", "_memo", "_rule", "_source")
+
+    def __init__(self, source: Source, rule: Rule):
+        from abnf import _analysis
+
+        self._source = source
+        self._rule = rule
+        self._memo: _ParseMemo = (source, {}, True, _analysis.possessives(rule))
+        hook = Rule._parse_session_hook
+        self._backend = hook(source) if hook is not None else None
+
+    def parse(self, start: int) -> tuple[Node, int]:
+        memo_token = _parse_memo.set(self._memo)
+        try:
+            if self._backend is None:
+                return self._rule._parse(self._source, start)
+            with self._backend:
+                return self._rule._parse(self._source, start)
+        finally:
+            _parse_memo.reset(memo_token)
 
 
 class Rule:
@@ -648,6 +1519,9 @@ class Rule:
 
         rule = cls.get(name)
         if rule is None:
+            if cls._grammar_frozen:
+                msg = f'Cannot add rule "{name}" to frozen grammar {cls.__name__}'
+                raise GrammarError(msg)
             rule = super().__new__(cls)
             obj_key = (cls, name.casefold())
             cls._obj_map[obj_key] = rule
@@ -679,13 +1553,27 @@ class Rule:
         writes through ``Rule._set_definition_hook`` (when set) so the
         Rust backend can keep its shadow registry of named-rule
         handles in sync with the Python-visible definition graph.
+
+        A rule whose grammar module deferred building it is built from
+        its text the first time this is read; see :meth:`warm_up`.
         """
 
-        return self._definition  # type: ignore[attr-defined,no-any-return]
+        try:
+            return self._definition  # type: ignore[attr-defined,no-any-return]
+        except AttributeError:
+            if not self._build_if_deferred():
+                raise
+            return self._definition  # type: ignore[attr-defined,no-any-return]
 
     @definition.setter
     def definition(self, value: Parser) -> None:
+        global _grammar_generation
+        self._check_not_frozen()
+        # A definition set in code replaces the text it was deferred with.
+        type(self)._deferred_rules.pop(self.name.casefold(), None)
         self._definition = value
+        _grammar_generation += 1
+        self._changed_generation = _grammar_generation
         hook = getattr(type(self), "_set_definition_hook", None)
         if hook is not None:
             hook(self, value)
@@ -717,7 +1605,11 @@ class Rule:
 
     @exclude.setter
     def exclude(self, value: Rule | None) -> None:
+        global _grammar_generation
+        self._check_not_frozen()
         self._exclude = value
+        _grammar_generation += 1
+        self._changed_generation = _grammar_generation
         hook = getattr(type(self), "_set_exclude_hook", None)
         if hook is not None:
             hook(self, value)
@@ -731,14 +1623,243 @@ class Rule:
         typing.Callable[[Rule, Rule | None], None] | None
     ] = None
 
-    #: Grammar-wide default for alternation semantics, applied to every
-    #: ``Alternation`` built for this class's rules -- including ones
-    #: nested inside a group or repetition, which is the whole point:
-    #: those are unreachable afterwards, since a rule exposes only its
-    #: top-level definition.  Written as ``first_match_alternation`` in
-    #: a subclass body; ``__init_subclass__`` moves it here so it does
+    #: The `_grammar_generation` of the last write to this rule's
+    #: definition, exclusion, :attr:`token` or :attr:`atomic`, for analyses
+    #: that depend on only some rules to tell whether they still hold.
+    _changed_generation = 0
+
+    #: Backs :attr:`token` and :attr:`atomic`; unset on almost every rule.
+    _token: bool = False
+    _atomic: bool = False
+    _memoise: bool | None = None
+
+    #: The definition this rule was last built with from ABNF text, the
+    #: grammar the text was read in, and the text of each line defining it;
+    #: what :attr:`memoise` builds the rule again from.
+    _source: tuple[Parser, type[Rule], tuple[str, ...]] | None = None
+
+    @property
+    def token(self) -> bool:
+        """Whether this rule is a lexical token: its node has one
+        ``LiteralNode`` child holding the whole match, and the nodes of
+        its definition are never built.  ``; @abnf: token`` in grammar
+        text sets it.
+        """
+
+        self._build_if_deferred()
+        return self._token
+
+    @token.setter
+    def token(self, value: bool) -> None:
+        self._set_pragma("token", value)
+
+    @property
+    def atomic(self) -> bool:
+        """Whether this rule commits to the match a parse would take -- the
+        longest, under longest-match alternation -- and never backtracks into
+        a shorter one.  ``; @abnf: atomic`` in grammar text sets it.
+
+        Like a possessive repetition this can change what the grammar
+        accepts: where what follows the rule would only match after a
+        shorter match of it, the enclosing rule now fails.
+        """
+
+        self._build_if_deferred()
+        return self._atomic
+
+    @atomic.setter
+    def atomic(self, value: bool) -> None:
+        self._set_pragma("atomic", value)
+
+    @property
+    def memoise(self) -> bool | None:
+        """Whether the repetitions and options of this rule's definition,
+        nested ones included, memoise their results for the rest of a
+        parse: ``None``, the default, leaves each to the analysis (see
+        :attr:`Repetition.memoise`); ``True`` or ``False`` overrides it.
+        ``; @abnf: nomemo`` in grammar text sets ``False``.
+
+        Grammar text shares a repetition or option among every rule built
+        with the same one, so setting this builds the definition again from
+        the rule's text, with repetitions and options of its own; the
+        settings of its alternations are kept.  A rule with no definition
+        yet takes the setting when its text defines it.
+
+        :raises GrammarError: if the rule has a definition not built from
+            ABNF text.  Build the repetitions and options of a definition
+            written in code with ``memoise=`` instead.
+        """
+
+        self._build_if_deferred()
+        return self._memoise
+
+    @memoise.setter
+    def memoise(self, value: bool | None) -> None:
+        self._check_not_frozen()
+        self._build_if_deferred()
+        if "_definition" not in vars(self):
+            self._memoise = value
+            return
+        source = self._source_text()
+        if source is None:
+            msg = (
+                f'Rule "{self.name}" was not built from ABNF text, so its '
+                "memoise setting cannot be changed; build its repetitions and "
+                "options with memoise= instead."
+            )
+            raise GrammarError(msg)
+        self._memoise = value
+        self._build_from_text(*source, like=self)
+
+    def _build_from_text(
+        self, grammar: type[Rule], texts: tuple[str, ...], like: Rule
+    ) -> None:
+        """Build this rule's definition from `texts`, the ABNF text of each
+        line defining it, with the rules of `grammar` and this rule's
+        `memoise` setting.  Its alternations take the settings of `like`'s,
+        which the same text built."""
+
+        definition, alternations = self._definition_from_text(grammar, texts, like)
+        self.definition = definition
+        self._alternations = tuple(alternations)
+        self._source = (definition, grammar, texts)
+
+    def _definition_from_text(
+        self,
+        grammar: type[Rule],
+        texts: tuple[str, ...],
+        like: Rule,
+        kinds: typing.Any = None,
+    ) -> tuple[Parser, list[Alternation]]:
+        """The definition `_build_from_text` builds, and its alternations,
+        without installing them; `kinds` as for `ABNFGrammarNodeVisitor`."""
+
+        visitor = ABNFGrammarNodeVisitor(rule_cls=grammar, kinds=kinds)
+        visitor._memoise = self._memoise
+        definition: Parser | None = None
+        for text in texts:
+            node = ABNFGrammarRule("rule").parse_all(text)
+            parser = visitor.visit(
+                next(child for child in node.children if child.name == "elements")
+            )
+            definition = (
+                parser
+                if definition is None
+                else visitor._new_alternation(definition, parser)
+            )
+        assert definition is not None
+        # The same text builds the same alternations, in the same order.
+        for mine, theirs in zip(
+            visitor._alternations, like._alternation_parsers(), strict=True
+        ):
+            mine.first_match = theirs.first_match
+            mine.adaptive = theirs.adaptive
+            mine.ordered = theirs.ordered
+            mine.hits = list(theirs.hits)
+        return definition, visitor._alternations
+
+    def _import(self, rule: Rule) -> None:
+        """Give this rule `rule`'s definition, and what it was built from."""
+
+        self.definition = rule.definition
+        self._memoise = rule._memoise
+        self._source = rule._source
+
+    def _source_text(self) -> tuple[type[Rule], tuple[str, ...]] | None:
+        """The grammar and the ABNF text of each line defining this rule, if
+        its definition is the one built from them."""
+
+        source = self._source
+        if source is None or source[0] is not getattr(self, "_definition", None):
+            return None
+        return source[1], source[2]
+
+    def _set_pragma(self, name: str, value: bool) -> None:
+        global _grammar_generation
+        self._check_not_frozen()
+        setattr(self, f"_{name}", bool(value))
+        _grammar_generation += 1
+        self._changed_generation = _grammar_generation
+        hook = getattr(type(self), "_set_pragma_hook", None)
+        if hook is not None:
+            hook(self, name, bool(value))
+
+    #: Optional hook invoked on every write to :attr:`token` or
+    #: :attr:`atomic` with the setting's name and value, so the Rust
+    #: engine applies them to nested rule references too.  Unset for the
+    #: pure-Python backend, which applies them in ``Rule.lparse``.
+    _set_pragma_hook: typing.ClassVar[
+        typing.Callable[[Rule, str, bool], None] | None
+    ] = None
+
+    #: Optional factory for a backend context manager that holds one
+    #: parse's memo open across several entries into the engine -- see
+    #: `_Session`.  Installed by the dispatch shim when the Rust backend
+    #: provides one; the pure-Python memo needs no help.
+    _parse_session_hook: typing.ClassVar[
+        typing.Callable[[Source], typing.ContextManager[typing.Any]] | None
+    ] = None
+
+    #: Optional hook invoked on each rule :meth:`freeze` reaches, so the
+    #: Rust engine can swap the rule's locked definition for an immutable
+    #: snapshot.  Unset for the pure-Python backend.
+    _freeze_hook: typing.ClassVar[typing.Callable[[Rule], None] | None] = None
+
+    #: Optional hook a failed parse calls to collect the farthest offset the
+    #: Rust engine failed at and descriptions of what failed there (or
+    #: `None`), which the engine then forgets.  Unset for the pure-Python
+    #: backend, which records into `_parse_failures` directly.
+    _farthest_failure_hook: typing.ClassVar[
+        typing.Callable[[], tuple[int, list[str]] | None] | None
+    ] = None
+
+    #: Optional hook :meth:`evaluate` parses through, returning the values
+    #: the actions it is given make of the longest match, and where the
+    #: match ends, so the Rust engine calls into Python only for rules
+    #: with actions.  Unset for the pure-Python backend, which walks its
+    #: own matches (see `Match._act`).
+    _evaluate_hook: typing.ClassVar[
+        typing.Callable[
+            [Rule, Source, int, dict[str, typing.Any]], tuple[list[typing.Any], int]
+        ]
+        | None
+    ] = None
+
+    #: ABNF text of the rules a grammar module has yet to build, by
+    #: casefolded name: the text of each line defining the rule, or the rule
+    #: of another grammar it is imported from.  See :meth:`_defer_rules`.
+    #: Reset for each subclass.
+    _deferred_rules: typing.ClassVar[dict[str, list[str] | Rule]] = {}
+
+    #: Copies of this grammar made by :meth:`profile` and :meth:`specialize`,
+    #: by what each was made for, with what it was copied from; see
+    #: `_variant`.  Reset for each subclass.
+    _variants: typing.ClassVar[
+        dict[typing.Hashable, tuple[typing.Any, type[Rule], list[Rule]]]
+    ] = {}
+
+    #: Whether this rule belongs to a frozen grammar; see :meth:`freeze`.
+    #: Set per rule, since a grammar freezes rules it reaches in other
+    #: grammars too.
+    _frozen: bool = False
+
+    #: This rule's DFA (see `abnf._dfa`) once it is frozen: ``True`` until
+    #: the rule is first parsed, then the DFA, or ``None`` if it has none.
+    _automaton: typing.Any = None
+
+    #: Whether :meth:`freeze` has been called on this class.  Reset for each
+    #: subclass: a subclass is a grammar of its own, with rules of its own.
+    _grammar_frozen: typing.ClassVar[bool] = False
+
+    #: Grammar-wide defaults for the per-alternation settings, keyed by
+    #: ``Alternation`` attribute and applied to every ``Alternation`` built
+    #: for this class's rules -- including ones nested inside a group or
+    #: repetition, which is the whole point: those are unreachable
+    #: afterwards, since a rule exposes only its top-level definition.
+    #: Written as ``first_match_alternation`` (or ``adaptive_alternation``)
+    #: in a subclass body; ``__init_subclass__`` moves it here so it does
     #: not shadow the property of the same name.
-    _first_match_default: typing.ClassVar[bool] = False
+    _alternation_defaults: typing.ClassVar[dict[str, bool]] = {}
 
     #: Alternations this rule's definition is built from, recorded at
     #: grammar-build time.  ``None`` for a rule built directly from a
@@ -747,16 +1868,24 @@ class Rule:
 
     def __init_subclass__(cls, **kwargs: typing.Any) -> None:
         super().__init_subclass__(**kwargs)
-        raw = cls.__dict__.get("first_match_alternation")
-        if isinstance(raw, bool):
-            cls._first_match_default = raw
-            # Restore the inherited property: a plain bool left in the
-            # class body would shadow it, so instances of this grammar
-            # could neither read nor set the flag per rule.  Deleting via
-            # the metaclass removes the class attribute; `del
-            # cls.first_match_alternation` would read as an attempt to
-            # delete the property itself, which has no deleter.
-            type.__delattr__(cls, "first_match_alternation")
+        cls._grammar_frozen = False
+        cls._deferred_rules = {}
+        cls._variants = {}
+        cls._alternation_defaults = dict(cls._alternation_defaults)
+        for name, attribute in (
+            ("first_match_alternation", "first_match"),
+            ("adaptive_alternation", "adaptive"),
+        ):
+            raw = cls.__dict__.get(name)
+            if isinstance(raw, bool):
+                cls._alternation_defaults[attribute] = raw
+                # Restore the inherited property: a plain bool left in the
+                # class body would shadow it, so instances of this grammar
+                # could neither read nor set the flag per rule.  Deleting
+                # via the metaclass removes the class attribute; `del
+                # cls.first_match_alternation` would read as an attempt to
+                # delete the property itself, which has no deleter.
+                type.__delattr__(cls, name)
 
     def _alternation_parsers(self) -> tuple[Alternation, ...]:
         """Every ``Alternation`` this rule's own definition is built
@@ -773,36 +1902,38 @@ class Rule:
         they are separate rules, with their own setting.
         """
 
+        self._build_if_deferred()
         recorded = getattr(self, "_alternations", None)
         if recorded is not None:
             return recorded
         definition = getattr(self, "_definition", None)
         return (definition,) if isinstance(definition, Alternation) else ()
 
-    def _get_first_match_alternation(self) -> bool:
-        """Whether alternation in this rule resolves to the first match.
+    def _get_alternation_setting(self, attribute: str) -> bool:
+        """Whether `attribute` is set on every alternation in this rule.
 
         ``False`` when the rule contains no alternation at all: there is
         nothing to resolve, so there is nothing to report.
         """
 
         alternations = self._alternation_parsers()
-        return bool(alternations) and all(a.first_match for a in alternations)
+        return bool(alternations) and all(getattr(a, attribute) for a in alternations)
 
-    def _set_first_match_alternation(self, value: bool) -> None:
+    def _set_alternation_setting(self, attribute: str, value: bool) -> None:
+        self._check_not_frozen()
         try:
             _ = self.definition
         except AttributeError as exc:
             msg = f'Undefined rule "{self.name}"'
             raise GrammarError(msg) from exc
         for alternation in self._alternation_parsers():
-            alternation.first_match = value
+            setattr(alternation, attribute, value)
         # A rule with no alternation is not an error -- the same flag set
         # grammar-wide covers plenty of such rules -- so setting it is
         # simply vacuous, and the getter says so.
 
     if typing.TYPE_CHECKING:
-        # Declared as a plain ``bool`` for type checkers.  At runtime it is
+        # Declared as plain ``bool`` for type checkers.  At runtime each is
         # the descriptor below, which serves both spellings of the same
         # setting -- ``MyGrammar.first_match_alternation = True`` in a class
         # body and ``rule.first_match_alternation = True`` on one rule.  A
@@ -810,8 +1941,257 @@ class Rule:
         # incompatible override, so the documented spelling would not
         # type-check for users.
         first_match_alternation: bool
+        adaptive_alternation: bool
     else:
-        first_match_alternation = _FirstMatchAlternation()
+        #: Whether alternation resolves to the first matching alternative
+        #: rather than the longest match.
+        first_match_alternation = _AlternationSetting("first_match")
+        #: Whether alternations count which alternative matches and try the
+        #: likeliest first.  Opt-in; results are unchanged either way.  See
+        #: :meth:`alternation_stats`.
+        adaptive_alternation = _AlternationSetting("adaptive")
+
+    @classmethod
+    def alternation_stats(cls) -> dict[str, list[list[int]]]:
+        """How often each alternative of each alternation in this grammar has
+        matched, as counted with :attr:`adaptive_alternation` set.
+
+        :returns: for each rule with alternations, a list with one list of
+            counts per alternation, in the order the rule's text builds them.
+            Plain data, so it can be saved as JSON and handed to
+            :meth:`load_alternation_stats` in another process.
+        """
+
+        return {
+            rule.name: [list(a.hits) for a in alternations]
+            for rule in cls.rules()
+            if (alternations := rule._alternation_parsers())
+        }
+
+    @classmethod
+    def prefix_free_alternations(cls) -> dict[str, list[bool]]:
+        """Which alternations in this grammar stop at the first alternative
+        that matches even under longest match, because the grammar says no
+        other can match there -- see :attr:`Alternation.prefix_free`.
+
+        :returns: for each rule with alternations, one flag per alternation,
+            in the order :meth:`alternation_stats` reports them.
+        """
+
+        return {
+            rule.name: [a.prefix_free for a in alternations]
+            for rule in cls.rules()
+            if (alternations := rule._alternation_parsers())
+        }
+
+    @classmethod
+    def load_alternation_stats(cls, stats: dict[str, list[list[int]]]) -> None:
+        """Restore counts saved by :meth:`alternation_stats`, so the adaptive
+        ordering starts out warm.
+
+        Counts for a rule that no longer exists, or whose alternations no
+        longer have the same shape, are ignored: they describe a different
+        grammar.
+        """
+
+        for name, counts in stats.items():
+            rule = cls.get(name)
+            if rule is None:
+                continue
+            alternations = rule._alternation_parsers()
+            if len(alternations) != len(counts) or any(
+                len(a.hits) != len(c) for a, c in zip(alternations, counts, strict=True)
+            ):
+                continue
+            for alternation, hits in zip(alternations, counts, strict=True):
+                alternation.hits = hits
+
+    @classmethod
+    def profile(
+        cls, corpus: typing.Mapping[str, typing.Iterable[str]]
+    ) -> dict[str, typing.Any]:
+        """Parse a sample of inputs and report which parts of this grammar
+        they use.
+
+        :param corpus: rule name to the inputs recorded for it -- the shape
+            of the committed ``tests/fuzz/corpus/*.json`` files, so one of
+            those can be passed straight in.  Each input is parsed with
+            :meth:`parse_all`.
+        :returns: plain data, ready for JSON and for :meth:`specialize`:
+
+            * ``"inputs"`` and ``"rejected"``: for each rule in ``corpus``,
+              how many inputs were parsed and how many of them failed;
+            * ``"rules"``: for each rule, how many times it appears in the
+              parse trees of the accepted inputs;
+            * ``"alternations"``: the alternative counts, exactly as
+              :meth:`alternation_stats` reports them.
+
+        Only rules and alternatives are counted: how many times a repetition
+        repeats is not, as nothing :meth:`specialize` does could use it.
+
+        The parsing is done by a copy of the grammar (see :meth:`specialize`),
+        so this grammar's own counts and settings are left alone.  The copy
+        is kept for the next call, and made again only once the grammar has
+        changed.
+        """
+
+        variant, built = cls._variant("profile")
+        for rule in built:
+            for alternation in rule._alternation_parsers():
+                alternation.adaptive = True
+                alternation.hits = [0] * len(alternation.hits)
+        inputs: dict[str, int] = {}
+        rejected: dict[str, int] = {}
+        used: dict[str, int] = {}
+        for name, sources in corpus.items():
+            rule = variant(name)
+            for source in sources:
+                inputs[name] = inputs.get(name, 0) + 1
+                try:
+                    node = rule.parse_all(source)
+                except ParseError:
+                    rejected[name] = rejected.get(name, 0) + 1
+                    continue
+                stack: list[Node] = [node]
+                while stack:
+                    node = stack.pop()
+                    if isinstance(node, Node):
+                        used[node.name] = used.get(node.name, 0) + 1
+                        stack.extend(node.children)
+        return {
+            "inputs": inputs,
+            "rejected": rejected,
+            "rules": used,
+            "alternations": variant.alternation_stats(),
+        }
+
+    @classmethod
+    def specialize(cls, profile: typing.Mapping[str, typing.Any]) -> type[Rule]:
+        """A copy of this grammar tuned for the inputs ``profile`` describes.
+
+        :param profile: as returned by :meth:`profile`, possibly after a
+            round trip through JSON.
+        :returns: a subclass of this class, with its own rules built from
+            the same text as this grammar's.  Each alternation the profile
+            saw match is hot: if it can stop at the alternative
+            that matched -- it is prefix-free (see
+            :meth:`prefix_free_alternations`), or first-match with
+            alternatives that rule others out -- it is given the recorded
+            counts and made to try its alternatives in that order (see
+            :attr:`Alternation.ordered`), so it tries the usual winner
+            first, without counting.  That is all it tunes: repetitions,
+            and alternations the profile did not see match, are left as
+            this grammar has them.
+
+        The copy parses exactly as this grammar does -- adaptive ordering
+        never changes a result, each alternation keeps this grammar's
+        settings, and each rule its :attr:`exclude`, :attr:`token`,
+        :attr:`atomic` and :attr:`memoise`.  A rule whose definition was not
+        built from this grammar's text (assigned in code, or imported from
+        another grammar) is given the same definition rather than a copy, and
+        is never tuned.  The same profile gets the same subclass until the
+        grammar changes.
+        """
+
+        counts = profile.get("alternations", {})
+        variant, built = cls._variant(
+            (
+                "specialize",
+                tuple(
+                    (name, tuple(tuple(hits) for hits in stats))
+                    for name, stats in sorted(counts.items())
+                ),
+            )
+        )
+        for rule in built:
+            stats = counts.get(rule.name)
+            alternations = rule._alternation_parsers()
+            if stats is None or len(stats) != len(alternations):
+                continue
+            for alternation, hits in zip(alternations, stats, strict=True):
+                if len(hits) != len(alternation.hits) or not any(hits):
+                    continue
+                # Ordering pays only where a match lets the alternatives
+                # not yet tried be skipped.  The Rust combinators do not
+                # expose which alternatives exclude which, so a first-match
+                # one is ordered on trust.
+                if not alternation.prefix_free:
+                    if not alternation.first_match:
+                        continue
+                    analyse = getattr(alternation, "_analyse", None)
+                    if analyse is not None:
+                        analyse()
+                        if not any(alternation._exclusive):
+                            continue
+                alternation.hits = hits
+                alternation.ordered = True
+        return variant
+
+    @classmethod
+    def _variant(cls, key: typing.Hashable) -> tuple[type[Rule], list[Rule]]:
+        """A subclass of `cls` holding a copy of its grammar, and the rules
+        of the copy that were built afresh from ABNF text.
+
+        A rule this grammar built from its text is built again from it, so
+        it has `Alternation` objects of its own, which is what lets one be
+        tuned without touching this grammar.  Any other rule -- defined in
+        code, or imported from another grammar -- is given this grammar's
+        definition as it stands.  Either way the rule keeps its settings.
+
+        Rules live as long as their grammar (see `_obj_map`), so the copy is
+        kept under `key`, and made again only once a rule of this grammar
+        has changed since.  Rules of other grammars are the same in both.
+        """
+
+        # The rules left as text are copied as they stand, so build them.
+        cls.warm_up()
+        stamp = [
+            (
+                rule,
+                rule._changed_generation,
+                [
+                    (a.first_match, a.adaptive, a.ordered)
+                    for a in rule._alternation_parsers()
+                ],
+            )
+            for rule in cls.rules()
+        ]
+        cached = cls._variants.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1], cached[2]
+
+        variant = typing.cast(
+            "type[Rule]",
+            type(
+                cls.__name__,
+                (cls,),
+                {"__doc__": cls.__doc__, "__module__": cls.__module__},
+            ),
+        )
+        pairs = [(original, variant(original.name)) for original in cls.rules()]
+        built: list[Rule] = []
+        for original, rule in pairs:
+            if "_definition" not in vars(original):
+                continue
+            rule._memoise = original._memoise
+            source = original._source_text()
+            if source is not None and source[0] is cls:
+                rule._build_from_text(variant, source[1], like=original)
+                built.append(rule)
+            else:
+                rule.definition = original.definition
+            if original.token:
+                rule.token = True
+            if original.atomic:
+                rule.atomic = True
+        for original, rule in pairs:
+            exclude = original.exclude
+            if exclude is not None:
+                if cls._obj_map.get((cls, exclude.name.casefold())) is exclude:
+                    exclude = variant(exclude.name)
+                rule.exclude = exclude
+        cls._variants[key] = (stamp, variant, built)
+        return variant, built
 
     def exclude_rule(self, rule: Rule) -> None:
         """
@@ -833,23 +2213,57 @@ class Rule:
         """
         self.exclude = rule
 
-    def lparse(self, source: Source, start: int) -> Matches:
-        def exclude(match: Match) -> bool:
-            if self.exclude is None:
-                return False
+    def _excludes(self, excluded: Rule, source: Source, start: int, end: int) -> bool:
+        """Whether the text from `start` to `end` parses completely as
+        `excluded`, this rule's exclusion."""
+        from abnf import _analysis
 
-            try:
-                self.exclude.parse_all("".join(item.value for item in match.nodes))
-            except ParseError:
-                return False
-            else:
-                return True
+        # Reserved words and the like: a finite language, enumerated once,
+        # so the test is a lookup rather than a parse.
+        lexicon = _analysis.lexicon(excluded)
+        if lexicon is not None and lexicon.current:
+            return source[start:end] in lexicon
 
+        hook = Rule._farthest_failure_hook
+        if hook is not None:
+            # The engine keeps one parse's farthest failure, and this
+            # sub-parse is another; take this parse's first.
+            _record_backend_failure(hook())
+        try:
+            # A match is a contiguous span of the source, so its text is
+            # a slice -- no need to build the nodes to read it off them.
+            excluded.parse_all(source[start:end])
+        except ParseError:
+            return False
+        else:
+            return True
+        finally:
+            if hook is not None:
+                # Offsets into the span, not the source.
+                hook()
+
+    def lparse(self, source: Source, start: int) -> Matches:
+        automaton = self._automaton
+        if automaton is not None:
+            if automaton is True:
+                from abnf import _dfa
+
+                # A single literal is matched as fast as a DFA is run.
+                automaton = self._automaton = (
+                    None if isinstance(self._definition, Literal) else _dfa.dfa(self)
+                )
+            failures = _parse_failures.get()
+            if automaton is not None and (failures is None or not failures.exact):
+                yield from self._lparse_automaton(automaton, source, start, failures)
+                return
+        excluded = self._exclude
         try:
             g = self.definition.lparse(source, start)
         except AttributeError as exc:
             msg = f'Undefined rule "{self.name}"'
             raise GrammarError(msg) from exc
+        # Read once the definition has been, which may have built the rule.
+        token = self._token
 
         # Yield matches lazily so callers that only need the first
         # (longest) match don't pay to materialise the entire
@@ -863,30 +2277,114 @@ class Rule:
         for match in g:
             if match.start in seen_starts:
                 continue
-            if exclude(match):
+            if excluded is not None and self._excludes(
+                excluded, source, start, match.start
+            ):
                 continue
             seen_starts.add(match.start)
             yielded = True
-            yield Match(
-                [Node(self.name, *match.nodes)],
-                match.start,
-            )
+            if token:
+                yield self._token_match(source, start, match.start)
+            elif isinstance(match, _Match):
+                # The node is built only if this candidate ends up in the
+                # tree; see `Match._concat`.
+                yield _Match._named(self.name, match)
+            else:
+                yield Match([Node(self.name, *match.nodes)], match.start)
+            if self._atomic:
+                return
         if not yielded:
+            _expect(self, start)
             raise ParseError(self, start) from None
 
-    def parse(self, source: str, start: int) -> tuple[Node, int]:
-        """
-        :param source: source data
-        :type str:
-        :param start=0: offset at which to begin parsing.
-        :returns: parse tree, new offset at which to continue parsing
-        :rtype: Node, int
-        :raises ParseError: if source cannot be parsed using rule.
-        :raises GrammarError: if rule has no definition.  This usually means that a
-            non-terminal in the grammar is not defined or imported.
-        :raises ValueError: if start is outside ``0 <= start <= len(source)``.
+    def _lparse_automaton(
+        self,
+        automaton: typing.Any,
+        source: Source,
+        start: int,
+        failures: _Failures | None,
+    ) -> Matches:
+        """`lparse` through the rule's DFA, which finds where every match
+        ends in one pass over the input, without backtracking.
+
+        What the DFA cannot say is how a match was derived, so each match's
+        nodes are built by `_derive` only if they are asked for -- for the
+        one that ends up in the tree, not for those only tried.
         """
 
+        ends, stop = automaton.ends(source, start)
+        # Parsing tries no terminal past where the DFA stopped, so if the
+        # parse has already failed farther on, it would have recorded
+        # nothing; otherwise where it failed has to be found by parsing,
+        # should anyone ask (see `_Failures.pending`).
+        if failures is not None and stop >= failures.farthest:
+            failures.skipped = True
+        if not ends:
+            _expect(self, start)
+            raise ParseError(self, start)
+        ctx = _parse_memo.get()
+        if self._atomic or (
+            # Only the longest match of a possessive repetition can help,
+            # and a rule defined as one is no different.
+            ctx is not None and ctx[0] is source and self._definition in ctx[3]
+        ):
+            ends = ends[-1:]
+        for end in reversed(ends):
+            if self._token:
+                yield self._token_match(source, start, end)
+                continue
+            match = _Match.__new__(_Match)
+            match._nodes = None
+            match._deferred = (self, (source, start))
+            match.start = end
+            yield match
+
+    def _derive(self, source: Source, start: int, end: int) -> Nodes:
+        """The nodes of this rule's match from `start` to `end`, which its
+        DFA found: the first derivation `lparse` would have found, as it
+        would have built it, worked out without parsing (see
+        `_dfa.derive`)."""
+        from abnf import _dfa
+
+        return _dfa.derive(self, source, start, end)
+
+    def _derivation(self, source: Source, start: int, end: int) -> Match:
+        """The definition's match of `_derive`."""
+        return Match(self._derive(source, start, end)[0].children, end)
+
+    def _token_match(self, source: Source, start: int, end: int) -> Match:
+        """A :attr:`token` rule's match from `start` to `end`: its node,
+        with the matched text as its one child."""
+        node = Node(self.name, LiteralNode(source[start:end], start, end - start))
+        return Match([node], end)
+
+    def _lparse_one(self, source: Source, start: int) -> Match:
+        """The one match of a rule with a deterministic definition (see
+        `_analysis.deterministic`), asked of the definition directly."""
+        if self._atomic:
+            # Deterministic for committing to one match, not for having
+            # a definition that only has one.
+            return next(iter(self.lparse(source, start)))
+        try:
+            definition = self.definition
+        except AttributeError as exc:
+            msg = f'Undefined rule "{self.name}"'
+            raise GrammarError(msg) from exc
+        match = definition._lparse_one(source, start)  # type: ignore[attr-defined]
+        excluded = self._exclude
+        if excluded is not None and self._excludes(
+            excluded, source, start, match.start
+        ):
+            _expect(self, start)
+            raise ParseError(self, start)
+        if self._token:
+            return self._token_match(source, start, match.start)
+        return _Match._named(self.name, match)
+
+    @staticmethod
+    def _check_start(source: str, start: int) -> int:
+        """`start` as an offset into `source`, or `ValueError`."""
+
         # Normalise first: this turns `True` into `1` (the Rust
         # backend already treated it as an index, while here it ended
         # up verbatim in `ParseError.start`) and rejects non-integers
@@ -906,6 +2404,38 @@ class Rule:
                 f"length {len(source)}; got {start}."
             )
             raise ValueError(msg)
+        return start
+
+    def parse(self, source: str, start: int) -> tuple[Node, int]:
+        """
+        :param source: source data
+        :type str:
+        :param start=0: offset at which to begin parsing.
+        :returns: parse tree, new offset at which to continue parsing
+        :rtype: Node, int
+        :raises ParseError: if source cannot be parsed using rule.
+        :raises GrammarError: if rule has no definition.  This usually means that a
+            non-terminal in the grammar is not defined or imported.
+        :raises ValueError: if start is outside ``0 <= start <= len(source)``.
+        """
+
+        start = self._check_start(source, start)
+        return self._parse_tracked(source, start, _Failures())
+
+    def _parse_tracked(
+        self,
+        source: str,
+        start: int,
+        failures: _Failures,
+        actions: dict[str, typing.Any] | None = None,
+        *,
+        whole: bool = False,
+    ) -> tuple[typing.Any, int]:
+        """`parse`, recording into `failures` how far it got, and attaching
+        them to the `ParseError` if it fails.  With `actions`, what they
+        make of the match (see :meth:`evaluate`) takes the node's place.
+        If only a match of all of `source` is `whole`, a shorter one's
+        node is `None`, not built."""
 
         # Bind a memo for the duration of this parse.  `reset(token)` restores
         # whatever was bound before, so a nested parse -- `Rule.lparse` runs
@@ -913,14 +2443,46 @@ class Rule:
         # correctly rather than sharing or clobbering this one.  The memo is
         # unreachable once `parse` returns, which is what keeps grammar
         # mutation between parses from ever being observable and keeps
-        # retention at zero.
-        memo_token = _parse_memo.set((source, {}))
+        # retention at zero.  The failures nest the same way.
+        from abnf import _analysis
+
+        memo_token = _parse_memo.set((source, {}, False, _analysis.possessives(self)))
+        failures_token = _parse_failures.set(failures)
         try:
-            return self._parse(source, start)
+            return self._parse(source, start, actions, whole=whole)
+        except ParseError as exc:
+            if failures.skipped:
+                # A rule matched through its DFA tried none of its
+                # terminals, so nothing says where in it the input went
+                # wrong.  That takes parsing again, trying everything, and
+                # is left until the error is asked.
+                failures.pending = (self, source, start)
+            else:
+                hook = Rule._farthest_failure_hook
+                if hook is not None:
+                    _record_backend_failure(hook())
+            if exc._failures is None:
+                exc._attach(failures)
+            raise
         finally:
+            _parse_failures.reset(failures_token)
             _parse_memo.reset(memo_token)
 
-    def _parse(self, source: str, start: int) -> tuple[Node, int]:
+    def _parse(
+        self,
+        source: str,
+        start: int,
+        actions: dict[str, typing.Any] | None = None,
+        *,
+        whole: bool = False,
+    ) -> tuple[typing.Any, int]:
+        hook = Rule._evaluate_hook
+        if actions is not None and hook is not None:
+            try:
+                return hook(self, source, start, actions)
+            except RecursionError as exc:
+                # See below.
+                raise ParseError(self, start) from exc
         g = self.lparse(source, start)
         # `lparse` yields matches longest-first (the upstream
         # combinators sort by `start` descending), so the first
@@ -942,6 +2504,11 @@ class Rule:
             # is not a ParseError, the intermediate `except ParseError` handlers
             # in Alternation/Repetition do not swallow it on the way up.
             raise ParseError(self, start) from exc
+        if whole and longest_match.start < len(source):
+            return (None, longest_match.start)
+        if actions is not None:
+            values = longest_match._act(source, start, actions)
+            return (values, longest_match.start)
         return (longest_match.nodes[0], longest_match.start)
 
     def parse_all(self, source: str) -> Node:
@@ -1010,11 +2577,174 @@ class Rule:
                     return box["node"]
         """
 
-        node, start = self.parse(source, 0)
+        return self._parse_all(source, None)
+
+    def evaluate(self, source: str) -> typing.Any:
+        """
+        Parses all of the source, as :meth:`parse_all` does, and returns what
+        the grammar's actions make of it rather than a parse tree.
+
+        An action is a ``visit_*`` method of the grammar, named as a
+        :class:`NodeVisitor` method is: ``visit_host`` for rule ``host``,
+        ``visit_ip_literal`` for ``IP-literal``.  Once the longest match is
+        found, the action of each rule in it is called with the text the rule
+        matched and a list of the values of the rules under it, and returns
+        that rule's value.  A rule with no action has no value of its own:
+        its place is taken by the values of the rules under it.  Actions are
+        looked up on, and bound to, the rule ``evaluate`` is called on.
+
+        No parse tree is built.  Actions run only on the winning derivation,
+        never on candidates the parse tried and dropped.
+
+        :param source: source data
+        :returns: the value of this rule's action, or, if it has none, the
+            list of values of the rules under it.
+        :raises ParseError: if source cannot be parsed using rule.
+        :raises GrammarError: if rule has no definition.
+        """
+
+        actions = {
+            name: getattr(self, attr)
+            for name, attr in _visit_attr_names(type(self)).items()
+        }
+        values = self._parse_all(source, actions)
+        if _action(self.name, actions) is not None:
+            return values[0]
+        return values
+
+    def _parse_all(
+        self, source: str, actions: dict[str, typing.Any] | None
+    ) -> typing.Any:
+        """`parse_all`, or with `actions`, `evaluate`'s list of values."""
+
+        from abnf import _analysis
+
+        # Input of a length no match can have is rejected without parsing --
+        # which bounds the work an oversized value can cause.  A too-short
+        # input fails where a failed parse does, at 0; a too-long one at the
+        # farthest offset any match could reach.
+        bounds = _analysis.bounds(self)
+        if bounds is not None:
+            if len(source) < bounds.min:
+                raise ParseError(self, 0)
+            if bounds.max is not None and len(source) > bounds.max:
+                raise ParseError(self, bounds.max)
+        # So is input holding a character no terminal the rule reaches can
+        # match, found in one pass and reported where it is.
+        search = _analysis.alien_search(self)
+        if search is not None:
+            alien = search(source)
+            if alien is not None:
+                raise ParseError(self, alien.start())
+
+        failures = _Failures()
+        node, start = self._parse_tracked(source, 0, failures, actions, whole=True)
         if start < len(source):
-            raise ParseError(self, start)
+            if failures.skipped:
+                # See `_parse_tracked`.
+                failures.pending = (self, source, 0)
+            # The longest match stopped short; what it stopped at was
+            # recorded on the way.
+            hook = Rule._farthest_failure_hook
+            if hook is not None:
+                _record_backend_failure(hook())
+            exc = ParseError(self, start)
+            exc._attach(failures)
+            raise exc
         return node
 
+    def is_valid(self, source: str) -> bool:
+        """Whether all of ``source`` matches this rule: :meth:`parse_all`,
+        answering ``False`` where it would raise :class:`ParseError`.
+
+        :raises GrammarError: if rule has no definition.
+        """
+
+        try:
+            self.parse_all(source)
+        except ParseError:
+            return False
+        return True
+
+    def parse_forest(self, source: str) -> Forest:
+        """
+        Parses all of the source, keeping every derivation rather than only
+        the longest match.
+
+        :param source: source data
+        :returns: a :class:`Forest` of the derivations, in which a part of
+            the source derived the same way along several of them appears
+            once.  ``forest.count()`` says how many there are without
+            enumerating them, and ``forest.trees()`` builds the parse trees
+            one at a time.
+        :raises ParseError: if no derivation covers all of the source.
+        :raises GrammarError: if rule has no definition.
+
+        Where the grammar is unambiguous for the source, the forest holds
+        one tree, equal to :meth:`parse_all`'s.
+        """
+
+        from abnf import _forest
+
+        return _forest.parse_forest(self, source)
+
+    def search(self, source: str, start: int = 0) -> tuple[Node, int, int] | None:
+        """
+        Finds the first offset at or after ``start`` at which the rule matches,
+        and parses there.
+
+        :param source: source data
+        :type str:
+        :param start=0: offset at which to begin searching.
+        :returns: ``(node, start, end)`` for the longest match at the first
+            offset with one, or ``None`` if there is no match anywhere.
+        :raises GrammarError: if rule has no definition.
+        :raises ValueError: if start is outside ``0 <= start <= len(source)``.
+
+        Only offsets where a match could begin are tried: the rule's FIRST set
+        and any literal every match must contain are worked out from the
+        grammar, and positions they rule out are skipped without parsing.  One
+        memo serves every offset tried, so work done for one is reused by the
+        next.
+        """
+
+        start = self._check_start(source, start)
+        for found in self._search(source, start):
+            return found
+        return None
+
+    def finditer(
+        self, source: str, start: int = 0
+    ) -> Generator[tuple[Node, int, int], None, None]:
+        """
+        Yields ``(node, start, end)`` for each non-overlapping match of the rule
+        in ``source``, scanning left to right from ``start``.  See
+        :meth:`search`.
+
+        As with ``re.finditer``, scanning resumes where a match ends, and an
+        empty match is followed by a search from the next offset.
+        """
+
+        start = self._check_start(source, start)
+        yield from self._search(source, start)
+
+    def _search(
+        self, source: str, start: int
+    ) -> Generator[tuple[Node, int, int], None, None]:
+        from abnf import _analysis
+
+        scanner = _analysis.prefilter(self).scanner(source)
+        session = _Session(source, self)
+        pos = scanner.next(start)
+        while pos is not None:
+            try:
+                node, end = session.parse(pos)
+            except ParseError:
+                pos = scanner.next(pos + 1)
+                continue
+            yield node, pos, end
+            pos = scanner.next(end if end > pos else pos + 1)
+
     def __str__(self):
         return f"{self.__class__.__name__}('{self.name}')"
 
@@ -1095,6 +2825,221 @@ class Rule:
 
         return [v for k, v in cls._obj_map.items() if k[0] is cls]
 
+    @classmethod
+    def warm_up(cls, rules: typing.Iterable[str] | None = None) -> None:
+        """Builds rules of a grammar module now, rather than when they are
+        first needed.
+
+        The bundled grammar modules keep each rule as ABNF text until a
+        parse, or anything else, first reads its definition; the rule is
+        then built, along with every rule it refers to, all at once.  A
+        process that cannot afford that pause on its first parse can take
+        it at startup instead::
+
+            rfc9110.Rule.warm_up(rules=["Accept", "Content-Type"])
+
+        :param rules: names of the rules to build, with everything they
+            refer to; every rule of the grammar if omitted.
+        :raises GrammarError: if this grammar has no rule by one of the
+            names, or a rule's text is not valid ABNF.
+        """
+
+        if rules is None:
+            names = list(cls._deferred_rules)
+        else:
+            names = [name.casefold() for name in rules]
+            for name in names:
+                if cls.get(name) is None:
+                    msg = f'Undefined rule "{name}"'
+                    raise GrammarError(msg)
+        with _deferred_lock:
+            cls._build_deferred(names)
+
+    @classmethod
+    def _defer_rules(
+        cls,
+        sources: typing.Iterable[str],
+        imported_rules: typing.Iterable[tuple[str, Rule]] = (),
+    ) -> None:
+        """Adds the rules in `sources` -- ABNF text ending in CRLF, a rule
+        each, with any comment lines before it -- and `imported_rules` to
+        this grammar, to be built when their definitions are first read.
+
+        Each rule is created, so that it can be referred to and looked up,
+        but not parsed: a parse of the ABNF for every rule is most of what
+        importing a grammar module used to cost.  Text that is not a rule
+        of this grammar's own to define, such as a core rule's, is loaded
+        at once, as is an import replacing a rule that has been.
+
+        The rules the text names are created in the order they are named,
+        as loading the text would: a rule is created with the spelling it is
+        first named by, and node names follow it.
+        """
+
+        deferred = cls._deferred_rules
+        for source in sources:
+            found = _DEFERRED_NAME.search(source)
+            if found is None or not cls._can_defer(found.group()):
+                cls.load_grammar(source, strict=False)
+                continue
+            for name in _DEFERRED_TOKENS.findall(source):
+                if name and cls.get(name) is None:
+                    cls(name)
+            entry = deferred.setdefault(found.group().casefold(), [])
+            assert isinstance(entry, list)
+            entry.append(source)
+        for name, rule in imported_rules:
+            if cls._can_defer(name):
+                cls(name)
+                deferred[name.casefold()] = rule
+            else:
+                cls(name)._import(rule)
+
+    @classmethod
+    def _can_defer(cls, name: str) -> bool:
+        """Whether building rule `name` can wait: it is this grammar's own,
+        with no definition but text it was deferred with."""
+
+        key = name.casefold()
+        if isinstance(cls._deferred_rules.get(key), list):
+            return True
+        rule = cls._obj_map.get((cls, key))
+        if rule is None:
+            return cls.get(name) is None
+        return getattr(rule, "_definition", None) is None
+
+    @classmethod
+    def _build_deferred(cls, names: typing.Iterable[str]) -> None:
+        """Builds the deferred rules `names` (casefolded), and every deferred
+        rule their text refers to, with one parse of their ABNF.
+
+        So every rule with a definition reaches only rules with one, which
+        is what lets a parse, or an analysis of the grammar, build only the
+        rule it starts from.  Call with `_deferred_lock` held.
+
+        The ABNF is parsed in a context of its own: the build can be set off
+        by a parse reading a definition, and must not share that parse's
+        memo or add to its failures.
+        """
+
+        deferred = cls._deferred_rules
+        taken: dict[str, list[str] | Rule] = {}
+        pending = list(names)
+        while pending:
+            key = pending.pop()
+            entry = deferred.pop(key, None)
+            if entry is None:
+                continue
+            taken[key] = entry
+            if isinstance(entry, list):
+                for source in entry:
+                    pending.extend(
+                        name.casefold()
+                        for name in _DEFERRED_TOKENS.findall(source)
+                        if name
+                    )
+        sources = [
+            source
+            for entry in taken.values()
+            if isinstance(entry, list)
+            for source in entry
+        ]
+        if sources:
+            try:
+                node = contextvars.Context().run(_parse_deferred, sources)
+            except BaseException:
+                # Left to fail the same way the next time they are needed,
+                # rather than to be reported undefined.
+                deferred.update(taken)
+                raise
+            ABNFGrammarNodeVisitor(rule_cls=cls).visit(node)
+        for key, entry in taken.items():
+            rule = cls._obj_map[(cls, key)]
+            if isinstance(entry, Rule):
+                rule._import(entry)
+            if rule._exclude is not None:
+                rule._exclude._build_if_deferred()
+
+    def _build_if_deferred(self) -> bool:
+        """Builds this rule if its grammar module deferred building it (see
+        `_defer_rules`); whether it has a definition built that way, or
+        any other."""
+
+        if "_definition" in vars(self):
+            return True
+        with _deferred_lock:
+            # Another thread may have built it while this one waited.
+            if "_definition" in vars(self):
+                return True
+            key = self.name.casefold()
+            if key not in type(self)._deferred_rules:
+                return False
+            type(self)._build_deferred([key])
+            return True
+
+    @classmethod
+    def freeze(cls) -> None:
+        """Makes this grammar immutable, and works out once everything the
+        parser learns from the grammar rather than from the input.
+
+        Every rule of this class is frozen, along with every rule they reach
+        -- by reference or by exclusion -- in any other grammar.  Afterwards,
+        setting a frozen rule's ``definition`` or ``exclude``, changing its
+        alternation settings, or adding a rule to this class raises
+        :class:`GrammarError`.
+
+        The analyses the parser otherwise works out on first use (FIRST sets
+        and nullability, length bounds, the alphabet, search prefilters, and
+        each combinator's own) are run here, and are never invalidated: an
+        unfrozen grammar has to start them over whenever any rule anywhere
+        changes, because a rule reference is late-bound.  Calling ``freeze``
+        again does nothing.
+
+        :raises GrammarError: if a rule to be frozen has no definition, since
+            it could never be given one.
+        """
+
+        from abnf import _analysis
+
+        if cls._grammar_frozen:
+            return
+        # A frozen rule cannot be given the definition it was deferred with.
+        cls.warm_up()
+        reachable: dict[Rule, None] = {}
+        pending: list[Rule] = cls.rules()
+        while pending:
+            for rule in _analysis._reachable_rules(pending.pop()):
+                if rule in reachable:
+                    continue
+                reachable[rule] = None
+                if _analysis._definition(rule) is None:
+                    msg = f'Undefined rule "{rule.name}"'
+                    raise GrammarError(msg)
+                if rule._exclude is not None:
+                    pending.append(rule._exclude)
+
+        cls._grammar_frozen = True
+        for rule in reachable:
+            rule._frozen = True
+            rule._automaton = True
+            if cls._freeze_hook is not None:
+                cls._freeze_hook(rule)
+        for rule in reachable:
+            _analysis.first(rule)
+            _analysis.bounds(rule)
+            _analysis.alien_search(rule)
+            _analysis.prefilter(rule)
+            for _owner, node in _analysis._combinators(rule._definition):
+                analyse = getattr(node, "_analyse", None)
+                if analyse is not None:
+                    analyse()
+                    node._analysis_generation = _FROZEN_GENERATION
+
+    def _check_not_frozen(self) -> None:
+        if self._frozen:
+            msg = f'Rule "{self.name}" belongs to a frozen grammar'
+            raise GrammarError(msg)
+
 
 #### Node classes ####
 # A parser returns a parse tree of Node objects.  Usually one would then walk the node tree
@@ -1165,41 +3110,47 @@ _VISIT_PREFIX = "visit_"
 _VISIT_NAME_START = len(_VISIT_PREFIX)
 
 
+def _visit_attr_names(cls: type) -> dict[str, str]:
+    """Node name -> attribute name, for every ``visit_*`` on `cls`: a
+    `NodeVisitor`, or a `Rule` subclass with actions (see `Rule.evaluate`).
+
+    `dir()` walks the whole MRO and sorts its result, which is far too
+    much work to repeat for every instance: importing the bundled
+    grammars alone constructs several hundred visitors.  The answer
+    depends only on the class, so compute it once and keep it there.
+
+    Cached in ``cls.__dict__`` rather than read through inheritance, so
+    a subclass builds its own table instead of borrowing its parent's.
+    """
+
+    # Adding a `visit_*` method to a class after it has been
+    # instantiated used to take effect, because the old code rebuilt
+    # from `dir(self)` every time.  Keep that working: the summed
+    # sizes of the MRO's dicts change whenever a method is added or
+    # removed anywhere in the hierarchy, and checking it costs ~240ns
+    # against ~3.1us for the scan it guards.  Replacing a method needs
+    # no signal at all -- the table maps to attribute *names*, which
+    # `getattr` resolves afresh on every instance.
+    signature = sum(len(klass.__dict__) for klass in cls.__mro__)
+    cached = cls.__dict__.get("_visit_attr_names_cache")
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    table = {
+        attr[_VISIT_NAME_START:]: attr
+        for attr in dir(cls)
+        if attr.startswith(_VISIT_PREFIX)
+    }
+    cls._visit_attr_names_cache = (signature, table)
+    return table
+
+
 class NodeVisitor:
     """An external visitor class."""
 
     @classmethod
     def _visit_attr_names(cls) -> dict[str, str]:
-        """Node name -> attribute name, for every ``visit_*`` on the class.
-
-        `dir()` walks the whole MRO and sorts its result, which is far too
-        much work to repeat for every instance: importing the bundled
-        grammars alone constructs several hundred visitors.  The answer
-        depends only on the class, so compute it once and keep it there.
-
-        Cached in ``cls.__dict__`` rather than read through inheritance, so
-        a subclass builds its own table instead of borrowing its parent's.
-        """
-
-        # Adding a `visit_*` method to a class after it has been
-        # instantiated used to take effect, because the old code rebuilt
-        # from `dir(self)` every time.  Keep that working: the summed
-        # sizes of the MRO's dicts change whenever a method is added or
-        # removed anywhere in the hierarchy, and checking it costs ~240ns
-        # against ~3.1us for the scan it guards.  Replacing a method needs
-        # no signal at all -- the table maps to attribute *names*, which
-        # `getattr` resolves afresh on every instance.
-        signature = sum(len(klass.__dict__) for klass in cls.__mro__)
-        cached = cls.__dict__.get("_visit_attr_names_cache")
-        if cached is not None and cached[0] == signature:
-            return cached[1]
-        table = {
-            attr[_VISIT_NAME_START:]: attr
-            for attr in dir(cls)
-            if attr.startswith(_VISIT_PREFIX)
-        }
-        cls._visit_attr_names_cache = (signature, table)
-        return table
+        """Node name -> attribute name, for every ``visit_*`` on the class."""
+        return _visit_attr_names(cls)
 
     def __init__(self):
         cache = {
@@ -1235,7 +3186,12 @@ class NodeVisitor:
 
 
 class ParseError(Exception):
-    """Raised in response to errors during parsing."""
+    """Raised in response to errors during parsing.
+
+    ``start`` is where the failing parser began; :attr:`farthest` and
+    :attr:`expected` say where the input stopped matching, and what would
+    have matched there.
+    """
 
     def __init__(self, parser: Parser, start: int, *args: typing.Any):
         # it turns out that calling super().__init__(*args) is quite slow.  Because
@@ -1245,8 +3201,113 @@ class ParseError(Exception):
         self.parser = parser
         self.start = start
 
+    #: Where the parse that raised this got farthest, if it was tracked --
+    #: attached by `Rule.parse` on the way out, never by the combinators,
+    #: which raise and discard far more errors than escape.
+    _failures: _Failures | None = None
+    _message: str | None = None
+
+    @property
+    def farthest(self) -> int:
+        """The farthest offset the failed parse reached: where the input
+        stopped matching anything.  ``start``, where the failing rule began,
+        if nothing was tracked beyond it."""
+
+        failures = self._failures
+        if failures is not None:
+            failures._resolve()
+        if failures is None or failures.farthest < self.start:
+            return self.start
+        return failures.farthest
+
+    @property
+    def expected(self) -> tuple[str, ...]:
+        """Descriptions of the terminals that failed to match at
+        :attr:`farthest`, first failure first -- where the analysis showed a
+        part could not match there without trying it, the terminals it can
+        begin with -- and of any rule whose every match there was excluded.
+        Empty if nothing was tracked there."""
+
+        failures = self._failures
+        if failures is not None:
+            failures._resolve()
+        if failures is None or failures.farthest < self.start:
+            return ()
+        descriptions = (
+            item if isinstance(item, str) else _describe(item, _EXPECTED_LIMIT_CHARS)
+            for item in failures.expected
+        )
+        return tuple(dict.fromkeys(descriptions))
+
+    def _attach(self, failures: _Failures) -> None:
+        self._failures = failures
+        self._message = None
+
     def __str__(self):
-        return f"{self.parser!s}: {self.start}"
+        # Built on first use and kept: a grammar's combinator trees can be
+        # large, and an error is often logged more than once.
+        if self._message is None:
+            message = f"{_describe(self.parser)}: {self.start}"
+            expected = self.expected
+            if expected:
+                shown = ", ".join(expected[:_EXPECTED_SHOWN])
+                if len(expected) > _EXPECTED_SHOWN:
+                    shown += f", ... ({len(expected) - _EXPECTED_SHOWN} more)"
+                message += f" (farthest {self.farthest}: expected {shown})"
+            self._message = message
+        return self._message
+
+
+#: How much of a parser `ParseError` spells out -- the failing one, and
+#: each expected one -- and how many of the expected ones its message lists.
+_DESCRIPTION_LIMIT = 200
+_EXPECTED_LIMIT_CHARS = 80
+_EXPECTED_SHOWN = 8
+
+
+def _describe(parser: object, limit: int = _DESCRIPTION_LIMIT) -> str:
+    """`str(parser)`, cut off after about `limit` characters without
+    building the rest: the string of a large rule's definition runs to
+    pages."""
+
+    pieces: list[str] = []
+    length = 0
+    for piece in _str_pieces(parser):
+        pieces.append(piece)
+        length += len(piece)
+        if length > limit:
+            return "".join(pieces)[: limit - 3] + "..."
+    return "".join(pieces)
+
+
+def _str_pieces(parser: object) -> typing.Iterator[str]:
+    """The pieces `str(parser)` joins, outermost first."""
+
+    if isinstance(parser, _CompositeParsers):
+        if isinstance(parser, Repetition):
+            head, children, tail = (
+                f"Repetition({parser.repeat}, ",
+                [parser.element],
+                ")",
+            )
+        else:
+            head, _, tail = parser.str_template.partition("%s")
+            children = (
+                [parser.alternation] if isinstance(parser, Option) else parser.parsers
+            )
+        yield head
+        for i, child in enumerate(children):
+            if i:
+                yield ", "
+            yield from _str_pieces(child)
+        yield tail
+    else:
+        yield str(parser)
+
+
+# The pure-Python combinators, bound now: the Rust backend rebinds the
+# module's names to its own classes, whose children are not visible.
+_CompositeParsers = (Alternation, Concatenation, Option, Repetition)
 
 
 class GrammarError(Exception):
@@ -1572,12 +3633,102 @@ for grammar_rule_def in typing.cast(
     ABNFGrammarRule(grammar_rule_def[0], grammar_rule_def[1])
 
 
+def _parse_deferred(sources: list[str]) -> Node:
+    """Parses the texts of deferred rules (see `Rule._build_deferred`) as
+    one rulelist.
+
+    :raises GrammarError: naming the rule whose text is not valid ABNF,
+        chained from the `ParseError` that says where.
+    """
+    try:
+        return ABNFGrammarRule("rulelist").parse_all("".join(sources))
+    except ParseError as exc:
+        at = exc.farthest
+        for source in sources:
+            if at < len(source):
+                break
+            at -= len(source)
+        found = _DEFERRED_NAME.search(source)
+        name = found.group() if found is not None else source.strip()
+        msg = f'Rule "{name}" cannot be built: its text is not valid ABNF.'
+        raise GrammarError(msg) from exc
+
+
 def NotNull(x: typing.Any) -> bool:
     return x is not None
 
 
+class _Same:
+    """A key part equal only to the very object it holds -- a rule, say,
+    which another grammar's rule of the same name is not -- and which keeps
+    that object alive as long as the key is."""
+
+    __slots__ = ("item",)
+
+    def __init__(self, item: typing.Any):
+        self.item = item
+
+    def __hash__(self) -> int:
+        return id(self.item)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Same) and other.item is self.item
+
+
+#: Combinators built from grammar text, by structure; see `_interned`.
+#: Read and written with `_deferred_lock` held.
+_interned_parsers: WeakValueDictionary[tuple[typing.Any, ...], typing.Any] = (
+    WeakValueDictionary()
+)
+
+
+def _interned(
+    factory: typing.Callable[..., typing.Any], *args: typing.Any
+) -> typing.Any:
+    """``factory(*args)``, or the combinator an earlier call with the same
+    factory and parts built, if it is still in use.
+
+    Grammar text builds the same pieces over and over -- ``2DIGIT``,
+    ``*( OWS "," )``, ``DQUOTE`` -- in one grammar, and in every grammar
+    built on the core rules.  One object per structure takes less memory,
+    and a parse memoises it once for all the rules that reach it.  Values (a
+    literal's text, a repeat's bounds) are compared by value, parsers by
+    identity.  Alternations are never shared, as their settings belong to
+    their rule, and so neither is anything built from one.
+    """
+    key = (
+        factory,
+        *(
+            arg
+            if isinstance(arg, str | tuple | bool)
+            else (arg.min, arg.max)
+            if isinstance(arg, Repeat)
+            else _Same(arg)
+            for arg in args
+        ),
+    )
+    # Grammars can be built on several threads at once.
+    with _deferred_lock:
+        parser = _interned_parsers.get(key)
+        if parser is None:
+            parser = factory(*args)
+            # An engine whose combinators cannot be weakly referenced does
+            # without sharing.
+            with contextlib.suppress(TypeError):
+                _interned_parsers[key] = parser
+    return parser
+
+
 class CharValNodeVisitor(NodeVisitor):
-    """CharVal node visitor."""
+    """CharVal node visitor.
+
+    :param kinds: where to find the `Literal` class to build with; by
+        default this module, whose classes the Rust backend replaces.
+    """
+
+    def __init__(self, kinds: typing.Any = None):
+        self._kinds = sys.modules[__name__] if kinds is None else kinds
+        super().__init__()
 
     def visit_char_val(self, node: Node):
         """Visit a char-val node."""
@@ -1586,12 +3737,12 @@ class CharValNodeVisitor(NodeVisitor):
     def visit_case_insensitive_string(self, node: Node):
         """Visit a case-insensitive-string node."""
         value: str = next(filter(NotNull, map(self.visit, node.children)))
-        return Literal(value, False)
+        return _interned(self._kinds.Literal, value, False)
 
     def visit_case_sensitive_string(self, node: Node):
         """Visit a case-sensitive-string node."""
         value: str = next(filter(NotNull, map(self.visit, node.children)))
-        return Literal(value, True)
+        return _interned(self._kinds.Literal, value, True)
 
     @staticmethod
     def visit_quoted_string(node: Node) -> str:
@@ -1600,7 +3751,14 @@ class CharValNodeVisitor(NodeVisitor):
 
 
 class NumValVisitor(NodeVisitor):
-    """Visitor of num-val nodes."""
+    """Visitor of num-val nodes.
+
+    :param kinds: as for `CharValNodeVisitor`.
+    """
+
+    def __init__(self, kinds: typing.Any = None):
+        self._kinds = sys.modules[__name__] if kinds is None else kinds
+        super().__init__()
 
     def visit_num_val(self, node: Node):
         """Visit a num-val, returning (value, case_sensitive)."""
@@ -1608,15 +3766,21 @@ class NumValVisitor(NodeVisitor):
 
     def visit_bin_val(self, node: Node):
         # first child node is marker literal "b"
-        return Literal(self._read_value(node.children[1:], "BIT", 2), True)
+        return _interned(
+            self._kinds.Literal, self._read_value(node.children[1:], "BIT", 2), True
+        )
 
     def visit_dec_val(self, node: Node):
         # first child node is marker literal "b"
-        return Literal(self._read_value(node.children[1:], "DIGIT", 10), True)
+        return _interned(
+            self._kinds.Literal, self._read_value(node.children[1:], "DIGIT", 10), True
+        )
 
     def visit_hex_val(self, node: Node):
         # first child node is marker literal "x"
-        return Literal(self._read_value(node.children[1:], "HEXDIG", 16), True)
+        return _interned(
+            self._kinds.Literal, self._read_value(node.children[1:], "HEXDIG", 16), True
+        )
 
     def _read_value(
         self, digit_nodes: list[Node], digit_node_name: str, base: int
@@ -1666,17 +3830,51 @@ class NumValVisitor(NodeVisitor):
         return chr(int(data, base=base))
 
 
+#: Marks a comment whose words are pragmas: ``; @abnf: token atomic``.
+_PRAGMA_MARKER = "@abnf:"
+
+#: The pragmas a comment can set on a rule.
+_PRAGMAS = ("atomic", "first-match", "nomemo", "token")
+
+
 class ABNFGrammarNodeVisitor(NodeVisitor):
-    """Visitor for visiting nodes generated from ABNFGrammarRules."""
+    """Visitor for visiting nodes generated from ABNFGrammarRules.
+
+    Comments of the form ``; @abnf: token atomic`` are pragmas for the
+    rule they belong to -- a comment on the rule's own lines, or on the
+    lines just before it.  ``token`` and ``atomic`` set :attr:`Rule.token`
+    and :attr:`Rule.atomic`; ``first-match`` sets
+    :attr:`Rule.first_match_alternation`; ``nomemo`` sets :attr:`Rule.memoise`
+    to ``False``, turning off memoising of every repetition and option in
+    the rule's definition.  To anything
+    else they are comments, so the grammar stays RFC 5234.
+
+    The combinators are built with the classes of `kinds`, by default this
+    module's -- which the Rust backend replaces with its own.
+    """
 
-    def __init__(self, rule_cls: type[Rule], *args: typing.Any, **kwargs: typing.Any):
+    def __init__(
+        self,
+        rule_cls: type[Rule],
+        *args: typing.Any,
+        kinds: typing.Any = None,
+        **kwargs: typing.Any,
+    ):
         self.rule_cls = rule_cls
+        self._kinds = sys.modules[__name__] if kinds is None else kinds
         #: Alternations built for the rule currently being visited.
         #: Kept because a nested one is otherwise unreachable once the
         #: tree is assembled -- see ``Rule._alternation_parsers``.
         self._alternations: list[Alternation] = []
-        self.visit_char_val = CharValNodeVisitor()
-        self.visit_num_val = NumValVisitor()
+        #: Pragmas read from the comment lines since the last rule, for
+        #: the next one.
+        self._pending: set[str] = set()
+        #: Pragmas of the rule currently being visited.
+        self._pragmas: frozenset[str] = frozenset()
+        #: The `Rule.memoise` setting of the rule currently being visited.
+        self._memoise: bool | None = None
+        self.visit_char_val = CharValNodeVisitor(kinds)
+        self.visit_num_val = NumValVisitor(kinds)
         # superclass init needs to happen here so that it will
         # find these two methods added at runtime.
         super().__init__(*args, **kwargs)
@@ -1694,7 +3892,12 @@ class ABNFGrammarNodeVisitor(NodeVisitor):
     def _new_alternation(self, *args: Parser) -> Alternation:
         """Build an `Alternation` with the grammar's semantics, and keep
         hold of it so the rule can reach it later."""
-        alternation = Alternation(*args, first_match=self.rule_cls._first_match_default)
+        defaults = self.rule_cls._alternation_defaults
+        alternation = self._kinds.Alternation(
+            *args, first_match=defaults.get("first_match", False)
+        )
+        if defaults.get("adaptive", False):
+            alternation.adaptive = True
         self._alternations.append(alternation)
         return alternation
 
@@ -1702,7 +3905,7 @@ class ABNFGrammarNodeVisitor(NodeVisitor):
         """Creates a Concatention object from concatenation node."""
         assert node.name == "concatenation"
         args: list[Parser] = list(filter(NotNull, map(self.visit, node.children)))
-        return Concatenation(*args) if len(args) > 1 else args[0]
+        return _interned(self._kinds.Concatenation, *args) if len(args) > 1 else args[0]
 
     @staticmethod
     def visit_defined_as(node: Node):
@@ -1724,7 +3927,7 @@ class ABNFGrammarNodeVisitor(NodeVisitor):
     def visit_option(self, node: Node):
         """Creates an Option object from option node."""
         parser: Parser = next(filter(NotNull, map(self.visit, node.children)))
-        return Option(parser)
+        return self._memoisable(self._kinds.Option, parser)
 
     def visit_prose_val(self, node: Node):
         """Creates a Prose parser that fails."""
@@ -1734,12 +3937,11 @@ class ABNFGrammarNodeVisitor(NodeVisitor):
         try:
             node = ABNFGrammarRule("rulename").parse_all(node.value[1:-1])
         except ParseError:
-            return Prose()
+            return self._kinds.Prose()
         else:
             return self.visit_rulename(node)
 
-    @staticmethod
-    def visit_repeat(node: Node):
+    def visit_repeat(self, node: Node):
         """Creates a Repeat object from repeat node."""
         repeat_op = "*"
         min_src = ""
@@ -1761,7 +3963,7 @@ class ABNFGrammarNodeVisitor(NodeVisitor):
         else:
             max_src = min_src
 
-        return Repeat(
+        return self._kinds.Repeat(
             min=int(min_src, base=10) if min_src else 0,
             max=int(max_src, base=10) if max_src else None,
         )
@@ -1769,7 +3971,8 @@ class ABNFGrammarNodeVisitor(NodeVisitor):
     def visit_repetition(self, node: Node):
         """Creates a Repetition object from repetition node."""
         if node.children[0].name == "repeat":
-            return Repetition(
+            return self._memoisable(
+                self._kinds.Repetition,
                 self.visit_repeat(node.children[0]),
                 self.visit_element(node.children[1]),
             )
@@ -1777,6 +3980,43 @@ class ABNFGrammarNodeVisitor(NodeVisitor):
             assert node.children[0].name == "element"
             return self.visit_element(node.children[0])
 
+    def _memoisable(
+        self, factory: typing.Callable[..., typing.Any], *args: typing.Any
+    ) -> typing.Any:
+        """A repetition or option, shared as `_interned` shares them, unless
+        the rule sets `Rule.memoise`: then it has a setting of its own, and
+        one that would be wrong for the rules it is shared with."""
+        if self._memoise is None:
+            return _interned(factory, *args)
+        return factory(*args, memoise=self._memoise)
+
+    def _read_pragmas(self, node: Node) -> set[str]:
+        """The pragmas in the comments in `node`."""
+        pragmas: set[str] = set()
+        if _PRAGMA_MARKER not in node.value:
+            return pragmas
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.name != "comment":
+                stack.extend(node.children)
+                continue
+            text = node.value[1:].lstrip(" \t")
+            if not text.startswith(_PRAGMA_MARKER):
+                continue
+            for word in text[len(_PRAGMA_MARKER) :].split():
+                pragma = word.casefold()
+                if pragma in _PRAGMAS:
+                    pragmas.add(pragma)
+                else:
+                    warnings.warn(
+                        f"unknown pragma {word!r} is ignored; the pragmas are "
+                        f"{', '.join(_PRAGMAS)}.",
+                        GrammarWarning,
+                        stacklevel=2,
+                    )
+        return pragmas
+
     def visit_rule(self, node: Node):
         """Visits a rule node, returning a Rule object."""
         rule: Rule
@@ -1786,6 +4026,15 @@ class ABNFGrammarNodeVisitor(NodeVisitor):
         # unpacking below is what drives the lazy map, so the list is
         # empty until then.
         self._alternations = []
+        # Pragmas first: ``nomemo``, or the rule's own setting, decides how
+        # the definition is built.
+        self._pragmas = frozenset(self._pending | self._read_pragmas(node))
+        self._pending = set()
+        if "nomemo" in self._pragmas:
+            self._memoise = False
+        else:
+            name = next(c.value for c in node.children if c.name == "rulename")
+            self._memoise = getattr(self.rule_cls.get(name), "_memoise", None)
         rule, defined_as, elements = filter(NotNull, map(self.visit, node.children))
         # this assertion tells mypy that rule should actually be an object. Without, mypy
         # returns 'error: <nothing> has no attribute "definition"'
@@ -1818,17 +4067,39 @@ class ABNFGrammarNodeVisitor(NodeVisitor):
         if defined_as == "=":
             rule.definition = elements
             rule._alternations = tuple(self._alternations)
+            texts: tuple[str, ...] | None = (node.value,)
         else:
             # '=/' keeps the earlier definition as one arm, so its
             # alternations stay live and stay configurable.
             previous = rule._alternation_parsers()
+            source = rule._source_text()
             rule.definition = self._new_alternation(rule.definition, elements)
             rule._alternations = tuple(previous) + tuple(self._alternations)
+            texts = None if source is None else (*source[1], node.value)
+        rule._source = (
+            None if texts is None else (rule.definition, self.rule_cls, texts)
+        )
+        if "nomemo" in self._pragmas:
+            rule._memoise = False
+        if "first-match" in self._pragmas:
+            rule.first_match_alternation = True
+        if "token" in self._pragmas:
+            rule.token = True
+        if "atomic" in self._pragmas:
+            rule.atomic = True
         return rule
 
     def visit_rulelist(self, node: Node):
         """Visits a rulelist node, returning a list of Rule objects."""
-        return list(filter(NotNull, map(self.visit, node.children)))
+        rules: list[Rule] = []
+        for child in node.children:
+            if child.name == "rule":
+                rules.append(self.visit(child))
+            else:
+                # A comment line, or a blank one: its pragmas are for the
+                # rule that follows.
+                self._pending |= self._read_pragmas(child)
+        return rules
 
     def visit_rulename(self, node: Node):
         """Visits a rulename node, looks up the Rule object for rulename, and returns it."""
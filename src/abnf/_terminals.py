@@ -0,0 +1,168 @@
+"""Scanners for the bundled terminals of `Terminal.bundled`.
+
+Each is a function ``scan(source, start)`` returning where the longest match
+of its rule from `start` ends, or ``None`` if there is none: the same end
+``parse`` finds for the rule as the RFC writes it, found with string
+methods rather than by trying the rule's alternatives one by one.  The Rust
+backend has its own, in ``abnf_core::terminal``; these are the pure-Python
+backend's.
+"""
+
+from __future__ import annotations
+
+import typing
+
+_DIGITS = frozenset("0123456789")
+_HEXDIGITS = frozenset("0123456789ABCDEFabcdef")
+_BASE64_CHARS = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+)
+
+#: The characters an IPv4address is made of, and how long the longest is.
+_IPV4_CHARS = frozenset("0123456789.")
+_IPV4_LONGEST = len("255.255.255.255")
+
+#: The characters an IPv6address is made of, and how long the longest is.
+_IPV6_CHARS = _HEXDIGITS | frozenset(":.")
+_IPV6_LONGEST = len("ffff:ffff:ffff:ffff:ffff:ffff:255.255.255.255")
+
+
+def _run(source: str, start: int, chars: frozenset[str], limit: int) -> int:
+    """Where the run of `chars` from `start` ends, looking no further than
+    `limit` characters."""
+
+    end = start
+    stop = min(len(source), start + limit)
+    while end < stop and source[end] in chars:
+        end += 1
+    return end
+
+
+def _is_dec_octet(text: str) -> bool:
+    """Whether `text` is all of an RFC 3986 ``dec-octet``: 0 to 255, with
+    no leading zero."""
+
+    return (
+        0 < len(text) <= 3
+        and all(c in _DIGITS for c in text)
+        and (len(text) == 1 or text[0] != "0")
+        and int(text) <= 255
+    )
+
+
+def _is_ipv4(text: str) -> bool:
+    """Whether `text` is all of an ``IPv4address``."""
+
+    parts = text.split(".")
+    return len(parts) == 4 and all(_is_dec_octet(part) for part in parts)
+
+
+def _units(text: str, ipv4_last: bool) -> int | None:
+    """How many 16-bit pieces `text` -- ``h16`` separated by ":" -- spells
+    out, the last of which may be an ``IPv4address`` (two pieces) when
+    `ipv4_last`; ``None`` if it is not one of those.  Empty is none."""
+
+    if not text:
+        return 0
+    groups = text.split(":")
+    count = 0
+    for i, group in enumerate(groups):
+        if ipv4_last and i == len(groups) - 1 and "." in group:
+            if not _is_ipv4(group):
+                return None
+            count += 2
+        elif 0 < len(group) <= 4 and all(c in _HEXDIGITS for c in group):
+            count += 1
+        else:
+            return None
+    return count
+
+
+def _is_ipv6(text: str) -> bool:
+    """Whether `text` is all of an ``IPv6address``: eight pieces, or fewer
+    with one "::" standing for the rest."""
+
+    left, double, right = text.partition("::")
+    if not double:
+        return _units(text, True) == 8
+    if "::" in right:
+        return False
+    left_units = _units(left, False)
+    right_units = _units(right, True)
+    return (
+        left_units is not None
+        and right_units is not None
+        and left_units + right_units <= 7
+    )
+
+
+def _longest(
+    source: str,
+    start: int,
+    end: int,
+    valid: typing.Callable[[str], bool],
+) -> int | None:
+    """The longest ``source[start:stop]`` with ``stop <= end`` that is
+    `valid`, as `stop`."""
+
+    for stop in range(end, start, -1):
+        if valid(source[start:stop]):
+            return stop
+    return None
+
+
+def ipv4address(source: str, start: int) -> int | None:
+    """RFC 3986 ``IPv4address``."""
+
+    end = _run(source, start, _IPV4_CHARS, _IPV4_LONGEST)
+    return _longest(source, start, end, _is_ipv4)
+
+
+def ipv6address(source: str, start: int) -> int | None:
+    """RFC 3986 ``IPv6address``."""
+
+    end = _run(source, start, _IPV6_CHARS, _IPV6_LONGEST)
+    return _longest(source, start, end, _is_ipv6)
+
+
+def base64(source: str, start: int) -> int:
+    """RFC 9051 ``base64``: groups of four ``base64-char``, the last of
+    which may be padded with "=".  It matches the empty string."""
+
+    end = start
+    while end < len(source) and source[end] in _BASE64_CHARS:
+        end += 1
+    groups_end = start + (end - start) // 4 * 4
+    extra = end - groups_end
+    if extra == 2 and source.startswith("==", end):
+        return end + 2
+    if extra == 3 and source.startswith("=", end):
+        return end + 1
+    return groups_end
+
+
+def utf8_octets(source: str, start: int) -> int:
+    """RFC 3629 ``UTF8-octets``: octets -- characters up to U+00FF -- that
+    are well-formed UTF-8.  It matches the empty string."""
+
+    text = source[start:]
+    try:
+        octets = text.encode("latin-1")
+    except UnicodeEncodeError as exc:
+        octets = text[: exc.start].encode("latin-1")
+    try:
+        # Python's decoder is RFC 3629's: no overlong forms, surrogates or
+        # code points past U+10FFFF.
+        octets.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        return start + exc.start
+    return start + len(octets)
+
+
+#: The bundled scanners by the names of the rules they match.
+BUNDLED: dict[str, typing.Callable[[str, int], int | None]] = {
+    "IPv4address": ipv4address,
+    "IPv6address": ipv6address,
+    "base64": base64,
+    "UTF8-octets": utf8_octets,
+}
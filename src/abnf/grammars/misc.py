@@ -10,6 +10,8 @@ def load_grammar_rules(imported_rules: list[tuple[str, Rule]] | None = None):
     that cls is a Rule subclass with a grammar attribute.
     The imported_rules parameter allows one to import rules from other modules. For examples,
     see for instance rfc7230.py.
+
+    Rules are built from their text when first needed, not here; see Rule.warm_up.
     """
 
     def rule_decorator(cls: type[Rule]):
@@ -19,11 +21,10 @@ def load_grammar_rules(imported_rules: list[tuple[str, Rule]] | None = None):
             msg = "This decorator must be used with a grammar of type list"
             raise TypeError(msg)
 
-        for src in cls.grammar:
-            cls.create(src)
-        if imported_rules:
-            for rule_def in imported_rules:
-                cls(rule_def[0], rule_def[1].definition)
+        cls._defer_rules(
+            (src if src[-2:] == "\r\n" else src + "\r\n" for src in cls.grammar),
+            imported_rules or (),
+        )
         return cls
 
     return rule_decorator
@@ -34,12 +35,18 @@ def load_grammar_rulelist(imported_rules: list[tuple[str, Rule]] | None = None):
     that cls is a Rule subclass with a grammar attribute.
     The imported_rules parameter allows one to import rules from other modules. For examples,
     see for instance rfc7230.py.
+
+    Rules are built from their text when first needed, not here; see Rule.warm_up.
     """
 
     def rule_decorator(cls: type[Rule]):
         """The function returned by decorator."""
         assert isinstance(cls.grammar, str)
         src = cls.grammar.rstrip().replace("\r", "").replace("\n", "\r\n") + "\r\n"
+        rules = _split_rulelist(src)
+        if rules is not None:
+            cls._defer_rules(rules, imported_rules or ())
+            return cls
         node = ABNFGrammarRule("rulelist").parse_all(src)
         visitor = ABNFGrammarNodeVisitor(cls)
         visitor.visit(node)
@@ -50,3 +57,28 @@ def load_grammar_rulelist(imported_rules: list[tuple[str, Rule]] | None = None):
         return cls
 
     return rule_decorator
+
+
+def _split_rulelist(src: str) -> list[str] | None:
+    """The rules of rulelist `src`, each with the lines continuing it and
+    the comment lines before it, or None if it is not laid out that way.
+
+    A rule starts on a line starting with its name, and goes on over the
+    lines after it that start with whitespace; a line starting any other
+    way ends it.  Comment and blank lines between rules are kept with the
+    rule after them, whose pragmas they may hold.
+    """
+
+    rules: list[str] = []
+    before: list[str] = []
+    for line in (line + "\r\n" for line in src.split("\r\n")[:-1]):
+        if line[:1].isascii() and line[:1].isalpha():
+            rules.append("".join(before) + line)
+            before = []
+        elif line[:1] in (" ", "\t") and rules and not before:
+            rules[-1] += line
+        elif line.lstrip(" \t")[:1] in (";", "\r", ""):
+            before.append(line)
+        else:
+            return None
+    return rules
@@ -20,6 +20,10 @@ import os
 import typing
 import warnings
 
+# Imported before the rebinding below, so that the combinator classes they
+# walk are the pure-Python ones.  See `abnf._analysis`.
+from abnf import _analysis, _dfa, _forest  # noqa: F401
+
 # The pure-Python implementation is always loaded.  It supplies the
 # canonical Rule / NodeVisitor / exception types (which never have
 # Rust-backed equivalents) and is the fallback backend.
@@ -62,13 +66,23 @@ _REQUIRED_BACKEND_ATTRS = (
     "Option",
     "Literal",
     "Prose",
+    "Terminal",
     "Repeat",
     "Match",
     "Node",
     "LiteralNode",
     "set_definition_hook",
     "set_exclude_hook",
+    "set_pragma_hook",
     "bootstrap",
+    "ParseSession",
+    "first_set",
+    "required_literal",
+    "length_bounds",
+    "alphabet",
+    "freeze_hook",
+    "farthest_failure",
+    "evaluate_hook",
 )
 
 
@@ -129,6 +143,7 @@ Repetition = _backend.Repetition
 Option = _backend.Option
 Literal = _backend.Literal
 Prose = _backend.Prose
+Terminal = _backend.Terminal
 Repeat = _backend.Repeat
 Match = _backend.Match
 Node = _backend.Node
@@ -136,6 +151,8 @@ LiteralNode = _backend.LiteralNode
 
 # Always-Python helpers.  The Rust backend re-uses these from the
 # pure-Python module to avoid duplicating their (cheap) logic.
+Forest = _forest.Forest
+ForestNode = _forest.ForestNode
 ParseCache = _py.ParseCache
 ABNFGrammarNodeVisitor = _py.ABNFGrammarNodeVisitor
 CharValNodeVisitor = _py.CharValNodeVisitor
@@ -167,6 +184,18 @@ if _BACKEND == "rust":
     # `Rule.lparse` on every call, bottlenecking the Rust engine.
     Rule._set_definition_hook = staticmethod(_backend.set_definition_hook)
     Rule._set_exclude_hook = staticmethod(_backend.set_exclude_hook)
+    Rule._set_pragma_hook = staticmethod(_backend.set_pragma_hook)
+    Rule._freeze_hook = staticmethod(_backend.freeze_hook)
+    # A failed parse asks the engine how far into the input it got.
+    Rule._farthest_failure_hook = staticmethod(_backend.farthest_failure)
+    # `Rule.evaluate` walks the engine's match in Rust, calling into
+    # Python only for rules with actions.
+    Rule._evaluate_hook = staticmethod(_backend.evaluate_hook)
+    # `Rule.search` keeps one engine memo open across the offsets it
+    # tries, and asks the engine for the FIRST set and required literal of
+    # rules whose definitions Python cannot see into.
+    Rule._parse_session_hook = staticmethod(_backend.ParseSession)
+    _analysis._backend = _backend
     # Replace the pure-Python combinator trees registered into
     # ABNFGrammarRule._obj_map at _parser_python import time with
     # Rust-backed equivalents.  See abnf_rust.bootstrap.
@@ -179,6 +208,8 @@ __all__ = [
     "Alternation",
     "CharValNodeVisitor",
     "Concatenation",
+    "Forest",
+    "ForestNode",
     "GrammarError",
     "GrammarWarning",
     "Literal",
@@ -201,6 +232,7 @@ __all__ = [
     "Repetition",
     "Rule",
     "Source",
+    "Terminal",
     "next_longest",
     "sorted_by_longest_match",
 ]
@@ -0,0 +1,110 @@
+"""Validate whole arrays of strings against a rule at once.
+
+Requires NumPy (``pip install abnf[numpy]``)::
+
+    import numpy as np
+    from abnf.grammars import rfc5646
+    from abnf.vectorized import validate
+
+    tags = np.array(["en-GB", "x", "de-CH-1996"])
+    valid, offsets = validate(rfc5646.Rule("Language-Tag"), tags)
+
+A regular rule is compiled to a DFA, and every value advances through it one
+character per step, with NumPy doing all of them in one operation.  For any
+other rule each value is parsed in turn, exactly as ``parse_all`` would.
+"""
+
+from __future__ import annotations
+
+import typing
+
+import numpy as np
+
+from abnf import _dfa
+from abnf.parser import ParseError, Rule
+
+
+class Validation(typing.NamedTuple):
+    """What `validate` found, in the shape of the array it was given."""
+
+    #: ``True`` where the value matches the rule.
+    valid: np.ndarray
+    #: Where each invalid value stops matching, ``-1`` for a valid one.  See
+    #: `validate`.
+    offsets: np.ndarray
+
+
+def validate(rule: Rule, values: typing.Any) -> Validation:
+    """Check every string in `values` against `rule`, as ``parse_all`` would.
+
+    :param values: a NumPy array of ``str_`` or ``bytes_``, or anything
+        ``numpy.asarray`` makes one of.  Bytes are read as Latin-1, one
+        character per byte.
+    :returns: a boolean mask and the offset each invalid value went wrong
+        at.  For a rule compiled to a DFA that is the first character no
+        valid value could continue with there, or the value's length if it
+        stopped short.  Otherwise it is :attr:`ParseError.farthest`, which
+        points at the start of a literal that failed, not into it.
+    :raises TypeError: if `values` does not hold strings.
+    :raises GrammarError: if the rule, or one it refers to, is undefined.
+    """
+
+    array = np.asarray(values)
+    if array.dtype.kind not in "US":
+        msg = f"expected an array of str_ or bytes_; got {array.dtype}."
+        raise TypeError(msg)
+    flat = np.ascontiguousarray(array.reshape(-1))
+    dfa = _dfa.dfa(rule)
+    if dfa is None:
+        valid, offsets = _parse_each(rule, flat)
+    else:
+        valid, offsets = _run(dfa, flat)
+    return Validation(valid.reshape(array.shape), offsets.reshape(array.shape))
+
+
+def _run(dfa: _dfa.DFA, flat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Advance every value through `dfa` together, one column at a time."""
+
+    # A fixed-width array holds each value padded with NULs: one code point
+    # per column for str_, one byte for bytes_.
+    width = flat.dtype.itemsize // (4 if flat.dtype.kind == "U" else 1)
+    codes = flat.view(np.uint32 if flat.dtype.kind == "U" else np.uint8)
+    codes = codes.reshape(len(flat), width)
+    filled = codes != 0
+    # NumPy strips trailing NULs from a value, so the last one that is not
+    # is where it ends.
+    lengths = np.where(
+        filled.any(axis=1), width - np.argmax(filled[:, ::-1], axis=1), 0
+    )
+
+    table = np.frombuffer(dfa.table, dtype=np.intc).reshape(dfa.states, dfa.classes)
+    bounds = np.asarray(dfa.bounds, dtype=np.uint32)
+    state = np.full(len(flat), _dfa.START, dtype=np.intc)
+    offsets = np.full(len(flat), -1, dtype=np.intp)
+    for column in range(width):
+        rows = np.flatnonzero((column < lengths) & (state != _dfa.DEAD))
+        if not len(rows):
+            break
+        classes = np.searchsorted(bounds, codes[rows, column], side="right")
+        following = table[state[rows], classes]
+        state[rows] = following
+        offsets[rows[following == _dfa.DEAD]] = column
+
+    valid = np.frombuffer(dfa.accepting, dtype=np.bool_)[state]
+    # Still alive at the end, but not in a match: the value stopped short.
+    short = ~valid & (offsets < 0)
+    offsets[short] = lengths[short]
+    return valid, offsets
+
+
+def _parse_each(rule: Rule, flat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    valid = np.ones(len(flat), dtype=np.bool_)
+    offsets = np.full(len(flat), -1, dtype=np.intp)
+    for index, value in enumerate(flat.tolist()):
+        text = value if isinstance(value, str) else value.decode("latin-1")
+        try:
+            rule.parse_all(text)
+        except ParseError as error:
+            valid[index] = False
+            offsets[index] = error.farthest
+    return valid, offsets
@@ -54,3 +54,13 @@ def test_redefinition_keeps_latest_definition():
     assert R("foo").parse_all("b")
     with pytest.raises(ParseError):
         R("foo").parse_all("a")
+
+
+def test_unknown_pragma_warns_and_is_ignored():
+    class R(Rule):
+        pass
+
+    with pytest.warns(GrammarWarning, match="unknown pragma 'tokn'"):
+        R.create("foo = 1*%x61 ; @abnf: tokn atomic")
+    assert R("foo").atomic
+    assert not R("foo").token
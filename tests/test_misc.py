@@ -1,7 +1,10 @@
+from typing import ClassVar
+
 import pytest
 
+from abnf import _parser_python
 from abnf.grammars.misc import load_grammar_rulelist, load_grammar_rules
-from abnf.parser import Literal
+from abnf.parser import GrammarError, Literal, ParseError
 from abnf.parser import Rule as _Rule
 
 
@@ -36,3 +39,88 @@ class Foo(_Rule):
 def test_load_grammar_rules_str():
     with pytest.raises(TypeError):
         load_grammar_rules()(Foo)
+
+
+def test_grammar_rules_are_built_when_first_needed():
+    @load_grammar_rules([("test", ImportRule("test"))])
+    class Lazy(_Rule):
+        grammar: ClassVar[list[str] | str] = [
+            'pair = word "=" ( word / test )',
+            "word = 1*ALPHA",
+            'broken = "a" /',
+        ]
+
+    # Defined by name, but none of it parsed: not even the broken rule.
+    assert {rule.name for rule in Lazy.rules()} == {"pair", "word", "broken", "test"}
+    assert "_definition" not in vars(Lazy("word"))
+
+    assert Lazy("pair").parse_all("a=test").value == "a=test"
+    assert "_definition" in vars(Lazy("word"))
+    with pytest.raises(GrammarError, match='"broken"') as raised:
+        Lazy.warm_up(rules=["broken"])
+    assert isinstance(raised.value.__cause__, ParseError)
+    # Still deferred, so it fails the same way again.
+    with pytest.raises(GrammarError, match='"broken"'):
+        _ = Lazy("broken").definition
+    with pytest.raises(GrammarError):
+        Lazy.warm_up(rules=["missing"])
+
+
+def test_grammar_rules_are_named_as_their_text_first_names_them():
+    @load_grammar_rulelist([("Test", ImportRule("test"))])
+    class Lazy(_Rule):
+        grammar = """
+pair = WORD "=" ( <TEST> / word )
+word = 1*ALPHA
+"""
+
+    # Named before they are defined or imported, so the text's spelling
+    # stands, as it did when the text was loaded at once.
+    assert [rule.name for rule in Lazy.rules()] == ["pair", "WORD", "TEST"]
+    node = Lazy("pair").parse_all("a=test")
+    assert [child.name for child in node.children] == ["WORD", "literal", "TEST"]
+
+
+def test_grammar_rules_built_during_a_parse_leave_it_alone(monkeypatch):
+    @load_grammar_rules()
+    class Lazy(_Rule):
+        grammar: ClassVar[list[str] | str] = ['word = "if" / "do"']
+
+    class Outer(_Rule):
+        pass
+
+    Outer.create("x = 1*ALPHA")
+    Outer("x").exclude_rule(Lazy("word"))
+    assert "_definition" not in vars(Lazy("word"))
+
+    # The exclusion is first read partway through parsing "x", which is
+    # when "word" is built.
+    seen = []
+    parse_deferred = _parser_python._parse_deferred
+
+    def spying(sources):
+        seen.append((_parser_python._parse_memo.get(), _parser_python._parse_failures.get()))
+        return parse_deferred(sources)
+
+    monkeypatch.setattr(_parser_python, "_parse_deferred", spying)
+    with pytest.raises(ParseError):
+        Outer("x").parse_all("do")
+    assert seen == [(None, None)]
+    assert Outer("x").parse_all("done").value == "done"
+
+
+def test_grammar_rulelist_is_built_when_first_needed():
+    @load_grammar_rulelist()
+    class Lazy(_Rule):
+        grammar = """
+; @abnf: token
+pair = word "=" word
+  / word
+word = 1*ALPHA ; @abnf: atomic
+"""
+
+    assert "_definition" not in vars(Lazy("pair"))
+    Lazy.warm_up()
+    assert Lazy("pair").token and Lazy("word").atomic
+    assert Lazy("pair").parse_all("ab").value == "ab"
+    assert Lazy("pair").parse_all("ab=c").children[0].value == "ab=c"
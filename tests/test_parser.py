@@ -1,4 +1,5 @@
 import gc
+import itertools
 import json
 import pathlib
 import re
@@ -8,7 +9,7 @@ import textwrap
 import threading
 import warnings
 import weakref
-from typing import cast
+from typing import ClassVar, cast
 
 import pytest
 
@@ -35,6 +36,7 @@ from abnf.parser import (
     Repeat,
     Repetition,
     Rule,
+    Terminal,
     next_longest,
     sorted_by_longest_match,
 )
@@ -1993,3 +1995,1363 @@ def test_204_parse_tree_nodes_are_unhashable():
         hash(LiteralNode("a", 0, 1))
     with pytest.raises(TypeError):
         hash(Node("x"))
+
+
+def test_search_finds_the_first_match():
+    from abnf.grammars import rfc3986
+
+    line = '127.0.0.1 - - "GET http://example.com/a?b HTTP/1.1" 200'
+    found = rfc3986.Rule("URI").search(line)
+    assert found is not None
+    node, start, end = found
+    assert (node.value, start, end) == ("http://example.com/a?b", 19, 41)
+
+
+def test_search_returns_none_without_a_match():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('word = 1*"x" "y"')
+    assert Grammar("word").search("xxxz xz") is None
+    assert Grammar("word").search("") is None
+
+
+def test_search_honours_start():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('word = "ab"')
+    assert Grammar("word").search("ab ab", 1)[1:] == (3, 5)  # type: ignore[index]
+    with pytest.raises(ValueError):
+        Grammar("word").search("ab", 3)
+
+
+def test_search_matches_a_case_insensitive_literal():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('key = 1*DIGIT "=on"')
+    found = Grammar("key").search("x 12=ON y")
+    assert found is not None
+    assert (found[0].value, found[1], found[2]) == ("12=ON", 2, 7)
+
+
+def test_finditer_yields_non_overlapping_matches():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('num = 1*DIGIT ["." 1*DIGIT]')
+    matches = list(Grammar("num").finditer("a 1.5 b 22 c 3."))
+    assert [(n.value, s, e) for n, s, e in matches] == [
+        ("1.5", 2, 5),
+        ("22", 8, 10),
+        ("3", 13, 14),
+    ]
+
+
+def test_finditer_advances_past_empty_matches():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('a = *"a"')
+    matches = [(n.value, s, e) for n, s, e in Grammar("a").finditer("baab")]
+    assert matches == [("", 0, 0), ("aa", 1, 3), ("", 3, 3), ("", 4, 4)]
+
+
+def test_finditer_does_not_leak_the_parse_memo():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('a = "a"')
+    matches = Grammar("a").finditer("aa")
+    next(matches)
+    assert _parser_python._parse_memo.get() is None
+    assert len(list(matches)) == 1
+
+
+def test_search_requires_a_definition():
+    class Grammar(Rule):
+        pass
+
+    with pytest.raises(GrammarError):
+        Grammar("undefined").search("x")
+
+
+def test_search_analysis_of_bundled_grammars():
+    from abnf import _analysis
+    from abnf.grammars import rfc3986, rfc5322
+
+    uri = _analysis.first(rfc3986.Rule("URI"))
+    assert not uri.nullable
+    assert "h" in uri.chars and "H" in uri.chars and "/" not in uri.chars
+    assert _analysis.required_literal(rfc3986.Rule("URI")).text == ":"
+    assert _analysis.required_literal(rfc5322.Rule("addr-spec")).text == "@"
+
+
+def test_bounds_of_fixed_width_rules():
+    from abnf import _analysis
+    from abnf.grammars import rfc3986
+
+    assert _analysis.bounds(rfc3986.Rule("IPv4address")) == (7, 15)
+    assert _analysis.bounds(rfc3986.Rule("h16")) == (1, 4)
+    assert _analysis.bounds(rfc3986.Rule("URI")).max is None
+
+
+def test_bounds_of_a_recursive_rule_are_unbounded():
+    from abnf import _analysis
+
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('a = "x" / "(" a ")"')
+    assert _analysis.bounds(Grammar("a")) == (1, None)
+
+
+def test_bounds_follow_redefinition():
+    from abnf import _analysis
+
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('a = 2"x" b\r\nb = "y"\r\n')
+    assert _analysis.bounds(Grammar("a")) == (3, 3)
+    Grammar("b").definition = Literal("yyy")
+    assert _analysis.bounds(Grammar("a")) == (5, 5)
+    Grammar("a").parse_all("xxyyy")
+
+
+def test_parse_all_rejects_input_too_long_for_any_match():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('time = 2DIGIT ":" 2DIGIT')
+    with pytest.raises(ParseError) as info:
+        Grammar("time").parse_all("12:34" + "5" * 100_000)
+    assert info.value.start == 5
+
+
+def test_parse_all_rejects_input_too_short_for_any_match():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('time = 2DIGIT ":" 2DIGIT')
+    with pytest.raises(ParseError) as info:
+        Grammar("time").parse_all("12:3")
+    assert info.value.start == 0
+
+
+def test_concatenation_rejects_when_the_rest_cannot_fit():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('time = 2DIGIT ":" 2DIGIT')
+    with pytest.raises(ParseError) as info:
+        list(Grammar("time").definition.lparse("x 12:3", 2))
+    assert info.value.start == 2
+
+
+def test_bounds_leave_undefined_rules_to_raise():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('a = "xyz" b')
+    with pytest.raises(GrammarError):
+        Grammar("a").parse_all("xyz")
+    # Too short for "xyz" either way, but which error wins is the
+    # parser's business, not the length check's.
+    with pytest.raises(ParseError):
+        Grammar("a").parse_all("x")
+
+
+def test_nullable_analysis():
+    from abnf import _analysis
+    from abnf.grammars import rfc3986
+
+    assert _analysis.nullable(rfc3986.Rule("path-abempty"))
+    assert not _analysis.nullable(rfc3986.Rule("URI"))
+    assert _analysis.nullable(Option(Literal("x")))
+    assert not _analysis.nullable(Concatenation(Option(Literal("x")), Literal("y")))
+
+
+def test_nullable_repetitions_are_reported():
+    from abnf import _analysis
+
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('a = *( *" " [b] ) "."\r\nb = "x"\r\nc = *( *" " b )\r\n')
+    found = _analysis.nullable_repetitions(Grammar("a"))
+    assert [owner for owner, _ in found] == [Grammar("a")]
+    assert _analysis.nullable_repetitions(Grammar("c")) == []
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="Counts calls into a pure-Python combinator.",
+)
+def test_repetition_skips_zero_progress_rounds():
+    element = Alternation(
+        Concatenation(Repetition(Repeat(), Literal(" ")), Literal("x")),
+        Repetition(Repeat(), Literal("y")),
+    )
+    starts: list[int] = []
+    lparse = element.lparse
+
+    def counting(source, start):
+        starts.append(start)
+        return lparse(source, start)
+
+    element.lparse = counting  # type: ignore[method-assign]
+    parser = Repetition(Repeat(), element)
+    matches = list(parser.lparse("  xyy x!", 0))
+    assert matches[0].start == 7
+    # The frontier at "!" -- where the element could only match "" --
+    # is never tried.
+    assert 7 not in starts
+
+
+def _parse_or_none(rule, source):
+    """``rule.parse(source, 0)``, or None if it raises `ParseError`."""
+    try:
+        return rule.parse(source, 0)
+    except ParseError:
+        return None
+
+
+@pytest.mark.parametrize("first_match", [False, True])
+def test_adaptive_alternation_does_not_change_results(first_match):
+    class Plain(Rule):
+        pass
+
+    class Adaptive(Rule):
+        adaptive_alternation = True
+
+    grammar = 'a = "x" / "ab" / 1*"a" / "abc" / ("a" "b" "c" "d")'
+    Plain.create(grammar)
+    Adaptive.create(grammar)
+    Plain("a").first_match_alternation = first_match
+    Adaptive("a").first_match_alternation = first_match
+    assert Adaptive.adaptive_alternation
+    assert Adaptive("a").adaptive_alternation
+    # Warm the ordering towards the later alternatives.
+    Adaptive.load_alternation_stats({"a": [[0, 0, 0, 5, 9]]})
+    for source in ["x", "ab", "aaa", "abc", "abcd", "abce", "q", ""]:
+        assert _parse_or_none(Adaptive("a"), source) == _parse_or_none(
+            Plain("a"), source
+        )
+
+
+def test_alternation_stats_round_trip_through_json():
+    class Grammar(Rule):
+        adaptive_alternation = True
+
+    Grammar.load_grammar('a = "x" / "y" / b\r\nb = "1" / "2"\r\nc = "z"\r\n')
+    for source in ["y", "y", "1", "x"]:
+        Grammar("a").parse_all(source)
+    stats = Grammar.alternation_stats()
+    assert stats == {"a": [[1, 2, 1]], "b": [[1, 0]]}
+
+    class Restarted(Rule):
+        adaptive_alternation = True
+
+    Restarted.load_grammar('a = "x" / "y" / b\r\nb = "1" / "2" / "3"\r\n')
+    Restarted.load_alternation_stats(json.loads(json.dumps(stats)))
+    # "b" changed shape, so its counts no longer describe it.
+    assert Restarted.alternation_stats() == {"a": [[1, 2, 1]], "b": [[0, 0, 0]]}
+
+
+def test_adaptive_alternation_is_off_by_default():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('a = "x" / "y"')
+    assert not Grammar.adaptive_alternation
+    assert not Grammar("a").adaptive_alternation
+    Grammar("a").parse_all("y")
+    assert Grammar.alternation_stats() == {"a": [[0, 0]]}
+    Grammar("a").adaptive_alternation = True
+    Grammar("a").parse_all("y")
+    assert Grammar.alternation_stats() == {"a": [[0, 1]]}
+
+
+def test_alternation_hits_want_one_count_per_alternative():
+    alternation = Alternation(Literal("x"), Literal("y"))
+    with pytest.raises(ValueError):
+        alternation.hits = [1]
+
+
+def test_profile_reports_rules_and_alternatives_used():
+    class Grammar(Rule):
+        grammar: ClassVar[list[str] | str] = [
+            'a = b / c / "z"',
+            'b = "x" 1*"y"',
+            'c = "q"',
+        ]
+
+    for source in Grammar.grammar:
+        Grammar.create(source)
+    profile = Grammar.profile({"a": ["xyy", "q", "xy", "!"], "c": ["q"]})
+    assert json.loads(json.dumps(profile)) == profile
+    assert profile["inputs"] == {"a": 4, "c": 1}
+    assert profile["rejected"] == {"a": 1}
+    assert profile["rules"] == {"a": 3, "b": 2, "c": 2}
+    assert profile["alternations"] == {"a": [[2, 1, 0]]}
+    # The profile parsed a copy; this grammar counted nothing.
+    assert Grammar.alternation_stats() == {"a": [[0, 0, 0]]}
+
+
+def test_specialize_parses_identically():
+    class Grammar(Rule):
+        grammar: ClassVar[list[str] | str] = [
+            'a = "x" / "ab" / 1*"a" / "abc" / ("a" "b" "c" "d") / k',
+            'k = "k" / "kk"',
+            "i = 1*ALPHA",
+            'n = "y" / "z"',
+            'ip = 1*3DIGIT 3("." 1*3DIGIT)',
+            "host = ip / i",
+        ]
+
+    for source in Grammar.grammar:
+        Grammar.create(source)
+    Grammar("a").first_match_alternation = True
+    Grammar("i").exclude_rule(Grammar("n"))
+    # Settings made in code, a definition among them.
+    Grammar("ip").definition = Terminal.bundled("IPv4address")
+    Grammar("k").token = True
+    Grammar("n").atomic = True
+    Grammar("i").memoise = True
+    sources = ["x", "ab", "aaa", "abc", "abcd", "k", "kk", "q", ""]
+    hosts = ["1.2.3.4", "999.2.3.4", "ab"]
+    profile = Grammar.profile({"a": sources, "i": ["y", "w"], "host": hosts})
+    Specialized = Grammar.specialize(json.loads(json.dumps(profile)))
+
+    assert issubclass(Specialized, Grammar)
+    assert Specialized("a") is not Grammar("a")
+    assert Specialized("a").first_match_alternation
+    assert Specialized("i").exclude is Specialized("n")
+    assert Specialized("k").token
+    assert Specialized("n").atomic
+    assert Specialized("i").memoise is True
+    assert Specialized("ip").definition is Grammar("ip").definition
+    assert not Grammar("a").adaptive_alternation
+    cases = [("a", s) for s in sources] + [("i", "y"), ("i", "w")]
+    for name, source in [*cases, *(("host", s) for s in hosts)]:
+        assert _parse_or_none(Specialized(name), source) == _parse_or_none(
+            Grammar(name), source
+        )
+    assert _parse_or_none(Specialized("host"), "999.2.3.4") is None
+
+    # One copy per profile, kept until the grammar changes: rules live as
+    # long as their grammar, so a copy per call would pile them up.
+    size = len(Rule._obj_map)
+    for _ in range(3):
+        assert Grammar.specialize(profile) is Specialized
+        assert Grammar.profile({"a": sources}) == Grammar.profile({"a": sources})
+    assert len(Rule._obj_map) == size
+    Grammar("a").first_match_alternation = False
+    assert not Grammar.specialize(profile)("a").first_match_alternation
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="Counts calls into the pure-Python rules.",
+)
+def test_specialize_tries_the_usual_winner_first(monkeypatch):
+    class Grammar(Rule):
+        grammar: ClassVar[list[str] | str] = [
+            "a = p / q / r / s",
+            'p = "p" DIGIT',
+            'q = "q" DIGIT',
+            'r = "r" DIGIT',
+            's = "s" DIGIT',
+            'w = "s" / "s1"',
+        ]
+
+    for source in Grammar.grammar:
+        Grammar.create(source)
+    Specialized = Grammar.specialize(
+        Grammar.profile({"a": ["s1"] * 8 + ["p1"], "w": ["s1"]})
+    )
+    (alternation,) = Specialized("a")._alternation_parsers()
+    assert alternation.ordered
+    assert not alternation.adaptive
+    # Longest match has to try every alternative of "w" anyway.
+    (alternation,) = Specialized("w")._alternation_parsers()
+    assert not alternation.ordered
+
+    # The rules of both grammars are instances of ``Grammar``.
+    tried: list[str] = []
+    for name in ("lparse", "_lparse_one"):
+        original = getattr(Grammar, name)
+
+        def counting(self, *args, original=original):
+            tried.append(self.name)
+            return original(self, *args)
+
+        monkeypatch.setattr(Grammar, name, counting)
+
+    expected = Grammar("a").parse_all("s1")
+    plain = [name for name in tried if name != "a"]
+    tried.clear()
+    assert Specialized("a").parse_all("s1") == expected
+    assert plain == ["p", "q", "r", "s"]
+    assert [name for name in tried if name != "a"] == ["s"]
+    # The profiled order is followed, not counted.
+    assert Specialized.alternation_stats()["a"] == [[1, 0, 0, 8]]
+
+
+def test_alphabet_is_every_terminal_reached():
+    from abnf import _analysis
+
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('a = "ok" / %x30-39 b\r\nb = "(" a ")" / %s"Q"\r\n')
+    alphabet = _analysis.alphabet(Grammar("a"))
+    assert alphabet is not None
+    assert all(c in alphabet for c in "oOkK()Q0123456789")
+    assert "q" not in alphabet
+    assert "x" not in alphabet
+    Grammar.create("c = a undefined")
+    assert _analysis.alphabet(Grammar("c")) is None
+
+
+def test_parse_all_rejects_alien_characters_where_they_are():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create('a = 1*( "x" / "y" )')
+    with pytest.raises(ParseError) as exc_info:
+        Grammar("a").parse_all("xyxy\x00xyxy")
+    assert exc_info.value.start == 4
+    assert Grammar("a").is_valid("xYxy")
+    assert not Grammar("a").is_valid("xy!")
+    assert not Grammar("a").is_valid("")
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="Counts the pure-Python engine's Node constructions.",
+)
+def test_nodes_are_built_only_for_the_winning_derivation(monkeypatch):
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('a = b "!" / b "?" / b\r\nb = 1*c\r\nc = "x"\r\n')
+    built: list[str] = []
+
+    class CountingNode(_parser_python.Node):
+        __slots__ = ()
+
+        def __init__(self, name: str, *children: Node) -> None:
+            built.append(name)
+            super().__init__(name, *children)
+
+    monkeypatch.setattr(_parser_python, "Node", CountingNode)
+    node = Grammar("a").parse_all("xxx?")
+    assert node.value == "xxx?"
+    # One per rule in the tree -- not one per candidate tried along the way:
+    # three lengths of b, each tried for all three alternatives.
+    assert sorted(built) == ["a", "b", "c", "c", "c"]
+
+
+def test_long_repetition_builds_its_tree_without_recursion():
+    rule = Rule.create('long-run = 1*"x"')
+    node = rule.parse_all("x" * 20000)
+    assert len(node.children) == 20000
+    assert node.value == "x" * 20000
+
+
+def test_parse_forest_counts_and_enumerates_every_derivation():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('s = 1*( "a" / "aa" )\r\nt = x x\r\nx = "a" / "a"\r\n')
+    forest = Grammar("s").parse_forest("aaaa")
+    # Compositions of 4 into 1s and 2s.
+    assert forest.count() == 5
+    trees = list(forest.trees())
+    assert len(trees) == 5
+    assert sorted(tuple(child.value for child in tree.children) for tree in trees) == [
+        ("a", "a", "a", "a"),
+        ("a", "a", "aa"),
+        ("a", "aa", "a"),
+        ("aa", "a", "a"),
+        ("aa", "aa"),
+    ]
+    # Counted, not enumerated: Fibonacci(3001) derivations.
+    assert len(str(Grammar("s").parse_forest("a" * 3000).count())) == 627
+
+    # Both alternatives of x match the same text: four derivations, and
+    # the nodes for each x are shared between them.
+    forest = Grammar("t").parse_forest("aa")
+    assert forest.count() == 4
+    (definition,) = forest.root.families[0]
+    assert definition.count() == 4
+    assert forest.root.name == "t"
+    assert definition.name is None
+    assert definition.value == "aa"
+
+
+def test_parse_forest_of_unambiguous_input_is_the_parse_tree():
+    from abnf.grammars import rfc3986
+
+    uri = "http://user@example.com:80/a/b?q=1#frag"
+    forest = rfc3986.Rule("URI").parse_forest(uri)
+    assert forest.count() == 1
+    assert list(forest) == [rfc3986.Rule("URI").parse_all(uri)]
+
+
+def test_parse_forest_follows_first_match_and_exclusions():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar(
+        'a = 1*b\r\nb = "x" / "xx"\r\nc = 1*d\r\nd = "x" / "xx"\r\n'
+        'i = 1*ALPHA\r\nk = "if"\r\n'
+    )
+    Grammar("d").first_match_alternation = True
+    Grammar("i").exclude_rule(Grammar("k"))
+    assert Grammar("a").parse_forest("xxx").count() == 3
+    # d only ever matches one "x".
+    assert Grammar("c").parse_forest("xxx").count() == 1
+    assert Grammar("i").parse_forest("iff").count() == 1
+    with pytest.raises(ParseError):
+        Grammar("i").parse_forest("if")
+    with pytest.raises(ParseError) as exc_info:
+        Grammar("a").parse_forest("xx!")
+    assert exc_info.value.start == 2
+
+
+def test_parse_forest_sees_through_definitions_it_cannot_walk():
+    class Opaque:
+        """A combinator that does not show its parts, as the Rust
+        backend's do not."""
+
+        def __init__(self, parser):
+            self._parser = parser
+
+        def lparse(self, source, start):
+            return self._parser.lparse(source, start)
+
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('t = x x\r\nx = "a" / "a"\r\nu = 2y\r\n')
+    # Built from text: the forest builds it again, and walks that.
+    x = Grammar("x")
+    x.definition = Opaque(x.definition)
+    x._source = (x.definition, *x._source[1:])
+    assert Grammar("t").parse_forest("aa").count() == 4
+    # Built in code: one part, with a derivation per end.
+    Grammar("y").definition = Opaque(Alternation(Literal("b"), Literal("b")))
+    forest = Grammar("u").parse_forest("bb")
+    assert forest.count() == 1
+    assert list(forest) == [Grammar("u").parse_all("bb")]
+
+
+def test_frozen_grammar_refuses_changes():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('a = b / "y"\r\nb = 1*ALPHA\r\nk = "if"\r\n')
+    Grammar("b").exclude_rule(Grammar("k"))
+    Grammar.freeze()
+    Grammar.freeze()
+    assert Grammar("a").parse_all("iff").value == "iff"
+    with pytest.raises(ParseError):
+        Grammar("a").parse_all("if")
+    with pytest.raises(GrammarError):
+        Grammar("a").definition = Literal("z")
+    with pytest.raises(GrammarError):
+        Grammar("b").exclude = None
+    with pytest.raises(GrammarError):
+        Grammar("a").first_match_alternation = True
+    with pytest.raises(GrammarError):
+        Grammar.create('c = "z"')
+    with pytest.raises(GrammarError):
+        Grammar("c")
+    # Reached from the grammar, so frozen with it.
+    with pytest.raises(GrammarError):
+        Rule("ALPHA").exclude = None
+
+    class Derived(Grammar):
+        pass
+
+    assert Derived.create('a = "z"').parse_all("z").value == "z"
+
+
+def test_freeze_requires_every_rule_defined():
+    class Grammar(Rule):
+        pass
+
+    Grammar.create("a = undefined")
+    with pytest.raises(GrammarError, match="undefined"):
+        Grammar.freeze()
+    Grammar.create('undefined = "x"')
+    Grammar.freeze()
+    assert Grammar("a").parse_all("x").value == "x"
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="Inspects the pure-Python analysis cache.",
+)
+def test_frozen_analyses_outlive_changes_elsewhere():
+    from abnf import _analysis
+
+    class Grammar(Rule):
+        pass
+
+    class Other(Rule):
+        pass
+
+    Grammar.create('a = 1*"x"')
+    Grammar.freeze()
+    Other.create('a = "y"')
+    _analysis.first(Other("a"))
+    Other.create('b = "z"')
+    assert _analysis._cached("first", Grammar("a")) is not _analysis._MISSING
+    assert _analysis._cached("first", Other("a")) is _analysis._MISSING
+    assert Grammar("a").parse_all("xxx").value == "xxx"
+
+
+def test_bounded_repetition_of_single_characters():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('a = 2DIGIT 1*4HEXDIG\r\nb = 2c\r\nc = %x61-7A\r\nk = "q"\r\n')
+    node = Grammar("a").parse_all("12fA9")
+    assert [child.name for child in node.children] == ["DIGIT"] * 2 + ["HEXDIG"] * 3
+    # HEXDIG's first alternative is DIGIT, so a digit is wrapped in both.
+    assert node.children[4].children[0].name == "DIGIT"
+    assert Grammar("a").parse("12abcdef", 0)[1] == 6
+    with pytest.raises(ParseError):
+        Grammar("a").parse_all("1")
+    assert Grammar("b").parse_all("xy").value == "xy"
+    Grammar("c").exclude_rule(Grammar("k"))
+    with pytest.raises(ParseError):
+        Grammar("b").parse_all("qy")
+
+
+def test_option_yields_element_matches_then_the_empty_match():
+    option = Option(Alternation(Literal("x"), Literal("xx")))
+    assert [match.start for match in option.lparse("xxx", 0)] == [2, 1, 0]
+    assert [match.start for match in option.lparse("y", 0)] == [0]
+    nullable = Option(Repetition(Repeat(0, None), Literal("x")))
+    assert [match.start for match in nullable.lparse("xx!", 0)] == [2, 1, 0]
+    rule = Rule.create('optional-tail = "a" [ "b" optional-tail ]')
+    assert rule.parse_all("ababa").value == "ababa"
+
+
+def test_concatenation_keeps_one_candidate_per_end_offset():
+    parser = Concatenation(
+        Alternation(Literal("a"), Literal("a")),
+        Alternation(Literal("a"), Literal("aa")),
+    )
+    assert [match.start for match in parser.lparse("aaa", 0)] == [3, 2]
+
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('a = b c\r\nb = "a" / x\r\nx = "a"\r\nc = "a" / "aa"\r\n')
+    node = Grammar("a").parse_all("aaa")
+    # b's first alternative, as before: the representative kept is the first.
+    assert [child.name for child in node.children[0].children] == ["literal"]
+
+
+def test_parse_error_reports_the_farthest_failure():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar(
+        'pair = key "=" value\r\nkey = 1*ALPHA\r\nvalue = 1*DIGIT ";"\r\n'
+    )
+    with pytest.raises(ParseError) as info:
+        Grammar("pair").parse_all("abc=123a")
+    assert info.value.start == 0
+    assert info.value.farthest == 7
+    assert len(info.value.expected) == 2
+    assert "farthest 7: expected" in str(info.value)
+    # Nothing recorded for an exception built by hand.
+    error = ParseError(Literal("a"), 1)
+    assert (error.farthest, error.expected) == (1, ())
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="the Rust engine describes its own failures",
+)
+def test_parse_error_expects_terminals_where_parts_were_skipped():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar(
+        'host = ip / name\r\nip = 1*3DIGIT\r\nname = ALPHA *( ALPHA / "-" ) "."\r\n'
+    )
+    Grammar("ip").definition = Terminal.bundled("IPv4address")
+    # "name" cannot start at "!", and "*( ALPHA / "-" )" cannot go on at the
+    # end: neither is tried, and what they start with is what is expected.
+    with pytest.raises(ParseError) as info:
+        Grammar("host").parse_all("!")
+    assert info.value.expected == (
+        "Terminal('IPv4address')",
+        "Literal(('A', 'Z'))",
+        "Literal(('a', 'z'))",
+    )
+    with pytest.raises(ParseError) as info:
+        Grammar("host").parse_all("ab")
+    assert info.value.expected == (
+        "Literal(('A', 'Z'))",
+        "Literal(('a', 'z'))",
+        "Literal('-')",
+        "Literal('.')",
+    )
+
+
+def test_parse_error_message_is_bounded():
+    parser = Alternation(*(Literal(f"word{i}") for i in range(1000)))
+    message = str(ParseError(parser, 0))
+    assert len(message) < 300
+    assert message.startswith("Alternation(Literal('word0')")
+    assert str(ParseError(parser, 0)) == message
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="the analysis sees into pure-Python definitions only",
+)
+def test_only_repetitions_entered_twice_at_one_offset_are_memoised():
+    from abnf import _analysis
+
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('top = *item ";" / 1*item ","\r\nitem = 1*"a" [ "b" ]\r\n')
+    top = Grammar("top").definition.parsers
+    # Each repetition of `item` is where the parse of `top` is at its start,
+    # once.  (Two `*item` would be one shared repetition, entered twice.)
+    assert not any(_analysis.reentrant(branch.parsers[0]) for branch in top)
+    # `item` is reached from both, so at one offset twice.
+    item = Grammar("item").definition.parsers
+    assert _analysis.reentrant(item[0])
+    assert _analysis.reentrant(item[1])
+
+    assert Grammar("top").parse_all("aaba,").value == "aaba,"
+    Grammar("top").memoise = True
+    forced = Grammar("top").definition.parsers
+    assert all(branch.parsers[0]._memoise for branch in forced)
+    Grammar("item").memoise = False
+    own = Grammar("item").definition.parsers
+    assert own[0] is not item[0]
+    assert own[0].memoise is own[1].memoise is False
+    assert item[0].memoise is None
+    assert Grammar("top").parse_all("aaba,").value == "aaba,"
+    # Back to the analysis, and to the repetitions other rules share.
+    Grammar("item").memoise = None
+    assert Grammar("item").definition.parsers[0] is item[0]
+
+    # A definition built in code takes its settings as it is built.
+    Grammar("code", Repetition(Repeat(1), Literal("a"), memoise=True))
+    assert Grammar("code").definition.memoise is True
+    with pytest.raises(GrammarError, match='"code"'):
+        Grammar("code").memoise = False
+
+
+def test_finite_exclusion_is_matched_by_spelling():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar(
+        'ident = 1*ALPHA\r\nkw = "if" / %s"Nil" / %x41-42 "x" / "do" / "done"\r\n'
+    )
+    Grammar("ident").exclude_rule(Grammar("kw"))
+    for text in ("if", "IF", "Nil", "Ax", "Bx", "do", "DONE"):
+        with pytest.raises(ParseError):
+            Grammar("ident").parse_all(text)
+    for text in ("nil", "ax", "i", "iff", "don"):
+        assert Grammar("ident").parse_all(text).value == text
+    # First match changes what the rule matches: "done" is no longer in it.
+    Grammar("kw").first_match_alternation = True
+    assert Grammar("ident").parse_all("done").value == "done"
+    with pytest.raises(ParseError):
+        Grammar("ident").parse_all("do")
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="the analysis sees into pure-Python definitions only",
+)
+def test_lexicon_enumerates_only_small_finite_languages():
+    from abnf import _analysis
+
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar(
+        'kw = "a" / 2"b" %s"C"\r\nmany = 1*"a"\r\nwide = %x0-10FFFF\r\n'
+        'deep = 12("a" / "b")\r\nloop = "x" [loop]\r\n'
+    )
+    lexicon = _analysis.lexicon(Grammar("kw"))
+    assert lexicon is not None
+    assert "A" in lexicon
+    assert "bBC" in lexicon
+    assert "bbc" not in lexicon
+    for name in ("many", "wide", "deep", "loop"):
+        assert _analysis.lexicon(Grammar(name)) is None
+
+
+def test_deterministic_rules_parse_through_the_single_result_path():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar(
+        'date = 4DIGIT "-" 2DIGIT "-" day\r\nday = 2DIGIT / "xx"\r\n'
+        'loose = 1*2DIGIT / "a" / "ab"\r\ntag = pair "!"\r\npair = 2ALPHA\r\n'
+        'kw = "aa"\r\n'
+    )
+    Grammar("pair").exclude_rule(Grammar("kw"))
+    assert Grammar("date").parse_all("2024-01-xx").value == "2024-01-xx"
+    node, end = Grammar("date").parse("2024-01-311", 0)
+    assert (node.value, end) == ("2024-01-31", 10)
+    with pytest.raises(ParseError) as info:
+        Grammar("date").parse_all("2024-01-3x")
+    assert info.value.farthest == 9
+    assert Grammar("loose").parse_all("ab").value == "ab"
+    assert Grammar("tag").parse_all("ab!").value == "ab!"
+    with pytest.raises(ParseError):
+        Grammar("tag").parse_all("AA!")
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="the analysis sees into pure-Python definitions only",
+)
+def test_determinism_needs_disjoint_alternatives_and_fixed_counts():
+    from abnf import _analysis
+
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar(
+        'date = 4DIGIT "-" day\r\nday = 2DIGIT / "xx"\r\nloose = 1*2DIGIT\r\n'
+        'overlap = "a" / "ab"\r\nmaybe = ["a"]\r\nnest = "(" [nest] ")"\r\n'
+    )
+    assert _analysis.deterministic(Grammar("date"))
+    for name in ("loose", "overlap", "maybe", "nest"):
+        assert not _analysis.deterministic(Grammar(name))
+
+
+def test_prefix_free_alternations_stop_at_the_first_match():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar(
+        'method = "GET" / "POST"\r\nsym = DIGIT / ALPHA\r\nkw = "ab" / "ac"\r\n'
+        'overlap = "a" / "ab"\r\nmaybe = ["x"] / "y"\r\nmany = 1*"a" / "ab"\r\n'
+        'pair = ("x" / "y") "q" / "z"\r\n'
+    )
+    assert Grammar.prefix_free_alternations() == {
+        "method": [True],
+        "sym": [True],
+        "kw": [True],
+        "overlap": [False],
+        "maybe": [False],
+        "many": [False],
+        "pair": [True, True],
+    }
+    assert Grammar("kw").parse_all("ac").value == "ac"
+    assert Grammar("overlap").parse_all("ab").value == "ab"
+    assert Grammar("many").parse_all("ab").value == "ab"
+    assert Grammar("pair").parse_all("yq").value == "yq"
+    # The analysis follows redefinitions.
+    # "ab" / "ac" still qualifies; the alternation "=/" makes of it and "a"
+    # does not.
+    Grammar.create('kw =/ "a"')
+    assert Grammar.prefix_free_alternations()["kw"] == [True, False]
+    assert Grammar("kw").parse_all("ac").value == "ac"
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="Rust combinators do not expose their parts.",
+)
+def test_grammar_text_shares_structurally_identical_combinators():
+    class Grammar(Rule):
+        pass
+
+    class Other(Rule):
+        pass
+
+    Grammar.load_grammar(
+        'a = 2DIGIT "-" 1*tok\r\nb = 2DIGIT "+" 1*tok\r\ntok = "x" / "y"\r\n'
+        'c = "x" / "y"\r\n'
+    )
+    Other.load_grammar('a = 2DIGIT "-" 1*tok\r\ntok = "x" / "y"\r\n')
+    a, b = Grammar("a").definition.parsers, Grammar("b").definition.parsers
+    assert a[0] is b[0]
+    assert a[2] is b[2]
+    assert a[1] is not b[1]
+    # Core rules are shared between grammars; their own rules are not.
+    other = Other("a").definition.parsers
+    assert other[0] is a[0]
+    assert other[1] is a[1]
+    assert other[2] is not a[2]
+    # Alternations carry per-rule settings, so each rule keeps its own.
+    assert Grammar("tok").definition is not Grammar("c").definition
+    Grammar("tok").first_match_alternation = True
+    assert not Grammar("c").first_match_alternation
+    assert Grammar("b").parse_all("12+xy").value == "12+xy"
+    # Nor can a memoisation setting on one leak into the other grammar.
+    with pytest.raises(AttributeError):
+        a[0].memoise = False
+    Grammar.load_grammar('d = 2DIGIT "-" ; @abnf: nomemo\r\n')
+    (own, _) = Grammar("d").definition.parsers
+    assert own is not a[0]
+    assert own.memoise is False
+    assert a[0].memoise is other[0].memoise is None
+    # Set on one rule, it gives that rule a copy, keeping the rule's
+    # alternation settings.
+    Grammar("tok").memoise = True
+    assert Grammar("tok").first_match_alternation
+    Grammar("b").memoise = True
+    forced = Grammar("b").definition.parsers
+    assert forced[0] is not a[0]
+    assert forced[0].memoise is True
+    assert a[0].memoise is None
+    assert Grammar("b").parse_all("12+xy").value == "12+xy"
+
+
+def test_frozen_regular_rules_parse_and_fail_as_before():
+    grammar = (
+        'list = item *("," item)\r\nitem = time / name\r\n'
+        'time = 2DIGIT ":" 2DIGIT [":" 2DIGIT]\r\nname = 1*ALPHA *(DIGIT / ALPHA)\r\n'
+    )
+
+    class Grammar(Rule):
+        pass
+
+    class Frozen(Rule):
+        pass
+
+    Grammar.load_grammar(grammar)
+    Frozen.load_grammar(grammar)
+    Frozen.freeze()
+    for text in ("12:34,ab1,12:34:56", "12:34:5", "ab,12:3x", "12:34,"):
+        try:
+            expected = str(Grammar("list").parse_all(text))
+        except ParseError as exc:
+            with pytest.raises(ParseError) as raised:
+                Frozen("list").parse_all(text)
+            assert (raised.value.start, raised.value.farthest) == (
+                exc.start,
+                exc.farthest,
+            )
+            assert [
+                description.replace("Frozen(", "Grammar(")
+                for description in raised.value.expected
+            ] == list(exc.expected)
+        else:
+            assert str(Frozen("list").parse_all(text)) == expected
+        node, end = Frozen("list").parse(text, 0)
+        reference, reference_end = Grammar("list").parse(text, 0)
+        assert (str(node), end) == (str(reference), reference_end)
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="Inspects the pure-Python DFA.",
+)
+def test_frozen_rules_compile_a_minimal_dfa_on_first_use():
+    from abnf import _dfa
+
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar(
+        'time = 2DIGIT ":" 2DIGIT [":" 2DIGIT]\r\nnest = "(" *nest ")"\r\n'
+    )
+    # One state per position, and a dead one.
+    assert _dfa.dfa(Grammar("time")).states == 10
+    assert _dfa.dfa(Grammar("time")).ends("12:34:5x", 0) == ([5], 7)
+    assert _dfa.dfa(Grammar("nest")) is None
+    Grammar.freeze()
+    assert Grammar("time")._automaton is True
+    assert Grammar("time").parse("12:34:56", 0)[1] == 8
+    assert isinstance(Grammar("time")._automaton, _dfa.DFA)
+    Grammar("nest").parse_all("(())")
+    assert Grammar("nest")._automaton is None
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="Counts calls into the pure-Python combinators.",
+)
+def test_frozen_rules_reject_and_build_trees_without_parsing(monkeypatch):
+    grammar = (
+        'list = item *("," item)\r\nitem = time / name\r\n'
+        'time = 2DIGIT ":" 2DIGIT [":" 2DIGIT]\r\nname = 1*ALPHA *(DIGIT / ALPHA)\r\n'
+    )
+
+    class Grammar(Rule):
+        pass
+
+    class Frozen(Rule):
+        pass
+
+    Grammar.load_grammar(grammar)
+    Frozen.load_grammar(grammar)
+    Frozen.freeze()
+    bad, good = "12:34,ab1,12:3x", "12:34,ab1,12:34:56"
+    with pytest.raises(ParseError) as reference:
+        Grammar("list").parse_all(bad)
+    tree = str(Grammar("list").parse_all(good))
+    Frozen("list").parse_all(good)
+
+    calls = []
+    for cls in (Alternation, Concatenation, Option, Repetition):
+        for name in ("lparse", "_lparse_one"):
+            original = getattr(cls, name, None)
+            if original is None:
+                continue
+
+            def counting(self, *args, original=original):
+                calls.append(self)
+                return original(self, *args)
+
+            monkeypatch.setattr(cls, name, counting)
+
+    with pytest.raises(ParseError) as raised:
+        Frozen("list").parse_all(bad)
+    assert calls == []
+    # Where it failed is found by parsing, once it is asked.
+    assert raised.value.farthest == reference.value.farthest
+    assert calls
+    calls.clear()
+    assert str(Frozen("list").parse_all(good)) == tree
+    assert calls == []
+
+
+def test_frozen_rules_build_the_trees_parsing_does():
+    # Ambiguous, so that the tree depends on which derivation is kept.
+    grammar = (
+        "p = 1*( a / aa ) a\r\nq = *a *( b / a ) [ b ]\r\n"
+        "r = [ a ] *( a / ab ) *b\r\ns = ( a / a a / 2a ) *( a b / ab )\r\n"
+        "t = 2*3( 1*2a ) 0*1a\r\nu = *( ab / a / b ) *( ba / b ) a\r\n"
+        'a = "a"\r\nb = "b"\r\naa = "aa"\r\nab = "ab"\r\nba = "ba"\r\n'
+    )
+
+    class Grammar(Rule):
+        pass
+
+    class Frozen(Rule):
+        pass
+
+    Grammar.load_grammar(grammar)
+    Frozen.load_grammar(grammar)
+    Frozen.freeze()
+
+    def tree(rule, text):
+        try:
+            return str(rule.parse(text, 0)[0])
+        except ParseError:
+            return None
+
+    for name in "pqrstu":
+        for length in range(7):
+            for chars in itertools.product("ab", repeat=length):
+                text = "".join(chars)
+                assert tree(Frozen(name), text) == tree(Grammar(name), text), text
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="Inspects the pure-Python analysis.",
+)
+def test_repetitions_nothing_after_can_start_like_are_possessive():
+    from abnf import _analysis
+
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar(
+        'pair = token "=" token\r\ntoken = 1*tchar\r\ntchar = ALPHA / DIGIT / "-"\r\n'
+        'decimal = 1*%x660-669 "." 1*%x660-669\r\ngiven = 1*( "a" / "ab" ) "b"\r\n'
+        'maybe = 1*HEXDIG [ "0" ]\r\nlist = word *( "," word )\r\nword = 1*%x3B1-3C9\r\n'
+        'words = 1*( word " " )\r\n'
+    )
+
+    # Combinators built from the same text are shared between grammars (see
+    # `_interned`), so the repetitions here use characters no other grammar
+    # does.  Whether one is possessive depends on the rule a parse starts
+    # from: only the rules it reaches can follow the repetition.
+
+    def repetitions(name, root=None):
+        definition = Grammar(name).definition
+        parsers = getattr(definition, "parsers", [definition])
+        return [
+            _analysis.possessive(p, Grammar(root or name))
+            for p in parsers
+            if isinstance(p, Repetition)
+        ]
+
+    assert repetitions("token") == [True]
+    assert repetitions("token", "pair") == [True]
+    assert repetitions("decimal") == [True, True]
+    assert repetitions("given") == [False]
+    assert repetitions("maybe") == [False]
+    assert repetitions("list") == [False]
+    # `word` is followed by "," in `list`, and by " " in `words`.
+    assert repetitions("word", "list") == [True]
+    assert repetitions("word", "words") == [True]
+    Grammar.create("tail = word %x3B1")
+    assert repetitions("word", "tail") == [False]
+    assert repetitions("word", "list") == [True]
+    # Outside a parse nothing is dropped; inside one, nothing parses
+    # differently.
+    starts = [m.start for m in Grammar("token").definition.lparse("ab-c=d", 0)]
+    assert starts == [4, 3, 2, 1]
+    assert Grammar("pair").parse_all("ab-c=d").value == "ab-c=d"
+    assert Grammar("given").parse_all("aab").value == "aab"
+    assert Grammar("maybe").parse_all("1a0").value == "1a0"
+    assert Grammar("tail").parse_all("\u03b2\u03b1").value == "\u03b2\u03b1"
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="Inspects the pure-Python analysis.",
+)
+def test_possessive_analysis_survives_defining_unrelated_rules(monkeypatch):
+    from abnf import _analysis
+    from abnf.grammars import rfc5322
+
+    message = "From: a@example.com\r\n\r\nbody"
+    assert rfc5322.Rule("message").parse_all(message).value == message
+
+    walked = []
+    find = _analysis._find_possessives
+
+    def counting(rules):
+        walked.append(len(rules))
+        return find(rules)
+
+    monkeypatch.setattr(_analysis, "_find_possessives", counting)
+
+    class Grammar(Rule):
+        pass
+
+    for n in range(40):
+        Grammar.create(f"unrelated-{n} = 1*DIGIT %x2E")
+    assert rfc5322.Rule("message").parse_all(message).value == message
+    assert walked == []
+    # A new root is worked out over only the rules it reaches.
+    assert Grammar("unrelated-0").parse_all("12.").value == "12."
+    assert walked == [2]
+
+
+@pytest.mark.parametrize("freeze", [False, True])
+def test_pragma_comments_set_rule_settings(freeze):
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar(
+        "; @abnf: token\r\n"
+        "ident = 1*%x3B1-3C9\r\n"
+        'greedy = 1*"~" ; @abnf: ATOMIC nomemo\r\n'
+        'tail = greedy "~"\r\n'
+        'pick = "!" / "!?"\r\n'
+        "  ; @abnf: first-match\r\n"
+        "plain = 1*%x3B1-3C9 ; not a pragma: @abnf: token\r\n"
+    )
+    assert Grammar("ident").token and not Grammar("ident").atomic
+    assert Grammar("greedy").atomic and not Grammar("greedy").token
+    assert not Grammar("plain").token and not Grammar("tail").atomic
+    assert Grammar("greedy").definition.memoise is False
+    assert Grammar("greedy").memoise is False
+    assert Grammar("pick").first_match_alternation
+    if freeze:
+        Grammar.freeze()
+
+    # A token's node is its text, however its definition matched it.
+    node = Grammar("ident").parse_all("αβγ")
+    assert [(c.name, c.value, c.offset) for c in node.children] == [
+        ("literal", "αβγ", 0)
+    ]
+    assert len(Grammar("plain").parse_all("αβγ").children) == 3
+    # An atomic rule does not give back the "~" the rest needs.
+    assert Grammar("greedy").parse_all("~~~").value == "~~~"
+    with pytest.raises(ParseError):
+        Grammar("tail").parse_all("~~~")
+    assert Grammar("pick").parse("!?", 0)[1] == 1
+
+
+@pytest.mark.parametrize(
+    ("name", "grammar", "samples"),
+    [
+        (
+            "IPv4address",
+            "rfc3986",
+            ["192.168.0.1", "1.2.3.256", "1.2.3.45x", "01.2.3.4", "1.2.3", ""],
+        ),
+        (
+            "IPv6address",
+            "rfc3986",
+            [
+                "::",
+                "fe80::1%eth0",
+                "1:2:3:4:5:6:7:8",
+                "::ffff:192.168.0.1]",
+                "1:2:3:4:5:6:7::",
+                "1:2::3:4:5:6:7:8",
+                "1:::2",
+                "12345::",
+                "1.2.3.4::",
+            ],
+        ),
+        ("base64", "rfc9051", ["", "aGVsbG8=", "aGk==", "aA==", "abcdef", "ab=c"]),
+        (
+            "UTF8-octets",
+            "rfc3629",
+            [
+                "a\xc3\xa9\xe2\x82\xac\xf0\x9f\x98\x80",
+                "a\xc0\x80",
+                "ab\xed\xa0\x80",
+                "\xe2\x82",
+                "a\u0100",
+            ],
+        ),
+    ],
+)
+def test_bundled_terminal_ends_where_the_rule_does(name, grammar, samples):
+    module = __import__(f"abnf.grammars.{grammar}", fromlist=["Rule"])
+    rule = module.Rule(name)
+    terminal = Terminal.bundled(name.lower())
+    assert str(terminal) == f"Terminal('{name}')"
+    for sample in samples:
+        try:
+            expected = max(match.start for match in rule.lparse(sample, 0))
+        except ParseError:
+            expected = None
+        try:
+            (match,) = terminal.lparse(sample, 0)
+        except ParseError:
+            assert expected is None, sample
+        else:
+            assert match.start == expected, sample
+            assert [(n.value, n.offset) for n in match.nodes] == [
+                (sample[:expected], 0)
+            ]
+
+
+def test_terminal_defines_a_rule():
+    class Grammar(Rule):
+        pass
+
+    def digits(source, start):
+        end = start
+        while end < len(source) and source[end] in "0123456789":
+            end += 1
+        return end if end > start else None
+
+    Grammar.load_grammar("pair = number %xA7 number\r\n")
+    Grammar("number").definition = Terminal(digits)
+    assert str(Grammar("number").definition) == "Terminal('digits')"
+    node = Grammar("pair").parse_all("12\u00a7345")
+    assert [(c.name, c.value) for c in node.children] == [
+        ("number", "12"),
+        ("literal", "\u00a7"),
+        ("number", "345"),
+    ]
+    assert [(c.name, c.value) for c in node.children[2].children] == [
+        ("literal", "345")
+    ]
+    with pytest.raises(ParseError) as info:
+        Grammar("pair").parse_all("12\u00a7x")
+    assert info.value.farthest == 3
+    assert "Terminal('digits')" in info.value.expected
+
+    Grammar("number").definition = Terminal(lambda source, start: start + 99, "far")
+    with pytest.raises(ValueError, match="outside the source"):
+        Grammar("pair").parse_all("12\u00a7345")
+    with pytest.raises(TypeError):
+        Terminal("not callable")
+    with pytest.raises(ValueError, match="no bundled terminal"):
+        Terminal.bundled("URI")
+
+
+@pytest.mark.parametrize("freeze", [False, True])
+def test_evaluate_runs_actions_over_the_winning_match(freeze):
+    calls = []
+
+    class Grammar(Rule):
+        def visit_total(self, text, values):
+            return sum(values)
+
+        def visit_number(self, text, values):
+            return int(text)
+
+        def visit_name_part(self, text, values):
+            calls.append(text)
+            return text
+
+        def visit_word(self, text, values):
+            return (text, values)
+
+    Grammar.load_grammar(
+        "total = number *( %xA7 number )\r\n"
+        "number = 1*numeral\r\n"
+        "numeral = %x30-39\r\n"
+        "numbers = number *( %xA7 number )\r\n"
+        "name = name-part name-part\r\n"
+        'name-part = 1*"a"\r\n'
+        "; @abnf: token\r\n"
+        "word = 1*( name-part / %x3B1-3C9 )\r\n"
+    )
+    if freeze:
+        Grammar.freeze()
+
+    # An action's value stands for its rule; a rule without one, like
+    # numeral or numbers, passes up the values under it.
+    assert Grammar("total").evaluate("12§34§5") == 51
+    assert Grammar("numbers").evaluate("12§34") == [12, 34]
+    assert Grammar("numeral").evaluate("7") == []
+
+    # Only the derivation the tree would have is acted on.
+    assert Grammar("name").evaluate("aaaa") == ["aaa", "a"]
+    assert calls == ["aaa", "a"]
+    node = Grammar("name").parse_all("aaaa")
+    assert [c.value for c in node.children] == calls
+
+    # Nothing under a token is visited.
+    calls.clear()
+    assert Grammar("word").evaluate("aαa") == ("aαa", [])
+    assert calls == []
+
+    with pytest.raises(ParseError):
+        Grammar("total").evaluate("12§")
+
+
+@pytest.mark.skipif(
+    __import__("abnf.parser", fromlist=["_BACKEND"])._BACKEND == "rust",
+    reason="Builds pure-Python matches and nodes.",
+)
+def test_evaluate_walks_trees_deeper_than_the_recursion_limit():
+    class Grammar(Rule):
+        def visit_e(self, text, values):
+            return 1 + sum(values)
+
+    Grammar.load_grammar('e = "(" e ")" / "x"\r\n')
+    assert Grammar("e").evaluate("(" * 50 + "x" + ")" * 50) == 51
+
+    # A parse leaves a chain of rule matches, or of nodes, as deep as the
+    # rules nested; the actions are applied without recursing down it.
+    depth = sys.getrecursionlimit() * 2
+    actions = {"e": Grammar("e").visit_e}
+    match = _parser_python._Match([_parser_python.LiteralNode("x", 0, 1)], 1)
+    node = _parser_python.Node("e", *match.nodes)
+    for _ in range(depth):
+        match = _parser_python._Match._named("e", match)
+        node = _parser_python.Node("e", node)
+    assert match._act("x", 0, actions) == [depth]
+    built = _parser_python._Match([node], 1)
+    assert built._act("x", 0, actions) == [depth + 1]
@@ -0,0 +1,98 @@
+import pytest
+
+from abnf import GrammarError, ParseError
+from abnf.grammars import rfc3339, rfc5646
+from abnf.parser import Rule
+
+np = pytest.importorskip("numpy")
+
+from abnf.vectorized import validate  # noqa: E402
+
+
+def _expected(rule, values):
+    valid = []
+    for value in values:
+        text = value if isinstance(value, str) else value.decode("latin-1")
+        try:
+            rule.parse_all(text)
+        except ParseError:
+            valid.append(False)
+        else:
+            valid.append(True)
+    return valid
+
+
+@pytest.mark.parametrize(
+    ("rule", "values"),
+    [
+        (
+            rfc3339.Rule("date-time"),
+            [
+                "1985-04-12T23:20:50.52Z",
+                "1996-12-19T16:39:57-08:00",
+                "1996-12-19t16:39:57-0800",
+                "1996-12-19",
+                "",
+                "1990-12-31T23:59:60Zx",
+            ],
+        ),
+        (
+            rfc5646.Rule("Language-Tag"),
+            ["en-GB", "EN-gb", "x", "de-CH-1996", "i-klingon", "en--GB", "zh-Hant-é"],
+        ),
+    ],
+)
+def test_validate_agrees_with_parse_all(rule, values):
+    result = validate(rule, np.array(values))
+    assert result.valid.tolist() == _expected(rule, values)
+    assert ((result.offsets == -1) == result.valid).all()
+
+
+def test_validate_reports_where_each_value_went_wrong():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('id = 2ALPHA "-" 1*3DIGIT\r\n')
+    valid, offsets = validate(
+        Grammar("id"), np.array([["ab-1", "ab-1234"], ["a1-2", "ab-"]])
+    )
+    assert valid.tolist() == [[True, False], [False, False]]
+    # The first character nothing can continue with; the length of a value
+    # that stops short.
+    assert offsets.tolist() == [[-1, 6], [1, 3]]
+    valid, offsets = validate(Grammar("id"), np.array([b"ab-1", b"ab\x00-1"]))
+    assert valid.tolist() == [True, False]
+    assert offsets.tolist() == [-1, 2]
+
+
+def test_validate_parses_each_value_of_a_rule_it_cannot_compile():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('nest = "(" [nest] ")"\r\nword = 1*ALPHA\r\nkw = "if"\r\n')
+    Grammar("word").exclude_rule(Grammar("kw"))
+    values = ["(())", "(()", "if", "iff"]
+    assert validate(Grammar("nest"), np.array(values)).valid.tolist() == [
+        True,
+        False,
+        False,
+        False,
+    ]
+    valid, offsets = validate(Grammar("word"), np.array(values))
+    assert valid.tolist() == [False, False, False, True]
+    assert offsets.tolist()[3] == -1
+    with pytest.raises(GrammarError):
+        validate(Grammar("undefined"), np.array(["x"]))
+    with pytest.raises(TypeError):
+        validate(Grammar("word"), np.array([1, 2]))
+
+
+def test_validate_follows_first_match():
+    class Grammar(Rule):
+        pass
+
+    Grammar.load_grammar('pick = ("a" / "ab") "c"\r\n')
+    values = np.array(["ac", "abc"])
+    assert validate(Grammar("pick"), values).valid.tolist() == [True, True]
+    Grammar("pick").first_match_alternation = True
+    assert validate(Grammar("pick"), values).valid.tolist() == [True, False]